@@ -0,0 +1,352 @@
+#!/usr/bin/env python3
+"""
+Asyncio TPU Coprocessor Client
+==============================
+Awaitable counterpart of TPUCoprocessor for hosts that run the TPU beside
+an asyncio service. Nothing here blocks the event loop: the serial port is
+driven through loop.add_reader()/add_writer() on its file descriptor,
+in-process device models run on a worker thread, and waits use asyncio
+timeouts instead of time.sleep.
+
+Every UART command is a request/response transaction. Transactions from
+concurrent tasks are serialized through a single lock, so the byte stream
+on the wire is always one complete command followed by its complete
+response, whatever order tasks are scheduled in.
+
+Usage:
+    tpu = await AsyncTPUCoprocessor.open('/dev/ttyUSB1')
+    await tpu.write_weights(0, row)
+    await tpu.write_ub(0, inputs)
+    await tpu.load_program(program)
+    await tpu.execute()
+    result = await tpu.read_ub(1)
+
+open() takes any transport URL (see tpu_transport), e.g.
+'socket://host:7000' or 'emu://'. For tests,
+AsyncTPUCoprocessor(DeviceStream(UARTStandIn())) runs the whole protocol
+in-process with no serial port.
+"""
+
+import asyncio
+import os
+import struct
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+import serial
+
+from completion_predictor import CompletionPredictor
+from tpu_coprocessor import InstructionMemoryShadow, TPUStatus, UARTCommand, UARTTransport
+from tpu_transport import open_transport, is_in_process
+
+
+class _RxBuffer:
+    """Received bytes plus a waiter for read_exact()"""
+
+    def __init__(self):
+        self.data = bytearray()
+        self._waiter: Optional[asyncio.Future] = None
+
+    def feed(self, data: bytes) -> None:
+        self.data += data
+        if self._waiter is not None and not self._waiter.done():
+            self._waiter.set_result(None)
+
+    async def read_exact(self, count: int, timeout: float) -> bytes:
+        """Return `count` bytes, or fewer if the deadline expires"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while len(self.data) < count:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            self._waiter = loop.create_future()
+            try:
+                await asyncio.wait_for(self._waiter, remaining)
+            except asyncio.TimeoutError:
+                break
+            finally:
+                self._waiter = None
+        out = bytes(self.data[:count])
+        del self.data[:count]
+        return out
+
+    def clear(self) -> None:
+        self.data.clear()
+
+
+class SerialStream:
+    """
+    Non-blocking byte stream over a pyserial port (POSIX event loops only).
+
+    Reads are pushed into a buffer by an add_reader callback; writes that
+    the OS cannot take immediately are finished by an add_writer callback.
+    """
+
+    def __init__(self, ser: serial.Serial, loop: Optional[asyncio.AbstractEventLoop] = None):
+        self.ser = ser
+        self.ser.timeout = 0
+        self._fd = ser.fileno()
+        self._loop = loop or asyncio.get_running_loop()
+        self._rx = _RxBuffer()
+        self._tx = bytearray()
+        self._drained = asyncio.Event()
+        self._drained.set()
+        self._loop.add_reader(self._fd, self._on_readable)
+
+    def _on_readable(self) -> None:
+        data = self.ser.read(self.ser.in_waiting or 1)
+        if data:
+            self._rx.feed(data)
+
+    def _on_writable(self) -> None:
+        try:
+            sent = os.write(self._fd, self._tx)
+        except BlockingIOError:
+            return
+        del self._tx[:sent]
+        if not self._tx:
+            self._loop.remove_writer(self._fd)
+            self._drained.set()
+
+    async def write(self, data: bytes) -> None:
+        if not self._tx:
+            try:
+                sent = os.write(self._fd, data)
+            except BlockingIOError:
+                sent = 0
+            data = data[sent:]
+            if not data:
+                return
+            self._drained.clear()
+            self._loop.add_writer(self._fd, self._on_writable)
+        self._tx += data
+        await self._drained.wait()
+
+    async def read_exact(self, count: int, timeout: float) -> bytes:
+        return await self._rx.read_exact(count, timeout)
+
+    def discard_input(self) -> None:
+        self._rx.clear()
+        self.ser.reset_input_buffer()
+
+    def close(self) -> None:
+        self._loop.remove_reader(self._fd)
+        if self._tx:
+            self._loop.remove_writer(self._fd)
+        self.ser.close()
+
+
+class DeviceStream:
+    """
+    In-process stream to a device model with a feed(bytes) -> bytes method
+    (e.g. uart_standin.UARTStandIn). Responses are delivered on the next
+    loop iteration, or after `byte_time` seconds per byte if given, so
+    callers still have to await them as they would over a real port.
+    feed() runs, in order, on a worker thread: models that block (the
+    emulator waits out a run's modelled time) do not stall the loop.
+    """
+
+    def __init__(self, device, byte_time: float = 0.0):
+        self.device = device
+        self.byte_time = byte_time
+        self._rx = _RxBuffer()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='tpu-device')
+
+    async def write(self, data: bytes) -> None:
+        if self.byte_time:
+            await asyncio.sleep(len(data) * self.byte_time)
+        response = await asyncio.get_running_loop().run_in_executor(
+            self._executor, self.device.feed, bytes(data))
+        if response:
+            asyncio.get_running_loop().call_later(
+                len(response) * self.byte_time, self._rx.feed, response)
+
+    async def read_exact(self, count: int, timeout: float) -> bytes:
+        return await self._rx.read_exact(count, timeout)
+
+    def discard_input(self) -> None:
+        self._rx.clear()
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False)
+
+
+class AsyncTPUCoprocessor:
+    """
+    Asyncio interface to the TPU FPGA coprocessor.
+
+    Mirrors TPUCoprocessor: write_ub/write_weights return True on a good
+    ACK, read_ub returns the bytes received, execute returns True once the
+    TPU reports idle. Safe to call from many tasks at once.
+    """
+
+    UB_WORD_SIZE = 32
+
+    def __init__(self, stream, timeout: float = 1.0):
+        self.stream = stream
+        self.timeout = timeout
+        self.completion_push = False
+        self._exec_read: Optional[bool] = None  # Fused EXEC_READ support, probed on first use
+        self.predictor = CompletionPredictor()
+        self.program: List[Optional[int]] = [None] * InstructionMemoryShadow.DEPTH
+        self._lock = asyncio.Lock()
+
+    @classmethod
+    async def open(cls, port: str, baudrate: int = 115200,
+                   timeout: float = 1.0) -> 'AsyncTPUCoprocessor':
+        ser = open_transport(port, baudrate, timeout=0)
+        if is_in_process(ser):
+            return cls(DeviceStream(ser.device), timeout)
+        ser.reset_input_buffer()
+        ser.reset_output_buffer()
+        return cls(SerialStream(ser), timeout)
+
+    def close(self) -> None:
+        self.stream.close()
+
+    async def _transact(self, request: bytes, response_len: int) -> bytes:
+        """Send one command and collect its response as a single unit"""
+        async with self._lock:
+            await self.stream.write(request)
+            if not response_len:
+                return b''
+            response = await self.stream.read_exact(response_len, self.timeout)
+            if len(response) < response_len:
+                # Late bytes would be mistaken for the next response
+                self.stream.discard_input()
+            return response
+
+    @staticmethod
+    def _header(cmd: UARTCommand, addr: int, length: int) -> bytes:
+        """5-byte command header: 16-bit address and length, big-endian"""
+        return bytes([cmd, (addr >> 8) & 0xFF, addr & 0xFF, (length >> 8) & 0xFF, length & 0xFF])
+
+    # -------------------------------------------------------------------------
+    # Memory Operations
+    # -------------------------------------------------------------------------
+
+    async def write_ub(self, addr: int, data: bytes) -> bool:
+        """Write one 32-byte Unified Buffer entry (padded/truncated)"""
+        data = bytes(data).ljust(self.UB_WORD_SIZE, b'\x00')[:self.UB_WORD_SIZE]
+        header = self._header(UARTCommand.WRITE_UB, addr, len(data))
+        ack = await self._transact(header + data, 1)
+        return ack == bytes([UARTTransport.ACK_BYTE_UB])
+
+    async def write_weights(self, addr: int, data: bytes) -> bool:
+        """Write one 8-byte weight memory row (padded)"""
+        data = bytes(data).ljust(8, b'\x00')
+        header = self._header(UARTCommand.WRITE_WT, addr, len(data))
+        ack = await self._transact(header + data, 1)
+        return ack == bytes([UARTTransport.ACK_BYTE_WT])
+
+    async def read_ub(self, addr: int, length: int = 32) -> bytes:
+        """Read `length` bytes from a Unified Buffer address (bit 8 selects the bank)"""
+        return await self._transact(self._header(UARTCommand.READ_UB, addr, length), length)
+
+    # -------------------------------------------------------------------------
+    # Instruction Programming & Execution
+    # -------------------------------------------------------------------------
+
+    async def write_instruction(self, addr: int, instr: int) -> None:
+        await self._transact(bytes([UARTCommand.WRITE_INSTR, 0, addr]) + struct.pack('>I', instr), 0)
+        self.program[addr % len(self.program)] = instr
+
+    async def load_program(self, instructions: List[int]) -> None:
+        """
+        Load a program; held as one transaction so tasks cannot interleave.
+        Raises ValueError, before sending anything, if it does not fit in
+        the 32-word instruction memory.
+        """
+        if len(instructions) > InstructionMemoryShadow.DEPTH:
+            raise ValueError(f"{len(instructions)} instructions do not fit in "
+                             f"{InstructionMemoryShadow.DEPTH} words")
+        frames = b''.join(bytes([UARTCommand.WRITE_INSTR, 0, addr]) + struct.pack('>I', instr)
+                          for addr, instr in enumerate(instructions))
+        await self._transact(frames, 0)
+        self.program[:len(instructions)] = instructions
+
+    async def read_status(self) -> TPUStatus:
+        status = await self._transact(bytes([UARTCommand.READ_STATUS]), 1)
+        return TPUStatus.from_byte(status[0] if status else 0)
+
+    async def _probe(self, request: bytes, ack: int) -> bool:
+        """
+        Send a command answered by a one-byte ACK on bitstreams that have
+        it. Older ones NACK each byte; those are drained under the same
+        lock, so another task cannot read them as its response.
+        """
+        async with self._lock:
+            await self.stream.write(request)
+            if await self.stream.read_exact(1, self.timeout) == bytes([ack]):
+                return True
+            await asyncio.sleep(0.05)
+            self.stream.discard_input()
+            return False
+
+    async def set_completion_push(self, enable: bool = True) -> bool:
+        """CFG_NOTIFY: have the FPGA push 0xDD + status at HALT (False if unsupported)"""
+        ok = await self._probe(bytes([UARTCommand.CFG_NOTIFY, 0x00, 0x80 if enable else 0x00]),
+                               UARTTransport.ACK_BYTE_NOTIFY_CFG)
+        self.completion_push = enable and ok
+        return ok
+
+    async def execute(self, timeout: float = 2.0, poll_interval: float = 0.001) -> bool:
+        """Start execution and wait (without blocking the loop) for idle"""
+        if not self.completion_push:
+            await self._transact(bytes([UARTCommand.EXECUTE]), 0)
+            started = asyncio.get_running_loop().time()
+            return await self.wait_idle(timeout, poll_interval, started)
+        # The push is the EXECUTE response: hold the lock until it arrives
+        async with self._lock:
+            await self.stream.write(bytes([UARTCommand.EXECUTE]))
+            push = await self.stream.read_exact(2, timeout)
+            if len(push) == 2 and push[0] == UARTTransport.NOTIFY_BYTE:
+                return TPUStatus.from_byte(push[1]).is_idle()
+            self.stream.discard_input()
+        return (await self.read_status()).is_idle()
+
+    async def wait_idle(self, timeout: float = 5.0, poll_interval: float = 0.001,
+                        started: Optional[float] = None) -> bool:
+        """
+        Poll until idle. After EXECUTE (`started`, loop time) the first poll
+        waits for the program's predicted completion, then backs off up to
+        `poll_interval` (see completion_predictor).
+        """
+        loop = asyncio.get_running_loop()
+        program = self.program if started is not None else None
+        start = loop.time() if started is None else started
+        deadline = start + timeout
+        last_busy = None
+        for polls, delay in enumerate(self.predictor.delays(program), 1):
+            wake = start + delay if polls == 1 else loop.time() + min(delay, poll_interval)
+            await asyncio.sleep(max(0.0, min(wake, deadline) - loop.time()))
+            polled = loop.time()
+            if (await self.read_status()).is_idle():
+                self.predictor.record(program, polled - start, polls, last_busy)
+                return True
+            if polled >= deadline:
+                return False
+            last_busy = polled - start
+
+    async def execute_and_read(self, addr: int, length: int = 32,
+                               timeout: float = 2.0) -> bytes:
+        """
+        Run the loaded program and read `length` UB bytes from `addr` once it
+        halts: one fused EXEC_READ when the bitstream has it, else execute()
+        followed by read_ub(). Short on timeout.
+        """
+        if self._exec_read is None:
+            self._exec_read = await self._probe(bytes([UARTCommand.EXEC_READ, 0, 0, 0, 0]),
+                                                UARTTransport.ACK_BYTE_EXEC_READ)
+        if not self._exec_read:
+            await self.execute(timeout)
+            return await self.read_ub(addr, length)
+        async with self._lock:
+            await self.stream.write(self._header(UARTCommand.EXEC_READ, addr, length))
+            data = await self.stream.read_exact(length, timeout)
+            if len(data) < length:
+                self.stream.discard_input()
+        if len(data) < length:
+            await self.read_status()  # Any byte aborts the on-chip wait
+        return data
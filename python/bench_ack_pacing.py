@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+ACK Pacing Benchmark
+====================
+Compares per-call latency of TPUCoprocessor memory operations with the
+legacy fixed sleeps against ACK-driven pacing (return as soon as the ACK
+or the requested bytes arrive), then times a full 256-row weight memory
+load one command at a time against pipelined writes with several
+in-flight windows, and a 32-instruction program upload word by word
+against a single burst WRITE_INSTR.
+
+Runs against the pty stand-in by default; pass a serial port to measure
+a real board instead.
+
+Usage:
+    python3 bench_ack_pacing.py [UART_PORT] [--iterations N]
+"""
+
+import argparse
+import statistics
+import time
+from typing import List
+
+from tpu_coprocessor import TPUCoprocessor
+from uart_standin import PtyStandIn
+
+
+def time_calls(fn, iterations: int) -> float:
+    """Median wall time of `fn()` in milliseconds"""
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        ok = fn()
+        samples.append((time.perf_counter() - start) * 1000)
+        assert ok, "operation failed"
+    return statistics.median(samples)
+
+
+def bench(port: str, baudrate: int, iterations: int, fixed_delays: bool) -> dict:
+    tpu = TPUCoprocessor(port, baudrate, fixed_delays=fixed_delays)
+    ub_data = bytes(range(32))
+    wt_data = bytes(range(8))
+    try:
+        return {
+            'write_unified_buffer': time_calls(
+                lambda: tpu.write_unified_buffer(5, ub_data), iterations),
+            'write_weights': time_calls(
+                lambda: tpu.write_weights(2, wt_data), iterations),
+            'read_unified_buffer': time_calls(
+                lambda: tpu.read_unified_buffer(5, 32) == ub_data, iterations),
+        }
+    finally:
+        tpu.close()
+
+
+def bench_weight_load(port: str, baudrate: int, windows: List[int]) -> dict:
+    """Seconds to fill all 256 weight rows, sequential vs pipelined"""
+    rows = [bytes([i & 0xFF] * 8) for i in range(256)]
+    results = {}
+    tpu = TPUCoprocessor(port, baudrate)
+    try:
+        start = time.perf_counter()
+        for addr, row in enumerate(rows):
+            assert tpu.write_weights(addr, row), f"weight write {addr} failed"
+        results['sequential'] = time.perf_counter() - start
+        for window in windows:
+            tpu.uart.window = window
+            start = time.perf_counter()
+            failed = tpu.write_weights_bulk(0, rows)
+            results[f'window={window}'] = time.perf_counter() - start
+            assert not failed, f"{len(failed)} pipelined writes failed"
+    finally:
+        tpu.close()
+    return results
+
+
+def bench_program_upload(port: str, baudrate: int) -> dict:
+    """Seconds to upload a full 32-entry program"""
+    program = [(0x10 << 26) | (i << 18) for i in range(32)]
+    results = {}
+    # Per-word WRITE_INSTR has no ACK, so the legacy path can only sleep
+    tpu = TPUCoprocessor(port, baudrate, fixed_delays=True)
+    try:
+        start = time.perf_counter()
+        for addr, instr in enumerate(program):
+            tpu.write_instruction(addr, instr)
+        results['per-word (10 ms sleeps)'] = time.perf_counter() - start
+    finally:
+        tpu.close()
+    tpu = TPUCoprocessor(port, baudrate)
+    try:
+        if tpu.supports_instruction_burst():
+            start = time.perf_counter()
+            assert tpu.load_program(program), "burst upload failed"
+            results['burst + ACK/checksum'] = time.perf_counter() - start
+    finally:
+        tpu.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('port', nargs='?', help='Serial port (default: pty stand-in)')
+    parser.add_argument('--baud', type=int, default=115200)
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--windows', type=int, nargs='+', default=[1, 4, 16])
+    args = parser.parse_args()
+
+    standin = None
+    port = args.port
+    if port is None:
+        standin = PtyStandIn(baudrate=args.baud).start()
+        port = standin.port
+
+    try:
+        fixed = bench(port, args.baud, args.iterations, fixed_delays=True)
+        paced = bench(port, args.baud, args.iterations, fixed_delays=False)
+        weight_load = bench_weight_load(port, args.baud, args.windows)
+        program_upload = bench_program_upload(port, args.baud)
+    finally:
+        if standin is not None:
+            standin.stop()
+
+    print()
+    print(f"{'Operation':<24} {'Fixed (ms)':>11} {'ACK (ms)':>10} {'Speedup':>9}")
+    print("-" * 57)
+    for name in fixed:
+        print(f"{name:<24} {fixed[name]:>11.2f} {paced[name]:>10.2f} "
+              f"{fixed[name] / paced[name]:>8.1f}x")
+
+    # 13 bytes (5 header + 8 data) per row, 10 bit times per byte
+    wire = 256 * 13 * 10 / args.baud
+    print()
+    print(f"{'Weight memory load':<24} {'Time (ms)':>11} {'vs wire':>10}")
+    print("-" * 47)
+    for name, seconds in weight_load.items():
+        print(f"{name:<24} {seconds * 1000:>11.1f} {seconds / wire:>9.2f}x")
+    print(f"{'wire limit':<24} {wire * 1000:>11.1f}")
+
+    print()
+    print(f"{'Program upload (32)':<24} {'Time (ms)':>11}")
+    print("-" * 36)
+    for name, seconds in program_upload.items():
+        print(f"{name:<24} {seconds * 1000:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Completion Notification Benchmark
+=================================
+Compares the tail of an inference -- run the program, then read 32 bytes
+of results -- when the host polls READ_STATUS every 10 ms, polls on the
+learned completion time (wait_idle with the completion predictor), waits
+for the completion push the FPGA sends at HALT (CFG_NOTIFY), or sends one
+fused EXEC_READ, for programs of several run lengths.
+
+Runs against the emulator on a pty, with its clock scaled so the 307-cycle
+matmul program takes each requested run time; the latency over the run
+time is what the host adds on top of the hardware. Pass a serial port to
+measure a real board instead (run time is then fixed by the bitstream).
+
+Usage:
+    python3 bench_completion.py [UART_PORT] [--iterations N]
+"""
+
+import argparse
+import statistics
+import time
+from typing import Dict, List, Optional
+
+from completion_predictor import CompletionPredictor
+from tpu_coprocessor import InstructionEncoder, TPUCoprocessor, UARTCommand
+from tpu_emulator import TPUEmulator
+from uart_standin import PtyStandIn
+
+enc = InstructionEncoder()
+PROGRAM = [enc.load_weights(0, 1), enc.load_ub(0), enc.matmul(0, 0, 3),
+           enc.store_ub(1), enc.halt()]
+MODES = ('fixed', 'predicted', 'push', 'fused')
+
+
+def execute_fixed_poll(tpu: TPUCoprocessor, timeout: float = 2.0) -> bool:
+    """EXECUTE, then READ_STATUS every 10 ms (the driver before the predictor)"""
+    tpu.uart.ser.write(bytes([UARTCommand.EXECUTE]))
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if tpu.read_status().is_idle():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def run_and_read(tpu: TPUCoprocessor, mode: str) -> bool:
+    if mode == 'fused':
+        return len(tpu.execute_and_read(1, 32)) == 32
+    ok = execute_fixed_poll(tpu) if mode == 'fixed' else tpu.execute()
+    return ok and len(tpu.read_unified_buffer(1, 32)) == 32
+
+
+def bench(tpu: TPUCoprocessor, mode: str, iterations: int,
+          emu: Optional[TPUEmulator] = None) -> Dict[str, float]:
+    """Median run-and-read latency (ms) and host bytes sent per run"""
+    push = mode == 'push'
+    assert tpu.set_completion_push(push) or not push, "no CFG_NOTIFY support"
+    assert mode != 'fused' or tpu.supports_exec_read(), "no EXEC_READ support"
+    tpu.predictor = CompletionPredictor()
+    samples = []
+    sent = 0
+    for _ in range(iterations):
+        received = emu.rx_count if emu else 0
+        start = time.perf_counter()
+        ok = run_and_read(tpu, mode)
+        samples.append((time.perf_counter() - start) * 1000)
+        assert ok, "run or read failed"
+        sent += (emu.rx_count - received) if emu else 0
+    return {'latency_ms': statistics.median(samples), 'bytes_sent': sent / iterations}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('port', nargs='?', help='Serial port (default: pty emulator)')
+    parser.add_argument('--baud', type=int, default=115200)
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--run-ms', type=float, nargs='+', default=[0.003, 1, 5, 25],
+                        help='Emulated program run times')
+    args = parser.parse_args()
+
+    rows: List[tuple] = []
+    if args.port:
+        tpu = TPUCoprocessor(args.port, args.baud)
+        try:
+            assert tpu.load_program(PROGRAM), "program upload failed"
+            rows.append(('board', [bench(tpu, mode, args.iterations) for mode in MODES]))
+        finally:
+            tpu.close()
+    else:
+        emu = TPUEmulator()
+        with PtyStandIn(emu, args.baud) as dev:
+            tpu = TPUCoprocessor(dev.port, args.baud)
+            try:
+                assert tpu.load_program(PROGRAM), "program upload failed"
+                tpu.execute()
+                for run_ms in args.run_ms:
+                    emu.clock_hz = emu.last_run_cycles / (run_ms / 1000)
+                    rows.append((f"{run_ms:g} ms run",
+                                 [bench(tpu, mode, args.iterations, emu) for mode in MODES]))
+            finally:
+                tpu.close()
+
+    print()
+    print(f"{'Program':<14}" + "".join(f" {mode + ' (ms)':>14}" for mode in MODES)
+          + "".join(f" {mode + ' B':>11}" for mode in MODES))
+    print("-" * (14 + 27 * len(MODES)))
+    for name, results in rows:
+        print(f"{name:<14}" + "".join(f" {r['latency_ms']:>14.2f}" for r in results)
+              + "".join(f" {r['bytes_sent']:>11.1f}" for r in results))
+
+
+if __name__ == "__main__":
+    main()
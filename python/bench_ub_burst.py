@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Unified Buffer Burst Benchmark
+==============================
+Fills and reads back one 128-entry UB bank (4 KiB) one entry per command
+versus a single burst WRITE_UB/READ_UB, and reports the command overhead
+saved.
+
+Runs against the pty stand-in by default; pass a serial port to measure
+a real board instead.
+
+Usage:
+    python3 bench_ub_burst.py [UART_PORT] [--words N]
+"""
+
+import argparse
+import time
+
+from tpu_coprocessor import TPUCoprocessor
+from uart_standin import PtyStandIn
+
+HEADER_BYTES = 5
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('port', nargs='?', help='Serial port (default: pty stand-in)')
+    parser.add_argument('--baud', type=int, default=115200)
+    parser.add_argument('--words', type=int, default=128)
+    args = parser.parse_args()
+
+    standin = None
+    port = args.port
+    if port is None:
+        standin = PtyStandIn(baudrate=args.baud).start()
+        port = standin.port
+
+    words = args.words
+    size = TPUCoprocessor.UB_WORD_SIZE
+    data = bytes((i * 31 + 7) & 0xFF for i in range(words * size))
+
+    tpu = TPUCoprocessor(port, args.baud)
+    try:
+        t_write_single, ok = timed(lambda: all(
+            tpu.write_unified_buffer(w, data[w * size:(w + 1) * size]) for w in range(words)))
+        assert ok, "per-entry write failed"
+        t_read_single, back = timed(lambda: b''.join(
+            tpu.read_unified_buffer(w, size) for w in range(words)))
+        assert back == data, "per-entry readback mismatch"
+
+        t_write_burst, ok = timed(lambda: tpu.write_unified_buffer(0, data))
+        assert ok, "burst write failed"
+        t_read_burst, back = timed(lambda: tpu.read_unified_buffer(0, len(data)))
+        assert back == data, "burst readback mismatch"
+    finally:
+        tpu.close()
+        if standin is not None:
+            standin.stop()
+
+    wire = len(data) * 10 / args.baud
+    print()
+    print(f"{words} UB entries ({len(data)} bytes), wire time {wire * 1000:.1f} ms each way")
+    print(f"{'Transfer':<12} {'Per-entry (ms)':>15} {'Burst (ms)':>11} {'Speedup':>9}")
+    print("-" * 50)
+    for name, single, burst in (('write', t_write_single, t_write_burst),
+                                ('read', t_read_single, t_read_burst)):
+        print(f"{name:<12} {single * 1000:>15.1f} {burst * 1000:>11.1f} {single / burst:>8.1f}x")
+    print(f"Commands: {words} -> 1 per direction, "
+          f"header bytes: {words * HEADER_BYTES} -> {HEADER_BYTES}, "
+          f"round trips: {words} -> 1")
+
+
+if __name__ == "__main__":
+    main()
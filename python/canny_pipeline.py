@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""
+Tiled Canny Pipeline
+====================
+Gaussian blur, then Sobel X and Y, over a whole image with halo-aware
+tiles. Each tile is one device program, and the blurred tile never
+leaves the unified buffer.
+
+TPU_Basys3.canny_edge_detect (drivers/tpu_driver.py) walks 8x8 tiles at
+stride 4, so every pixel is convolved about four times per kernel. It
+also runs blur, Sobel X and Sobel Y as three separate passes of
+per-pixel conv2d calls. Here output tiles do not overlap. Each tile's
+input carries a 2-pixel halo (1 pixel per 3x3 stage), and the program
+for a tile does:
+
+    input rows (R+4) x groups  --blur-->  blurred rows (R+2), in the UB
+                               --Sobel X+Y-->  R*C words [gx, gy, 0]
+
+Pixels are packed three to a UB word (word q of a row holds pixels 3q..
+3q+2). An output word whose lanes compute kernel k_l at pixel x0 + o_l
+is a sum over kernel rows r and input words q of tile(r, s) @ word(q),
+where s = 3q - x0 and tile(r, s)[l, j] = k_l[r, s + j - o_l] (zero
+outside the kernel). So:
+
+- Blur writes three neighbouring pixels per word, in the same packing
+  the Sobel stage reads. That is 2 input words per kernel row.
+- Sobel X and Y share one 2-output-column tile, lanes [gx, gy]: one word
+  per pixel. Its tile depends on x mod 3, and needs 1 or 2 input words
+  per kernel row.
+
+All the tiles (at most 21) stay in weight memory for the whole image.
+Products for one tile run back to back: LD_UB + MATMUL[_ACC] into one
+accumulator entry per output word, then ST_UB after each word's last
+product. ST_UB writes bank 0, so the programs run with LD_UB reading
+bank 0 as well. The Sobel outputs overwrite the tile's input words,
+which are dead by then. Programs are longer than instruction memory and
+run through program_segments.SegmentRunner.
+
+Pixels are 8-bit. They are shifted right by `input_shift` so that the
+blurred values (Gaussian weights sum to 16) fit int8. The gradients
+saturate to int8, and an edge is a gradient magnitude above `threshold`.
+canny_reference() computes the same thing on the host.
+
+Usage:
+    canny = CannyPipeline(tpu)
+    edges = canny.run(image)                     # H x W, 0 or 255
+    print(canny.report())                        # tiles, Mpixel/s, redundancy
+"""
+
+import time
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from conv2d_im2col import conv2d_reference
+from gemm_tiler import TILE, UB_BANK_WORDS, UB_WORD_BYTES
+from program_segments import SegmentRunner
+from tpu_coprocessor import InstructionEncoder, TPUCoprocessor
+from weight_memory import WEIGHT_DEPTH
+
+GAUSSIAN = np.array([[1, 2, 1], [2, 4, 2], [1, 2, 1]])
+SOBEL_X = np.array([[-1, 0, 1], [-2, 0, 2], [-1, 0, 1]])
+SOBEL_Y = np.array([[-1, -2, -1], [0, 0, 0], [1, 2, 1]])
+HALO = 2                        # Blur and Sobel each read a 1-pixel border
+ACC_DEPTH = 256
+LEGACY_TILE, LEGACY_STRIDE = 8, 4
+
+
+def canny_reference(image: np.ndarray, threshold: int = 50,
+                    input_shift: int = 5) -> np.ndarray:
+    """Host-side edges run() should produce: 255 where the gradient exceeds threshold"""
+    pixels = np.asarray(image).astype(np.int64) >> input_shift
+    blurred = conv2d_reference(pixels, GAUSSIAN)[0]
+    gx, gy = conv2d_reference(blurred, np.stack([SOBEL_X, SOBEL_Y])).astype(np.int64)
+    edges = np.zeros(pixels.shape, dtype=np.uint8)
+    edges[HALO:-HALO, HALO:-HALO] = np.where(np.hypot(gx, gy) > threshold, 255, 0)
+    return edges
+
+
+def lane_tile(lanes: List[Tuple[np.ndarray, int]], row: int, shift: int) -> np.ndarray:
+    """
+    Weight tile taking input word q to the output word at x0, with shift
+    = 3q - x0: lane l computes kernel row `row` of lanes[l][0] at pixel
+    x0 + lanes[l][1].
+    """
+    tile = np.zeros((TILE, TILE), dtype=np.int64)
+    for lane, (kernel, offset) in enumerate(lanes):
+        for j in range(TILE):
+            col = shift + j - offset
+            if 0 <= col < TILE:
+                tile[lane, j] = kernel[row, col]
+    return tile
+
+
+class CannyPipeline:
+    """
+    Edge detection over whole images, one program per halo-aware tile of
+    `tile` = (rows, cols) output pixels. The default 12 x 7 tile packs
+    the 9 blurred columns into exactly three words and fills the UB bank.
+    """
+
+    def __init__(self, tpu: TPUCoprocessor, tile: Tuple[int, int] = (12, 7),
+                 threshold: int = 50, input_shift: int = 5, weight_base: int = 0):
+        self.tpu = tpu
+        self.rows, self.cols = tile
+        self.threshold = threshold
+        self.input_shift = input_shift
+        self.weight_base = weight_base
+        self.encoder = InstructionEncoder()
+        self.runner = SegmentRunner(tpu)
+
+        # UB layout of a tile (bank 0): input, then the blurred rows; outputs over the input
+        self.blur_groups = -(-(self.cols + HALO) // TILE)
+        self.in_groups = self.blur_groups + 1      # Blur word g reads input words g, g+1
+        self.in_words = (self.rows + HALO * 2) * self.in_groups
+        self.out_words = self.rows * self.cols
+        self.blur_base = max(self.in_words, self.out_words)
+        blur_words = (self.rows + HALO) * self.blur_groups
+        if self.blur_base + blur_words > UB_BANK_WORDS:
+            raise ValueError(f"tile {self.rows}x{self.cols} needs "
+                             f"{self.blur_base + blur_words} UB words, a bank has {UB_BANK_WORDS}")
+        if max(blur_words, self.out_words) > ACC_DEPTH:
+            raise ValueError(f"tile {self.rows}x{self.cols} needs more than "
+                             f"{ACC_DEPTH} accumulator entries")
+
+        self.tiles: List[np.ndarray] = []          # Weight tiles, in weight memory order
+        self._tile_row: Dict[bytes, int] = {}
+        blur = [(GAUSSIAN, lane) for lane in range(TILE)]
+        sobel = [(SOBEL_X, 0), (SOBEL_Y, 0)]
+        self.program = (
+            self._stage(blur, self.rows + HALO, range(0, TILE * self.blur_groups, TILE),
+                        0, self.in_groups, self.blur_base)
+            + self._stage(sobel, self.rows, range(self.cols),
+                          self.blur_base, self.blur_groups, 0)
+            + [self.encoder.halt()])
+        self.reset_stats()
+
+    def _weight_row(self, tile: np.ndarray) -> int:
+        key = tile.tobytes()
+        if key not in self._tile_row:
+            row = self.weight_base + TILE * len(self.tiles)
+            if row + TILE > WEIGHT_DEPTH:
+                raise ValueError(f"weight tiles do not fit below row {WEIGHT_DEPTH}")
+            self._tile_row[key] = row
+            self.tiles.append(tile)
+        return self._tile_row[key]
+
+    def _stage(self, lanes, rows: int, xs, src: int, src_groups: int, dst: int) -> List[int]:
+        """
+        Products of one 3x3 stage: output word i = (y, x0) over `rows` x
+        `xs`, reading word (y + r, q) at src + (y + r) * src_groups + q,
+        stored at dst + i. Words with the same x0 mod 3 share their tiles.
+        """
+        enc = self.encoder
+        words = [(y, x0) for y in range(rows) for x0 in xs]
+        offsets = [offset for _, offset in lanes]
+        body: List[int] = []
+        first = True
+        for phase in range(TILE):
+            members = [i for i, (_, x0) in enumerate(words) if x0 % TILE == phase]
+            if not members:
+                continue
+            keys = [(shift, r) for shift in range(min(offsets) - 2, max(offsets) + TILE)
+                    if (shift + phase) % TILE == 0 for r in range(TILE)
+                    if lane_tile(lanes, r, shift).any()]
+            for n, (shift, r) in enumerate(keys):
+                row = self._weight_row(lane_tile(lanes, r, shift))
+                body += [enc.load_weights(row + k, 1) for k in range(TILE)]
+                for i in members:
+                    y, x0 = words[i]
+                    word = src + (y + r) * src_groups + (x0 + shift) // TILE
+                    # The stage's first MATMUL clears every entry the others add to
+                    product = enc.matmul if first else enc.matmul_acc
+                    first = False
+                    body += [enc.load_ub(word), product(word, i, TILE)]
+                    if n == len(keys) - 1:
+                        body.append(enc.store_ub(dst + i))
+        return body
+
+    def reset_stats(self) -> None:
+        self.images = 0
+        self.tiles_run = 0
+        self.pixels = 0
+        self.wall_time = 0.0
+        self.runner.reset_stats()
+
+    def gradients(self, image: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Sobel X and Y of the blurred, shifted image: two (H-4) x (W-4)
+        int8 maps.
+
+        Raises:
+            IOError: an upload or result read failed, or a program did not halt
+        """
+        tpu = self.tpu
+        pixels = np.asarray(image).astype(np.int64) >> self.input_shift
+        h, w = pixels.shape
+        oh, ow = h - 2 * HALO, w - 2 * HALO
+        if oh < 1 or ow < 1:
+            raise ValueError(f"image {h}x{w} is smaller than the 5x5 blur + Sobel footprint")
+        start = time.monotonic()
+
+        rows = [row for tile in self.tiles for row in tpu.weight_rows(tile)]
+        if not tpu.load_weights(self.weight_base, rows):
+            raise IOError(f"weight upload to row {self.weight_base} failed")
+        if tpu.ub_bank is None:
+            tpu.probe_ub_bank()
+        if tpu.ub_bank != 0:
+            # ST_UB writes bank 0; have LD_UB read it too
+            self.runner.run([self.encoder.sync(), self.encoder.halt()])
+
+        ty, tx = -(-oh // self.rows), -(-ow // self.cols)
+        span_y = self.rows + 2 * HALO
+        span_x = TILE * self.in_groups
+        padded = np.zeros(((ty - 1) * self.rows + span_y, (tx - 1) * self.cols + span_x),
+                          dtype=np.int8)
+        padded[:h, :w] = np.clip(pixels, -128, 127)
+        gx = np.zeros((ty * self.rows, tx * self.cols), dtype=np.int8)
+        gy = np.zeros_like(gx)
+        words = np.zeros((self.in_words, UB_WORD_BYTES), dtype=np.int8)
+        out = np.zeros((self.out_words, UB_WORD_BYTES), dtype=np.int8)
+        for y in range(0, ty * self.rows, self.rows):
+            for x in range(0, tx * self.cols, self.cols):
+                words[:, :TILE] = padded[y:y + span_y, x:x + span_x].reshape(-1, TILE)
+                if not tpu.write_unified_buffer(0, words):
+                    raise IOError("unified buffer write was not acknowledged")
+                self.runner.run(self.program)
+                received = tpu.read_unified_buffer_into(0, out)
+                if received < out.nbytes:
+                    raise IOError(f"result read returned {received} of {out.nbytes} bytes")
+                gx[y:y + self.rows, x:x + self.cols] = out[:, 0].reshape(self.rows, self.cols)
+                gy[y:y + self.rows, x:x + self.cols] = out[:, 1].reshape(self.rows, self.cols)
+                self.tiles_run += 1
+        self.images += 1
+        self.pixels += h * w
+        self.wall_time += time.monotonic() - start
+        return gx[:oh, :ow], gy[:oh, :ow]
+
+    def run(self, image: np.ndarray) -> np.ndarray:
+        """Edge map of an 8-bit image: H x W uint8, 255 on edges, 0 elsewhere and on the border"""
+        gx, gy = self.gradients(image)
+        edges = np.zeros(np.shape(image), dtype=np.uint8)
+        magnitude = np.hypot(gx.astype(np.int64), gy.astype(np.int64))
+        edges[HALO:-HALO, HALO:-HALO] = np.where(magnitude > self.threshold, 255, 0)
+        return edges
+
+    def report(self) -> Dict[str, float]:
+        """
+        Tiles and throughput of the runs so far, and how often each output
+        pixel is convolved per kernel here and in canny_edge_detect
+        """
+        blurred = (self.rows + HALO) * (self.cols + HALO)
+        legacy = (LEGACY_TILE - 2) ** 2 * (LEGACY_TILE // LEGACY_STRIDE) ** 2 \
+            / LEGACY_TILE ** 2
+        return {'images': self.images, 'tiles': self.tiles_run,
+                'instructions_per_tile': len(self.program),
+                'segments': self.runner.report()['segments'],
+                'wall_s': self.wall_time,
+                'mpixels_per_s': self.pixels / self.wall_time / 1e6 if self.wall_time else 0.0,
+                'blur_per_pixel': blurred / (self.rows * self.cols),
+                'legacy_blur_per_pixel': legacy}
+
+
+def main():
+    """Edges of a synthetic image on an emulated board"""
+    import argparse
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--port', default='emu://')
+    parser.add_argument('--size', type=int, default=32)
+    args = parser.parse_args()
+
+    yy, xx = np.mgrid[:args.size, :args.size]
+    image = np.where((yy - args.size / 2) ** 2 + (xx - args.size / 2) ** 2
+                     < (args.size / 3) ** 2, 220, 30).astype(np.uint8)
+    tpu = TPUCoprocessor(args.port)
+    try:
+        canny = CannyPipeline(tpu)
+        edges = canny.run(image)
+    finally:
+        tpu.close()
+    assert np.array_equal(edges, canny_reference(image))
+    report = canny.report()
+    print(f"{args.size}x{args.size} image: {report['tiles']} tiles of "
+          f"{canny.rows}x{canny.cols}, {report['instructions_per_tile']} instructions "
+          f"({report['segments'] // max(report['tiles'], 1)} segments) per tile")
+    print(f"blur convolutions per output pixel: {report['blur_per_pixel']:.2f} "
+          f"(canny_edge_detect: {report['legacy_blur_per_pixel']:.2f})")
+    print(f"{report['mpixels_per_s']:.4f} Mpixel/s on {args.port}, "
+          f"{int(edges.sum() // 255)} edge pixels; matches the host reference")
+
+
+if __name__ == "__main__":
+    main()
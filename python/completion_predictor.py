@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Completion Predictor
+====================
+Predicts when a program started by EXECUTE reaches HALT, so status
+polling (wait_idle) can sleep until then instead of polling every 10 ms.
+
+The first run of a program is predicted from a cycle estimate: FETCH +
+DECODE per instruction plus each opcode's execute cycles, with MATMUL
+costing its row count, the systolic pipeline and the accumulator clear,
+and ST_UB the PIPE_LATENCY wait (rtl/tpu_controller.sv). Later runs use
+what was observed, per program content hash:
+
+- If the first poll already sees the TPU idle, the run finished somewhere
+  before it, so the prediction shrinks to probe lower next time.
+- Otherwise the run finished after the last poll that saw it busy; that
+  time is blended into the prediction, so a deterministic program settles
+  at one poll just before HALT and one right after it.
+
+After the predicted time, polls back off exponentially from
+`min_interval` up to `max_interval` (the old fixed 10 ms), so a program
+that takes longer than expected costs no more than before.
+
+Usage:
+    predictor = CompletionPredictor(clock_hz=100e6)
+    for delay in predictor.delays(program):   # sleep, then poll
+        ...
+    predictor.record(program, elapsed, polls)
+"""
+
+import hashlib
+import struct
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional, Sequence
+
+# Opcodes and timing (rtl/tpu_controller.sv, rtl/systolic_controller.sv)
+OP_RD_HOST_MEM = 0x01
+OP_WR_HOST_MEM = 0x02
+OP_RD_WEIGHT = 0x03
+OP_LD_UB = 0x04
+OP_ST_UB = 0x05
+OP_MATMUL = 0x10
+OP_CONV2D = 0x11
+OP_MATMUL_ACC = 0x12
+OP_SYNC = 0x30
+OP_CFG_REG = 0x31
+OP_HALT = 0x3F
+VPU_OPS = range(0x18, 0x24)
+
+PIPE_LATENCY = 3            # ST_UB: 1 cycle BRAM + 2 cycles pipeline
+FETCH_DECODE_CYCLES = 2
+WEIGHT_LOAD_CYCLES = 7
+SYS_PIPELINE_LATENCY = 4
+ACC_CLEAR_CYCLES = 256 + 2
+# Execute cycles after FETCH + DECODE; NOP and invalid opcodes retire in DECODE
+EXEC_CYCLES = {OP_RD_WEIGHT: 12, OP_LD_UB: 2, OP_ST_UB: 2 + PIPE_LATENCY,
+               OP_RD_HOST_MEM: 2, OP_WR_HOST_MEM: 2,
+               OP_SYNC: 1, OP_CFG_REG: 1, OP_HALT: 1}
+VPU_CYCLES = 4
+
+
+def running_prefix(program: Sequence[Optional[int]]) -> Optional[List[int]]:
+    """Instructions EXECUTE runs (PC 0 through the first HALT); None if unknown"""
+    prefix = []
+    for instr in program:
+        if instr is None:
+            return None
+        prefix.append(instr)
+        if (instr >> 26) & 0x3F == OP_HALT:
+            return prefix
+    return None  # No HALT: the controller never finishes
+
+
+@dataclass
+class ProgramStats:
+    """Observed completion times of one program"""
+    estimate: float             # Seconds from EXECUTE to HALT
+    runs: int = 0
+    polls: int = 0
+    total_time: float = 0.0
+
+
+class CompletionPredictor:
+    """
+    Per-program completion time estimates and the poll schedule built on them.
+
+    Times are measured from the moment EXECUTE was written. The READ_STATUS
+    byte spends as long on the wire as EXECUTE did, so polling at that
+    offset samples the status right as the program would finish.
+    """
+
+    def __init__(self, clock_hz: float = 100e6, min_interval: float = 0.0002,
+                 max_interval: float = 0.01, backoff: float = 2.0,
+                 shrink: float = 0.98, smoothing: float = 0.5):
+        self.clock_hz = clock_hz
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.shrink = shrink
+        self.smoothing = smoothing
+        self.programs: Dict[bytes, ProgramStats] = {}
+
+    @staticmethod
+    def key(program: Sequence[Optional[int]]) -> Optional[bytes]:
+        prefix = running_prefix(program)
+        if prefix is None:
+            return None
+        return hashlib.blake2b(struct.pack(f'>{len(prefix)}I', *prefix),
+                               digest_size=16).digest()
+
+    @staticmethod
+    def estimate_cycles(program: Sequence[int]) -> int:
+        """Static cycle count of a run from PC 0 to HALT"""
+        cycles = 0
+        for instr in running_prefix(program) or []:
+            opcode = (instr >> 26) & 0x3F
+            rows = (instr >> 2) & 0xFF
+            cycles += FETCH_DECODE_CYCLES
+            if opcode in (OP_MATMUL, OP_CONV2D, OP_MATMUL_ACC):
+                cycles += 1 + WEIGHT_LOAD_CYCLES + rows + 2 + SYS_PIPELINE_LATENCY + 2
+                if opcode != OP_MATMUL_ACC:
+                    cycles += ACC_CLEAR_CYCLES
+            elif opcode in VPU_OPS:
+                cycles += VPU_CYCLES
+            else:
+                cycles += EXEC_CYCLES.get(opcode, 0)
+        return cycles
+
+    def predict(self, program: Optional[Sequence[Optional[int]]]) -> float:
+        """Seconds after EXECUTE to the first poll (0 for an unknown program)"""
+        key = self.key(program) if program is not None else None
+        if key is None:
+            return 0.0
+        stats = self.programs.get(key)
+        if stats is None:
+            return self.estimate_cycles(program) / self.clock_hz
+        return stats.estimate
+
+    def delays(self, program: Optional[Sequence[Optional[int]]]) -> Iterator[float]:
+        """Sleep before each poll: the prediction, then exponential backoff"""
+        yield self.predict(program)
+        interval = self.min_interval
+        while True:
+            yield interval
+            interval = min(interval * self.backoff, self.max_interval)
+
+    def record(self, program: Optional[Sequence[Optional[int]]], elapsed: float,
+               polls: int, last_busy: Optional[float] = None) -> None:
+        """
+        Learn from a run first seen idle `elapsed` s after EXECUTE, on poll
+        `polls`; `last_busy` is when the poll before it still saw it busy.
+        """
+        key = self.key(program) if program is not None else None
+        if key is None:
+            return
+        stats = self.programs.get(key)
+        if stats is None:
+            stats = self.programs[key] = ProgramStats(self.predict(program))
+        if last_busy is None:
+            # Done before the first poll: only an upper bound, so probe earlier
+            stats.estimate = min(stats.estimate, elapsed) * self.shrink
+        elif stats.runs == 0:
+            stats.estimate = last_busy
+        else:
+            # HALT came after `last_busy`: aim the first poll just short of it
+            stats.estimate += self.smoothing * (last_busy - stats.estimate)
+        stats.runs += 1
+        stats.polls += polls
+        stats.total_time += elapsed
+
+    def report(self) -> Dict[str, Dict[str, float]]:
+        """Per-program runs, current prediction, mean completion time and polls per run"""
+        return {key.hex()[:12]: {'runs': stats.runs,
+                                 'predicted_ms': stats.estimate * 1e3,
+                                 'mean_ms': stats.total_time / stats.runs * 1e3,
+                                 'polls_per_run': stats.polls / stats.runs}
+                for key, stats in self.programs.items() if stats.runs}
@@ -12,9 +12,19 @@ import struct
 import threading
 import json
 import os
+from collections import deque
+from concurrent.futures import Future, TimeoutError as FutureTimeout
 from enum import IntEnum
 from typing import List, Tuple, Optional, Union
 from dataclasses import dataclass
+try:
+    from tpu_transport import open_transport, is_in_process
+except ImportError:  # drivers/ used on its own: serial ports and pyserial URLs only
+    def open_transport(url, baudrate=115200, timeout=2.0):
+        return serial.serial_for_url(url, baudrate=baudrate, timeout=timeout)
+
+    def is_in_process(ser):
+        return False
 
 # ============================================================================
 # OPCODE DEFINITIONS - All 20 Instructions
@@ -124,6 +134,60 @@ class TPUStatus:
                 f"ub_busy={self.ub_busy}, sys_done={self.sys_done}, "
                 f"vpu_done={self.vpu_done}, ub_done={self.ub_done}")
 
+# ============================================================================
+# RX DEMULTIPLEXER
+# ============================================================================
+
+class RingBuffer:
+    """Fixed-capacity byte FIFO between the serial port and the dispatcher"""
+
+    def __init__(self, capacity: int = 4096):
+        self._buf = bytearray(capacity)
+        self._head = 0
+        self._size = 0
+        self.overflows = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def write(self, data: bytes) -> None:
+        """Append bytes; on overflow the oldest bytes are dropped"""
+        capacity = len(self._buf)
+        if len(data) > capacity:
+            self.overflows += len(data) - capacity
+            data = data[-capacity:]
+        excess = self._size + len(data) - capacity
+        if excess > 0:
+            self.overflows += excess
+            self._head = (self._head + excess) % capacity
+            self._size -= excess
+        tail = (self._head + self._size) % capacity
+        first = min(len(data), capacity - tail)
+        self._buf[tail:tail + first] = data[:first]
+        self._buf[:len(data) - first] = data[first:]
+        self._size += len(data)
+
+    def read(self, count: int) -> bytes:
+        """Remove and return up to `count` bytes"""
+        count = min(count, self._size)
+        capacity = len(self._buf)
+        first = min(count, capacity - self._head)
+        out = bytes(self._buf[self._head:self._head + first]) + bytes(self._buf[:count - first])
+        self._head = (self._head + count) % capacity
+        self._size -= count
+        return out
+
+
+class PendingResponse:
+    """A response the FPGA owes us: `length` bytes, in command order"""
+
+    def __init__(self, length: int):
+        self.length = length
+        self.data = bytearray()
+        self.future: Future = Future()
+        self.abandoned_at: Optional[float] = None
+
+
 # ============================================================================
 # MAIN COPROCESSOR DRIVER
 # ============================================================================
@@ -139,8 +203,16 @@ class TPU_Coprocessor:
     - Flow control and backpressure handling
     - Status monitoring
     - Unified Buffer and Weight Memory access
+    - Background RX thread: every response (ACK, status byte, stream
+      ACK, UB payload) is delivered to the Future of the command that
+      caused it, so nothing is lost to input flushes and callers can do
+      host work while a response is in flight
     """
     
+    # A timed-out response keeps its place in the RX queue this long, so
+    # late bytes are absorbed instead of being handed to the next command
+    STALE_RESPONSE_S = 1.0
+    
     def __init__(self, port='/dev/ttyUSB0', baud=115200, timeout=2, verbose=True):
         """
         Initialize TPU coprocessor connection
@@ -164,12 +236,23 @@ class TPU_Coprocessor:
         self._debug_log_path = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), '.cursor', 'debug.log')
         self._stream_buffer_sel = 0
         
+        # RX demultiplexer state
+        self._rx_ring = RingBuffer()
+        self._pending = deque()
+        self._pending_lock = threading.Lock()
+        # Held from registering a response until its command is written, so
+        # commands reach the wire in the order their responses are queued
+        self._send_lock = threading.RLock()
+        self._rx_thread = None
+        self._rx_running = False
+        
         # Statistics
         self.stats = {
             'instructions_sent': 0,
             'instructions_executed': 0,
             'bytes_sent': 0,
             'bytes_received': 0,
+            'unsolicited_bytes': 0,
             'errors': 0
         }
         
@@ -178,14 +261,16 @@ class TPU_Coprocessor:
     def _connect(self):
         """Establish serial connection"""
         try:
-            self.ser = serial.Serial(self.port, self.baud, timeout=self.timeout)
+            self.ser = open_transport(self.port, self.baud, self.timeout)
             # #region agent log
             try:
                 with open(self._debug_log_path, 'a') as f:
                     f.write(json.dumps({"sessionId":"debug-session","runId":"run1","hypothesisId":"D","location":"tpu_coprocessor_driver.py:_connect","message":"Serial port opened","data":{"port":self.port,"baud":self.baud,"timeout":self.timeout,"parity":self.ser.parity,"stopbits":self.ser.stopbits,"bytesize":self.ser.bytesize},"timestamp":int(time.time()*1000)}) + "\n")
             except: pass
             # #endregion
-            time.sleep(2)  # Wait for FPGA initialization
+            if not is_in_process(self.ser):
+                time.sleep(2)  # Wait for FPGA initialization
+            self._start_rx_thread()
             if self.verbose:
                 print(f"✓ Connected to TPU coprocessor on {self.port} at {self.baud} baud")
         except Exception as e:
@@ -203,6 +288,7 @@ class TPU_Coprocessor:
         if self.ser and self.ser.is_open:
             if self._stream_mode:
                 self.disable_stream_mode()
+            self._stop_rx_thread()
             self.ser.close()
             if self.verbose:
                 print("✓ Connection closed")
@@ -232,7 +318,8 @@ class TPU_Coprocessor:
                 f.write(json.dumps({"sessionId":"debug-session","runId":"run1","hypothesisId":"A","location":"tpu_coprocessor_driver.py:_send_command","message":"Sending UART command","data":{"cmd":hex(cmd),"args":[hex(a) for a in args],"bytes":data.hex(),"length":len(data)},"timestamp":int(time.time()*1000)}) + "\n")
         except: pass
         # #endregion
-        bytes_written = self.ser.write(data)
+        with self._send_lock:
+            bytes_written = self.ser.write(data)
         # #region agent log
         try:
             import json
@@ -242,43 +329,94 @@ class TPU_Coprocessor:
         # #endregion
         self.stats['bytes_sent'] += len(data)
     
-    def _read_response(self, length: int, timeout: float = 1.0) -> bytes:
-        """Read response from FPGA"""
-        # Set timeout for this read
-        old_timeout = self.ser.timeout
-        self.ser.timeout = timeout
-        # #region agent log
-        try:
-            import json
-            with open(self._debug_log_path, 'a') as f:
-                f.write(json.dumps({"sessionId":"debug-session","runId":"run1","hypothesisId":"C","location":"tpu_coprocessor_driver.py:_read_response","message":"Starting read","data":{"expected_length":length,"timeout":timeout,"in_waiting":self.ser.in_waiting},"timestamp":int(time.time()*1000)}) + "\n")
-        except: pass
-        # #endregion
-        try:
-            data = self.ser.read(length)
-            # #region agent log
+    def _start_rx_thread(self) -> None:
+        """Start the background reader that owns all serial input"""
+        self.ser.timeout = 0.05  # Bounds how long stop() waits for the thread
+        self._rx_running = True
+        self._rx_thread = threading.Thread(target=self._rx_loop, name='tpu-rx', daemon=True)
+        self._rx_thread.start()
+    
+    def _stop_rx_thread(self) -> None:
+        self._rx_running = False
+        if self._rx_thread is not None:
+            self._rx_thread.join(timeout=1.0)
+            self._rx_thread = None
+    
+    def _rx_loop(self) -> None:
+        """Read continuously into the ring buffer and hand bytes out in order"""
+        while self._rx_running:
             try:
-                import json
-                with open(self._debug_log_path, 'a') as f:
-                    f.write(json.dumps({"sessionId":"debug-session","runId":"run1","hypothesisId":"C","location":"tpu_coprocessor_driver.py:_read_response","message":"Read complete","data":{"expected_length":length,"actual_length":len(data),"data_hex":data.hex() if data else "","in_waiting":self.ser.in_waiting},"timestamp":int(time.time()*1000)}) + "\n")
-            except: pass
-            # #endregion
-            self.stats['bytes_received'] += len(data)
-            return data
-        finally:
-            self.ser.timeout = old_timeout
+                data = self.ser.read(self.ser.in_waiting or 1)
+            except (serial.SerialException, OSError, TypeError):
+                break  # Port closed underneath us
+            with self._pending_lock:
+                if data:
+                    self._rx_ring.write(data)
+                    self.stats['bytes_received'] += len(data)
+                self._dispatch()
+    
+    def _dispatch(self) -> None:
+        """Assign buffered bytes to pending responses (caller holds the lock)"""
+        now = time.monotonic()
+        while self._pending:
+            head = self._pending[0]
+            if head.abandoned_at is not None and now - head.abandoned_at > self.STALE_RESPONSE_S:
+                self._pending.popleft()  # Never arrived; stop holding the queue
+                continue
+            if not len(self._rx_ring):
+                return
+            head.data += self._rx_ring.read(head.length - len(head.data))
+            if len(head.data) < head.length:
+                return
+            self._pending.popleft()
+            if head.abandoned_at is None:
+                head.future.set_result(bytes(head.data))
+        # Bytes nobody is waiting for (e.g. ACK of a command sent before connect)
+        if len(self._rx_ring):
+            self.stats['unsolicited_bytes'] += len(self._rx_ring)
+            self._rx_ring.read(len(self._rx_ring))
+    
+    def _transact(self, data: bytes, response_len: int) -> Optional[PendingResponse]:
+        """
+        Send a command, registering its response first so the RX thread
+        can never see the reply before anyone is waiting for it.
+        """
+        pending = None
+        with self._send_lock:
+            if response_len:
+                pending = PendingResponse(response_len)
+                with self._pending_lock:
+                    self._pending.append(pending)
+            self.ser.write(data)
+            self.stats['bytes_sent'] += len(data)
+        return pending
+    
+    def _wait(self, pending: PendingResponse, timeout: float) -> bytes:
+        """Block for a response; on timeout return whatever part arrived"""
+        try:
+            return pending.future.result(timeout)
+        except FutureTimeout:
+            with self._pending_lock:
+                if pending.future.done():
+                    return pending.future.result()
+                pending.abandoned_at = time.monotonic()
+                self.stats['errors'] += 1
+                return bytes(pending.data)
     
     # ========================================================================
     # UNIFIED BUFFER OPERATIONS
     # ========================================================================
     
-    def write_ub(self, addr: int, data: Union[np.ndarray, bytes]) -> None:
+    def write_ub(self, addr: int, data: Union[np.ndarray, bytes]) -> Future:
         """
         Write data to Unified Buffer
         
         Args:
             addr: UB address (0-255)
             data: numpy array or bytes (padded to multiple of 32 bytes)
+        
+        Returns:
+            Future: resolves to the ACK byte (b'\\xAA') when the FPGA answers
         """
         if isinstance(data, np.ndarray):
             data = data.tobytes()
@@ -290,8 +428,7 @@ class TPU_Coprocessor:
         
         length = len(data)
         
-        # Send command: CMD, addr_hi, addr_lo, length_hi, length_lo
-        self._send_command(UARTCommand.WRITE_UB, 0, addr, length >> 8, length & 0xFF)
+        header = bytes([UARTCommand.WRITE_UB, 0, addr, length >> 8, length & 0xFF])
         
         # #region agent log
         try:
@@ -300,19 +437,29 @@ class TPU_Coprocessor:
                 f.write(json.dumps({"sessionId":"debug-session","runId":"run1","hypothesisId":"A","location":"tpu_coprocessor_driver.py:write_ub","message":"Writing UB data","data":{"addr":addr,"length":length,"first_4_bytes":data[:4].hex() if len(data) >= 4 else data.hex()},"timestamp":int(time.time()*1000)}) + "\n")
         except: pass
         # #endregion
-        # Send data
-        bytes_written = self.ser.write(data)
+        # Send command and data; the ACK (0xAA) resolves the returned future
+        pending = self._transact(header + data, 1)
         # #region agent log
         try:
             import json
             with open(self._debug_log_path, 'a') as f:
-                f.write(json.dumps({"sessionId":"debug-session","runId":"run1","hypothesisId":"A","location":"tpu_coprocessor_driver.py:write_ub","message":"UB data written","data":{"addr":addr,"bytes_written":bytes_written,"expected":length},"timestamp":int(time.time()*1000)}) + "\n")
+                f.write(json.dumps({"sessionId":"debug-session","runId":"run1","hypothesisId":"A","location":"tpu_coprocessor_driver.py:write_ub","message":"UB data written","data":{"addr":addr,"expected":length},"timestamp":int(time.time()*1000)}) + "\n")
         except: pass
         # #endregion
-        self.stats['bytes_sent'] += length
         
         if self.verbose:
             print(f"✓ Wrote {length} bytes to UB[{addr}]")
+        return pending.future
+    
+    def read_ub_async(self, addr: int, length: int) -> Future:
+        """
+        Issue a UB read without waiting for it
+        
+        Returns:
+            Future: resolves to the `length` bytes read
+        """
+        pending = self._transact(bytes([UARTCommand.READ_UB, 0, addr, length >> 8, length & 0xFF]), length)
+        return pending.future
     
     def read_ub(self, addr: int, length: int, timeout: float = 2.0) -> bytes:
         """
@@ -337,14 +484,9 @@ class TPU_Coprocessor:
                 f.write(json.dumps({"sessionId":"debug-session","runId":"run1","hypothesisId":"C","location":"tpu_coprocessor_driver.py:read_ub","message":"Reading UB","data":{"addr":addr,"length":length,"timeout":timeout},"timestamp":int(time.time()*1000)}) + "\n")
         except: pass
         # #endregion
-        # Send command
-        self._send_command(UARTCommand.READ_UB, 0, addr, length >> 8, length & 0xFF)
-        
-        # Small delay to let FPGA process command
-        time.sleep(0.01)
-        
-        # Read response with longer timeout
-        data = self._read_response(length, timeout=timeout)
+        # Send command; the RX thread collects exactly `length` bytes for it
+        pending = self._transact(bytes([UARTCommand.READ_UB, 0, addr, length >> 8, length & 0xFF]), length)
+        data = self._wait(pending, timeout)
         # #region agent log
         try:
             import json
@@ -362,13 +504,16 @@ class TPU_Coprocessor:
     # WEIGHT MEMORY OPERATIONS
     # ========================================================================
     
-    def write_weights(self, addr: int, data: Union[np.ndarray, bytes]) -> None:
+    def write_weights(self, addr: int, data: Union[np.ndarray, bytes]) -> Future:
         """
         Write weights to Weight Memory
         
         Args:
             addr: Weight memory address (0-1023)
             data: numpy array or bytes (padded to multiple of 8 bytes)
+        
+        Returns:
+            Future: resolves to the ACK byte (b'\\xBB') when the FPGA answers
         """
         if isinstance(data, np.ndarray):
             data = data.tobytes()
@@ -382,15 +527,13 @@ class TPU_Coprocessor:
         addr_hi = (addr >> 8) & 0xFF
         addr_lo = addr & 0xFF
         
-        # Send command
-        self._send_command(UARTCommand.WRITE_WT, addr_hi, addr_lo, length >> 8, length & 0xFF)
-        
-        # Send data
-        self.ser.write(data)
-        self.stats['bytes_sent'] += length
+        # Send command and data
+        header = bytes([UARTCommand.WRITE_WT, addr_hi, addr_lo, length >> 8, length & 0xFF])
+        pending = self._transact(header + data, 1)
         
         if self.verbose:
             print(f"✓ Wrote {length} bytes to Weight Memory[{addr}]")
+        return pending.future
     
     # ========================================================================
     # INSTRUCTION BUFFER MODE (Legacy)
@@ -412,12 +555,13 @@ class TPU_Coprocessor:
         
         instr = Instruction(opcode, arg1, arg2, arg3, flags)
         
-        # Send command: CMD, addr_hi, addr_lo
-        self._send_command(UARTCommand.WRITE_INSTR, 0, addr)
-        
-        # Send instruction (4 bytes, big-endian)
-        self.ser.write(instr.to_bytes())
-        self.stats['bytes_sent'] += 4
+        with self._send_lock:
+            # Send command: CMD, addr_hi, addr_lo
+            self._send_command(UARTCommand.WRITE_INSTR, 0, addr)
+
+            # Send instruction (4 bytes, big-endian)
+            self.ser.write(instr.to_bytes())
+            self.stats['bytes_sent'] += 4
         self.stats['instructions_sent'] += 1
         
         if self.verbose:
@@ -444,14 +588,13 @@ class TPU_Coprocessor:
             # #region agent log
             import json,time;open('/Users/abiralshakya/Documents/tpu_to_fpga/.cursor/debug.log','a').write(json.dumps({'location':'tpu_coprocessor_driver.py:353','message':'enable_stream_mode called','data':{'current_stream_mode':self._stream_mode,'bytes_in_waiting':self.ser.in_waiting if self.ser else -1},'timestamp':int(time.time()*1000),'sessionId':'debug-session','hypothesisId':'E'})+'\n')
             # #endregion
-            # Send stream mode command
-            self._send_command(UARTCommand.STREAM_INSTR)
+            # Send stream mode command (response is registered with it below)
             # #region agent log
             import json,time;open('/Users/abiralshakya/Documents/tpu_to_fpga/.cursor/debug.log','a').write(json.dumps({'location':'tpu_coprocessor_driver.py:362','message':'Sent STREAM_INSTR command','data':{'command':UARTCommand.STREAM_INSTR,'bytes_sent':self.stats['bytes_sent']},'timestamp':int(time.time()*1000),'sessionId':'debug-session','hypothesisId':'E'})+'\n')
             # #endregion
             
             # Read response: 0x00=ready, 0xFF=not ready, 0x01=buffer select
-            response = self._read_response(1)
+            response = self._wait(self._transact(bytes([UARTCommand.STREAM_INSTR]), 1), 1.0)
             # #region agent log
             import json,time;open('/Users/abiralshakya/Documents/tpu_to_fpga/.cursor/debug.log','a').write(json.dumps({'location':'tpu_coprocessor_driver.py:369','message':'Received stream mode response','data':{'response_len':len(response),'response_hex':response.hex() if response else 'empty','status_byte':response[0] if response else None},'timestamp':int(time.time()*1000),'sessionId':'debug-session','hypothesisId':'E'})+'\n')
             # #endregion
@@ -537,14 +680,13 @@ class TPU_Coprocessor:
         # #region agent log
         import json,time;open('/Users/abiralshakya/Documents/tpu_to_fpga/.cursor/debug.log','a').write(json.dumps({'location':'tpu_coprocessor_driver.py:435','message':'Sending instruction bytes','data':{'instr_bytes':instr_bytes.hex(),'bytes_in_waiting_before':self.ser.in_waiting if self.ser else -1},'timestamp':int(time.time()*1000),'sessionId':'debug-session','hypothesisId':'A,B'})+'\n')
         # #endregion
-        self.ser.write(instr_bytes)
-        self.stats['bytes_sent'] += 4
+        pending = self._transact(instr_bytes, 1)
         
         # Read acknowledgment: 0x00=accepted, 0xFF=full, 0x01=buffer swapped
         # #region agent log
         import json,time;open('/Users/abiralshakya/Documents/tpu_to_fpga/.cursor/debug.log','a').write(json.dumps({'location':'tpu_coprocessor_driver.py:445','message':'About to read ACK','data':{'bytes_in_waiting':self.ser.in_waiting if self.ser else -1,'timeout':self.timeout},'timestamp':int(time.time()*1000),'sessionId':'debug-session','hypothesisId':'B,D'})+'\n')
         # #endregion
-        response = self._read_response(1)
+        response = self._wait(pending, 1.0)
         # #region agent log
         import json,time;open('/Users/abiralshakya/Documents/tpu_to_fpga/.cursor/debug.log','a').write(json.dumps({'location':'tpu_coprocessor_driver.py:451','message':'Received ACK response','data':{'response_len':len(response),'response_hex':response.hex() if response else 'empty','ack_byte':response[0] if response else None},'timestamp':int(time.time()*1000),'sessionId':'debug-session','hypothesisId':'A,D'})+'\n')
         # #endregion
@@ -658,12 +800,7 @@ class TPU_Coprocessor:
                 f.write(json.dumps({"sessionId":"debug-session","runId":"run1","hypothesisId":"B","location":"tpu_coprocessor_driver.py:read_status","message":"Reading status","data":{"timeout":timeout},"timestamp":int(time.time()*1000)}) + "\n")
         except: pass
         # #endregion
-        self._send_command(UARTCommand.READ_STATUS)
-        
-        # Small delay to let FPGA process command
-        time.sleep(0.01)
-        
-        response = self._read_response(1, timeout=timeout)
+        response = self._wait(self._transact(bytes([UARTCommand.READ_STATUS]), 1), timeout)
         
         # #region agent log
         try:
@@ -700,23 +837,32 @@ class TPU_Coprocessor:
                 print(f"⚠ Warning: Failed to parse status byte 0x{response[0]:02X}: {e}")
             return None
     
+    def read_status_async(self) -> Future:
+        """Issue a status read; the future resolves to the raw status byte"""
+        return self._transact(bytes([UARTCommand.READ_STATUS]), 1).future
+    
     def wait_done(self, timeout: float = 10.0, poll_interval: float = 0.01) -> bool:
         """
         Wait until TPU is done executing
         
+        Polls back off exponentially from 0.2 ms up to `poll_interval`, so
+        short programs do not pay a full polling period.
+        
         Args:
             timeout: Maximum seconds to wait
-            poll_interval: Status polling interval
+            poll_interval: Longest status polling interval
         
         Returns:
             bool: True if done, False if timeout
         """
         start = time.time()
+        interval = min(0.0002, poll_interval)
         while time.time() - start < timeout:
             status = self.read_status()
             if status and not status.sys_busy and not status.vpu_busy:
                 return True
-            time.sleep(poll_interval)
+            time.sleep(interval)
+            interval = min(interval * 2, poll_interval)
         return False
     
     # ========================================================================
@@ -14,6 +14,14 @@ try:
     VISUALIZATION_AVAILABLE = True
 except ImportError:
     VISUALIZATION_AVAILABLE = False
+try:
+    from tpu_transport import open_transport, is_in_process
+except ImportError:  # drivers/ used on its own: serial ports and pyserial URLs only
+    def open_transport(url, baudrate=115200, timeout=2.0):
+        return serial.serial_for_url(url, baudrate=baudrate, timeout=timeout)
+
+    def is_in_process(ser):
+        return False
 
 class TPU_Basys3:
     """UART interface to TPU on Basys3 FPGA"""
@@ -49,9 +57,10 @@ class TPU_Basys3:
     OP_HALT         = 0x3F
 
     def __init__(self, port='/dev/ttyUSB0', baud=115200, timeout=2):
-        """Initialize UART connection to TPU"""
-        self.ser = serial.Serial(port, baud, timeout=timeout)
-        time.sleep(2)  # Wait for FPGA to initialize
+        """Initialize UART connection to TPU (port may be a transport URL)"""
+        self.ser = open_transport(port, baud, timeout)
+        if not is_in_process(self.ser):
+            time.sleep(2)  # Wait for FPGA to initialize
         print(f"Connected to TPU on {port} at {baud} baud")
 
     def close(self):
@@ -0,0 +1,400 @@
+#!/usr/bin/env python3
+"""
+GEMM Tiler
+==========
+Compiles an int8 GEMM of any shape, C = A @ B with A M x K (weights) and
+B K x N (input columns), into host steps and 32-instruction programs for
+the 3x3 array, and runs them on a TPUCoprocessor.
+
+A is cut into 3x3 weight tiles (i, k) and B into 3-element input words
+(k, n), both zero-padded. Output word (i, n) accumulates tile (i, k) @
+word (k, n) over every k, then ST_UB saturates it to int8.
+
+Hardware rules the schedule follows (rtl/tpu_controller.sv, accumulator.sv):
+
+- MATMUL clears the *whole* accumulator buffer before writing its entry;
+  MATMUL_ACC adds to one entry. So the first product of a clear epoch is
+  a MATMUL (the first K-slice) and every other product a MATMUL_ACC,
+  which lands on a cleared entry the first time each entry is touched.
+- ST_UB stores the entry of the MATMUL before it, so each output is
+  stored right after its last K-slice.
+- The weight FIFO holds one tile (3 RD_WEIGHT rows), so each program
+  loads the tile its products use; instruction memory holds 32 words.
+
+Loop nest, per column block of `block` columns:
+
+    for k-chunk (the input words that fit in the UB at once):
+        upload input words (k, n)
+        for row strip i:
+            for k in chunk: RD_WEIGHT tile (i, k)
+                for n in block: LD_UB (k, n); MATMUL[_ACC] -> acc;
+                                ST_UB if k is the last K-slice
+
+With one k-chunk each strip is its own clear epoch; with several, the
+partial sums of a whole block live in the accumulator across chunks.
+Each tile is read into the FIFO once per block, so wider blocks mean
+fewer weight reloads. When all tiles fit in weight memory they are
+uploaded once ('columns' order). Otherwise the tiler compares re-uploading
+tiles per block ('columns') with uploading each group of row strips once
+and re-sending the inputs per group ('rows'), and keeps the order and
+block width with the fewest UART bytes, then the fewest reloads.
+
+Usage:
+    tiler = GemmTiler()
+    plan = tiler.plan(M, K, N)
+    print(plan.stats())
+    C = tiler.run(tpu, A, B)
+    assert np.array_equal(C, gemm_reference(A, B))
+"""
+
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from tpu_coprocessor import InstructionEncoder, InstructionMemoryShadow, Opcode, TPUCoprocessor
+from weight_memory import WEIGHT_DEPTH, WEIGHT_ROW_BYTES
+
+TILE = 3                                     # Systolic array size
+UB_BANK_WORDS = 128
+OUTPUT_WORDS = 32                            # UB words 96..127 of bank 0 hold results
+INPUT_WORDS = UB_BANK_WORDS - OUTPUT_WORDS   # UB words 0..95 of the LD_UB bank
+ACC_DEPTH = 256
+PROGRAM_WORDS = InstructionMemoryShadow.DEPTH
+UB_WORD_BYTES = TPUCoprocessor.UB_WORD_SIZE
+
+WEIGHTS, INPUTS, PROGRAM, READ = 'weights', 'inputs', 'program', 'read'
+
+
+def gemm_reference(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """
+    Vectorized model of the tiled computation: zero-pad to 3x3 tiles, sum
+    tile products over K in the 32-bit accumulator, saturate to int8.
+    """
+    a = np.clip(a, -128, 127).astype(np.int64)
+    b = np.clip(b, -128, 127).astype(np.int64)
+    (m, k), n = a.shape, b.shape[1]
+    mt, kt = -(-m // TILE), -(-k // TILE)
+    ap = np.zeros((mt * TILE, kt * TILE), dtype=np.int64)
+    bp = np.zeros((kt * TILE, n), dtype=np.int64)
+    ap[:m, :k] = a
+    bp[:k] = b
+    tiles = ap.reshape(mt, TILE, kt, TILE)           # [i, row, k, col]
+    words = bp.reshape(kt, TILE, n)                   # [k, col, n]
+    acc = np.einsum('irkc,kcn->irn', tiles, words).astype(np.int32)
+    return np.clip(acc.reshape(mt * TILE, n)[:m], -128, 127).astype(np.int8)
+
+
+@dataclass
+class Step:
+    """One host action: upload a tile or input words, run a program, read results"""
+    kind: str
+    addr: int = 0                   # Weight row (WEIGHTS) or UB word
+    items: List[Tuple[int, int]] = field(default_factory=list)  # (i, k), (k, n) or (i, n)
+    program: List[int] = field(default_factory=list)
+
+
+@dataclass
+class GemmPlan:
+    """The steps computing an M x K @ K x N GEMM, and the choices behind them"""
+    m: int
+    k: int
+    n: int
+    order: str                      # 'columns' or 'rows'
+    block: int                      # Columns per block
+    k_chunk: int                    # K-slices whose input words are resident together
+    steps: List[Step]
+
+    def stats(self) -> Dict[str, int]:
+        """Programs, weight tile reloads and UART payload bytes of the plan"""
+        programs = [s.program for s in self.steps if s.kind == PROGRAM]
+        count = {kind: sum(len(s.items) for s in self.steps if s.kind == kind)
+                 for kind in (WEIGHTS, INPUTS, READ)}
+        rd_weights = sum(1 for p in programs for instr in p if instr >> 26 == Opcode.RD_WEIGHT)
+        stats = {
+            'programs': len(programs),
+            'instructions': sum(len(p) for p in programs),
+            'weight_reloads': rd_weights // TILE,
+            'weight_bytes': count[WEIGHTS] * TILE * WEIGHT_ROW_BYTES,
+            'input_bytes': count[INPUTS] * UB_WORD_BYTES,
+            'output_bytes': count[READ] * UB_WORD_BYTES,
+            'instruction_bytes': 4 * sum(len(p) for p in programs),
+        }
+        stats['uart_bytes'] = (stats['weight_bytes'] + stats['input_bytes']
+                               + stats['output_bytes'] + stats['instruction_bytes'])
+        return stats
+
+
+class _ProgramBuilder:
+    """Packs products into <=32-word programs and tracks tile and output residency"""
+
+    def __init__(self, tiler: 'GemmTiler'):
+        self.enc = tiler.encoder
+        self.base = tiler.weight_base
+        self.slots = tiler.weight_slots
+        self.steps: List[Step] = []
+        self.body: List[int] = []
+        self.loaded: Optional[Tuple[int, int]] = None   # Tile in the FIFO this program
+        self.where: Dict[Tuple[int, int], int] = {}     # Tile -> weight row
+        self.slot_tile: Dict[int, Tuple[int, int]] = {}
+        self.next_slot = 0
+        self.outputs: List[Tuple[int, int]] = []        # (i, n) in ST_UB order
+
+    def flush(self) -> None:
+        if self.body:
+            self.steps.append(Step(PROGRAM, program=self.body + [self.enc.halt()]))
+            self.body = []
+            self.loaded = None
+
+    def upload_tile(self, tile: Tuple[int, int], slot: Optional[int] = None) -> None:
+        """Place a tile in a weight memory slot (round robin when not given)"""
+        if tile in self.where:
+            return
+        if slot is None:
+            slot, self.next_slot = self.next_slot, (self.next_slot + 1) % self.slots
+        self.flush()  # Programs already packed may still use the slot's old tile
+        self.where.pop(self.slot_tile.get(slot), None)
+        self.slot_tile[slot] = tile
+        self.where[tile] = self.base + TILE * slot
+        self.steps.append(Step(WEIGHTS, self.where[tile], [tile]))
+
+    def upload_inputs(self, words: List[Tuple[int, int]]) -> None:
+        self.flush()
+        self.steps.append(Step(INPUTS, 0, words))
+
+    def read_outputs(self) -> None:
+        if self.outputs:
+            self.flush()
+            self.steps.append(Step(READ, INPUT_WORDS, self.outputs))
+            self.outputs = []
+
+    def product(self, tile: Tuple[int, int], word: int, acc: int, first: bool,
+                output: Optional[Tuple[int, int]]) -> None:
+        """LD_UB + MATMUL (first) or MATMUL_ACC, and ST_UB of `output` if given"""
+        self.upload_tile(tile)
+        if output is not None and len(self.outputs) == OUTPUT_WORDS:
+            self.read_outputs()
+        mac = self.enc.matmul if first else self.enc.matmul_acc
+        group = [self.enc.load_ub(word), mac(word, acc, TILE)]
+        if output is not None:
+            group.append(self.enc.store_ub(INPUT_WORDS + len(self.outputs)))
+        reload = tile != self.loaded
+        if len(self.body) + len(group) + TILE * reload > PROGRAM_WORDS - 1:
+            self.flush()
+            reload = True
+        if reload:
+            self.body += [self.enc.load_weights(self.where[tile] + row, 1) for row in range(TILE)]
+            self.loaded = tile
+        self.body += group
+        if output is not None:
+            self.outputs.append(output)
+
+
+class GemmTiler:
+    """
+    Plans and runs int8 GEMMs of any shape on the 3x3 array.
+
+    Weight tiles go to weight memory rows [weight_base, weight_base +
+    3 * weight_slots); inputs to UB words 0..95 of the bank LD_UB reads,
+    results to words 96..127 of bank 0 (where ST_UB writes).
+    """
+
+    def __init__(self, weight_base: int = 0, weight_slots: Optional[int] = None):
+        if weight_slots is None:
+            weight_slots = (WEIGHT_DEPTH - weight_base) // TILE
+        if weight_slots < 1 or weight_base + TILE * weight_slots > WEIGHT_DEPTH:
+            raise ValueError(f"{weight_slots} tiles from row {weight_base} "
+                             f"do not fit in {WEIGHT_DEPTH} rows")
+        self.weight_base = weight_base
+        self.weight_slots = weight_slots
+        self.encoder = InstructionEncoder()
+
+    def _estimate(self, mt: int, kt: int, n: int, order: str,
+                  block: int) -> Optional[Tuple[int, int]]:
+        """(UART bytes, tile reloads) of a loop order and block width; None if infeasible"""
+        tiles = mt * kt
+        k_chunk = min(kt, INPUT_WORDS // block)
+        chunks, blocks = -(-kt // k_chunk), -(-n // block)
+        if order == 'columns':
+            strips = mt
+            weight_uploads = tiles if tiles <= self.weight_slots else blocks * tiles
+            input_words = n * kt
+        else:
+            strips = self.weight_slots // kt
+            if tiles <= self.weight_slots or strips == 0:
+                return None  # Nothing to gain over 'columns', or a strip does not fit
+            weight_uploads = tiles
+            input_words = -(-mt // strips) * n * kt
+        if chunks > 1 and min(strips, mt) * block > ACC_DEPTH:
+            return None  # Partial sums of a block would not fit the accumulator
+        reloads = blocks * tiles
+        products = tiles * n
+        instructions = 2 * products + mt * n + TILE * reloads
+        programs = -(-instructions // (PROGRAM_WORDS - 1 - TILE))
+        instructions += programs * (1 + TILE)  # HALT, and a tile reload per program
+        uart = (weight_uploads * TILE * WEIGHT_ROW_BYTES + input_words * UB_WORD_BYTES
+                + mt * n * UB_WORD_BYTES + 4 * instructions)
+        return uart, reloads
+
+    def plan(self, m: int, k: int, n: int, order: Optional[str] = None,
+             block: Optional[int] = None) -> GemmPlan:
+        """
+        Schedule an M x K @ K x N GEMM. The loop order ('columns' or
+        'rows') and block width are chosen by estimated UART bytes, then
+        weight reloads, unless given.
+        """
+        if min(m, k, n) < 1:
+            raise ValueError(f"empty GEMM {m}x{k} @ {k}x{n}")
+        mt, kt = -(-m // TILE), -(-k // TILE)
+        candidates = []
+        for o in ('columns', 'rows') if order is None else (order,):
+            for nb in range(1, min(n, INPUT_WORDS) + 1) if block is None else (block,):
+                cost = self._estimate(mt, kt, n, o, nb)
+                if cost is not None:
+                    candidates.append((cost, -nb, o, nb))
+        if not candidates:
+            raise ValueError(f"no schedule for {m}x{k} @ {k}x{n} "
+                             f"(order={order}, block={block})")
+        _, _, order, block = min(candidates)
+        return self._build(m, k, n, order, block)
+
+    def _build(self, m: int, k: int, n: int, order: str, block: int) -> GemmPlan:
+        mt, kt = -(-m // TILE), -(-k // TILE)
+        k_chunk = min(kt, INPUT_WORDS // block)
+        chunks = [range(c, min(c + k_chunk, kt)) for c in range(0, kt, k_chunk)]
+        strips = mt if order == 'columns' else self.weight_slots // kt
+        groups = [range(g, min(g + strips, mt)) for g in range(0, mt, strips)]
+        builder = _ProgramBuilder(self)
+        if mt * kt <= self.weight_slots:
+            for i in range(mt):
+                for kk in range(kt):
+                    builder.upload_tile((i, kk), i * kt + kk)
+        for group in groups:
+            if order == 'rows':
+                for i in group:
+                    for kk in range(kt):
+                        builder.upload_tile((i, kk), (i - group.start) * kt + kk)
+            for start in range(0, n, block):
+                cols = range(start, min(start + block, n))
+                for chunk in chunks:
+                    builder.upload_inputs([(kk, col) for kk in chunk for col in cols])
+                    for i in group:
+                        for kk in chunk:
+                            for j, col in enumerate(cols):
+                                word = (kk - chunk.start) * len(cols) + j
+                                if len(chunks) == 1:
+                                    # Clear epoch per strip; entries per column
+                                    first = kk == 0 and j == 0
+                                    acc = j
+                                else:
+                                    # Clear epoch per block: every strip stays live
+                                    first = (chunk is chunks[0] and i == group.start
+                                             and kk == 0 and j == 0)
+                                    acc = (i - group.start) * len(cols) + j
+                                output = (i, col) if kk == kt - 1 else None
+                                builder.product((i, kk), word, acc, first, output)
+        builder.read_outputs()
+        builder.flush()
+        return GemmPlan(m, k, n, order, block, k_chunk, builder.steps)
+
+    def run(self, tpu: TPUCoprocessor, a: np.ndarray, b: np.ndarray,
+            plan: Optional[GemmPlan] = None, runner=None) -> np.ndarray:
+        """
+        Compute A @ B on the board; returns M x N int8.
+
+        With a program_segments.SegmentRunner as `runner`, the programs
+        between two host transfers run as one program, its segments
+        uploaded while the previous ones execute.
+
+        Raises:
+            IOError: an upload or result read failed, or a program did not halt
+        """
+        a, b = np.asarray(a), np.asarray(b)
+        (m, k), n = a.shape, b.shape[1]
+        assert b.shape[0] == k, f"inner dimensions differ: {a.shape} @ {b.shape}"
+        plan = plan or self.plan(m, k, n)
+        mt, kt = -(-m // TILE), -(-k // TILE)
+        ap = np.zeros((mt * TILE, kt * TILE), dtype=np.int8)
+        bp = np.zeros((kt, TILE, n), dtype=np.int8)
+        ap[:m, :k] = np.clip(a, -128, 127)
+        bp.reshape(kt * TILE, n)[:k] = np.clip(b, -128, 127)
+        out = np.zeros((mt, TILE, n), dtype=np.int8)
+        if tpu.ub_bank is None:
+            tpu.probe_ub_bank()
+        bank = tpu.ub_bank
+
+        pending: List[int] = []      # Programs merged for the runner
+
+        def run_pending():
+            if pending:
+                runner.run(pending + [self.encoder.halt()])
+                pending.clear()
+
+        for step in plan.steps:
+            if runner is not None:
+                if step.kind == PROGRAM:
+                    pending += step.program[:-1]
+                    continue
+                run_pending()
+            if step.kind == WEIGHTS:
+                (i, kk), = step.items
+                tile = ap[TILE * i:TILE * i + TILE, TILE * kk:TILE * kk + TILE]
+                if not tpu.load_weights(step.addr, tpu.weight_rows(tile)):
+                    raise IOError(f"weight tile {i},{kk} upload to row {step.addr} failed")
+            elif step.kind == INPUTS:
+                ks, cols = zip(*step.items)
+                words = np.zeros((len(step.items), UB_WORD_BYTES), dtype=np.int8)
+                words[:, :TILE] = bp[list(ks), :, list(cols)]
+                if not tpu.write_unified_buffer((bank << 8) | step.addr, words):
+                    raise IOError("unified buffer write was not acknowledged")
+            elif step.kind == PROGRAM:
+                if not tpu.load_program(step.program):
+                    raise IOError("program upload failed")
+                if not tpu.execute():
+                    raise IOError("program did not halt")
+            else:
+                words = np.zeros((len(step.items), UB_WORD_BYTES), dtype=np.int8)
+                received = tpu.read_unified_buffer_into(step.addr, words)
+                if received < words.nbytes:
+                    raise IOError(f"result read returned {received} of {words.nbytes} bytes")
+                strips, cols = zip(*step.items)
+                out[list(strips), :, list(cols)] = words[:, :TILE]
+        if runner is not None:
+            run_pending()
+        return out.reshape(mt * TILE, n)[:m]
+
+
+def main():
+    """Plan a few shapes, and run one on the emulator"""
+    import argparse
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--port', default='emu://')
+    parser.add_argument('--shape', type=int, nargs=3, default=[10, 14, 23],
+                        metavar=('M', 'K', 'N'), help='GEMM to run on the board')
+    args = parser.parse_args()
+
+    tiler = GemmTiler()
+    print(f"{'GEMM':<18} {'order':>8} {'block':>6} {'programs':>9} {'reloads':>8} "
+          f"{'weight B':>9} {'input B':>9} {'instr B':>9} {'UART B':>9}")
+    for m, k, n in [(3, 3, 9), (10, 14, 23), (64, 64, 64), (256, 256, 8), (300, 60, 32)]:
+        plan = tiler.plan(m, k, n)
+        st = plan.stats()
+        print(f"{m:>4}x{k:<4}@ {k:>4}x{n:<4} {plan.order:>8} {plan.block:>6} "
+              f"{st['programs']:>9} {st['weight_reloads']:>8} {st['weight_bytes']:>9} "
+              f"{st['input_bytes']:>9} {st['instruction_bytes']:>9} {st['uart_bytes']:>9}")
+
+    m, k, n = args.shape
+    rng = np.random.default_rng(0)
+    a, b = rng.integers(-4, 5, (m, k)), rng.integers(-4, 5, (k, n))
+    tpu = TPUCoprocessor(args.port)
+    try:
+        c = tiler.run(tpu, a, b)
+    finally:
+        tpu.close()
+    assert np.array_equal(c, gemm_reference(a, b))
+    print(f"{m}x{k} @ {k}x{n} on {args.port}: matches the NumPy reference")
+
+
+if __name__ == "__main__":
+    main()
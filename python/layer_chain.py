@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+"""
+On-Device Layer Chaining
+========================
+Compiles dense int8 layers, y = act(W @ x + b), into one program per
+layer or one program for a whole chain. Activations stay in the unified
+buffer between layers, and only the final output is read over UART.
+
+TPU_Basys3.forward_pass (drivers/tpu_driver.py) runs each layer as a
+MATMUL program and a RELU program. Each is its own load_program + EXECUTE
++ status wait, and each layer's output is read back and re-uploaded as
+the next layer's input. report() prices that path against the fused
+program for the same layers and batch.
+
+How a layer maps onto the hardware (tpu_controller.sv, tpu_emulator.py):
+
+- W is cut into 3x3 tiles as in gemm_tiler.py. Each output tile j is one
+  accumulator clear epoch. For each input tile k, the program does
+  RD_WEIGHT tile (j, k), then per column LD_UB and MATMUL (first product
+  of the epoch) or MATMUL_ACC -> acc[column].
+- Bias: the datapath's ADD_BIAS adds norm_bias, which is tied to zero.
+  So b is folded in as one more K-slice instead: a weight tile whose
+  first column is b, applied to a constant word [1, 0, 0] kept in the UB.
+- Activation: VPU ops read the accumulator buffer SYNC last swapped out
+  and write the UB bank LD_UB is not reading. So each output tile ends
+  with SYNC, then RELU (or ADD_BIAS as a plain write-back when there is
+  no activation) per column, then SYNC. The first SYNC makes the products
+  visible to the VPU. The second flips both selects back, so the outputs
+  land in the bank the next layer's LD_UB reads, with no bank change
+  visible to the host. Each write saturates to int8.
+- Layer inputs and outputs alternate between two UB regions, and the
+  constant word sits at word 0. Programs of any length run through
+  program_segments.SegmentRunner.
+
+Usage:
+    chain = LayerChain(tpu, [Layer(w1, b1), Layer(w2, b2, relu=False)])
+    y = chain.run(x)                             # x: K x batch
+    assert np.array_equal(y, chain.reference(x))
+    print(chain.report(x.shape[1]))
+"""
+
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from gemm_tiler import TILE, UB_BANK_WORDS, UB_WORD_BYTES
+from program_segments import SegmentRunner
+from tpu_coprocessor import InstructionEncoder, TPUCoprocessor
+from weight_memory import WEIGHT_DEPTH
+
+ONES_WORD = 0                   # UB word holding [1, 0, 0] for the bias K-slice
+HEADER_BYTES = 5                # UART command header (cmd, addr, length)
+BURST_ACK_BYTES = 2             # 0xCC + checksum
+
+
+@dataclass
+class Layer:
+    """y = relu(W @ x + b) (or without the ReLU); W is N x K, b has N entries"""
+    weights: np.ndarray
+    bias: Optional[np.ndarray] = None
+    relu: bool = True
+
+    @property
+    def k_tiles(self) -> int:
+        return -(-self.weights.shape[1] // TILE)
+
+    @property
+    def n_tiles(self) -> int:
+        return -(-self.weights.shape[0] // TILE)
+
+    def tiles(self) -> List[List[np.ndarray]]:
+        """3x3 weight tiles per output tile j, the bias tile last"""
+        n, k = self.weights.shape
+        w = np.zeros((self.n_tiles * TILE, self.k_tiles * TILE), dtype=np.int64)
+        w[:n, :k] = np.clip(self.weights, -128, 127)
+        tiles = []
+        for j in range(self.n_tiles):
+            strip = [w[TILE * j:TILE * j + TILE, TILE * k:TILE * k + TILE]
+                     for k in range(self.k_tiles)]
+            if self.bias is not None:
+                b = np.zeros((self.n_tiles * TILE, TILE), dtype=np.int64)
+                b[:n, 0] = np.clip(self.bias, -128, 127)
+                strip.append(b[TILE * j:TILE * j + TILE])
+            tiles.append(strip)
+        return tiles
+
+
+class LayerChain:
+    """
+    A stack of dense layers compiled into UB-resident programs. Weight
+    tiles are laid out from `weight_base` and uploaded once (the driver's
+    weight cache skips them on later runs).
+    """
+
+    def __init__(self, tpu: TPUCoprocessor, layers: List[Layer], weight_base: int = 0):
+        assert layers, "need at least one layer"
+        for prev, layer in zip(layers, layers[1:]):
+            assert layer.weights.shape[1] == prev.weights.shape[0], \
+                f"layer widths differ: {prev.weights.shape} then {layer.weights.shape}"
+        self.tpu = tpu
+        self.layers = layers
+        self.weight_base = weight_base
+        self.encoder = InstructionEncoder()
+        self.runner = SegmentRunner(tpu)
+        self.tiles = [layer.tiles() for layer in layers]
+        # Weight row of every tile, [layer][j][k]
+        self.tile_rows: List[List[List[int]]] = []
+        row = weight_base
+        for strips in self.tiles:
+            self.tile_rows.append([])
+            for strip in strips:
+                self.tile_rows[-1].append(list(range(row, row + TILE * len(strip), TILE)))
+                row += TILE * len(strip)
+        if row > WEIGHT_DEPTH:
+            raise ValueError(f"weight tiles need rows {weight_base}..{row - 1}, "
+                             f"weight memory has {WEIGHT_DEPTH}")
+
+    # -------------------------------------------------------------------------
+    # Programs
+    # -------------------------------------------------------------------------
+
+    def regions(self, batch: int) -> List[Tuple[int, int]]:
+        """(input word, output word) of each layer; inputs and outputs ping-pong"""
+        size = batch * max(max(l.k_tiles, l.n_tiles) for l in self.layers)
+        if ONES_WORD + 1 + 2 * size > UB_BANK_WORDS:
+            raise ValueError(f"batch {batch} needs {2 * size + 1} UB words, "
+                             f"a bank has {UB_BANK_WORDS}")
+        a, b = ONES_WORD + 1, ONES_WORD + 1 + size
+        return [(a, b) if i % 2 == 0 else (b, a) for i in range(len(self.layers))]
+
+    def _layer_parts(self, index: int, batch: int) -> Tuple[List[List[int]], List[List[int]]]:
+        """Per output tile: the products into acc[column], and the write-back to the UB"""
+        enc = self.encoder
+        layer = self.layers[index]
+        src, dst = self.regions(batch)[index]
+        products, writebacks = [], []
+        for j, rows in enumerate(self.tile_rows[index]):
+            body = []
+            for k, row in enumerate(rows):
+                body += [enc.load_weights(row + r, 1) for r in range(TILE)]
+                for col in range(batch):
+                    word = ONES_WORD if k == layer.k_tiles else src + col * layer.k_tiles + k
+                    # The epoch's first MATMUL clears every entry the others add to
+                    product = enc.matmul if k == 0 and col == 0 else enc.matmul_acc
+                    body += [enc.load_ub(word), product(word, col, TILE)]
+            products.append(body)
+            # ADD_BIAS adds nothing in this datapath: a saturating write-back
+            write = enc.relu if layer.relu else enc.add_bias
+            writebacks.append([enc.sync()]
+                              + [write(col, dst + col * layer.n_tiles + j, TILE)
+                                 for col in range(batch)]
+                              + [enc.sync()])
+        return products, writebacks
+
+    def layer_program(self, index: int, batch: int) -> List[int]:
+        """One program for layer `index`: input and output stay in the UB"""
+        products, writebacks = self._layer_parts(index, batch)
+        body = [instr for p, w in zip(products, writebacks) for instr in p + w]
+        return body + [self.encoder.halt()]
+
+    def program(self, batch: int) -> List[int]:
+        """One program for the whole chain"""
+        body = [instr for i in range(len(self.layers))
+                for instr in self.layer_program(i, batch)[:-1]]
+        return body + [self.encoder.halt()]
+
+    # -------------------------------------------------------------------------
+    # Execution
+    # -------------------------------------------------------------------------
+
+    def run(self, inputs: np.ndarray, per_layer: bool = False,
+            timeout: float = 2.0) -> np.ndarray:
+        """
+        Run the chain on K x batch int8 inputs; returns N x batch int8.
+        With `per_layer`, each layer is its own program (still UB-resident).
+
+        Raises:
+            IOError: an upload or the result read failed, or a program did not halt
+        """
+        tpu = self.tpu
+        first, last = self.layers[0], self.layers[-1]
+        inputs = np.asarray(inputs)
+        assert inputs.shape[0] == first.weights.shape[1], \
+            f"inputs must be {first.weights.shape[1]} x batch, got {inputs.shape}"
+        batch = inputs.shape[1]
+        src, _ = self.regions(batch)[0]
+
+        rows = [row for strips in self.tiles for strip in strips
+                for tile in strip for row in tpu.weight_rows(tile)]
+        if not tpu.load_weights(self.weight_base, rows):
+            raise IOError(f"weight upload to row {self.weight_base} failed")
+        if tpu.ub_bank is None:
+            tpu.probe_ub_bank()
+        bank = tpu.ub_bank
+
+        x = np.zeros((first.k_tiles * TILE, batch), dtype=np.int8)
+        x[:inputs.shape[0]] = np.clip(inputs, -128, 127)
+        words = np.zeros((src + batch * first.k_tiles, UB_WORD_BYTES), dtype=np.int8)
+        words[ONES_WORD, 0] = 1
+        words[src:, :TILE] = x.reshape(first.k_tiles, TILE, batch).transpose(2, 0, 1) \
+                              .reshape(batch * first.k_tiles, TILE)
+        if not tpu.write_unified_buffer(bank << 8, words):
+            raise IOError("unified buffer write was not acknowledged")
+
+        programs = ([self.layer_program(i, batch) for i in range(len(self.layers))]
+                    if per_layer else [self.program(batch)])
+        for program in programs:
+            self.runner.run(program, timeout)
+
+        _, dst = self.regions(batch)[-1]
+        length = batch * last.n_tiles * UB_WORD_BYTES
+        data = tpu.read_unified_buffer((bank << 8) | dst, length)
+        if len(data) < length:
+            raise IOError(f"result read returned {len(data)} of {length} bytes")
+        out = np.frombuffer(data, dtype=np.int8).reshape(batch, last.n_tiles, UB_WORD_BYTES)
+        return out[:, :, :TILE].reshape(batch, -1).T[:last.weights.shape[0]].copy()
+
+    def reference(self, inputs: np.ndarray) -> np.ndarray:
+        """Host-side result run() should produce (int8 saturation after each layer)"""
+        x = np.clip(np.asarray(inputs), -128, 127).astype(np.int64)
+        for layer in self.layers:
+            y = np.clip(layer.weights, -128, 127).astype(np.int64) @ x
+            if layer.bias is not None:
+                y += np.clip(layer.bias, -128, 127).astype(np.int64)[:, None]
+            if layer.relu:
+                y = np.maximum(y, 0)
+            x = np.clip(y, -128, 127)
+        return x.astype(np.int8)
+
+    # -------------------------------------------------------------------------
+    # Cost model
+    # -------------------------------------------------------------------------
+
+    @staticmethod
+    def _write_cost(words: int) -> Dict[str, int]:
+        return {'bytes': HEADER_BYTES + words * UB_WORD_BYTES + 1, 'round_trips': 1}
+
+    @staticmethod
+    def _read_cost(words: int) -> Dict[str, int]:
+        return {'bytes': HEADER_BYTES + words * UB_WORD_BYTES, 'round_trips': 1}
+
+    def _program_cost(self, program: List[int], exec_queue: bool) -> Dict[str, int]:
+        """Burst uploads, starts and one status poll, as SegmentRunner sends them"""
+        segments = self.runner.segments_for(program, exec_queue)
+        cost = {'bytes': 0, 'round_trips': 0}
+        for segment in segments:
+            cost['bytes'] += HEADER_BYTES + 4 * len(segment) + BURST_ACK_BYTES
+            cost['round_trips'] += 1
+        if len(segments) > 1 and exec_queue:
+            cost['bytes'] += 4 * len(segments) + 2      # EXEC_QUEUE + ACK each, a poll
+            cost['round_trips'] += len(segments) + 1
+        else:
+            cost['bytes'] += 3 * len(segments)          # EXECUTE and a poll each
+            cost['round_trips'] += len(segments)
+        return cost
+
+    def report(self, batch: int, per_layer: bool = False,
+               exec_queue: bool = False) -> Dict[str, int]:
+        """
+        Modelled UART bytes (both directions) and host round trips of one
+        run() against the unfused path: per layer a MATMUL program and a
+        write-back program, the output read back and re-uploaded with the
+        constant word. Weight uploads are the same for both and left out.
+
+        Nothing is sent to the board: `exec_queue` says whether programs
+        longer than instruction memory are priced as EXEC_QUEUE halves
+        (pass tpu.supports_exec_queue() to match the board).
+        """
+        def total(costs):
+            return {key: sum(c[key] for c in costs) for key in ('bytes', 'round_trips')}
+
+        first, last = self.layers[0], self.layers[-1]
+        programs = ([self.layer_program(i, batch) for i in range(len(self.layers))]
+                    if per_layer else [self.program(batch)])
+        fused = total([self._write_cost(1 + batch * first.k_tiles)]
+                      + [self._program_cost(p, exec_queue) for p in programs]
+                      + [self._read_cost(batch * last.n_tiles)])
+        unfused_costs = []
+        halt = [self.encoder.halt()]
+        for i, layer in enumerate(self.layers):
+            products, writebacks = self._layer_parts(i, batch)
+            unfused_costs += [self._write_cost(1 + batch * layer.k_tiles),
+                              self._program_cost(sum(products, []) + halt, exec_queue),
+                              self._program_cost(sum(writebacks, []) + halt, exec_queue),
+                              self._read_cost(batch * layer.n_tiles)]
+        unfused = total(unfused_costs)
+        return {'programs': len(programs),
+                'instructions': sum(len(p) for p in programs),
+                'fused_bytes': fused['bytes'], 'fused_round_trips': fused['round_trips'],
+                'unfused_bytes': unfused['bytes'],
+                'unfused_round_trips': unfused['round_trips'],
+                'saved_bytes': unfused['bytes'] - fused['bytes'],
+                'saved_round_trips': unfused['round_trips'] - fused['round_trips']}
+
+
+def main():
+    """Run a three-layer MLP as one program on an emulated board"""
+    import argparse
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--port', default='emu://')
+    parser.add_argument('--baud', type=int, default=115200)
+    parser.add_argument('--batch', type=int, default=4)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    layers = [Layer(rng.integers(-3, 4, (9, 6)), rng.integers(-4, 5, 9)),
+              Layer(rng.integers(-3, 4, (6, 9)), rng.integers(-4, 5, 6)),
+              Layer(rng.integers(-3, 4, (3, 6)), relu=False)]
+    inputs = rng.integers(-8, 9, (6, args.batch))
+    tpu = TPUCoprocessor(args.port, args.baud)
+    try:
+        chain = LayerChain(tpu, layers)
+        outputs = chain.run(inputs)
+        assert np.array_equal(outputs, chain.reference(inputs))
+        segments = len(chain.runner.segments_for(chain.program(args.batch)))
+        for per_layer in (False, True):
+            report = chain.report(args.batch, per_layer, tpu.supports_exec_queue())
+            name = 'one program per layer' if per_layer else 'one program for the chain'
+            print(f"{name}: {report['programs']} program(s), {report['instructions']} "
+                  f"instructions")
+            print(f"  UART bytes {report['fused_bytes']} vs {report['unfused_bytes']} unfused "
+                  f"(saved {report['saved_bytes']}), round trips "
+                  f"{report['fused_round_trips']} vs {report['unfused_round_trips']} "
+                  f"(saved {report['saved_round_trips']})")
+    finally:
+        tpu.close()
+    print(f"chain program ran as {segments} segments; outputs match the reference")
+
+
+if __name__ == "__main__":
+    main()
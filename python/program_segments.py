@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+Program Segmentation
+====================
+Runs programs longer than the 32-word instruction memory of tpu_top.sv by
+cutting them into segments that end in HALT and starting those back to
+back.
+
+Controller and datapath state -- the weight FIFO, the accumulators, both
+bank selects, the LD_UB interlock -- survives HALT, so a program can be
+cut between any two instructions and resumed by starting the next
+segment. Instruction memory is used as two halves (words 0..15 and
+16..31): while segment k runs from one half, the host uploads segment k+1
+into the other and queues its start with EXEC_QUEUE (0x0B + start PC).
+The FPGA fires a queued start on the cycle after the running segment's
+HALT and answers only then, so the host never sits between segments:
+
+    upload 0 -> [0..15],  EXEC_QUEUE 0    starts at once (0xEC)
+    upload 1 -> [16..31], EXEC_QUEUE 16   while segment 0 runs
+                                          0xEB at its HALT: 1 running
+    upload 2 -> [0..15],  EXEC_QUEUE 0    while segment 1 runs
+    ...
+
+A later start answered 0xEC is a bubble: the upload took longer than the
+segment it overlapped and the TPU waited at HALT for the command. The
+report counts them. Each cut costs the controller a HALT and a fetch,
+a few cycles, not a host round trip.
+
+Bitstreams without EXEC_QUEUE fall back to load_program + execute per
+segment, with the whole memory for each (31 instructions + HALT).
+
+The legacy driver's STREAM_INSTR mode (drivers/tpu_coprocessor_driver.py,
+command 0x07) has no counterpart in uart_dma_basys3.sv, which answers
+0xFF; queued starts over the two halves take its place.
+
+Usage:
+    runner = SegmentRunner(tpu)
+    runner.run(program)              # any length, ending in HALT
+    print(runner.report())
+"""
+
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from completion_predictor import CompletionPredictor, running_prefix
+from tpu_coprocessor import InstructionEncoder, InstructionMemoryShadow, Opcode, TPUCoprocessor
+
+HALF_WORDS = InstructionMemoryShadow.DEPTH // 2
+
+
+def split_program(program: List[int], segment_words: int = HALF_WORDS) -> List[List[int]]:
+    """
+    Cut a program (through its first HALT) into segments of at most
+    `segment_words` instructions, each ending in HALT.
+
+    Raises:
+        ValueError: the program has no HALT
+    """
+    prefix = running_prefix(program)
+    if prefix is None:
+        raise ValueError("program must end in HALT")
+    assert segment_words >= 2, "a segment needs room for an instruction and HALT"
+    body = prefix[:-1]
+    step = segment_words - 1
+    halt = InstructionEncoder.halt()
+    return [body[i:i + step] + [halt] for i in range(0, max(len(body), 1), step)]
+
+
+class SegmentRunner:
+    """
+    Runs programs of any length on one board, uploading the next segment
+    into the idle half of instruction memory while the current one runs.
+    """
+
+    def __init__(self, tpu: TPUCoprocessor):
+        self.tpu = tpu
+        self.reset_stats()
+
+    def reset_stats(self) -> None:
+        self.programs = 0
+        self.segments = 0
+        self.bubbles = 0            # Starts that found the TPU already idle
+        self.upload_time = 0.0      # Segment uploads
+        self.wall_time = 0.0
+
+    def segments_for(self, program: List[int],
+                     exec_queue: Optional[bool] = None) -> List[List[int]]:
+        """
+        The segments run() would execute for `program`: the whole program
+        if it fits, else halves with EXEC_QUEUE and full memories without.
+        `exec_queue` overrides the (probed) EXEC_QUEUE support.
+        """
+        prefix = running_prefix(program)
+        if prefix is not None and len(prefix) <= InstructionMemoryShadow.DEPTH:
+            return [prefix]
+        if exec_queue is None:
+            exec_queue = self.tpu.supports_exec_queue()
+        if exec_queue:
+            return split_program(program, HALF_WORDS)
+        return split_program(program, InstructionMemoryShadow.DEPTH)
+
+    def run(self, program: List[int], timeout: float = 2.0) -> None:
+        """
+        Run `program` to its HALT.
+
+        Raises:
+            ValueError: the program has no HALT
+            IOError: a segment upload failed or a segment did not halt
+        """
+        tpu = self.tpu
+        segments = self.segments_for(program)
+        start = time.monotonic()
+        try:
+            if len(segments) > 1 and tpu.supports_exec_queue():
+                self._run_queued(segments, timeout)
+            else:
+                for i, segment in enumerate(segments):
+                    self._upload(segment, 0)
+                    if not tpu.execute(timeout):
+                        raise IOError(f"segment {i} did not halt")
+                    if i:
+                        self.bubbles += 1  # Each later segment waited on a round trip
+            self.programs += 1
+            self.segments += len(segments)
+        finally:
+            self.wall_time += time.monotonic() - start
+
+    def _upload(self, segment: List[int], base: int) -> None:
+        upload_start = time.monotonic()
+        if not self.tpu.load_program(segment, start=base):
+            raise IOError(f"segment upload to word {base} failed")
+        self.upload_time += time.monotonic() - upload_start
+
+    def _run_queued(self, segments: List[List[int]], timeout: float) -> None:
+        tpu = self.tpu
+        # Queued starts answer at HALT; keep the completion push out of the stream
+        push = tpu.completion_push
+        if push:
+            tpu.set_completion_push(False)
+        try:
+            for i, segment in enumerate(segments):
+                base = (i % 2) * HALF_WORDS
+                self._upload(segment, base)
+                tpu.queue_execution(base)
+                back_to_back = tpu.wait_queued_start(timeout)
+                if back_to_back is None:
+                    tpu.uart.flush()
+                    tpu.ub_bank = None
+                    raise IOError(f"segment {i - 1} did not halt" if i else
+                                  "segment 0 did not start")
+                if i and not back_to_back:
+                    self.bubbles += 1
+            if not tpu.wait_idle(timeout):
+                tpu.ub_bank = None
+                raise IOError(f"segment {len(segments) - 1} did not halt")
+        finally:
+            if push:
+                tpu.set_completion_push(True)
+        if tpu.ub_bank is not None:
+            # execute() follows the bank select only for programs at PC 0
+            syncs = sum(1 for segment in segments for instr in segment
+                        if (instr >> 26) & 0x3F == Opcode.SYNC)
+            tpu.ub_bank ^= syncs & 1
+
+    def report(self) -> Dict[str, float]:
+        """Segments run, bubbles between them, and upload vs wall time"""
+        return {'programs': self.programs, 'segments': self.segments,
+                'bubbles': self.bubbles,
+                'upload_s': self.upload_time, 'wall_s': self.wall_time}
+
+
+def main():
+    """Run a 30-column batch (94 instructions) segmented on an emulated board"""
+    import argparse
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--port', default='emu://?paced=1')
+    parser.add_argument('--baud', type=int, default=115200)
+    parser.add_argument('--columns', type=int, default=30)
+    parser.add_argument('--segment-ms', type=float, default=10.0,
+                        help='Emulated run time of one segment (emu:// only)')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    weights = rng.integers(-2, 3, (3, 3))
+    inputs = rng.integers(-8, 9, (3, args.columns))
+    enc = InstructionEncoder()
+    program = [enc.load_weights(row, 1) for row in range(3)]
+    for col in range(args.columns):
+        program += [enc.load_ub(col), enc.matmul(col, col, 3),
+                    enc.store_ub(TPUCoprocessor.BATCH_OUTPUT_ADDR + col)]
+    program.append(enc.halt())
+
+    tpu = TPUCoprocessor(args.port, args.baud)
+    try:
+        runner = SegmentRunner(tpu)
+        segments = runner.segments_for(program)
+        if args.port.startswith('emu://'):
+            cycles = max(CompletionPredictor.estimate_cycles(s) for s in segments)
+            tpu.uart.ser.device.clock_hz = cycles / (args.segment_ms / 1000)
+        assert tpu.load_weights(0, tpu.weight_rows(weights))
+        words = np.zeros((args.columns, TPUCoprocessor.UB_WORD_SIZE), dtype=np.int8)
+        words[:, :3] = inputs.T
+        assert tpu.write_unified_buffer((tpu.ub_bank or 0) << 8, words)
+        runner.run(program)
+        results = tpu.read_unified_buffer(TPUCoprocessor.BATCH_OUTPUT_ADDR,
+                                          args.columns * TPUCoprocessor.UB_WORD_SIZE)
+        outputs = np.frombuffer(results, dtype=np.int8).reshape(args.columns, -1)[:, :3].T
+        assert np.array_equal(outputs, np.clip(weights @ inputs, -128, 127))
+        report = runner.report()
+    finally:
+        tpu.close()
+    print(f"{len(program)} instructions in {report['segments']} segments, "
+          f"{report['bubbles']} bubbles")
+    print(f"wall {report['wall_s'] * 1e3:.1f} ms, segment uploads "
+          f"{report['upload_s'] * 1e3:.1f} ms (overlapped with runs)")
+
+
+if __name__ == "__main__":
+    main()
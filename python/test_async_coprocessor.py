@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+AsyncTPUCoprocessor Test
+========================
+Exercises the asyncio client against the in-process UART stand-in
+(no FPGA needed), or against a board when a port is given.
+
+Usage:
+    python3 test_async_coprocessor.py            # in-process stand-in
+    python3 test_async_coprocessor.py /dev/ttyUSB1
+    python3 -m pytest test_async_coprocessor.py
+"""
+
+import asyncio
+import sys
+import time
+
+from async_tpu_coprocessor import AsyncTPUCoprocessor, DeviceStream
+from tpu_coprocessor import InstructionEncoder
+from uart_standin import UARTStandIn, STATUS_HALTED
+
+
+def make_tpu(device=None):
+    device = device or UARTStandIn()
+    return AsyncTPUCoprocessor(DeviceStream(device, byte_time=10 / 115200), timeout=0.5), device
+
+
+async def check_round_trip(tpu: AsyncTPUCoprocessor):
+    data = bytes(range(32))
+    assert await tpu.write_ub(7, data)
+    assert await tpu.read_ub(7) == data
+    assert await tpu.write_weights(3, b'\x01\x02\x03')
+    assert await tpu.read_ub(7, 4) == data[:4]
+
+
+async def check_concurrent_tasks(tpu: AsyncTPUCoprocessor):
+    """Many tasks share one link; every response must land on its own request"""
+    async def worker(addr):
+        word = bytes([addr]) * 32
+        assert await tpu.write_ub(addr, word)
+        await asyncio.sleep(0)
+        return await tpu.read_ub(addr) == word
+
+    results = await asyncio.gather(*(worker(addr) for addr in range(16, 48)))
+    assert all(results)
+
+
+async def check_program(tpu: AsyncTPUCoprocessor, device: UARTStandIn = None):
+    enc = InstructionEncoder()
+    program = [enc.load_weights(0, 1), enc.load_ub(0, 1), enc.matmul(0, 0, 3),
+               enc.store_ub(1, 1), enc.halt()]
+    await tpu.load_program(program)
+    if device is not None:
+        assert device.instr[:len(program)] == program
+    assert await tpu.execute(timeout=1.0)
+    if device is not None:
+        assert (await tpu.read_status()).raw == STATUS_HALTED
+
+
+def test_round_trip():
+    tpu, _ = make_tpu()
+    asyncio.run(check_round_trip(tpu))
+
+
+def test_wide_addresses_and_lengths():
+    """Bank-1 addresses and reads longer than 255 bytes use 16-bit fields"""
+    tpu, device = make_tpu()
+
+    async def run():
+        word = bytes(range(32, 64))
+        assert await tpu.write_ub(0x100 + 44, word)
+        assert device.ub_word(device._uart_ub_addr(0x100 + 44)) == word
+        assert device.ub_word(44) != word  # Bank 0 untouched
+        assert await tpu.read_ub(0x100 + 44) == word
+        for addr in range(9):
+            assert await tpu.write_ub(addr, bytes([addr]) * 32)
+        assert await tpu.read_ub(0, 288) == b''.join(bytes([i]) * 32 for i in range(9))
+
+    asyncio.run(run())
+
+
+def test_concurrent_tasks():
+    tpu, _ = make_tpu()
+    asyncio.run(check_concurrent_tasks(tpu))
+
+
+def test_program_and_execute():
+    tpu, device = make_tpu()
+    asyncio.run(check_program(tpu, device))
+
+
+def test_program_too_long_rejected():
+    tpu, device = make_tpu()
+
+    async def run():
+        try:
+            await tpu.load_program([0] * 33)
+            assert False, "33-word program accepted"
+        except ValueError:
+            pass
+        assert device.rx_count == 0 and len(tpu.program) == 32
+        await tpu.load_program([7] * 32)
+        assert device.instr == [7] * 32 and tpu.program == [7] * 32
+
+    asyncio.run(run())
+
+
+def test_completion_push():
+    tpu, device = make_tpu()
+
+    async def run():
+        assert await tpu.set_completion_push()
+        received = device.rx_count
+        await check_program(tpu)
+        # Program upload (5 x 7 bytes) and EXECUTE only: no READ_STATUS polls
+        assert device.rx_count - received == 5 * 7 + 1
+
+    asyncio.run(run())
+
+
+def old_bitstream(*commands) -> UARTStandIn:
+    """A stand-in without `commands`: it NACKs each of their bytes"""
+    device = UARTStandIn()
+    for cmd in commands:
+        del device._table[cmd]
+    return device
+
+
+def test_unsupported_push_keeps_other_tasks_aligned():
+    """The probe's trailing NACKs are discarded before another task's command"""
+    tpu, device = make_tpu(old_bitstream(0x09))
+
+    async def run():
+        word = bytes(range(32))
+        assert await tpu.write_ub(9, word)
+        results = await asyncio.gather(tpu.set_completion_push(),
+                                       *(tpu.read_ub(9) for _ in range(4)))
+        assert results[0] is False and not tpu.completion_push
+        assert results[1:] == [word] * 4
+
+    asyncio.run(run())
+
+
+def test_execute_and_read():
+    tpu, device = make_tpu()
+
+    async def run():
+        assert await tpu.write_ub(5, bytes(range(32)))
+        received = device.rx_count
+        assert await tpu.execute_and_read(5, 8) == bytes(range(8))
+        assert device.rx_count - received == 2 * 5  # Probe, then one EXEC_READ
+        assert device.status == STATUS_HALTED
+
+    asyncio.run(run())
+
+
+def test_exec_read_fallback_keeps_other_tasks_aligned():
+    """Without EXEC_READ the probe's NACKs never reach a concurrent read"""
+    tpu, device = make_tpu(old_bitstream(0x0A))
+
+    async def run():
+        word = bytes(range(32))
+        assert await tpu.write_ub(9, word)
+        results = await asyncio.gather(tpu.execute_and_read(9, 8),
+                                       *(tpu.read_ub(9) for _ in range(4)))
+        assert results[0] == word[:8] and tpu._exec_read is False
+        assert results[1:] == [word] * 4
+        assert device.status == STATUS_HALTED
+
+    asyncio.run(run())
+
+
+class BlockingStandIn(UARTStandIn):
+    """A model whose feed() blocks, like the emulator waiting for HALT"""
+
+    def feed(self, data: bytes) -> bytes:
+        time.sleep(0.1)
+        return super().feed(data)
+
+
+def test_device_model_does_not_block_loop():
+    tpu, device = make_tpu(BlockingStandIn())
+
+    async def run():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        task = asyncio.ensure_future(ticker())
+        assert await tpu.write_ub(2, bytes(range(32)))
+        assert await tpu.read_ub(2) == bytes(range(32))
+        task.cancel()
+        assert ticks >= 10  # The loop kept running through both 0.1 s feeds
+
+    try:
+        asyncio.run(run())
+    finally:
+        tpu.close()
+
+
+def test_timeout_resynchronizes():
+    """A missing response times out without corrupting the next transaction"""
+    tpu, device = make_tpu()
+
+    async def run():
+        handlers = device._table
+        size, handler = handlers[0x01]
+        handlers[0x01] = (size, lambda frame: (handler(frame), b'')[1])  # drop the ACK
+        assert not await tpu.write_ub(0, b'\x11' * 32)
+        handlers[0x01] = (size, handler)
+        assert await tpu.write_ub(0, b'\x22' * 32)
+        assert await tpu.read_ub(0, 4) == b'\x22' * 4
+
+    asyncio.run(run())
+
+
+async def run_hardware(port: str):
+    tpu = await AsyncTPUCoprocessor.open(port)
+    try:
+        for name, check in [("Round trip", check_round_trip),
+                            ("Concurrent tasks", check_concurrent_tasks),
+                            ("Program + execute", check_program)]:
+            try:
+                await check(tpu)
+                print(f"  ✓ {name}")
+            except AssertionError as e:
+                print(f"  ✗ {name}: {e}")
+    finally:
+        tpu.close()
+
+
+def main():
+    if len(sys.argv) > 1:
+        asyncio.run(run_hardware(sys.argv[1]))
+        return
+    for test in (test_round_trip, test_wide_addresses_and_lengths, test_concurrent_tasks,
+                 test_program_and_execute, test_program_too_long_rejected, test_completion_push,
+                 test_unsupported_push_keeps_other_tasks_aligned,
+                 test_execute_and_read, test_exec_read_fallback_keeps_other_tasks_aligned,
+                 test_device_model_does_not_block_loop, test_timeout_resynchronizes):
+        test()
+        print(f"  ✓ {test.__name__}")
+
+
+if __name__ == "__main__":
+    main()
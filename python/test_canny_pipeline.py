@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Tiled Canny Pipeline Test
+=========================
+Checks the halo-aware tiled pipeline on the emulator (emu://) against the
+host reference: gradients and edge maps for image sizes that do and do
+not divide into tiles, a start with LD_UB on bank 1, the lane tiles, and
+the redundancy and throughput report.
+
+Usage:
+    python3 test_canny_pipeline.py
+    python3 -m pytest test_canny_pipeline.py
+"""
+
+import numpy as np
+
+from canny_pipeline import (GAUSSIAN, HALO, SOBEL_X, SOBEL_Y, CannyPipeline,
+                            canny_reference, lane_tile)
+from conv2d_im2col import conv2d_reference
+from tpu_coprocessor import TPUCoprocessor
+
+rng = np.random.default_rng(25)
+
+
+def test_lane_tiles():
+    # Blur word at x0 = 3g: lane l is pixel x0 + l, words g and g + 1
+    blur = [(GAUSSIAN, lane) for lane in range(3)]
+    assert np.array_equal(lane_tile(blur, 0, 0), [[1, 2, 1], [0, 1, 2], [0, 0, 1]])
+    assert np.array_equal(lane_tile(blur, 0, 3), [[0, 0, 0], [1, 0, 0], [2, 1, 0]])
+    # Sobel word at x0 = 3q + 1: the window starts at lane 1 of word q
+    sobel = [(SOBEL_X, 0), (SOBEL_Y, 0)]
+    assert np.array_equal(lane_tile(sobel, 2, -1), [[0, -1, 0], [0, 1, 2], [0, 0, 0]])
+    assert np.array_equal(lane_tile(sobel, 2, 2), [[1, 0, 0], [1, 0, 0], [0, 0, 0]])
+
+
+def test_matches_reference():
+    tpu = TPUCoprocessor('emu://')
+    try:
+        canny = CannyPipeline(tpu, tile=(6, 4))
+        for shape in [(10, 8), (13, 17)]:
+            image = rng.integers(0, 256, shape)
+            gx, gy = canny.gradients(image)
+            blurred = conv2d_reference(image >> 5, GAUSSIAN)[0]
+            assert np.array_equal(np.stack([gx, gy]),
+                                  conv2d_reference(blurred, np.stack([SOBEL_X, SOBEL_Y])))
+            assert np.array_equal(canny.run(image), canny_reference(image))
+    finally:
+        tpu.close()
+
+
+def test_starts_from_bank_one():
+    tpu = TPUCoprocessor('emu://')
+    try:
+        tpu.load_program([tpu.encoder.sync(), tpu.encoder.halt()])
+        assert tpu.execute()
+        assert tpu.probe_ub_bank() == 1
+        image = rng.integers(0, 256, (9, 9))
+        canny = CannyPipeline(tpu, tile=(5, 5), threshold=20)
+        assert np.array_equal(canny.run(image), canny_reference(image, threshold=20))
+        assert tpu.ub_bank == 0
+    finally:
+        tpu.close()
+
+
+def test_tiling_report():
+    tpu = TPUCoprocessor('emu://')
+    try:
+        canny = CannyPipeline(tpu, tile=(6, 7))
+        image = rng.integers(0, 256, (6 + 2 * HALO, 14 + 2 * HALO))
+        canny.run(image)
+        report = canny.report()
+        assert report['tiles'] == 2  # Output tiles do not overlap
+        assert len(canny.tiles) <= 21
+        assert report['blur_per_pixel'] < report['legacy_blur_per_pixel']
+        assert report['mpixels_per_s'] > 0
+
+        try:
+            CannyPipeline(tpu, tile=(16, 16))
+            assert False, "tile larger than a UB bank accepted"
+        except ValueError:
+            pass
+    finally:
+        tpu.close()
+
+
+def main():
+    tests = [test_lane_tiles, test_matches_reference, test_starts_from_bank_one,
+             test_tiling_report]
+    for test in tests:
+        test()
+        print(f"  PASS: {test.__name__}")
+
+
+if __name__ == "__main__":
+    main()
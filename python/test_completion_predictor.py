@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Completion Predictor Test
+=========================
+Checks the static cycle estimate against the emulator's cycle model and
+that wait_idle learns a program's run time from observed polls.
+
+Usage:
+    python3 test_completion_predictor.py
+    python3 -m pytest test_completion_predictor.py
+"""
+
+import statistics
+import time
+
+from completion_predictor import CompletionPredictor, running_prefix
+from tpu_coprocessor import InstructionEncoder, TPUCoprocessor
+from tpu_emulator import TPUEmulator
+
+enc = InstructionEncoder()
+MATMUL_PROGRAM = [enc.load_weights(0, 1), enc.load_ub(0), enc.matmul(0, 0, 3),
+                  enc.store_ub(1), enc.halt()]
+
+
+def test_estimate_matches_emulator():
+    programs = [[enc.nop(), enc.halt()], MATMUL_PROGRAM,
+                [enc.load_weights(0, 3), enc.load_ub(0), enc.matmul_acc(0, 0, 3),
+                 enc.relu(0, 2), enc.sync(), enc.halt(), enc.nop()]]
+    for program in programs:
+        emu = TPUEmulator()
+        emu.instr[:len(program)] = program
+        emu.execute()
+        assert CompletionPredictor.estimate_cycles(program) == emu.last_run_cycles
+
+
+def test_unknown_programs_poll_at_once():
+    predictor = CompletionPredictor()
+    assert running_prefix([enc.nop(), None, enc.halt()]) is None
+    assert predictor.predict([enc.nop()] * 4) == 0.0  # No HALT
+    assert predictor.predict(None) == 0.0
+    delays = predictor.delays(None)
+    assert [next(delays) for _ in range(9)][-1] == predictor.max_interval
+
+
+def test_wait_idle_learns_run_time():
+    """The predictor assumes 100 MHz; the emulated board runs ~300x slower"""
+    tpu = TPUCoprocessor('emu://')
+    emu = tpu.uart.ser.device
+    emu.clock_hz = 1e4 / 3  # 307 cycles -> ~92 ms
+    run_time = 307 / emu.clock_hz
+    try:
+        assert tpu.load_program(MATMUL_PROGRAM)
+        latencies, polls = [], []
+        for _ in range(8):
+            received = emu.rx_count
+            start = time.monotonic()
+            assert tpu.execute()
+            latencies.append(time.monotonic() - start)
+            polls.append(emu.rx_count - received - 1)
+        (program,) = tpu.predictor.report().values()
+        assert program['runs'] == 8
+        assert abs(program['predicted_ms'] / 1e3 - run_time) < 0.3 * run_time
+        # The first run backs off from 3 us; learned runs poll around HALT only
+        assert polls[0] > 8 and statistics.median(polls[4:]) <= 5
+        assert statistics.median(latencies[4:]) < run_time + 0.005
+    finally:
+        tpu.close()
+
+
+def main():
+    tests = [test_estimate_matches_emulator, test_unknown_programs_poll_at_once,
+             test_wait_idle_learns_run_time]
+    for test in tests:
+        test()
+        print(f"  PASS: {test.__name__}")
+
+
+if __name__ == "__main__":
+    main()
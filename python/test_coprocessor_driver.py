@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+TPU_Coprocessor Driver RX Test
+==============================
+Checks the background RX demultiplexer of drivers/tpu_coprocessor_driver.py:
+the ring buffer's wrap-around and overflow, how _dispatch hands bytes to
+pending responses in order and absorbs late bytes of abandoned ones, and
+that concurrent commands reach the wire in the order their responses
+are queued (standin://).
+
+Usage:
+    python3 test_coprocessor_driver.py
+    python3 -m pytest test_coprocessor_driver.py
+"""
+
+import threading
+import time
+
+from drivers.tpu_coprocessor_driver import PendingResponse, RingBuffer, TPU_Coprocessor
+
+
+def driver(rx_thread: bool = True) -> TPU_Coprocessor:
+    tpu = TPU_Coprocessor('standin://', verbose=False)
+    if not rx_thread:
+        tpu._stop_rx_thread()  # The test feeds the ring and dispatches itself
+    return tpu
+
+
+def dispatch(tpu: TPU_Coprocessor, data: bytes) -> None:
+    with tpu._pending_lock:
+        tpu._rx_ring.write(data)
+        tpu._dispatch()
+
+
+def test_ring_buffer_wraps():
+    ring = RingBuffer(8)
+    ring.write(b'abcdef')
+    assert ring.read(4) == b'abcd'
+    ring.write(b'ghijk')  # Tail wraps past the end of the storage
+    assert len(ring) == 7
+    assert ring.read(3) == b'efg'
+    assert ring.read(10) == b'hijk'  # Head wraps; short read returns what is there
+    assert len(ring) == 0 and ring.read(1) == b''
+    assert ring.overflows == 0
+
+
+def test_ring_buffer_overflow_drops_oldest():
+    ring = RingBuffer(8)
+    ring.write(b'abcdef')
+    ring.write(b'ghij')
+    assert ring.overflows == 2
+    assert ring.read(8) == b'cdefghij'
+    ring.write(b'0123456789AB')  # Larger than the ring: only the newest bytes fit
+    assert ring.overflows == 2 + 4
+    assert ring.read(8) == b'456789AB'
+
+
+def test_dispatch_order_and_partial_responses():
+    tpu = driver(rx_thread=False)
+    try:
+        ack, data = PendingResponse(1), PendingResponse(4)
+        tpu._pending.extend([ack, data])
+        dispatch(tpu, b'\xAAwx')
+        assert ack.future.result(0) == b'\xAA'
+        assert not data.future.done()
+        dispatch(tpu, b'yz!!')
+        assert data.future.result(0) == b'wxyz'
+        assert not tpu._pending and len(tpu._rx_ring) == 0
+        assert tpu.stats['unsolicited_bytes'] == 2
+    finally:
+        tpu.close()
+
+
+def test_abandoned_response_absorbs_late_bytes():
+    tpu = driver(rx_thread=False)
+    try:
+        late, stale, nxt = PendingResponse(2), PendingResponse(3), PendingResponse(1)
+        stale.abandoned_at = time.monotonic() - tpu.STALE_RESPONSE_S - 1
+        late.abandoned_at = time.monotonic()
+        tpu._pending.extend([stale, late, nxt])
+        # The stale slot is dropped; the recent one eats its bytes unresolved
+        dispatch(tpu, b'LL\xAA')
+        assert not stale.future.done() and not late.future.done()
+        assert nxt.future.result(0) == b'\xAA'
+        assert tpu.stats['unsolicited_bytes'] == 0
+    finally:
+        tpu.close()
+
+
+def test_concurrent_commands_keep_response_order():
+    """A command queued second cannot overtake one still being written"""
+    tpu = driver()
+    try:
+        words = [bytes([i]) * 32 for i in range(2)]
+        for addr, word in enumerate(words):
+            assert tpu.write_ub(addr, word).result(1.0) == b'\xAA'
+
+        write = tpu.ser.write
+
+        def slow_write(data):
+            if data[:3] == bytes([0x04, 0, 0]):
+                time.sleep(0.05)  # Thread A is preempted mid-send
+            return write(data)
+
+        tpu.ser.write = slow_write
+        results = {}
+        reader = threading.Thread(target=lambda: results.update(a=tpu.read_ub(0, 32)))
+        reader.start()
+        while not tpu._pending:
+            time.sleep(0.001)
+        results['b'] = tpu.read_ub(1, 32)
+        reader.join()
+        assert results == {'a': words[0], 'b': words[1]}
+    finally:
+        tpu.close()
+
+
+def main():
+    tests = [test_ring_buffer_wraps, test_ring_buffer_overflow_drops_oldest,
+             test_dispatch_order_and_partial_responses,
+             test_abandoned_response_absorbs_late_bytes,
+             test_concurrent_commands_keep_response_order]
+    for test in tests:
+        test()
+        print(f"  PASS: {test.__name__}")
+
+
+if __name__ == "__main__":
+    main()
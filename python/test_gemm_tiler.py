@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+GEMM Tiler Test
+===============
+Runs tiled GEMMs of assorted shapes on the emulator (emu://) against the
+vectorized NumPy reference, under both loop orders, weight paging and
+K split across UB loads, and checks the plans fit instruction memory.
+
+Usage:
+    python3 test_gemm_tiler.py
+    python3 -m pytest test_gemm_tiler.py
+"""
+
+import numpy as np
+
+from gemm_tiler import PROGRAM, GemmTiler, gemm_reference
+from tpu_coprocessor import TPUCoprocessor
+
+rng = np.random.default_rng(8)
+
+
+def test_reference_matches_numpy():
+    for m, k, n in [(1, 1, 1), (3, 3, 3), (5, 7, 11), (40, 17, 9)]:
+        a, b = rng.integers(-128, 128, (m, k)), rng.integers(-128, 128, (k, n))
+        expected = np.clip(a @ b, -128, 127).astype(np.int8)
+        assert np.array_equal(gemm_reference(a, b), expected)
+
+
+def test_shapes_match_reference():
+    tpu = TPUCoprocessor('emu://')
+    try:
+        for m, k, n in [(1, 1, 1), (3, 3, 9), (10, 14, 23), (7, 40, 5), (4, 2, 40)]:
+            a, b = rng.integers(-6, 7, (m, k)), rng.integers(-6, 7, (k, n))
+            assert np.array_equal(GemmTiler().run(tpu, a, b), gemm_reference(a, b)), (m, k, n)
+    finally:
+        tpu.close()
+
+
+def test_paging_and_k_chunks():
+    """Few weight slots force paging or row groups; wide blocks split K"""
+    tpu = TPUCoprocessor('emu://')
+    a, b = rng.integers(-6, 7, (9, 60)), rng.integers(-6, 7, (60, 10))
+    try:
+        for tiler, order, block in [(GemmTiler(weight_slots=4), 'columns', 3),
+                                    (GemmTiler(weight_slots=40), 'rows', 5),
+                                    (GemmTiler(), 'columns', 10)]:
+            plan = tiler.plan(9, 60, 10, order, block)
+            assert np.array_equal(tiler.run(tpu, a, b, plan), gemm_reference(a, b)), order
+        assert plan.k_chunk == 9  # 96 input words / 10 columns: 3 UB loads for 20 K-slices
+    finally:
+        tpu.close()
+
+
+def test_plans_fit_and_choose_fewest_bytes():
+    for tiler, shape in [(GemmTiler(), (256, 256, 8)), (GemmTiler(), (10, 14, 23)),
+                         (GemmTiler(weight_slots=12), (30, 9, 40)), (GemmTiler(), (300, 60, 32))]:
+        plan = tiler.plan(*shape)
+        programs = [s.program for s in plan.steps if s.kind == PROGRAM]
+        assert all(len(p) <= 32 and p[-1] == tiler.encoder.halt() for p in programs)
+        for order in {'columns', 'rows'} - {plan.order}:
+            try:
+                other = tiler.plan(*shape, order)
+            except ValueError:
+                continue  # 'rows' only applies when the tiles do not all fit
+            assert plan.stats()['uart_bytes'] <= other.stats()['uart_bytes'], shape
+    # 2000 tiles, 20 per strip: row groups send each tile once instead of per block
+    assert GemmTiler().plan(300, 60, 32).order == 'rows'
+    # Resident weights: each tile uploaded once, read into the FIFO once per block
+    plan = GemmTiler().plan(10, 14, 23)
+    stats = plan.stats()
+    assert stats['weight_bytes'] == 4 * 5 * 24
+    assert stats['weight_reloads'] >= 20 * -(-23 // plan.block)
+
+
+def main():
+    tests = [test_reference_matches_numpy, test_shapes_match_reference,
+             test_paging_and_k_chunks, test_plans_fit_and_choose_fewest_bytes]
+    for test in tests:
+        test()
+        print(f"  PASS: {test.__name__}")
+
+
+if __name__ == "__main__":
+    main()
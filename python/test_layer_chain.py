@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Layer Chaining Test
+===================
+Checks fused layer programs against the host reference: chains with and
+without bias and ReLU, one program per layer against one for the chain,
+the host-visible bank select left unchanged, and the reported savings
+over the unfused forward_pass path, priced without touching the board
+(emu://).
+
+Usage:
+    python3 test_layer_chain.py
+    python3 -m pytest test_layer_chain.py
+"""
+
+import numpy as np
+
+from layer_chain import Layer, LayerChain
+from tpu_coprocessor import TPUCoprocessor
+
+rng = np.random.default_rng(23)
+
+
+def mlp(widths, bias=True, relu_last=False):
+    layers = []
+    for i, (k, n) in enumerate(zip(widths, widths[1:])):
+        last = i == len(widths) - 2
+        layers.append(Layer(rng.integers(-3, 4, (n, k)),
+                            rng.integers(-6, 7, n) if bias else None,
+                            relu=relu_last or not last))
+    return layers
+
+
+def test_single_layer():
+    tpu = TPUCoprocessor('emu://')
+    try:
+        for layer in (Layer(rng.integers(-4, 5, (3, 3))),
+                      Layer(rng.integers(-4, 5, (5, 4)), rng.integers(-9, 10, 5), relu=False)):
+            chain = LayerChain(tpu, [layer])
+            inputs = rng.integers(-10, 11, (layer.weights.shape[1], 2))
+            assert np.array_equal(chain.run(inputs), chain.reference(inputs))
+    finally:
+        tpu.close()
+
+
+def test_chain_matches_reference():
+    tpu = TPUCoprocessor('emu://')
+    try:
+        for widths, bias in (([6, 9, 6, 3], True), ([4, 7, 2], False)):
+            chain = LayerChain(tpu, mlp(widths, bias))
+            inputs = rng.integers(-8, 9, (widths[0], 3))
+            expected = chain.reference(inputs)
+            assert np.array_equal(chain.run(inputs), expected)
+            assert np.array_equal(chain.run(inputs, per_layer=True), expected)
+
+        # Large products saturate to int8 after each layer, as on the host
+        layers = [Layer(np.full((3, 3), 40)), Layer(np.full((3, 3), -2), relu=False)]
+        chain = LayerChain(tpu, layers)
+        inputs = np.full((3, 2), 5)
+        assert np.array_equal(chain.run(inputs), chain.reference(inputs))
+    finally:
+        tpu.close()
+
+
+def test_bank_select_unchanged():
+    tpu = TPUCoprocessor('emu://')
+    try:
+        bank = tpu.probe_ub_bank()
+        chain = LayerChain(tpu, mlp([3, 6, 3]))
+        chain.run(rng.integers(-8, 9, (3, 2)))
+        assert tpu.ub_bank == bank
+        tpu.ub_bank = None
+        assert tpu.probe_ub_bank() == bank
+    finally:
+        tpu.close()
+
+
+def test_report_savings():
+    tpu = TPUCoprocessor('emu://')
+    try:
+        widths, batch = [6, 9, 6, 3], 4
+        chain = LayerChain(tpu, mlp(widths))
+        sent = tpu.uart.ser.device.rx_count
+        report = chain.report(batch)
+        # Pricing is offline: no EXEC_QUEUE probe or anything else on the link
+        assert tpu.uart.ser.device.rx_count == sent and tpu._exec_queue is None
+        assert len(chain.program(batch)) > 32
+        queued = chain.report(batch, exec_queue=True)
+        assert queued['fused_round_trips'] > report['fused_round_trips']
+        assert tpu.uart.ser.device.rx_count == sent
+        assert report['programs'] == 1
+        assert report['instructions'] == len(chain.program(batch))
+        assert report['saved_round_trips'] > 0
+        # Intermediate activations are neither read back nor re-uploaded
+        intermediate = sum(batch * -(-n // 3) * 32 * 2 for n in widths[1:-1])
+        assert report['saved_bytes'] >= intermediate
+        assert report['saved_bytes'] == report['unfused_bytes'] - report['fused_bytes']
+        assert chain.report(batch, per_layer=True)['programs'] == len(widths) - 1
+
+        try:
+            LayerChain(tpu, mlp([9, 9])).regions(64)
+            assert False, "batch larger than a UB bank accepted"
+        except ValueError:
+            pass
+    finally:
+        tpu.close()
+
+
+def main():
+    tests = [test_single_layer, test_chain_matches_reference,
+             test_bank_select_unchanged, test_report_savings]
+    for test in tests:
+        test()
+        print(f"  PASS: {test.__name__}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Program Segmentation Test
+=========================
+Checks how long programs are cut into HALT-terminated segments, that a
+segmented program computes what the whole one would, that queued starts
+over the two instruction-memory halves leave no bubbles behind slow runs,
+and the load_program + execute fallback without EXEC_QUEUE (emu://).
+
+Usage:
+    python3 test_program_segments.py
+    python3 -m pytest test_program_segments.py
+"""
+
+import numpy as np
+
+from completion_predictor import CompletionPredictor
+from program_segments import HALF_WORDS, SegmentRunner, split_program
+from tpu_coprocessor import InstructionEncoder, TPUCoprocessor
+
+enc = InstructionEncoder()
+rng = np.random.default_rng(11)
+
+
+def batch_program(columns: int, sync: bool = False) -> list:
+    """matrix_multiply_batch's program for more columns than fit in 32 words"""
+    program = [enc.load_weights(row, 1) for row in range(3)]
+    for col in range(columns):
+        program += [enc.load_ub(col), enc.matmul(col, col, 3),
+                    enc.store_ub(TPUCoprocessor.BATCH_OUTPUT_ADDR + col)]
+    return program + ([enc.sync()] if sync else []) + [enc.halt()]
+
+
+def run_batch(tpu: TPUCoprocessor, runner: SegmentRunner, columns: int) -> None:
+    weights = rng.integers(-3, 4, (3, 3))
+    inputs = rng.integers(-8, 9, (3, columns))
+    assert tpu.load_weights(0, tpu.weight_rows(weights))
+    words = np.zeros((columns, TPUCoprocessor.UB_WORD_SIZE), dtype=np.int8)
+    words[:, :3] = inputs.T
+    assert tpu.write_unified_buffer((tpu.ub_bank or 0) << 8, words)
+    runner.run(batch_program(columns))
+    results = tpu.read_unified_buffer(TPUCoprocessor.BATCH_OUTPUT_ADDR,
+                                      columns * TPUCoprocessor.UB_WORD_SIZE)
+    outputs = np.frombuffer(results, dtype=np.int8).reshape(columns, -1)[:, :3].T
+    assert np.array_equal(outputs, np.clip(weights @ inputs, -128, 127))
+
+
+def test_split_program():
+    program = batch_program(20)
+    segments = split_program(program)
+    assert all(len(s) <= HALF_WORDS and s[-1] == enc.halt() for s in segments)
+    assert sum((s[:-1] for s in segments), []) == program[:-1]
+    assert len(segments) == -(-(len(program) - 1) // (HALF_WORDS - 1))
+    # Anything after the first HALT never runs
+    assert split_program([enc.nop(), enc.halt(), enc.nop()], 32) == [[enc.nop(), enc.halt()]]
+    assert split_program([enc.halt()]) == [[enc.halt()]]
+    try:
+        split_program([enc.nop()] * 40)
+        assert False, "program without HALT accepted"
+    except ValueError:
+        pass
+
+
+def test_segmented_matches_whole():
+    tpu = TPUCoprocessor('emu://')
+    try:
+        assert tpu.supports_exec_queue()
+        runner = SegmentRunner(tpu)
+        # Fits: one segment at PC 0, no queued starts
+        run_batch(tpu, runner, 9)
+        assert runner.report()['segments'] == 1
+        run_batch(tpu, runner, 40)
+        assert runner.report()['segments'] == 1 + len(split_program(batch_program(40)))
+
+        # The bank select follows the SYNCs of every segment
+        tpu.probe_ub_bank()
+        bank = tpu.ub_bank
+        runner.run(batch_program(12, sync=True))
+        assert tpu.ub_bank == bank ^ 1
+        tpu.ub_bank = None
+        assert tpu.probe_ub_bank() == bank ^ 1
+    finally:
+        tpu.close()
+
+
+def test_no_bubbles_behind_slow_segments():
+    tpu = TPUCoprocessor('emu://?paced=1', 115_200)
+    emu = tpu.uart.ser.device
+    try:
+        runner = SegmentRunner(tpu)
+        segments = runner.segments_for(batch_program(30))
+        # Segments of ~15 ms; a 16-word upload takes ~6 ms on the wire
+        emu.clock_hz = max(map(CompletionPredictor.estimate_cycles, segments)) / 0.015
+        run_batch(tpu, runner, 30)
+        report = runner.report()
+        assert report['segments'] == len(segments) and report['bubbles'] == 0
+
+        # At full speed each segment halts long before the next upload ends
+        emu.clock_hz = 100e6
+        runner.reset_stats()
+        run_batch(tpu, runner, 30)
+        assert runner.report()['bubbles'] == len(segments) - 1
+    finally:
+        tpu.close()
+
+
+def test_fallback_without_exec_queue():
+    tpu = TPUCoprocessor('emu://')
+    try:
+        tpu._exec_queue = False  # As probed on an older bitstream
+        runner = SegmentRunner(tpu)
+        run_batch(tpu, runner, 40)
+        program = batch_program(40)
+        assert runner.report()['segments'] == len(split_program(program, 32))
+        assert all(len(s) <= 32 for s in runner.segments_for(program))
+    finally:
+        tpu.close()
+
+
+def main():
+    tests = [test_split_program, test_segmented_matches_whole,
+             test_no_bubbles_behind_slow_segments, test_fallback_without_exec_queue]
+    for test in tests:
+        test()
+        print(f"  PASS: {test.__name__}")
+
+
+if __name__ == "__main__":
+    main()
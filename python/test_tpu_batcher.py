@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Dynamic Batching Test
+=====================
+Checks matrix_multiply_batch and the MatmulBatcher front end against the
+emulator (emu://): results, grouping by weights, deadlines and reports.
+
+Usage:
+    python3 test_tpu_batcher.py
+    python3 -m pytest test_tpu_batcher.py
+"""
+
+import threading
+import time
+
+import numpy as np
+
+from tpu_batcher import MatmulBatcher
+from tpu_coprocessor import TPUCoprocessor
+
+
+def test_matrix_multiply_batch():
+    rng = np.random.default_rng(3)
+    tpu = TPUCoprocessor('emu://')
+    try:
+        weights = rng.integers(-6, 7, (3, 3))
+        for count in (tpu.MAX_BATCH, 1, 4):
+            inputs = rng.integers(-9, 10, (3, count))
+            result = tpu.matrix_multiply_batch(weights, inputs)
+            assert result.shape == (3, count)
+            assert np.array_equal(result, np.clip(weights @ inputs, -128, 127))
+        # Shrinking the batch only moves HALT: the rest of the program is resident
+        sent = tpu.program_cache.stats['words_sent']
+        tpu.matrix_multiply_batch(weights, rng.integers(-9, 10, (3, 3)))
+        assert tpu.program_cache.stats['words_sent'] - sent == 1
+    finally:
+        tpu.close()
+
+
+def test_concurrent_callers_are_batched():
+    rng = np.random.default_rng(4)
+    weight_sets = [rng.integers(-4, 5, (3, 3)) for _ in range(2)]
+    tpu = TPUCoprocessor('emu://')
+    failures = []
+
+    with MatmulBatcher(tpu, max_delay=0.05) as batcher:
+        def client(index):
+            weights = weight_sets[index % 2]
+            inputs = rng.integers(-8, 9, (3, 1))
+            if not np.array_equal(batcher.matrix_multiply(weights, inputs, timeout=5),
+                                  weights @ inputs):
+                failures.append(index)
+
+        threads = [threading.Thread(target=client, args=(i,)) for i in range(12)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    tpu.close()
+
+    report = batcher.report()
+    assert not failures
+    assert report['requests'] == 12 and report['errors'] == 0
+    assert report['mean_batch'] > 1 and max(report['batch_sizes']) <= tpu.MAX_BATCH
+    assert report['queue_delay_ms']['max'] < 1000
+
+
+def test_deadline_and_slo():
+    tpu = TPUCoprocessor('emu://')
+    weights = np.eye(3, dtype=np.int64)
+    try:
+        with MatmulBatcher(tpu, max_delay=0.2) as batcher:
+            start = time.monotonic()
+            assert np.array_equal(batcher.matrix_multiply(weights, np.array([1, 2, 3])),
+                                  [[1], [2], [3]])
+            assert time.monotonic() - start >= 0.2  # A lone request waits out the window
+
+        with MatmulBatcher(tpu, max_delay=0.2, slo=0.05) as batcher:
+            start = time.monotonic()
+            batcher.matrix_multiply(weights, np.array([1, 2, 3]))
+            assert time.monotonic() - start < 0.2  # The SLO shortens the window
+    finally:
+        tpu.close()
+
+
+def main():
+    tests = [test_matrix_multiply_batch, test_concurrent_callers_are_batched,
+             test_deadline_and_slo]
+    for test in tests:
+        test()
+        print(f"  PASS: {test.__name__}")
+
+
+if __name__ == "__main__":
+    main()
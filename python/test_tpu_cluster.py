@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+TPU Cluster Test
+================
+Shards batches across several emulated boards (emu://) and checks result
+order, failover and slow-board removal.
+
+Usage:
+    python3 test_tpu_cluster.py
+    python3 -m pytest test_tpu_cluster.py
+"""
+
+import numpy as np
+
+from tpu_cluster import TPUCluster
+from tpu_coprocessor import TPUCoprocessor
+
+rng = np.random.default_rng(5)
+
+
+def expected(weights, inputs):
+    return np.clip(weights @ inputs, -128, 127)
+
+
+def test_results_merge_in_order():
+    weights = rng.integers(-4, 5, (3, 3))
+    inputs = rng.integers(-8, 9, (3, 50))
+    with TPUCluster(['emu://'] * 3) as cluster:
+        cluster.broadcast_weights(weights)
+        assert all(b.tpu.weight_cache.stats['rows_sent'] == 3 for b in cluster.boards)
+        assert np.array_equal(cluster.matrix_multiply(weights, inputs), expected(weights, inputs))
+        # Broadcast weights are already resident: no further weight traffic
+        assert all(b.tpu.weight_cache.stats['rows_sent'] == 3 for b in cluster.boards)
+        report = cluster.report()
+    assert sum(r['columns'] for r in report.values()) == 50
+
+
+def test_failed_board_leaves_rotation():
+    weights = rng.integers(-4, 5, (3, 3))
+    inputs = rng.integers(-8, 9, (3, 45))
+    boards = [TPUCoprocessor('emu://?paced=1', 1_000_000), TPUCoprocessor('emu://')]
+    with TPUCluster(boards) as cluster:
+        cluster.boards[1].tpu.uart.ser.close()  # Unplugged mid-run: its chunk is re-queued
+        assert np.array_equal(cluster.matrix_multiply(weights, inputs), expected(weights, inputs))
+        assert [b.healthy for b in cluster.boards] == [True, False]
+        assert cluster.boards[1].failures == 1 and 'PortNotOpen' in cluster.boards[1].reason
+        cluster.boards[0].tpu.uart.ser.close()
+        try:
+            cluster.matrix_multiply(weights, inputs, timeout=10)
+            assert False, "expected IOError with every board down"
+        except IOError:
+            pass
+
+
+def test_slow_board_leaves_rotation_and_restore():
+    weights = rng.integers(-4, 5, (3, 3))
+    inputs = rng.integers(-8, 9, (3, 27))
+    boards = [TPUCoprocessor('emu://?paced=1', 1_000_000),
+              TPUCoprocessor('emu://?paced=1', 38_400),
+              TPUCoprocessor('emu://?paced=1', 1_000_000)]
+    with TPUCluster(boards, slow_factor=4.0) as cluster:
+        for _ in range(5):
+            assert np.array_equal(cluster.matrix_multiply(weights, inputs),
+                                  expected(weights, inputs))
+            if not cluster.boards[1].healthy:
+                break
+        assert not cluster.boards[1].healthy and 'slow' in cluster.boards[1].reason
+        assert cluster.boards[0].healthy and cluster.boards[2].healthy
+        cluster.matrix_multiply(weights, inputs)  # The parked worker exits
+        cluster.restore(1)
+        assert cluster.boards[1].healthy
+        assert np.array_equal(cluster.matrix_multiply(weights, inputs), expected(weights, inputs))
+
+
+def main():
+    tests = [test_results_merge_in_order, test_failed_board_leaves_rotation,
+             test_slow_board_leaves_rotation_and_restore]
+    for test in tests:
+        test()
+        print(f"  PASS: {test.__name__}")
+
+
+if __name__ == "__main__":
+    main()
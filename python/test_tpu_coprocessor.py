@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+TPU Coprocessor Driver Test
+===========================
+Checks TPUCoprocessor against the in-process emulator and stand-in
+(emu://, standin://): the command framing of each call, the bytes it
+puts on the link, the results it decodes, and that calls return on
+their ACK rather than after fixed delays, within their deadline, and
+the instruction memory shadow behind load_program.
+
+Usage:
+    python3 test_tpu_coprocessor.py
+    python3 -m pytest test_tpu_coprocessor.py
+"""
+
+import threading
+import time
+
+import numpy as np
+
+from tpu_coprocessor import TPUCoprocessor, UARTCommand, UARTTransport
+from uart_standin import STATUS_HALTED, STATUS_IDLE, UARTStandIn
+
+rng = np.random.default_rng(11)
+
+
+class FaultyStandIn(UARTStandIn):
+    """Stand-in whose write ACKs can be replaced per address (b'' = no ACK)"""
+
+    def __init__(self, replies=None):
+        super().__init__()
+        self.replies = replies or {}
+
+    def _write_ub(self, frame: bytes) -> bytes:
+        ack = super()._write_ub(frame)
+        return self.replies.get(self._header(frame)[0], ack)
+
+    def _write_wt(self, frame: bytes) -> bytes:
+        ack = super()._write_wt(frame)
+        return self.replies.get(self._header(frame)[0], ack)
+
+
+def faulty(replies=None, window: int = 8) -> TPUCoprocessor:
+    tpu = TPUCoprocessor('standin://', window=window)
+    tpu.uart.ser.device = FaultyStandIn(replies)
+    return tpu
+
+
+def test_read_status_single_byte():
+    """READ_STATUS is one byte: nothing is left behind for the next read"""
+    tpu = TPUCoprocessor('standin://')
+    try:
+        dev = tpu.uart.ser.device
+        word = bytes(range(32))
+        assert tpu.write_unified_buffer(3, word)
+        sent = dev.rx_count
+        assert tpu.read_status().raw == STATUS_IDLE
+        assert dev.rx_count == sent + 1
+        assert tpu.uart.ser.in_waiting == 0
+        assert tpu.read_unified_buffer(3) == word
+    finally:
+        tpu.close()
+
+
+def test_matrix_multiply_orientation():
+    """Results are weights @ inputs for non-symmetric weights, run after run"""
+    tpu = TPUCoprocessor('emu://')
+    try:
+        for _ in range(3):
+            weights = rng.integers(-5, 6, (3, 3))
+            inputs = rng.integers(-9, 10, (3, 1))
+            out = tpu.matrix_multiply(weights, inputs)
+            assert out.shape == (3, 1)
+            assert np.array_equal(out, np.clip(weights @ inputs, -128, 127))
+        assert tpu.uart.ser.device.status == STATUS_HALTED
+    finally:
+        tpu.close()
+
+
+def test_wrong_ack_fails_only_its_command():
+    tpu = faulty({5: b'\x00'}, window=3)
+    try:
+        words = [bytes([i]) * 32 for i in range(8)]
+        failed = tpu.write_unified_buffer_bulk(0, words)
+        assert [(p.addr, p.received) for p in failed] == [(5, 0x00)]
+        assert not tpu.uart.in_flight
+        dev = tpu.uart.ser.device
+        assert all(dev.ub_word(i) == words[i] for i in range(8))
+    finally:
+        tpu.close()
+
+
+def test_missing_ack_fails_everything_in_flight():
+    """After a lost ACK the stream cannot be realigned: all in flight fail"""
+    tpu = faulty({addr: b'' for addr in range(5, 8)})
+    try:
+        uart = tpu.uart
+        failed = []
+        for addr in range(8):
+            failed += uart.submit(UARTCommand.WRITE_UB, addr, bytes(32), UARTTransport.ACK_BYTE_UB,
+                                  pad_to=32)
+        assert not failed and len(uart.in_flight) == 3
+        uart.ser.device.replies.clear()
+        uart.ser.write(bytes([0x42]))  # A stray NACK is discarded with the queue
+        failed = uart.drain(0.05)
+        assert [p.addr for p in failed] == [5, 6, 7]
+        assert failed[0].received == 0xFF and failed[1].received is None
+        assert not uart.in_flight and uart.ser.in_waiting == 0
+    finally:
+        tpu.close()
+
+
+def test_window_back_pressure():
+    """submit() blocks while `window` commands await an ACK"""
+    tpu = faulty({addr: b'' for addr in range(4)}, window=2)
+    try:
+        uart = tpu.uart
+        ack = UARTTransport.ACK_BYTE_UB
+        assert uart.submit(UARTCommand.WRITE_UB, 0, bytes(32), ack, timeout=0.1) == []
+        assert uart.submit(UARTCommand.WRITE_UB, 1, bytes(32), ack, timeout=0.1) == []
+        start = time.monotonic()
+        failed = uart.submit(UARTCommand.WRITE_UB, 2, bytes(32), ack, timeout=0.1)
+        assert time.monotonic() - start >= 0.1
+        assert [p.addr for p in failed] == [0, 1]
+        assert [p.addr for p in uart.in_flight] == [2]
+        assert [p.addr for p in uart.drain(0.05)] == [2]
+        uart.ser.device.replies.clear()
+        assert uart.submit(UARTCommand.WRITE_UB, 3, bytes(32), ack) == []
+        assert uart.drain() == []
+    finally:
+        tpu.close()
+
+
+def burst_bytes(words: int) -> int:
+    return UARTTransport.HEADER_SIZE + 4 * words
+
+
+def test_resident_program_reload_sends_nothing():
+    tpu = TPUCoprocessor('standin://')
+    try:
+        dev, stats = tpu.uart.ser.device, tpu.program_cache.stats
+        program = [0x1000_0000 + i for i in range(8)]
+        assert tpu.load_program(program)
+        assert dev.instr[:8] == program
+        sent = dev.rx_count
+        assert tpu.load_program(program)
+        assert dev.rx_count == sent
+        assert stats['hits'] == 1 and stats['words_sent'] == 8 and stats['words_skipped'] == 8
+    finally:
+        tpu.close()
+
+
+def test_partial_program_diff_sends_changed_runs():
+    tpu = TPUCoprocessor('standin://')
+    try:
+        dev = tpu.uart.ser.device
+        program = [0x1000_0000 + i for i in range(8)]
+        assert tpu.load_program(program, start=4)
+        edited = list(program)
+        edited[2], edited[5], edited[6] = 0xA, 0xB, 0xC
+        sent = dev.rx_count
+        assert tpu.load_program(edited, start=4)
+        # Two bursts: word 6 alone, then words 9-10
+        assert dev.rx_count - sent == burst_bytes(1) + burst_bytes(2)
+        assert dev.instr[4:12] == edited
+        assert tpu.program_cache.stats['words_sent'] == 8 + 3
+        sent = dev.rx_count
+        assert tpu.load_program(edited, start=4) and dev.rx_count == sent
+    finally:
+        tpu.close()
+
+
+def test_invalidate_program_cache_forces_full_reload():
+    tpu = TPUCoprocessor('standin://')
+    try:
+        dev = tpu.uart.ser.device
+        program = [0x2000_0000 + i for i in range(5)]
+        assert tpu.load_program(program)
+        tpu.ub_bank = 1
+        tpu.invalidate_program_cache()
+        assert tpu.ub_bank is None
+        assert tpu.program_cache.words == [None] * 32
+        sent = dev.rx_count
+        assert tpu.load_program(program)
+        assert dev.rx_count - sent == burst_bytes(5)
+    finally:
+        tpu.close()
+
+
+def test_program_out_of_range_rejected():
+    tpu = TPUCoprocessor('standin://')
+    try:
+        dev = tpu.uart.ser.device
+        sent = dev.rx_count
+        for program, start in (([0] * 4, 29), ([0] * 33, 0), ([0], -1)):
+            try:
+                tpu.load_program(program, start)
+                assert False, f"{len(program)} words at {start} accepted"
+            except ValueError:
+                pass
+        assert dev.rx_count == sent  # Rejected before anything was sent
+        assert tpu.load_program([7] * 4, start=28) and dev.instr[28:] == [7] * 4
+    finally:
+        tpu.close()
+
+
+def elapsed(call, *args) -> float:
+    start = time.monotonic()
+    assert call(*args)
+    return time.monotonic() - start
+
+
+def test_ack_paced_calls_skip_fixed_delays():
+    """Without fixed_delays each call returns on its response, not after 50 ms"""
+    word = bytes(range(32))
+    for fixed_delays in (False, True):
+        tpu = TPUCoprocessor('standin://?paced=1', fixed_delays=fixed_delays)
+        try:
+            times = [elapsed(tpu.write_unified_buffer, 2, word),
+                     elapsed(tpu.read_unified_buffer, 2),
+                     elapsed(tpu.write_weights, 0, bytes(8))]
+            if fixed_delays:
+                assert min(times) >= 0.05
+            else:
+                assert max(times) < 0.05
+        finally:
+            tpu.close()
+
+
+def test_missing_ack_times_out_at_deadline():
+    """A lost ACK costs exactly the deadline; a trickle cannot stretch it"""
+    tpu = faulty({3: b''})
+    try:
+        start = time.monotonic()
+        assert not tpu.write_unified_buffer(3, bytes(32), timeout=0.2)
+        assert 0.2 <= time.monotonic() - start < 0.5
+
+        uart, ser = tpu.uart, tpu.uart.ser
+        stop = threading.Event()
+
+        def trickle():
+            while not stop.wait(0.02):
+                with ser._cond:
+                    ser._rx += b'\x00'
+                    ser._cond.notify_all()
+
+        feeder = threading.Thread(target=trickle)
+        feeder.start()
+        try:
+            start = time.monotonic()
+            data = uart.read_exact(32, 0.2)
+            took = time.monotonic() - start
+        finally:
+            stop.set()
+            feeder.join()
+        assert 0 < len(data) < 32
+        assert 0.2 <= took < 0.5
+    finally:
+        tpu.close()
+
+
+def main():
+    tests = [test_read_status_single_byte, test_matrix_multiply_orientation,
+             test_wrong_ack_fails_only_its_command, test_missing_ack_fails_everything_in_flight,
+             test_window_back_pressure, test_ack_paced_calls_skip_fixed_delays,
+             test_missing_ack_times_out_at_deadline, test_resident_program_reload_sends_nothing,
+             test_partial_program_diff_sends_changed_runs,
+             test_invalidate_program_cache_forces_full_reload, test_program_out_of_range_rejected]
+    for test in tests:
+        test()
+        print(f"  PASS: {test.__name__}")
+
+
+if __name__ == "__main__":
+    main()
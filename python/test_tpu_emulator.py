@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+TPU Emulator Test
+=================
+Runs the unmodified TPUCoprocessor driver against the behavioural
+emulator (pty and in-process), checking datapath results, controller
+details and cycle accounting.
+
+Usage:
+    python3 test_tpu_emulator.py
+    python3 -m pytest test_tpu_emulator.py
+"""
+
+import time
+
+import numpy as np
+
+from tpu_coprocessor import InstructionEncoder, TPUCoprocessor
+from tpu_emulator import TPUEmulator, EmulatedSerial
+from uart_standin import (CMD_CFG_NOTIFY, CMD_EXEC_READ, CMD_READ_STATUS, PtyStandIn,
+                          STATUS_HALTED, UB_BANK_DEPTH)
+
+enc = InstructionEncoder()
+
+
+def run(emu: TPUEmulator, program):
+    emu.instr[:len(program)] = program
+    emu.execute()
+    assert emu.halted
+
+
+def test_matrix_multiply_over_pty():
+    """The stock driver computes weights @ inputs and can re-execute"""
+    rng = np.random.default_rng(1)
+    emu = TPUEmulator()
+    with PtyStandIn(emu) as dev:
+        tpu = TPUCoprocessor(dev.port)
+        try:
+            for _ in range(3):
+                weights = rng.integers(-4, 5, (3, 3))
+                inputs = rng.integers(-8, 9, (3, 1))
+                expected = np.clip(weights @ inputs, -128, 127)
+                assert np.array_equal(tpu.matrix_multiply(weights, inputs), expected)
+        finally:
+            tpu.close()
+    assert emu.status == STATUS_HALTED
+
+
+def test_saturation_and_unsigned():
+    emu = TPUEmulator()
+    for row in range(3):
+        emu.weights[row * 8:row * 8 + 3] = bytes([100, 200, 1])
+    emu.set_ub_word(0, bytes([2, 2, 2]))
+    program = [enc.load_weights(0, 3), enc.load_ub(0), enc.matmul(0, 0, 3, signed=False),
+               enc.store_ub(1), enc.halt()]
+    run(emu, program)
+    assert emu.ub_word(1)[:4] == bytes([255, 255, 6, 0])
+
+
+def test_matmul_requires_ld_ub():
+    """A MATMUL with no LD_UB before it only loads the activation"""
+    emu = TPUEmulator()
+    emu.weights[0:3] = bytes([1, 1, 1])
+    emu.set_ub_word(0, bytes([5, 0, 0]))
+    emu.set_ub_word(1, bytes([9] * 32))
+    run(emu, [enc.load_weights(0, 1), enc.matmul(0, 0, 3), enc.store_ub(1), enc.halt()])
+    assert emu.ub_word(1)[:3] == bytes(3)
+
+
+def test_sync_toggles_banks():
+    emu = TPUEmulator()
+    emu.weights[0:3] = bytes([1, 0, 0])
+    emu.set_ub_word(4, bytes([3]))
+    emu.set_ub_word(UB_BANK_DEPTH + 4, bytes([7]))
+    run(emu, [enc.load_weights(0, 1), enc.load_weights(1, 2), enc.sync(),
+              enc.load_ub(4), enc.matmul(4, 0, 3), enc.store_ub(5), enc.halt()])
+    assert emu.ub_word(5)[0] == 7
+
+
+def test_matmul_clears_accumulator():
+    """MATMUL zeroes the whole buffer; MATMUL_ACC adds to one entry"""
+    emu = TPUEmulator()
+    emu.weights[0:3] = bytes([1, 0, 0])
+    emu.set_ub_word(0, bytes([2]))
+    emu.set_ub_word(1, bytes([5]))
+    mac = [enc.load_ub(1), enc.matmul_acc(1, 7, 3)]
+    run(emu, [enc.load_weights(0, 1)] + mac + mac + [enc.store_ub(10),
+              enc.load_ub(0), enc.matmul(0, 3, 3)] + mac + [enc.store_ub(11), enc.halt()])
+    assert emu.ub_word(10)[0] == 10
+    assert emu.ub_word(11)[0] == 5  # Entry 7 was cleared by the MATMUL into entry 3
+
+
+def test_cycle_counts():
+    emu = TPUEmulator()
+    run(emu, [enc.nop(), enc.halt()])
+    assert emu.last_run_cycles == 2 + 3
+    run(emu, [enc.load_weights(0, 1), enc.load_ub(0), enc.matmul(0, 0, 3),
+              enc.store_ub(1), enc.halt()])
+    # RD_WEIGHT 14 + LD_UB 4 + MATMUL (2 + 258 clear + 19) + ST_UB 7 + HALT 3
+    assert emu.last_run_cycles == 307
+    assert emu.cycles == 312
+
+
+def test_emulated_serial():
+    """In-process pyserial-style port: raw protocol bytes, no pty"""
+    ser = EmulatedSerial(TPUEmulator())
+    ser.write(bytes([0x01, 0, 3, 0, 32]) + bytes(range(32)))
+    assert ser.read(1) == b'\xAA'
+    ser.write(bytes([0x04, 0, 3, 0, 32]))
+    buf = bytearray(32)
+    assert ser.readinto(buf) == 32 and buf == bytes(range(32))
+    ser.write(bytes([0x06]))
+    assert ser.in_waiting == 1 and ser.read(1) == b'\x20'
+
+
+def test_completion_push():
+    """execute() returns on the pushed status once the run's cycles have elapsed"""
+    tpu = TPUCoprocessor('emu://')
+    emu = tpu.uart.ser.device
+    emu.clock_hz = 1e4  # 307 cycles -> ~31 ms per run
+    program = [enc.load_weights(0, 1), enc.load_ub(0), enc.matmul(0, 0, 3),
+               enc.store_ub(1), enc.halt()]
+    try:
+        assert tpu.load_program(program)
+        assert tpu.set_completion_push()
+        for _ in range(2):
+            received = emu.rx_count
+            start = time.monotonic()
+            assert tpu.execute()
+            assert time.monotonic() - start >= emu.last_run_cycles / emu.clock_hz
+            assert emu.rx_count - received == 1  # EXECUTE only: no READ_STATUS polls
+        assert tpu.set_completion_push(False) and not tpu.completion_push
+        assert tpu.execute()
+
+        del emu._table[CMD_CFG_NOTIFY]  # Older bitstream: NACKs the command
+        assert not tpu.set_completion_push()
+        assert tpu.execute() and tpu.read_status().raw == STATUS_HALTED
+    finally:
+        tpu.close()
+
+
+def test_execute_and_read():
+    """One EXEC_READ replaces EXECUTE, status polls and READ_UB; old bitstreams fall back"""
+    program = [enc.load_weights(0, 1), enc.load_ub(0), enc.matmul(0, 0, 3),
+               enc.store_ub(1), enc.halt()]
+    for fused in (True, False):
+        tpu = TPUCoprocessor('emu://')
+        emu = tpu.uart.ser.device
+        emu.clock_hz = 1e4  # ~31 ms per run
+        if not fused:
+            del emu._table[CMD_EXEC_READ]
+        try:
+            emu.weights[0:3] = bytes([1, 2, 3])
+            emu.set_ub_word(0, bytes([2, 0, 0]))
+            assert tpu.load_program(program)
+            assert tpu.supports_exec_read() == fused
+            statuses = []
+            emu._table[CMD_READ_STATUS] = (lambda rx: 1, lambda frame: (
+                statuses.append(frame), emu._read_status(frame))[1])
+            start = time.monotonic()
+            assert tpu.execute_and_read(1, 4) == bytes([2, 4, 6, 0])
+            assert time.monotonic() - start >= emu.last_run_cycles / emu.clock_hz
+            assert bool(statuses) != fused
+        finally:
+            tpu.close()
+
+
+def main():
+    tests = [test_matrix_multiply_over_pty, test_saturation_and_unsigned,
+             test_matmul_requires_ld_ub, test_sync_toggles_banks, test_matmul_clears_accumulator,
+             test_cycle_counts, test_emulated_serial, test_completion_push,
+             test_execute_and_read]
+    for test in tests:
+        test()
+        print(f"  PASS: {test.__name__}")
+
+
+if __name__ == "__main__":
+    main()
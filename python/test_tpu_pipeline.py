@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Layer Pipeline Test
+===================
+Runs multi-layer forward passes across emulated boards (emu://) and
+checks results, layer placement, stage statistics and failure handling.
+
+Usage:
+    python3 test_tpu_pipeline.py
+    python3 -m pytest test_tpu_pipeline.py
+"""
+
+import numpy as np
+
+from tpu_coprocessor import TPUCoprocessor
+from tpu_pipeline import LayerPipeline
+
+rng = np.random.default_rng(6)
+
+
+def make_layers(count):
+    return [(rng.integers(-3, 4, (3, 3)), i < count - 1) for i in range(count)]
+
+
+def test_forward_pass_matches_reference():
+    layers = make_layers(4)
+    inputs = rng.integers(-8, 9, (3, 40))
+    for boards in (1, 2, 4):
+        with LayerPipeline(['emu://'] * boards, layers) as pipe:
+            assert [len(s.layers) for s in pipe.stages] == {1: [4], 2: [2, 2], 4: [1] * 4}[boards]
+            assert np.array_equal(pipe.forward_pass(inputs), pipe.reference(inputs))
+            # Weights were pinned up front: the pass itself sent none
+            assert all(s.tpu.weight_cache.stats['misses'] == len(s.layers) for s in pipe.stages)
+            assert all(s.micro_batches == 5 for s in pipe.stages)
+
+
+def test_uneven_split_and_micro_batch():
+    layers = make_layers(5)
+    inputs = rng.integers(-8, 9, (3, 10))
+    with LayerPipeline(['emu://'] * 3, layers) as pipe:
+        assert [len(s.layers) for s in pipe.stages] == [1, 2, 2]
+        assert [s.weight_addrs for s in pipe.stages] == [[0], [0, 3], [0, 3]]
+        assert np.array_equal(pipe.forward_pass(inputs, micro_batch=4), pipe.reference(inputs))
+        assert [s.micro_batches for s in pipe.stages] == [3, 3, 3]
+
+
+def test_bottleneck_stage_is_reported():
+    layers = make_layers(3)
+    boards = [TPUCoprocessor('emu://?paced=1', 1_000_000),
+              TPUCoprocessor('emu://?paced=1', 115_200),
+              TPUCoprocessor('emu://?paced=1', 1_000_000)]
+    with LayerPipeline(boards, layers) as pipe:
+        inputs = rng.integers(-8, 9, (3, 27))
+        assert np.array_equal(pipe.forward_pass(inputs), pipe.reference(inputs))
+        report = pipe.report()
+    assert report['bottleneck'] == 1
+    stages = report['stages']
+    assert stages[1]['utilization'] > stages[0]['utilization']
+    # The stage after the slow one starves; the one before it blocks
+    assert stages[2]['wait_in_s'] > stages[2]['busy_s']
+
+
+def test_stage_failure_raises():
+    with LayerPipeline(['emu://'] * 2, make_layers(2)) as pipe:
+        pipe.stages[1].tpu.uart.ser.close()
+        try:
+            pipe.forward_pass(rng.integers(-8, 9, (3, 30)))
+            assert False, "expected IOError from stage 1"
+        except IOError as exc:
+            assert 'stage 1' in str(exc)
+
+
+def main():
+    tests = [test_forward_pass_matches_reference, test_uneven_split_and_micro_batch,
+             test_bottleneck_stage_is_reported, test_stage_failure_raises]
+    for test in tests:
+        test()
+        print(f"  PASS: {test.__name__}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+TPU Server Test
+===============
+Runs TPUServer in-process on a stub device (the emulator over emu://)
+and talks to it from several clients over a Unix socket, including the
+driver-side shadows that raw commands must invalidate.
+
+Usage:
+    python3 test_tpu_server.py
+    python3 -m pytest test_tpu_server.py
+"""
+
+import os
+import tempfile
+import threading
+
+import numpy as np
+
+from tpu_coprocessor import Opcode, TPUCoprocessor
+from tpu_server import FairQueue, TPUClient, TPUServer
+
+
+def start_server(**kwargs):
+    path = os.path.join(tempfile.mkdtemp(), 'tpu.sock')
+    tpu = TPUCoprocessor('emu://')
+    return TPUServer(tpu, **kwargs).start(path), path
+
+
+def test_fair_queue_round_robin():
+    queue = FairQueue()
+    for i in range(4):
+        queue.push('a', f'a{i}')
+    queue.push('b', 'b0')
+    queue.push('c', 'c0')
+    order = [queue.pop() for _ in range(len(queue))]
+    assert order == ['a0', 'b0', 'c0', 'a1', 'a2', 'a3']
+    queue.push('a', 'x')
+    assert queue.drop('a') == ['x'] and len(queue) == 0 and queue.peek() is None
+
+
+def test_raw_pipelined_and_coalesced():
+    server, path = start_server()
+    try:
+        with TPUClient(path) as client:
+            word = bytes(range(32))
+            assert client.raw(bytes([0x01, 0, 9, 0, 32]) + word, 1) == b'\xAA'
+            ids = [client.submit_raw(bytes([0x04, 0, 9, 0, 32]), 32) for _ in range(20)]
+            ids.append(client.submit_raw(bytes([0x06]), 1))
+            assert all(client.result(i) == word for i in ids[:-1])
+            assert client.result(ids[-1]) == b'\x20'
+            stats = client.stats()
+        assert stats['batches'] < stats['batched_requests'] == 22
+        assert stats['errors'] == 0 and stats['depth'] == 0
+    finally:
+        server.stop()
+
+
+def test_many_clients_share_the_board():
+    server, path = start_server()
+    rng = np.random.default_rng(2)
+    jobs = [(rng.integers(-5, 6, (3, 3)), rng.integers(-9, 10, (3, 1))) for _ in range(4)]
+    failures = []
+
+    def worker(index):
+        weights, inputs = jobs[index]
+        with TPUClient(path) as client:
+            for _ in range(3):
+                addr = 40 + index
+                word = bytes([index]) * 32
+                if client.raw(bytes([0x01, 0, addr, 0, 32]) + word, 1) != b'\xAA':
+                    failures.append((index, 'ack'))
+                if not np.array_equal(client.matrix_multiply(weights, inputs), weights @ inputs):
+                    failures.append((index, 'matmul'))
+                if client.raw(bytes([0x04, 0, addr, 0, 32]), 32) != word:
+                    failures.append((index, 'readback'))
+
+    try:
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(len(jobs))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=30)
+        assert not failures
+        assert server.stats['requests'] == 4 * 3 * 3 and server.stats['errors'] == 0
+    finally:
+        server.stop()
+
+
+def test_queue_limit_and_short_response():
+    server, path = start_server(max_pending=4)
+    try:
+        with TPUClient(path) as client:
+            ids = [client.submit_raw(bytes([0x04, 0, 0, 0, 32]), 32) for _ in range(32)]
+            outcomes = []
+            for request_id in ids:
+                try:
+                    client.result(request_id)
+                    outcomes.append(True)
+                except IOError:
+                    outcomes.append(False)
+            assert any(outcomes) and not all(outcomes)
+            # A length the commands do not answer fails only that request
+            try:
+                client.raw(bytes([0x06]), 2)
+                assert False, "short response should raise"
+            except IOError:
+                pass
+            assert client.raw(bytes([0x06]), 1) == b'\x20'
+            stats = client.stats()
+        assert stats['rejected'] == outcomes.count(False)
+        assert stats['clients']['0']['max_depth'] <= 4
+    finally:
+        server.stop()
+
+
+def test_raw_frames_invalidate_shadows():
+    """Every frame of a RAW payload is checked, not only the first"""
+    server, path = start_server()
+    tpu = server.tpu
+    try:
+        program = [Opcode.SYNC << 26, Opcode.HALT << 26]
+        rows = [bytes([i]) * 8 for i in range(4)]
+        assert tpu.load_program(program) and tpu.load_weights(0, rows)
+        tpu.ub_bank = 0
+        with TPUClient(path) as client:
+            # READ_STATUS, then a WRITE_WT over row 2
+            assert client.raw(bytes([0x06, 0x02, 0, 2, 0, 8]) + bytes(8), 2) == b'\x20\xBB'
+            assert tpu.weight_cache.rows[:4] == [rows[0], rows[1], None, rows[3]]
+            assert tpu.program_cache.words[:2] == program and tpu.ub_bank == 0
+            # WRITE_UB with a payload that looks like commands, then EXECUTE
+            word = bytes([0x03, 0x05, 0x0B]) + bytes(29)
+            assert client.raw(bytes([0x01, 0, 4, 0, 32]) + word + bytes([0x05]), 1) == b'\xAA'
+            assert tpu.ub_bank is None
+            assert tpu.program_cache.words[:2] == program and tpu.weight_cache.rows[0] == rows[0]
+            for frame in (bytes([0x0B, 0x00, 0x00]), bytes([0x0A, 0, 4, 0, 32])):
+                tpu.ub_bank = 1
+                client.raw(frame, 1 if frame[0] == 0x0B else 32)
+                assert tpu.ub_bank is None
+            # READ_UB, then a single-word WRITE_INSTR
+            client.raw(bytes([0x04, 0, 4, 0, 32, 0x03, 0, 5]) + bytes(4), 32)
+            assert tpu.program_cache.words == [None] * 32
+    finally:
+        server.stop()
+
+
+def test_malformed_raw_fails_only_its_client():
+    """Cut-off frames and wrong lengths cannot shift other clients' replies"""
+    server, path = start_server(max_batch=8)
+    try:
+        dev = server.tpu.uart.ser.device
+        word = bytes(range(32))
+        with TPUClient(path) as a, TPUClient(path) as b:
+            assert a.raw(bytes([0x01, 0, 6, 0, 32]) + word, 1) == b'\xAA'
+            sent = dev.rx_count
+            bad = [a.submit_raw(bytes([0x01, 0, 7, 0, 32]) + word[:8], 1),  # Cut off
+                   a.submit_raw(bytes([0x06, 0x06]), 1),                    # Answers 2
+                   a.submit_raw(bytes([0x05]), 0)]                          # Runs alone
+            good = [b.submit_raw(bytes([0x04, 0, 6, 0, 32]), 32) for _ in range(3)]
+            for request_id in bad[:2]:
+                try:
+                    a.result(request_id)
+                    assert False, "malformed RAW request accepted"
+                except IOError:
+                    pass
+            assert a.result(bad[2]) == b''
+            assert all(b.result(i) == word for i in good)
+            assert len(b.raw(bytes([0x06]), 1)) == 1
+        # Neither rejected request reached the board
+        assert dev.rx_count - sent == 1 + 3 * 5 + 1
+    finally:
+        server.stop()
+
+
+def main():
+    tests = [test_fair_queue_round_robin, test_raw_pipelined_and_coalesced,
+             test_many_clients_share_the_board, test_queue_limit_and_short_response,
+             test_raw_frames_invalidate_shadows, test_malformed_raw_fails_only_its_client]
+    for test in tests:
+        test()
+        print(f"  PASS: {test.__name__}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Double-Buffered Streaming Test
+==============================
+Checks UART access to both UB banks, bank-select tracking through SYNC,
+streamed results, and the hidden upload time reported against slow and
+fast emulated runs (emu://).
+
+Usage:
+    python3 test_tpu_stream.py
+    python3 -m pytest test_tpu_stream.py
+"""
+
+import numpy as np
+
+from completion_predictor import CompletionPredictor
+from tpu_coprocessor import TPUCoprocessor
+from tpu_stream import DoubleBufferedMatmul
+
+rng = np.random.default_rng(7)
+
+
+def test_uart_addresses_both_banks():
+    tpu = TPUCoprocessor('emu://')
+    try:
+        assert tpu.write_unified_buffer(5, bytes([1]) * 32)
+        assert tpu.write_unified_buffer(0x100 | 5, bytes([2]) * 32)
+        assert tpu.read_unified_buffer(5) == bytes([1]) * 32
+        assert tpu.read_unified_buffer(0x100 | 5) == bytes([2]) * 32
+
+        assert tpu.ub_bank is None and tpu.probe_ub_bank() == 0
+        assert tpu.load_program([tpu.encoder.sync(), tpu.encoder.halt()])
+        assert tpu.execute() and tpu.ub_bank == 1
+        tpu.ub_bank = None
+        assert tpu.probe_ub_bank() == 1
+        # Batches land in the bank LD_UB reads
+        weights = rng.integers(-3, 4, (3, 3))
+        inputs = rng.integers(-8, 9, (3, 4))
+        expected = np.clip(weights @ inputs, -128, 127).astype(np.int8)
+        assert np.array_equal(tpu.matrix_multiply_batch(weights, inputs), expected)
+    finally:
+        tpu.close()
+
+
+def test_stream_matches_reference():
+    tpu = TPUCoprocessor('emu://')
+    try:
+        stream = DoubleBufferedMatmul(tpu, rng.integers(-3, 4, (3, 3)))
+        for columns in (1, 9, 40):
+            inputs = rng.integers(-8, 9, (3, columns))
+            bank = tpu.ub_bank or 0
+            assert np.array_equal(stream.run(inputs), stream.reference(inputs))
+            # One SYNC per batch
+            assert tpu.ub_bank == bank ^ (-(-columns // 9) & 1)
+        assert stream.report()['batches'] == 1 + 1 + 5
+    finally:
+        tpu.close()
+
+
+def test_upload_hidden_behind_slow_runs():
+    tpu = TPUCoprocessor('emu://?paced=1', 115_200)
+    emu = tpu.uart.ser.device
+    try:
+        stream = DoubleBufferedMatmul(tpu, rng.integers(-3, 4, (3, 3)))
+        inputs = rng.integers(-8, 9, (3, 54))
+        # Runs of ~40 ms; a 9-column upload takes ~25 ms on the wire
+        emu.clock_hz = CompletionPredictor.estimate_cycles(stream.program(9)) / 0.04
+        assert np.array_equal(stream.run(inputs), stream.reference(inputs))
+        report = stream.report()
+        # Everything but the first batch's upload overlapped a run
+        first = report['upload_s'] / 6
+        assert report['exposed_upload_s'] < 1.5 * first
+        assert report['hidden_fraction'] > 0.7
+
+        # At full speed a run is ~30 us: almost nothing to hide behind
+        emu.clock_hz = 100e6
+        stream.reset_stats()
+        assert np.array_equal(stream.run(inputs), stream.reference(inputs))
+        assert stream.report()['hidden_fraction'] < 0.1
+    finally:
+        tpu.close()
+
+
+def main():
+    tests = [test_uart_addresses_both_banks, test_stream_matches_reference,
+             test_upload_hidden_behind_slow_runs]
+    for test in tests:
+        test()
+        print(f"  PASS: {test.__name__}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+TPU Transport Test
+==================
+Checks that open_transport() hands back a working port for each URL
+scheme and that the stock driver runs unmodified over TCP and in-process,
+and the copy-free UARTTransport I/O (send_frame, read_into, byte_view) on
+both the pyserial and the file-descriptor paths.
+
+Usage:
+    python3 test_tpu_transport.py
+    python3 -m pytest test_tpu_transport.py
+"""
+
+import os
+import time
+
+import numpy as np
+
+from tpu_coprocessor import TPUCoprocessor, UARTCommand, UARTTransport, byte_view
+from tpu_emulator import EmulatedSerial, TPUEmulator
+from tpu_transport import open_transport, is_in_process
+from uart_standin import TcpStandIn, UARTStandIn
+
+
+def roundtrip(ser) -> None:
+    """WRITE_UB then READ_UB one word through a raw port"""
+    ser.write(bytes([0x01, 0, 7, 0, 32]) + bytes(range(32)))
+    assert ser.read(1) == b'\xAA'
+    ser.write(bytes([0x04, 0, 7, 0, 32]))
+    assert ser.read(32) == bytes(range(32))
+
+
+def test_in_process_schemes():
+    emu = open_transport('emu://', timeout=1.0)
+    standin = open_transport('standin://?paced=1', baudrate=1_000_000, timeout=1.0)
+    assert isinstance(emu, EmulatedSerial) and isinstance(emu.device, TPUEmulator)
+    assert type(standin.device) is UARTStandIn and standin.paced
+    for ser in (emu, standin):
+        assert is_in_process(ser)
+        roundtrip(ser)
+        ser.close()
+
+
+def test_socket_scheme():
+    with TcpStandIn(UARTStandIn()) as server:
+        ser = open_transport(server.url, timeout=2.0)
+        try:
+            assert not is_in_process(ser)
+            roundtrip(ser)
+        finally:
+            ser.close()
+        # The server takes the next connection after a disconnect
+        ser = open_transport(server.url, timeout=2.0)
+        try:
+            roundtrip(ser)
+        finally:
+            ser.close()
+
+
+def test_driver_over_each_transport():
+    weights = np.array([[1, 2, 3], [-1, 0, 1], [2, 2, -2]])
+    inputs = np.array([[3], [-4], [5]])
+    expected = weights @ inputs
+    with TcpStandIn(TPUEmulator()) as server:
+        for url in ('emu://', server.url):
+            tpu = TPUCoprocessor(url)
+            try:
+                assert np.array_equal(tpu.matrix_multiply(weights, inputs), expected)
+            finally:
+                tpu.close()
+
+
+def test_byte_view_copies_only_non_contiguous():
+    grid = np.arange(64, dtype=np.uint8).reshape(8, 8)
+    assert byte_view(grid).obj is grid  # Contiguous: a view, no copy
+    column = grid[:, 3]
+    view = byte_view(column)
+    assert view.obj is not column and bytes(view) == column.tobytes()
+    wide = np.array([1, -2], dtype='<i4')[::-1]
+    assert bytes(byte_view(wide)) == wide.tobytes() and len(byte_view(wide)) == 8
+
+
+def test_send_frame_pads_non_contiguous_input():
+    uart = UARTTransport('standin://')
+    try:
+        dev = uart.ser.device
+        column = np.arange(64, dtype=np.uint8).reshape(8, 8)[:, 5]
+        assert uart.send_frame(UARTCommand.WRITE_UB, 9, column, pad_to=32) == 32
+        assert uart.wait_ack()
+        assert dev.ub_word(9) == column.tobytes() + bytes(24)
+        # Empty payloads still carry one padded unit
+        assert uart.send_frame(UARTCommand.WRITE_UB, 10, b'', pad_to=32) == 32
+        assert uart.wait_ack() and dev.ub_word(10) == bytes(32)
+        assert uart.send_frame(UARTCommand.WRITE_WT, 0, bytes(9), pad_to=8) == 16
+        assert uart.wait_ack(expected=UARTTransport.ACK_BYTE_WT)
+    finally:
+        uart.close()
+
+
+def test_read_into_short_read_keeps_caller_array():
+    uart = UARTTransport('standin://')
+    try:
+        uart.ser.device.set_ub_word(4, bytes(range(32)))
+        uart.send_command(UARTCommand.READ_UB, 0, 4, 0, 32)
+        out = np.full(40, 0xEE, dtype=np.uint8)
+        start = time.monotonic()
+        assert uart.read_into(out, 0.1) == 32
+        assert time.monotonic() - start >= 0.1
+        assert out[:32].tobytes() == bytes(range(32)) and (out[32:] == 0xEE).all()
+        # Multi-byte element arrays are filled byte-wise
+        uart.send_command(UARTCommand.READ_UB, 0, 4, 0, 8)
+        words = np.zeros(2, dtype='<u4')
+        assert uart.read_into(words) == 8
+        assert words.tolist() == [0x03020100, 0x07060504]
+    finally:
+        uart.close()
+
+
+def test_fd_path_frames_and_eof():
+    uart = UARTTransport('standin://')
+    rx, tx = os.pipe()
+    try:
+        uart._fd = tx  # Frames go straight to the descriptor
+        column = np.arange(16, dtype=np.uint8).reshape(4, 4)[:, 0]
+        assert uart.send_frame(UARTCommand.WRITE_WT, 0x0102, column, pad_to=8) == 8
+        assert os.read(rx, 64) == bytes([0x02, 0x01, 0x02, 0, 8, 0, 4, 8, 12, 0, 0, 0, 0])
+
+        uart._fd = rx
+        os.write(tx, b'\x01\x02\x03')
+        os.close(tx)
+        tx = None
+        out = np.zeros(8, dtype=np.uint8)
+        start = time.monotonic()
+        assert uart.read_into(out, 2.0) == 3
+        assert time.monotonic() - start < 1.0  # EOF ends the read, not the deadline
+        assert out.tolist() == [1, 2, 3, 0, 0, 0, 0, 0]
+    finally:
+        uart._fd = None
+        uart.close()
+        os.close(rx)
+        if tx is not None:
+            os.close(tx)
+
+
+def main():
+    tests = [test_in_process_schemes, test_socket_scheme, test_driver_over_each_transport,
+             test_byte_view_copies_only_non_contiguous, test_send_frame_pads_non_contiguous_input,
+             test_read_into_short_read_keeps_caller_array, test_fd_path_frames_and_eof]
+    for test in tests:
+        test()
+        print(f"  PASS: {test.__name__}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+Weight Memory Residency Test
+============================
+Checks the weight memory shadow behind TPUCoprocessor.load_weights and
+write_weights_bulk (hits, row diffs, invalidation on NACK), and runs
+WeightPager against the emulator (emu://): LRU and schedule-aware
+(Belady) eviction, replacing a registered tile, a failed upload, stale
+hits and the hit/byte counters, checking the rows that end up in weight
+memory.
+
+Usage:
+    python3 test_weight_memory.py
+    python3 -m pytest test_weight_memory.py
+"""
+
+from tpu_coprocessor import TPUCoprocessor, UARTTransport
+from weight_memory import WeightMemoryShadow, WeightPager, pad_row
+
+TILES = {key: [bytes([n * 16 + row]) * 3 for row in range(3)]
+         for n, key in enumerate('abcd', 1)}
+
+
+def pager(slots: int, base: int = 0) -> WeightPager:
+    tpu = TPUCoprocessor('emu://')
+    pages = WeightPager(tpu, tile_rows=3, base=base, slots=slots)
+    for key, rows in TILES.items():
+        pages.register(key, rows)
+    return pages
+
+
+def nack_weights(tpu: TPUCoprocessor, addrs) -> None:
+    """Make the device NACK WRITE_WT frames starting at any of `addrs`"""
+    dev = tpu.uart.ser.device
+
+    def write_wt(frame):
+        ack = dev._write_wt(frame)
+        return b'\xFF' if dev._header(frame)[0] in addrs else ack
+
+    dev._table[0x02] = (dev._size_with_payload, write_wt)
+
+
+def frame_bytes(rows: int) -> int:
+    return UARTTransport.HEADER_SIZE + rows * 8
+
+
+def resident_rows(pages: WeightPager, addr: int):
+    dev = pages.tpu.uart.ser.device
+    return [dev.weight_row(addr + row) for row in range(pages.tile_rows)]
+
+
+def padded(rows):
+    return [pad_row(r) for r in rows]
+
+
+def test_shadow_hit_miss_and_rows_skipped():
+    tpu = TPUCoprocessor('emu://')
+    try:
+        dev, stats = tpu.uart.ser.device, tpu.weight_cache.stats
+        assert tpu.load_weights(10, TILES['a'])
+        assert stats == {'hits': 0, 'misses': 1, 'rows_sent': 3, 'rows_skipped': 0}
+        assert tpu.weight_cache.locate(padded(TILES['a'])) == 10
+        sent = dev.rx_count
+        assert tpu.load_weights(10, TILES['a'])
+        assert dev.rx_count == sent  # Resident: nothing on the link
+        assert stats == {'hits': 1, 'misses': 1, 'rows_sent': 3, 'rows_skipped': 3}
+        assert tpu.weight_cache.hit_rate() == 0.5
+        # Same tile one row further on: a miss, rows 11-12 happen to differ
+        assert tpu.load_weights(11, TILES['a'])
+        assert stats['misses'] == 2 and stats['rows_sent'] == 3 + 3
+        assert [dev.weight_row(10 + i) for i in range(4)] == padded(TILES['a'][:1] + TILES['a'])
+    finally:
+        tpu.close()
+
+
+def test_partial_diff_sends_changed_runs():
+    shadow = WeightMemoryShadow()
+    old = [bytes([i]) * 8 for i in range(5)]
+    shadow.update(20, old)
+    new = [old[0], b'\x11', old[2], b'\x33', b'\x44']
+    assert shadow.changed_runs(20, new) == [(21, [pad_row(b'\x11')]),
+                                            (23, [pad_row(b'\x33'), pad_row(b'\x44')])]
+    assert shadow.stats['rows_sent'] == 3 and shadow.stats['rows_skipped'] == 2
+
+    tpu = TPUCoprocessor('emu://')
+    try:
+        dev = tpu.uart.ser.device
+        assert tpu.load_weights(20, old)
+        sent = dev.rx_count
+        assert tpu.load_weights(20, new)
+        assert dev.rx_count - sent == frame_bytes(1) + frame_bytes(2)
+        assert [dev.weight_row(20 + i) for i in range(5)] == padded(new)
+        assert tpu.weight_cache.is_resident(20, padded(new))
+    finally:
+        tpu.close()
+
+
+def test_nack_invalidates_shadow():
+    tpu = TPUCoprocessor('emu://')
+    try:
+        dev, shadow = tpu.uart.ser.device, tpu.weight_cache
+        assert tpu.load_weights(0, TILES['a'])
+        nack_weights(tpu, {1})
+        new = [TILES['a'][0], TILES['b'][1], TILES['b'][2]]
+        assert not tpu.load_weights(0, new)
+        # Rows 1-2 are unknown now, the tile is no longer resident
+        assert shadow.rows[:3] == [pad_row(TILES['a'][0]), None, None]
+        assert shadow.tiles == {}
+        assert not tpu.write_weights(1, TILES['c'][1])
+        assert shadow.rows[1] is None
+        nack_weights(tpu, set())
+        sent = dev.rx_count
+        assert tpu.load_weights(0, new)
+        assert dev.rx_count - sent == frame_bytes(2)
+        assert [dev.weight_row(i) for i in range(1, 3)] == padded(new[1:])
+    finally:
+        tpu.close()
+
+
+def test_bulk_failed_rows_invalidated():
+    tpu = TPUCoprocessor('emu://')
+    try:
+        dev, shadow = tpu.uart.ser.device, tpu.weight_cache
+        rows = [bytes([0x50 + i]) * 8 for i in range(4)]
+        nack_weights(tpu, {42})
+        failed = tpu.write_weights_bulk(40, rows)
+        assert [p.addr for p in failed] == [42]
+        assert shadow.rows[40:44] == [rows[0], rows[1], None, rows[3]]
+        assert 40 not in shadow.tiles
+        # A reload resends only the row that was NACKed
+        sent = dev.rx_count
+        nack_weights(tpu, set())
+        assert tpu.load_weights(40, rows)
+        assert dev.rx_count - sent == frame_bytes(1)
+        assert [dev.weight_row(40 + i) for i in range(4)] == rows
+    finally:
+        tpu.close()
+
+
+def test_lru_eviction():
+    pages = pager(slots=2, base=30)
+    try:
+        a, b = pages.acquire('a'), pages.acquire('b')
+        assert (a, b) == (30, 33)
+        assert pages.acquire('a') == a  # Hit: 'b' is now least recently used
+        assert pages.acquire('c') == b
+        assert pages.resident() == ['a', 'c']
+        assert resident_rows(pages, b) == padded(TILES['c'])
+        assert resident_rows(pages, a) == padded(TILES['a'])
+        assert pages.stats['evictions'] == 1
+    finally:
+        pages.tpu.close()
+
+
+def test_schedule_evicts_furthest_next_use():
+    pages = pager(slots=2)
+    try:
+        pages.set_schedule(['a', 'b', 'c', 'a', 'b'])
+        pages.acquire('a')
+        pages.acquire('b')
+        # LRU would evict 'a'; it is needed before 'b', so 'b' goes
+        pages.acquire('c')
+        assert pages.resident() == ['a', 'c']
+        assert pages.acquire('a') == 0 and pages.stats['hits'] == 1
+        # Off the end of the schedule: back to LRU ('c')
+        pages.acquire('b')
+        pages.acquire('d')
+        assert pages.resident() == ['b', 'd']
+    finally:
+        pages.tpu.close()
+
+
+def test_register_replaces_resident_tile():
+    pages = pager(slots=2)
+    try:
+        addr = pages.acquire('a')
+        new_rows = [b'\x7f\x01', TILES['a'][1], b'\x02']
+        pages.register('a', new_rows)
+        assert 'a' not in pages.resident()
+        sent = pages.stats['bytes_sent']
+        assert pages.acquire('a') == addr
+        assert pages.stats['misses'] == 2
+        # The unchanged middle row is not resent
+        assert pages.stats['bytes_sent'] - sent == 2 * 8
+        assert resident_rows(pages, addr) == padded(new_rows)
+    finally:
+        pages.tpu.close()
+
+
+def test_failed_upload_releases_slot():
+    pages = pager(slots=1)
+    try:
+        nack_weights(pages.tpu, {0})
+        try:
+            pages.acquire('a')
+            assert False, "failed upload returned an address"
+        except IOError:
+            pass
+        assert pages.resident() == [] and pages._free == [0]
+        assert pages.tpu.weight_cache.tiles == {}
+        nack_weights(pages.tpu, set())
+        assert pages.acquire('a') == 0
+        assert resident_rows(pages, 0) == padded(TILES['a'])
+        assert pages.stats['evictions'] == 0
+    finally:
+        pages.tpu.close()
+
+
+def test_hit_rate_and_bytes_sent():
+    pages = pager(slots=2)
+    try:
+        assert pages.hit_rate() == 0.0
+        for key in 'abab':
+            pages.acquire(key)
+        assert pages.stats['hits'] == 2 and pages.stats['misses'] == 2
+        assert pages.hit_rate() == 0.5
+        assert pages.stats['bytes_sent'] == 2 * 3 * 8
+        assert pages.acquire('a') == 0
+        # Evicts 'b'; only the row that differs from b's old contents is sent
+        pages.register('e', TILES['b'][:2] + [TILES['c'][2]])
+        assert pages.acquire('e') == 3
+        assert pages.stats['bytes_sent'] == 2 * 3 * 8 + 8
+        assert pages.hit_rate() == 3 / 6
+        sent = pages.tpu.uart.ser.device.rx_count
+        assert pages.acquire('e') == 3 and pages.acquire('a') == 0
+        assert pages.tpu.uart.ser.device.rx_count == sent  # Hits stay off the link
+        assert pages.stats['bytes_sent'] == 2 * 3 * 8 + 8
+    finally:
+        pages.tpu.close()
+
+
+def test_stale_hit_reloads():
+    """A resident key whose rows changed behind the pager's back is reloaded"""
+    pages = pager(slots=2)
+    tpu = pages.tpu
+    try:
+        dev = tpu.uart.ser.device
+        assert (pages.acquire('a'), pages.acquire('b')) == (0, 3)
+        # Another writer overwrites a row of 'b'
+        assert tpu.write_weights(4, bytes(8))
+        sent = pages.stats['bytes_sent']
+        assert pages.acquire('b') == 3  # Same slot, only that row resent
+        assert pages.stats['bytes_sent'] - sent == 8
+        assert resident_rows(pages, 3) == padded(TILES['b'])
+        # Rewriting a row with the same bytes: a miss that sends nothing
+        assert tpu.write_weights(1, TILES['a'][1])
+        sent = dev.rx_count
+        assert pages.acquire('a') == 0 and dev.rx_count == sent
+        tpu.invalidate_weight_cache()
+        sent = pages.stats['bytes_sent']
+        assert pages.acquire('b') == 3 and pages.stats['bytes_sent'] - sent == 3 * 8
+        assert pages.acquire('a') == 0 and pages.acquire('b') == 3
+        # Every acquire above missed except the last
+        assert pages.stats['misses'] == 6 and pages.stats['hits'] == 1
+        assert pages.resident() == ['a', 'b'] and pages.stats['evictions'] == 0
+    finally:
+        tpu.close()
+
+
+def test_unregistered_key():
+    pages = pager(slots=2)
+    try:
+        try:
+            pages.acquire('z')
+            assert False, "unregistered tile acquired"
+        except KeyError as exc:
+            assert "'z'" in str(exc)
+        assert pages.stats['misses'] == 0 and pages.resident() == []
+    finally:
+        pages.tpu.close()
+
+
+def main():
+    tests = [test_shadow_hit_miss_and_rows_skipped, test_partial_diff_sends_changed_runs,
+             test_nack_invalidates_shadow, test_bulk_failed_rows_invalidated,
+             test_lru_eviction, test_schedule_evicts_furthest_next_use,
+             test_register_replaces_resident_tile, test_failed_upload_releases_slot,
+             test_hit_rate_and_bytes_sent, test_stale_hit_reloads, test_unregistered_key]
+    for test in tests:
+        test()
+        print(f"  PASS: {test.__name__}")
+
+
+if __name__ == "__main__":
+    main()
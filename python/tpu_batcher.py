@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Dynamic Request Batching
+========================
+Front end for TPUCoprocessor.matrix_multiply that merges concurrent calls
+sharing the same weights. Each request waits at most `max_delay` (less
+if a latency SLO is set) for company; the group then runs as one
+matrix_multiply_batch: one weight check, one UB burst in, one program
+run, one UB burst out, and the columns are scattered back to the callers.
+
+Usage:
+    batcher = MatmulBatcher(tpu, max_delay=0.005, slo=0.050)
+    y = batcher.matrix_multiply(weights, x)      # from any number of threads
+    print(batcher.report())                       # batch sizes, queueing delay
+    batcher.close()
+"""
+
+import threading
+import time
+from collections import Counter, OrderedDict, deque
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from tpu_coprocessor import TPUCoprocessor
+
+
+@dataclass
+class _Pending:
+    inputs: np.ndarray  # int8 column, shape (3,)
+    future: Future
+    enqueued: float = field(default_factory=time.monotonic)
+
+
+class MatmulBatcher:
+    """
+    Batch matrix_multiply requests by weight matrix.
+
+    A group is dispatched when it reaches `max_batch` requests or when its
+    oldest request has waited `max_delay`. With `slo` set, the wait is cut
+    further so that wait + expected batch run time (a moving average of
+    recent runs) stays within the SLO. One worker thread owns the device.
+    """
+
+    def __init__(self, tpu: TPUCoprocessor, max_delay: float = 0.005,
+                 slo: Optional[float] = None, max_batch: Optional[int] = None,
+                 weight_addr: int = 0):
+        self.tpu = tpu
+        self.max_delay = max_delay
+        self.slo = slo
+        self.max_batch = min(max_batch or tpu.MAX_BATCH, tpu.MAX_BATCH)
+        self.weight_addr = weight_addr
+        self.service_time = 0.0  # Moving average of batch run time
+        self.stats = {'requests': 0, 'batches': 0, 'slo_misses': 0, 'errors': 0}
+        self.batch_sizes: Counter = Counter()
+        self.queue_delays: deque = deque(maxlen=10000)
+        self.latencies: deque = deque(maxlen=10000)
+        self._groups: 'OrderedDict[bytes, Tuple[np.ndarray, List[_Pending]]]' = OrderedDict()
+        self._cond = threading.Condition()
+        self._closed = False
+        self._worker = threading.Thread(target=self._run, daemon=True)
+        self._worker.start()
+
+    def submit(self, weights: np.ndarray, inputs: np.ndarray) -> Future:
+        """Queue weights @ inputs; the Future resolves to a 3x1 int8 array"""
+        assert weights.shape == (3, 3), f"Weights must be 3x3, got {weights.shape}"
+        w_int8 = np.clip(weights, -128, 127).astype(np.int8)
+        pending = _Pending(np.clip(inputs, -128, 127).astype(np.int8).reshape(3), Future())
+        key = w_int8.tobytes()
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("batcher is closed")
+            self._groups.setdefault(key, (w_int8, []))[1].append(pending)
+            self.stats['requests'] += 1
+            self._cond.notify()
+        return pending.future
+
+    def matrix_multiply(self, weights: np.ndarray, inputs: np.ndarray,
+                        timeout: Optional[float] = None) -> np.ndarray:
+        """Blocking weights @ inputs, batched with concurrent callers"""
+        return self.submit(weights, inputs).result(timeout)
+
+    def close(self) -> None:
+        """Run what is queued, then stop the worker"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._worker.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    # -------------------------------------------------------------------------
+    # Worker
+    # -------------------------------------------------------------------------
+
+    def _window(self) -> float:
+        """How long a group's oldest request may wait for company"""
+        if self.slo is None:
+            return self.max_delay
+        return max(0.0, min(self.max_delay, self.slo - self.service_time))
+
+    def _next_due(self) -> Tuple[Optional[bytes], float]:
+        """The group to dispatch next and when it is due"""
+        best_key, best_due = None, float('inf')
+        window = self._window()
+        for key, (_, pending) in self._groups.items():
+            due = (float('-inf') if len(pending) >= self.max_batch
+                   else pending[0].enqueued + window)
+            if due < best_due:
+                best_key, best_due = key, due
+        return best_key, best_due
+
+    def _take(self) -> Optional[Tuple[np.ndarray, List[_Pending]]]:
+        """Block until a group is due; None once closed and drained"""
+        with self._cond:
+            while True:
+                key, due = self._next_due()
+                now = time.monotonic()
+                if key is not None and (due <= now or self._closed):
+                    break
+                if key is None and self._closed:
+                    return None
+                self._cond.wait(None if key is None else due - now)
+            weights, pending = self._groups[key]
+            batch = pending[:self.max_batch]
+            del pending[:self.max_batch]
+            if not pending:
+                del self._groups[key]
+            return weights, batch
+
+    def _run(self) -> None:
+        while True:
+            taken = self._take()
+            if taken is None:
+                return
+            weights, batch = taken
+            started = time.monotonic()
+            inputs = np.stack([p.inputs for p in batch], axis=1)
+            try:
+                results = self.tpu.matrix_multiply_batch(weights, inputs, self.weight_addr)
+            except Exception as exc:
+                self.stats['errors'] += len(batch)
+                for pending in batch:
+                    pending.future.set_exception(exc)
+                continue
+            finished = time.monotonic()
+            elapsed = finished - started
+            self.service_time = (elapsed if not self.stats['batches']
+                                 else 0.8 * self.service_time + 0.2 * elapsed)
+            self.stats['batches'] += 1
+            self.batch_sizes[len(batch)] += 1
+            for col, pending in enumerate(batch):
+                self.queue_delays.append(started - pending.enqueued)
+                latency = finished - pending.enqueued
+                self.latencies.append(latency)
+                if self.slo is not None and latency > self.slo:
+                    self.stats['slo_misses'] += 1
+                pending.future.set_result(results[:, col:col + 1].copy())
+
+    # -------------------------------------------------------------------------
+    # Reporting
+    # -------------------------------------------------------------------------
+
+    def report(self) -> Dict[str, object]:
+        """Achieved batch sizes and queueing delay / latency percentiles (ms)"""
+        def percentiles(samples):
+            if not samples:
+                return {'mean': 0.0, 'p50': 0.0, 'p95': 0.0, 'max': 0.0}
+            ms = np.array(samples) * 1e3
+            return {'mean': float(ms.mean()), 'p50': float(np.percentile(ms, 50)),
+                    'p95': float(np.percentile(ms, 95)), 'max': float(ms.max())}
+
+        batches = self.stats['batches']
+        served = sum(size * n for size, n in self.batch_sizes.items())
+        return dict(self.stats,
+                    mean_batch=served / batches if batches else 0.0,
+                    batch_sizes=dict(sorted(self.batch_sizes.items())),
+                    queue_delay_ms=percentiles(self.queue_delays),
+                    latency_ms=percentiles(self.latencies),
+                    service_ms=self.service_time * 1e3)
+
+
+def main():
+    """Compare sequential matrix_multiply with batched concurrent callers"""
+    import argparse
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--port', default='emu://?paced=1', help='Board port or transport URL')
+    parser.add_argument('--clients', type=int, default=9)
+    parser.add_argument('--requests', type=int, default=4, help='Requests per client')
+    parser.add_argument('--max-delay', type=float, default=0.005)
+    parser.add_argument('--slo', type=float, default=None)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    weights = rng.integers(-4, 5, (3, 3))
+    tpu = TPUCoprocessor(args.port)
+    try:
+        total = args.clients * args.requests
+        start = time.perf_counter()
+        for _ in range(total):
+            tpu.matrix_multiply(weights, rng.integers(-8, 9, (3, 1)))
+        sequential = time.perf_counter() - start
+
+        with MatmulBatcher(tpu, max_delay=args.max_delay, slo=args.slo) as batcher:
+            def client():
+                for _ in range(args.requests):
+                    batcher.matrix_multiply(weights, rng.integers(-8, 9, (3, 1)))
+            threads = [threading.Thread(target=client) for _ in range(args.clients)]
+            start = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            batched = time.perf_counter() - start
+        report = batcher.report()
+    finally:
+        tpu.close()
+
+    print(f"{total} requests: sequential {sequential * 1e3:.1f} ms, "
+          f"batched {batched * 1e3:.1f} ms ({sequential / batched:.1f}x)")
+    print(f"batches: {report['batches']}, mean size {report['mean_batch']:.1f}, "
+          f"sizes {report['batch_sizes']}")
+    print(f"queueing delay ms: {report['queue_delay_ms']}")
+    print(f"latency ms: {report['latency_ms']}, SLO misses: {report['slo_misses']}")
+
+
+if __name__ == "__main__":
+    main()
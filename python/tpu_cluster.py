@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""
+TPU Cluster
+===========
+Data-parallel matrix multiply across several boards on one host.
+
+TPUCluster opens one TPUCoprocessor per port and starts one I/O worker
+thread per board. A batch of input columns is cut into chunks of at most
+MAX_BATCH columns; workers pull chunks from a shared queue, so faster
+boards simply take more of them, and the results are merged back in
+column order. Weights are broadcast to every board once and afterwards
+only checked against each board's residency shadow.
+
+A board that raises (no ACK, short read, closed port) is taken out of
+rotation and its chunk is re-queued for the others. A board whose time
+per column exceeds `slow_factor` times the fastest board's is taken out
+as well. restore() puts a board back after it has been fixed.
+
+Usage:
+    cluster = TPUCluster(['/dev/ttyUSB1', '/dev/ttyUSB3'])
+    cluster.broadcast_weights(weights)
+    outputs = cluster.matrix_multiply(weights, inputs)   # inputs: 3 x N
+    print(cluster.report())
+
+    TPUCluster(['emu://?paced=1'] * 4)                    # no boards needed
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Union
+
+import numpy as np
+
+from tpu_coprocessor import TPUCoprocessor
+
+
+@dataclass
+class _Job:
+    """One matrix_multiply call: its chunks, results and completion"""
+    weights: np.ndarray
+    weight_addr: int
+    results: List[Optional[np.ndarray]]
+    remaining: int
+    done: threading.Event = field(default_factory=threading.Event)
+    error: Optional[Exception] = None
+
+
+@dataclass
+class Board:
+    """A cluster member and its counters"""
+    index: int
+    tpu: TPUCoprocessor
+    name: str
+    healthy: bool = True
+    reason: str = ''
+    chunks: int = 0
+    columns: int = 0
+    busy_time: float = 0.0
+    failures: int = 0
+    column_time: float = 0.0  # Moving average of seconds per column
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+
+class TPUCluster:
+    """
+    Shard activation batches across N boards (data parallelism).
+
+    `ports` may mix port strings/URLs and already-open TPUCoprocessor
+    objects. Slowness needs a faster board to compare against, so the
+    last healthy board is only removed when it fails; once every board
+    has failed, matrix_multiply raises IOError.
+    """
+
+    def __init__(self, ports: Sequence[Union[str, TPUCoprocessor]], baudrate: int = 115200,
+                 slow_factor: float = 4.0, weight_addr: int = 0):
+        self.boards = []
+        for index, port in enumerate(ports):
+            tpu = port if isinstance(port, TPUCoprocessor) else TPUCoprocessor(port, baudrate)
+            self.boards.append(Board(index, tpu, port if isinstance(port, str) else f"board{index}"))
+        self.slow_factor = slow_factor
+        self.weight_addr = weight_addr
+        self.chunk_size = min(board.tpu.MAX_BATCH for board in self.boards)
+        self._tasks: 'queue.Queue' = queue.Queue()
+        self._state = threading.Lock()
+        self._workers = [threading.Thread(target=self._work, args=(board,), daemon=True)
+                         for board in self.boards]
+        for worker in self._workers:
+            worker.start()
+
+    def close(self) -> None:
+        for worker in self._workers:
+            if worker.is_alive():
+                self._tasks.put(None)
+        for worker in self._workers:
+            worker.join(timeout=5.0)
+        for board in self.boards:
+            board.tpu.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def healthy(self) -> List[Board]:
+        return [board for board in self.boards if board.healthy]
+
+    # -------------------------------------------------------------------------
+    # Weights
+    # -------------------------------------------------------------------------
+
+    def broadcast_weights(self, weights: np.ndarray, weight_addr: Optional[int] = None) -> None:
+        """Upload a 3x3 weight matrix to every healthy board in parallel"""
+        addr = self.weight_addr if weight_addr is None else weight_addr
+        rows = TPUCoprocessor.weight_rows(weights)
+
+        def upload(board: Board) -> None:
+            with board.lock:
+                ok = board.tpu.load_weights(addr, rows)
+            if not ok:
+                self._take_out(board, f"weight upload to row {addr} failed")
+
+        boards = self.healthy()
+        with ThreadPoolExecutor(max_workers=len(boards)) as pool:
+            list(pool.map(upload, boards))
+        if not self.healthy():
+            raise IOError("no healthy boards left")
+
+    # -------------------------------------------------------------------------
+    # Compute
+    # -------------------------------------------------------------------------
+
+    def matrix_multiply(self, weights: np.ndarray, inputs: np.ndarray,
+                        timeout: Optional[float] = None) -> np.ndarray:
+        """weights @ inputs for a 3 x N input matrix, sharded across boards"""
+        if not self.healthy():
+            raise IOError("no healthy boards left")
+        inputs = np.asarray(inputs).reshape(3, -1)
+        starts = range(0, inputs.shape[1], self.chunk_size)
+        job = _Job(weights, self.weight_addr, [None] * len(starts), len(starts))
+        for chunk, start in enumerate(starts):
+            self._tasks.put((job, chunk, inputs[:, start:start + self.chunk_size]))
+        if not job.done.wait(timeout):
+            raise TimeoutError("cluster matrix_multiply timed out")
+        if job.error is not None:
+            raise job.error
+        return np.concatenate(job.results, axis=1)
+
+    def _work(self, board: Board) -> None:
+        while True:
+            task = self._tasks.get()
+            if task is None:
+                return
+            if not board.healthy:
+                # Out of rotation: hand the chunk to the remaining boards
+                self._requeue(task)
+                return
+            job, chunk, inputs = task
+            started = time.perf_counter()
+            try:
+                with board.lock:
+                    result = board.tpu.matrix_multiply_batch(job.weights, inputs, job.weight_addr)
+            except Exception as exc:
+                board.failures += 1
+                self._take_out(board, f"{type(exc).__name__}: {exc}")
+                self._requeue(task, exc)
+                continue
+            elapsed = time.perf_counter() - started
+            self._record(board, inputs.shape[1], elapsed)
+            job.results[chunk] = result
+            with self._state:
+                job.remaining -= 1
+                if job.remaining == 0:
+                    job.done.set()
+
+    def _requeue(self, task, exc: Optional[Exception] = None) -> None:
+        job = task[0]
+        if self.healthy():
+            self._tasks.put(task)
+            return
+        with self._state:
+            if job.error is None:
+                job.error = IOError(f"no healthy boards left (last error: {exc})")
+            job.done.set()
+
+    def _record(self, board: Board, columns: int, elapsed: float) -> None:
+        board.chunks += 1
+        board.columns += columns
+        board.busy_time += elapsed
+        per_column = elapsed / columns
+        board.column_time = (per_column if board.chunks == 1
+                             else 0.7 * board.column_time + 0.3 * per_column)
+        measured = [b.column_time for b in self.healthy() if b.chunks >= 2]
+        if board.chunks >= 2 and len(measured) >= 2 and \
+                board.column_time > self.slow_factor * min(measured):
+            self._take_out(board, f"slow: {board.column_time * 1e3:.2f} ms/column vs "
+                                  f"{min(measured) * 1e3:.2f} ms/column")
+
+    def _take_out(self, board: Board, reason: str) -> None:
+        with self._state:
+            if not board.healthy:
+                return
+            board.healthy = False
+            board.reason = reason
+        print(f"Warning: {board.name} out of rotation ({reason})")
+
+    def restore(self, index: int) -> None:
+        """Return a repaired board to rotation (its caches are reset)"""
+        board = self.boards[index]
+        board.tpu.invalidate_weight_cache()
+        board.tpu.invalidate_program_cache()
+        board.column_time = 0.0
+        board.chunks = 0
+        with self._state:
+            was_out = not board.healthy
+            board.healthy = True
+            board.reason = ''
+        if was_out and not self._workers[index].is_alive():
+            self._workers[index] = threading.Thread(target=self._work, args=(board,), daemon=True)
+            self._workers[index].start()
+
+    # -------------------------------------------------------------------------
+    # Reporting
+    # -------------------------------------------------------------------------
+
+    def report(self) -> Dict[str, Dict[str, object]]:
+        """Per-board share of the work, busy time and health"""
+        return {f"{board.index}:{board.name}": {
+                    'healthy': board.healthy, 'reason': board.reason,
+                    'chunks': board.chunks, 'columns': board.columns,
+                    'busy_s': board.busy_time, 'failures': board.failures,
+                    'ms_per_column': board.column_time * 1e3}
+                for board in self.boards}
+
+
+def main():
+    """Throughput versus board count on paced emulated endpoints"""
+    import argparse
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--port', default='emu://?paced=1', help='Port URL for every board')
+    parser.add_argument('--boards', type=int, default=4)
+    parser.add_argument('--columns', type=int, default=108)
+    parser.add_argument('--baud', type=int, default=115200)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    weights = rng.integers(-4, 5, (3, 3))
+    inputs = rng.integers(-8, 9, (3, args.columns))
+    expected = np.clip(weights @ inputs, -128, 127)
+    baseline = None
+    for count in range(1, args.boards + 1):
+        with TPUCluster([args.port] * count, args.baud) as cluster:
+            cluster.broadcast_weights(weights)
+            start = time.perf_counter()
+            outputs = cluster.matrix_multiply(weights, inputs)
+            elapsed = time.perf_counter() - start
+        assert np.array_equal(outputs, expected)
+        baseline = baseline or elapsed
+        print(f"{count} board(s): {args.columns / elapsed:8.1f} columns/s "
+              f"({baseline / elapsed:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -18,14 +18,22 @@ Design Principles:
 - Streaming: Supports continuous data flow for inference
 """
 
+import hashlib
+import os
+import select
 import serial
 import struct
 import time
 import numpy as np
+from collections import deque
 from dataclasses import dataclass
 from typing import Optional, List, Tuple
 from enum import IntEnum
 
+from completion_predictor import CompletionPredictor, running_prefix
+from tpu_transport import open_transport, is_in_process
+from weight_memory import WeightMemoryShadow, WEIGHT_ROW_BYTES
+
 
 # =============================================================================
 # ISA DEFINITIONS (matches rtl/tpu_controller.sv)
@@ -63,6 +71,10 @@ class UARTCommand(IntEnum):
     READ_UB     = 0x04  # Read from Unified Buffer
     EXECUTE     = 0x05  # Start TPU execution
     READ_STATUS = 0x06  # Read status register
+    WRITE_INSTR_BURST = 0x08  # Write `count` instructions from a start address
+    CFG_NOTIFY  = 0x09  # Enable/disable the completion push at HALT
+    EXEC_READ   = 0x0A  # Execute, wait for HALT on-chip, then stream a UB range
+    EXEC_QUEUE  = 0x0B  # Start at a PC once the current run halts
     READ_DEBUG  = 0x14  # Read debug counters
 
 
@@ -163,9 +175,13 @@ class InstructionEncoder:
         return cls.encode(Opcode.MATMUL, ub_input_addr, acc_output_addr, num_rows, flags)
 
     @classmethod
-    def matmul_acc(cls, ub_input_addr: int, acc_addr: int, num_rows: int = 3) -> int:
-        """MATMUL_ACC: Accumulate matrix multiply (add to existing accumulator)"""
-        return cls.encode(Opcode.MATMUL_ACC, ub_input_addr, acc_addr, num_rows)
+    def matmul_acc(cls, ub_input_addr: int, acc_addr: int, num_rows: int = 3,
+                   signed: bool = True) -> int:
+        """MATMUL_ACC: Accumulate matrix multiply (add to existing accumulator)
+           flags: bit1=signed (MATMUL also clears the whole accumulator buffer;
+           MATMUL_ACC does not)"""
+        return cls.encode(Opcode.MATMUL_ACC, ub_input_addr, acc_addr, num_rows,
+                          2 if signed else 0)
 
     @classmethod
     def relu(cls, acc_input_addr: int, ub_output_addr: int, num_elements: int = 9) -> int:
@@ -189,22 +205,77 @@ class InstructionEncoder:
 # UART TRANSPORT LAYER
 # =============================================================================
 
+def byte_view(data) -> memoryview:
+    """
+    Flat unsigned-byte view of any buffer-protocol object (bytes, bytearray,
+    memoryview, numpy array). Copies only if the source is non-contiguous.
+    """
+    view = memoryview(data)
+    if not view.c_contiguous:
+        view = memoryview(view.tobytes())
+    return view.cast('B')
+
+
+@dataclass
+class PendingCommand:
+    """A pipelined command awaiting its ACK"""
+    cmd: int
+    addr: int
+    expected_ack: int
+    received: Optional[int] = None  # Byte actually received (None = timed out)
+
+    def __str__(self) -> str:
+        got = 'timeout' if self.received is None else f'0x{self.received:02X}'
+        return (f"{UARTCommand(self.cmd).name}@{self.addr}: "
+                f"expected 0x{self.expected_ack:02X}, got {got}")
+
+
 class UARTTransport:
     """
     Low-level UART communication with FPGA.
 
     Handles byte-level protocol with proper synchronization.
+
+    Pipelined mode: submit() writes commands back-to-back with up to
+    `window` of them awaiting an ACK. The FPGA answers strictly in order,
+    so ACKs are matched to the in-flight queue FIFO; collect()/drain()
+    return the commands whose ACK was wrong or missing.
+
+    Copy-free I/O: send_frame() assembles header + payload in one reusable
+    frame buffer, and read_into() fills caller-provided buffers. On POSIX
+    ports both go straight to the file descriptor, since pyserial's
+    write()/readinto() convert through intermediate bytes objects.
     """
 
     ACK_BYTE_UB = 0xAA  # ACK for unified buffer writes
     ACK_BYTE_WT = 0xBB  # ACK for weight memory writes
+    ACK_BYTE_INSTR = 0xCC  # ACK for burst instruction writes (followed by checksum)
+    ACK_BYTE_NOTIFY_CFG = 0xDE  # ACK for CFG_NOTIFY
+    NOTIFY_BYTE = 0xDD  # Completion push at HALT (followed by the status byte)
+    ACK_BYTE_EXEC_READ = 0xEA  # ACK for the zero-length EXEC_READ probe
+    ACK_BYTE_QUEUED = 0xEB  # EXEC_QUEUE start fired at the previous run's HALT (and probe ACK)
+    ACK_BYTE_STARTED_IDLE = 0xEC  # EXEC_QUEUE start fired at once: nothing was running
     NACK_BYTE = 0xFF
-
-    def __init__(self, port: str, baudrate: int = 115200, timeout: float = 2.0):
-        self.ser = serial.Serial(port, baudrate, timeout=timeout)
-        time.sleep(0.1)  # Allow UART to stabilize
+    HEADER_SIZE = 5
+    FRAME_SIZE = HEADER_SIZE + 256 * 32  # Header + both UB banks
+
+    def __init__(self, port: str, baudrate: int = 115200, timeout: float = 2.0,
+                 window: int = 8):
+        # `port` is a device path or transport URL (socket://, emu://, ...)
+        self.ser = open_transport(port, baudrate, timeout)
+        if not is_in_process(self.ser):
+            time.sleep(0.1)  # Allow UART to stabilize
         self.ser.reset_input_buffer()
         self.ser.reset_output_buffer()
+        self.window = window
+        self.in_flight = deque()
+        self._frame = bytearray(self.FRAME_SIZE)
+        self._fd = getattr(self.ser, 'fd', None)  # None: not a POSIX port
+
+    def _set_timeout(self, timeout: float) -> None:
+        """Update the read timeout only when it changes (avoids termios calls)"""
+        if self.ser.timeout != timeout:
+            self.ser.timeout = timeout
 
     def close(self):
         self.ser.close()
@@ -212,17 +283,47 @@ class UARTTransport:
     def send_command(self, cmd: UARTCommand, addr_hi: int = 0, addr_lo: int = 0,
                      len_hi: int = 0, len_lo: int = 0) -> None:
         """Send 5-byte command header"""
-        header = bytes([cmd, addr_hi, addr_lo, len_hi, len_lo])
-        self.ser.write(header)
+        struct.pack_into('5B', self._frame, 0, cmd, addr_hi, addr_lo, len_hi, len_lo)
+        self._write(memoryview(self._frame)[:self.HEADER_SIZE])
+
+    def send_data(self, data) -> None:
+        """Send raw data bytes (any buffer-protocol object)"""
+        self._write(byte_view(data))
 
-    def send_data(self, data: bytes) -> None:
-        """Send raw data bytes"""
-        self.ser.write(data)
+    def send_frame(self, cmd: UARTCommand, addr: int, payload, pad_to: int = 1) -> int:
+        """
+        Send header + payload as one write from the reusable frame buffer.
+
+        The payload (any buffer-protocol object) is zero-padded to a
+        non-zero multiple of `pad_to` bytes; the padded length goes in the
+        header and is returned.
+        """
+        src = byte_view(payload)
+        size = max(-(-len(src) // pad_to), 1) * pad_to
+        end = self.HEADER_SIZE + size
+        if end > len(self._frame):
+            self._frame = bytearray(end)
+        struct.pack_into('>BHH', self._frame, 0, cmd, addr & 0xFFFF, size)
+        self._frame[self.HEADER_SIZE:self.HEADER_SIZE + len(src)] = src
+        if size > len(src):
+            self._frame[self.HEADER_SIZE + len(src):end] = bytes(size - len(src))
+        self._write(memoryview(self._frame)[:end])
+        return size
+
+    def _write(self, view: memoryview) -> None:
+        if self._fd is None:
+            self.ser.write(view)
+            return
+        while view:
+            select.select([], [self._fd], [])
+            try:
+                view = view[os.write(self._fd, view):]
+            except BlockingIOError:
+                continue
 
     def wait_ack(self, expected: int = None, timeout: float = 1.0) -> bool:
-        """Wait for ACK byte from FPGA"""
-        self.ser.timeout = timeout
-        ack = self.ser.read(1)
+        """Wait for ACK byte from FPGA (returns as soon as it arrives)"""
+        ack = self.read_exact(1, timeout)
         if not ack:
             return False
         if expected is not None:
@@ -234,11 +335,174 @@ class UARTTransport:
         """Read specified number of bytes"""
         return self.ser.read(count)
 
+    def read_exact(self, count: int, timeout: float = 1.0) -> bytes:
+        """
+        Read `count` bytes, returning as soon as they have all arrived.
+
+        The timeout is a deadline for the whole transfer rather than a
+        per-read timeout, so a slow trickle of bytes cannot stretch the
+        wait. Returns fewer bytes than requested only if the deadline
+        expires or the port is closed at the other end.
+        """
+        data = bytearray(count)
+        del data[self.read_into(data, timeout):]
+        return bytes(data)
+
+    def read_into(self, buf, timeout: float = 1.0) -> int:
+        """
+        Fill a writable buffer (bytearray, memoryview, numpy array) in
+        place, with the same whole-transfer deadline as read_exact().
+        Returns the number of bytes received.
+        """
+        view = memoryview(buf).cast('B')
+        deadline = time.monotonic() + timeout
+        got = 0
+        while got < len(view):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            if self._fd is None:
+                self._set_timeout(remaining)
+                got += self.ser.readinto(view[got:]) or 0
+                continue
+            if not select.select([self._fd], [], [], remaining)[0]:
+                break
+            try:
+                n = os.readv(self._fd, [view[got:]])
+            except BlockingIOError:
+                continue
+            if n == 0:
+                break  # EOF: readable but empty, nothing more will arrive
+            got += n
+        return got
+
+    def wire_time(self, nbytes: int) -> float:
+        """Seconds to shift `nbytes` over the link (8N1: 10 bits per byte)"""
+        return nbytes * 10 / self.ser.baudrate
+
     def flush(self) -> None:
         """Flush buffers"""
         self.ser.reset_input_buffer()
         self.ser.reset_output_buffer()
 
+    # -------------------------------------------------------------------------
+    # Pipelined commands
+    # -------------------------------------------------------------------------
+
+    def submit(self, cmd: UARTCommand, addr: int, data, expected_ack: int,
+               timeout: float = 1.0, pad_to: int = 1) -> List[PendingCommand]:
+        """
+        Queue a write command without waiting for its ACK.
+
+        Blocks only while the in-flight window is full. Returns any
+        commands that failed while making room (see collect()).
+        """
+        failed = []
+        while len(self.in_flight) >= self.window:
+            failed += self.collect(timeout)
+        self.send_frame(cmd, addr, data, pad_to)
+        self.in_flight.append(PendingCommand(cmd, addr, expected_ack))
+        # Retire ACKs that have already arrived so the window keeps moving
+        while self.in_flight and self.ser.in_waiting:
+            failed += self.collect(timeout)
+        return failed
+
+    def collect(self, timeout: float = 1.0) -> List[PendingCommand]:
+        """
+        Match the next ACK byte against the oldest in-flight command.
+
+        A wrong byte fails only that command. A missing byte means the
+        ACK stream can no longer be aligned with the queue, so every
+        in-flight command is failed and the input buffer is discarded.
+        """
+        if not self.in_flight:
+            return []
+        ack = self.read_exact(1, timeout)
+        if not ack:
+            failed = list(self.in_flight)
+            self.in_flight.clear()
+            self.ser.reset_input_buffer()
+            return failed
+        pending = self.in_flight.popleft()
+        pending.received = ack[0]
+        return [] if ack[0] == pending.expected_ack else [pending]
+
+    def drain(self, timeout: float = 1.0) -> List[PendingCommand]:
+        """Wait for every in-flight command; return the ones that failed"""
+        failed = []
+        while self.in_flight:
+            failed += self.collect(timeout)
+        return failed
+
+
+# =============================================================================
+# INSTRUCTION MEMORY SHADOW
+# =============================================================================
+
+class InstructionMemoryShadow:
+    """
+    Host copy of the FPGA's 32-entry instruction memory.
+
+    Tracks what each address holds so load_program can send only changed
+    words. Whole uploaded ranges are also indexed by content hash, making
+    the common "same program again" case a single dict lookup. Entries
+    are None when unknown (after reset, reprogramming or a failed upload).
+    """
+
+    DEPTH = 32
+
+    def __init__(self):
+        self.words: List[Optional[int]] = [None] * self.DEPTH
+        self._ranges = {}  # (start, length) -> digest of resident words
+        self.stats = {'hits': 0, 'misses': 0, 'words_sent': 0, 'words_skipped': 0}
+
+    @staticmethod
+    def digest(instructions: List[int]) -> bytes:
+        return hashlib.blake2b(struct.pack(f'>{len(instructions)}I', *instructions),
+                               digest_size=16).digest()
+
+    def invalidate(self, start: int = 0, length: int = DEPTH) -> None:
+        """Forget the contents of [start, start+length) (all by default)"""
+        for addr in range(start, min(start + length, self.DEPTH)):
+            self.words[addr] = None
+        self._drop_ranges(start, length)
+
+    def changed_runs(self, start: int, instructions: List[int]) -> List[Tuple[int, List[int]]]:
+        """
+        Return (addr, words) runs that differ from the shadow and must be
+        sent; an empty list means the program is already resident.
+        Raises ValueError if the words do not fit in instruction memory.
+        """
+        if start < 0 or start + len(instructions) > self.DEPTH:
+            raise ValueError(f"{len(instructions)} instructions at {start} "
+                             f"do not fit in {self.DEPTH} words")
+        if self._ranges.get((start, len(instructions))) == self.digest(instructions):
+            self.stats['hits'] += 1
+            self.stats['words_skipped'] += len(instructions)
+            return []
+        self.stats['misses'] += 1
+        runs = []
+        for offset, instr in enumerate(instructions):
+            addr = start + offset
+            if self.words[addr] == instr:
+                self.stats['words_skipped'] += 1
+            elif runs and runs[-1][0] + len(runs[-1][1]) == addr:
+                runs[-1][1].append(instr)
+            else:
+                runs.append((addr, [instr]))
+        return runs
+
+    def update(self, start: int, instructions: List[int]) -> None:
+        """Record that [start, start+len) now holds `instructions`"""
+        self._drop_ranges(start, len(instructions))
+        self.words[start:start + len(instructions)] = instructions
+        self._ranges[(start, len(instructions))] = self.digest(instructions)
+
+    def _drop_ranges(self, start: int, length: int) -> None:
+        for (r_start, r_len) in list(self._ranges):
+            if r_start < start + length and start < r_start + r_len:
+                del self._ranges[(r_start, r_len)]
+
 
 # =============================================================================
 # TPU COPROCESSOR HIGH-LEVEL INTERFACE
@@ -257,95 +521,236 @@ class TPUCoprocessor:
 
     SYSTOLIC_SIZE = 3  # 3x3 systolic array
     UB_WORD_SIZE = 32  # 256-bit = 32 bytes per UB entry
+    # matrix_multiply_batch: 3 RD_WEIGHT + 3 per column + HALT in 32 instructions
+    MAX_BATCH = (InstructionMemoryShadow.DEPTH - 4) // 3
+    BATCH_OUTPUT_ADDR = 64  # UB word of the first batch result
 
-    def __init__(self, port: str, baudrate: int = 115200):
-        self.uart = UARTTransport(port, baudrate)
+    def __init__(self, port: str, baudrate: int = 115200, fixed_delays: bool = False,
+                 window: int = 8, completion_push: bool = False):
+        """
+        Args:
+            port: Serial port of the FPGA
+            baudrate: UART baud rate
+            fixed_delays: Use the legacy fixed sleeps between command and
+                response instead of returning as soon as the ACK or the
+                expected byte count arrives (for debugging marginal links)
+            window: Max commands in flight for the *_bulk writes
+            completion_push: Have the FPGA push its status at HALT so
+                execute() blocks on it instead of polling READ_STATUS
+                (falls back to polling on bitstreams without CFG_NOTIFY)
+        """
+        self.uart = UARTTransport(port, baudrate, window=window)
         self.encoder = InstructionEncoder()
+        self.fixed_delays = fixed_delays
+        self._instr_burst = None  # Burst WRITE_INSTR support, probed on first use
+        self._exec_read = None  # Fused EXEC_READ support, probed on first use
+        self._exec_queue = None  # Queued-start EXEC_QUEUE support, probed on first use
+        self.program_cache = InstructionMemoryShadow()
+        self.weight_cache = WeightMemoryShadow()
+        self.predictor = CompletionPredictor()
+        self.completion_push = False
+        # UB bank LD_UB reads (the controller's cur_ub_bank_sel); it survives
+        # runs, so it is tracked through each program's SYNCs. None: unknown
+        self.ub_bank: Optional[int] = None
         print(f"TPU Coprocessor connected on {port}")
+        if completion_push and not self.set_completion_push(True):
+            print("Warning: no CFG_NOTIFY support, polling READ_STATUS instead")
 
     def close(self):
         self.uart.close()
 
+    def _settle(self, delay: float) -> None:
+        """Legacy fixed delay between a command and its response"""
+        if self.fixed_delays:
+            time.sleep(delay)
+
+    def _drain_tx(self, delay: float) -> None:
+        """Pace commands that have no ACK: wait until they are on the wire"""
+        if self.fixed_delays:
+            time.sleep(delay)
+        else:
+            self.uart.ser.flush()
+
     # -------------------------------------------------------------------------
     # Status & Debug
     # -------------------------------------------------------------------------
 
-    def read_status(self) -> TPUStatus:
+    def read_status(self, timeout: float = 0.5) -> TPUStatus:
         """Read TPU status register"""
-        self.uart.send_command(UARTCommand.READ_STATUS)
-        time.sleep(0.02)
-        status_byte = self.uart.read_bytes(1)
+        # Single-byte command: a 5-byte header would leave four NACKs behind
+        self.uart.ser.write(bytes([UARTCommand.READ_STATUS]))
+        self._settle(0.02)
+        status_byte = self.uart.read_exact(1, timeout)
         if status_byte:
             return TPUStatus.from_byte(status_byte[0])
         return TPUStatus.from_byte(0)
 
-    def wait_idle(self, timeout: float = 5.0) -> bool:
-        """Wait for TPU to become idle"""
-        start = time.time()
-        while time.time() - start < timeout:
-            status = self.read_status()
-            if status.is_idle():
+    def wait_idle(self, timeout: float = 5.0, started: Optional[float] = None) -> bool:
+        """
+        Wait for TPU to become idle.
+
+        After EXECUTE (`started` is when it was written) the first poll
+        waits for the predicted completion time of the resident program,
+        then polls back off exponentially; observed times refine the
+        prediction (see completion_predictor).
+        """
+        program = self.program_cache.words if started is not None else None
+        start = time.monotonic() if started is None else started
+        deadline = start + timeout
+        last_busy = None
+        for polls, delay in enumerate(self.predictor.delays(program), 1):
+            wake = (start if polls == 1 else time.monotonic()) + delay
+            time.sleep(max(0.0, min(wake, deadline) - time.monotonic()))
+            polled = time.monotonic()
+            if self.read_status().is_idle():
+                self.predictor.record(program, polled - start, polls, last_busy)
+                if started is not None:
+                    self._ran_program(True)
                 return True
-            time.sleep(0.01)
-        return False
+            if polled >= deadline:
+                if started is not None:
+                    self._ran_program(False)
+                return False
+            last_busy = polled - start
 
     # -------------------------------------------------------------------------
     # Memory Operations
     # -------------------------------------------------------------------------
 
-    def write_unified_buffer(self, addr: int, data: bytes) -> bool:
+    def write_unified_buffer(self, addr: int, data, timeout: float = 1.0) -> bool:
         """
         Write data to Unified Buffer.
 
+        Data longer than one entry is sent as a single burst command that
+        fills consecutive addresses starting at `addr`.
+
         Args:
-            addr: UB address (0-127 per bank)
-            data: Data bytes (padded to 32 bytes if needed)
+            addr: UB address (0-127 per bank; bit 8 selects the bank)
+            data: bytes or any buffer (e.g. numpy array), padded to a
+                multiple of 32 bytes
+            timeout: ACK deadline once the data has been sent
         """
         # Flush any stale data
         self.uart.flush()
 
-        # Pad to 32 bytes
-        if len(data) < self.UB_WORD_SIZE:
-            data = data + bytes(self.UB_WORD_SIZE - len(data))
-        elif len(data) > self.UB_WORD_SIZE:
-            data = data[:self.UB_WORD_SIZE]
+        size = self.uart.send_frame(UARTCommand.WRITE_UB, addr, data, pad_to=self.UB_WORD_SIZE)
+        self._settle(0.05)
+        return self.uart.wait_ack(expected=UARTTransport.ACK_BYTE_UB,
+                                  timeout=timeout + self.uart.wire_time(size))
 
-        self.uart.send_command(UARTCommand.WRITE_UB, 0, addr, 0, len(data))
-        self.uart.send_data(data)
-        time.sleep(0.05)
-        return self.uart.wait_ack(expected=UARTTransport.ACK_BYTE_UB)
-
-    def read_unified_buffer(self, addr: int, length: int = 32) -> bytes:
+    def read_unified_buffer(self, addr: int, length: int = 32,
+                            timeout: float = 1.0) -> bytes:
         """
         Read data from Unified Buffer.
 
+        Lengths above 32 read consecutive entries in one burst.
+
         Args:
             addr: UB address
             length: Number of bytes to read (default 32)
+            timeout: Deadline for the response, on top of its wire time
         """
-        self.uart.send_command(UARTCommand.READ_UB, 0, addr, 0, length)
-        time.sleep(0.05)
-        return self.uart.read_bytes(length)
+        self.uart.send_command(UARTCommand.READ_UB, (addr >> 8) & 0xFF, addr & 0xFF,
+                               length >> 8, length & 0xFF)
+        self._settle(0.05)
+        return self.uart.read_exact(length, timeout + self.uart.wire_time(length))
 
-    def write_weights(self, addr: int, data: bytes) -> bool:
+    def read_unified_buffer_into(self, addr: int, out, timeout: float = 1.0) -> int:
+        """
+        Read len(out) bytes from the Unified Buffer directly into `out`
+        (a writable buffer such as a numpy array), without intermediate
+        bytes objects. Returns the number of bytes received.
+        """
+        length = memoryview(out).nbytes
+        self.uart.send_command(UARTCommand.READ_UB, (addr >> 8) & 0xFF, addr & 0xFF,
+                               length >> 8, length & 0xFF)
+        self._settle(0.05)
+        return self.uart.read_into(out, timeout + self.uart.wire_time(length))
+
+    def write_weights(self, addr: int, data) -> bool:
         """
         Write weights to Weight Memory.
 
         Args:
             addr: Weight memory address
-            data: Weight data (8 bytes for 3x3 array row)
+            data: Weight data (8 bytes for 3x3 array row; longer data fills
+                consecutive rows). bytes or any buffer, e.g. a numpy array
         """
         # Flush any stale data
         self.uart.flush()
 
-        # Weight memory expects 8 bytes (for 3x3 systolic array)
-        if len(data) < 8:
-            data = data + bytes(8 - len(data))
+        # Weight memory rows are 8 bytes (for 3x3 systolic array)
+        self.uart.send_frame(UARTCommand.WRITE_WT, addr, data, pad_to=WEIGHT_ROW_BYTES)
+        self._settle(0.05)
+        ok = self.uart.wait_ack(expected=UARTTransport.ACK_BYTE_WT)
+        view = byte_view(data)
+        rows = [view[i:i + WEIGHT_ROW_BYTES] for i in range(0, len(view), WEIGHT_ROW_BYTES)] or [b'']
+        if ok:
+            self.weight_cache.update(addr, rows)
+        else:
+            self.weight_cache.invalidate(addr, len(rows))
+        return ok
 
-        self.uart.send_command(UARTCommand.WRITE_WT, 0, addr, 0, len(data))
-        self.uart.send_data(data)
-        time.sleep(0.05)
-        return self.uart.wait_ack(expected=UARTTransport.ACK_BYTE_WT)
+    def load_weights(self, addr: int, rows: List[bytes]) -> bool:
+        """
+        Make a weight tile (consecutive rows from `addr`) resident.
+
+        Rows already holding the same bytes are not resent, so loading
+        the resident tile costs no UART traffic. Hit/miss counters are in
+        `weight_cache.stats`.
+        """
+        ok = True
+        runs = self.weight_cache.changed_runs(addr, rows)
+        for run_addr, run in runs:
+            ok &= self.write_weights(run_addr, b''.join(run))
+        if ok:
+            # Also when no row differed: the rows form this tile again
+            self.weight_cache.update(addr, rows)
+        return ok
+
+    def invalidate_weight_cache(self) -> None:
+        """
+        Forget which weights are resident. Call after the board is reset
+        or the bitstream is reloaded.
+        """
+        self.weight_cache.invalidate()
+
+    def _write_bulk(self, cmd: UARTCommand, ack: int, addr: int,
+                    chunks: List[memoryview], pad_to: int) -> List[PendingCommand]:
+        self.uart.flush()
+        failed = []
+        for offset, data in enumerate(chunks):
+            failed += self.uart.submit(cmd, addr + offset, data, ack, pad_to=pad_to)
+        failed += self.uart.drain()
+        for pending in failed:
+            print(f"Warning: {pending}")
+        return failed
+
+    def write_unified_buffer_bulk(self, addr: int, words: List[bytes]) -> List[PendingCommand]:
+        """
+        Write consecutive UB entries starting at `addr`, pipelined.
+
+        Each word is its own WRITE_UB command; up to `window` are in
+        flight at once. Returns the commands that were not ACKed correctly
+        (empty list on success), so failed addresses can be retried.
+        """
+        chunks = [byte_view(w)[:self.UB_WORD_SIZE] for w in words]
+        return self._write_bulk(UARTCommand.WRITE_UB, UARTTransport.ACK_BYTE_UB, addr,
+                                chunks, self.UB_WORD_SIZE)
+
+    def write_weights_bulk(self, addr: int, rows: List[bytes]) -> List[PendingCommand]:
+        """
+        Write consecutive weight memory rows starting at `addr`, pipelined.
+
+        Returns the commands that were not ACKed correctly (empty on success).
+        """
+        chunks = [byte_view(r)[:WEIGHT_ROW_BYTES] for r in rows]
+        failed = self._write_bulk(UARTCommand.WRITE_WT, UARTTransport.ACK_BYTE_WT, addr,
+                                  chunks, WEIGHT_ROW_BYTES)
+        self.weight_cache.update(addr, chunks)
+        for pending in failed:
+            self.weight_cache.invalidate(pending.addr, 1)
+        return failed
 
     # -------------------------------------------------------------------------
     # Instruction Programming
@@ -356,28 +761,253 @@ class TPUCoprocessor:
         cmd = bytes([UARTCommand.WRITE_INSTR, 0, addr])
         self.uart.ser.write(cmd)
         self.uart.ser.write(struct.pack('>I', instr))
-        time.sleep(0.01)
+        self._drain_tx(0.01)
+        self.program_cache.update(addr, [instr])
+
+    def invalidate_program_cache(self) -> None:
+        """
+        Forget which program is resident. Call after the board is reset
+        or the bitstream is reloaded, since instruction memory is cleared.
+        The UB bank select is forgotten with it.
+        """
+        self.program_cache.invalidate()
+        self.ub_bank = None
+
+    def supports_instruction_burst(self) -> bool:
+        """Probe (once) for burst WRITE_INSTR with a zero-count burst"""
+        if self._instr_burst is None:
+            self.uart.flush()
+            self.uart.send_command(UARTCommand.WRITE_INSTR_BURST, 0, 0, 0, 0)
+            reply = self.uart.read_exact(2, 0.2)
+            self._instr_burst = reply == bytes([UARTTransport.ACK_BYTE_INSTR, 0])
+            if not self._instr_burst:
+                # Older bitstreams NACK each header byte; let them drain
+                self.uart.read_exact(8, 0.05)
+                self.uart.flush()
+        return self._instr_burst
+
+    def write_instructions_burst(self, addr: int, instructions: List[int],
+                                 timeout: float = 1.0) -> bool:
+        """
+        Write consecutive instructions with one command.
 
-    def load_program(self, instructions: List[int]) -> None:
-        """Load a program (list of instructions) to instruction memory"""
-        for addr, instr in enumerate(instructions):
-            self.write_instruction(addr, instr)
+        The FPGA answers with an ACK and an 8-bit sum of the instruction
+        bytes; returns True only if both match.
+        """
+        payload = b''.join(struct.pack('>I', instr) for instr in instructions)
+        self.uart.flush()
+        self.uart.send_command(UARTCommand.WRITE_INSTR_BURST, 0, addr,
+                               len(instructions) >> 8, len(instructions) & 0xFF)
+        self.uart.send_data(payload)
+        reply = self.uart.read_exact(2, timeout + self.uart.wire_time(len(payload)))
+        ok = reply == bytes([UARTTransport.ACK_BYTE_INSTR, sum(payload) & 0xFF])
+        if ok:
+            self.program_cache.update(addr, instructions)
+        else:
+            self.program_cache.invalidate(addr, len(instructions))
+        return ok
+
+    def load_program(self, instructions: List[int], start: int = 0) -> bool:
+        """
+        Load a program (list of instructions) to instruction memory.
+
+        Only words that differ from what the FPGA already holds are sent;
+        reloading the resident program costs no UART traffic. Changed
+        words go as burst uploads when the bitstream supports them, else
+        one WRITE_INSTR per word. Returns False if a burst was not
+        acknowledged with a matching checksum; raises ValueError, before
+        sending anything, if the program does not fit in the 32 words.
+        """
+        ok = True
+        runs = self.program_cache.changed_runs(start, instructions)
+        for addr, words in runs:
+            self.program_cache.stats['words_sent'] += len(words)
+            if self.supports_instruction_burst():
+                ok &= self.write_instructions_burst(addr, words)
+            else:
+                for offset, instr in enumerate(words):
+                    self.write_instruction(addr + offset, instr)
+        if ok and runs:
+            # Index the whole program range for the next fast-path lookup
+            self.program_cache.update(start, instructions)
+        return ok
 
     # -------------------------------------------------------------------------
     # Execution
     # -------------------------------------------------------------------------
 
-    def execute(self) -> bool:
-        """Start TPU execution"""
+    def set_completion_push(self, enable: bool = True) -> bool:
+        """
+        Enable or disable the completion push (CFG_NOTIFY).
+
+        With the push on, the FPGA sends 0xDD and the status byte when a
+        run reaches HALT. Returns False if the bitstream does not ACK the
+        command, in which case execute() keeps polling.
+        """
+        self.uart.flush()
+        self.uart.send_data(bytes([UARTCommand.CFG_NOTIFY, 0x00, 0x80 if enable else 0x00]))
+        reply = self.uart.read_exact(1, 0.2)
+        ok = reply == bytes([UARTTransport.ACK_BYTE_NOTIFY_CFG])
+        if not ok:
+            # Older bitstreams NACK each byte; let them drain
+            self.uart.read_exact(3, 0.05)
+            self.uart.flush()
+        self.completion_push = enable and ok
+        return ok
+
+    def start_execution(self) -> float:
+        """
+        Send EXECUTE without waiting for the run; returns when it was sent,
+        for wait_idle(started=...). The link stays free for commands that
+        do not touch what the program uses (e.g. uploads to the other UB bank).
+        """
         self.uart.ser.write(bytes([UARTCommand.EXECUTE]))
-        time.sleep(0.1)
-        return self.wait_idle(timeout=2.0)
+        return time.monotonic()
+
+    def execute(self, timeout: float = 2.0) -> bool:
+        """Start TPU execution and wait for it to finish"""
+        started = self.start_execution()
+        if self.completion_push:
+            return self.wait_completion(timeout)
+        self._drain_tx(0.1)
+        return self.wait_idle(timeout=timeout, started=started)
+
+    def wait_completion(self, timeout: float = 2.0) -> bool:
+        """Block on the completion push after EXECUTE (no READ_STATUS polling)"""
+        push = self.uart.read_exact(2, timeout)
+        if len(push) == 2 and push[0] == UARTTransport.NOTIFY_BYTE:
+            ok = TPUStatus.from_byte(push[1]).is_idle()
+        else:
+            # No push: the program did not reach HALT in time (or the link
+            # dropped bytes). Resynchronise and report what the status says.
+            self.uart.flush()
+            ok = self.read_status().is_idle()
+        self._ran_program(ok)
+        return ok
+
+    def _ran_program(self, halted: bool) -> None:
+        """Follow the UB bank select through the SYNCs of the resident program"""
+        prefix = running_prefix(self.program_cache.words)
+        if not halted or prefix is None:
+            self.ub_bank = None  # Unknown program, or stopped somewhere inside it
+        elif self.ub_bank is not None:
+            syncs = sum(1 for instr in prefix if (instr >> 26) & 0x3F == Opcode.SYNC)
+            self.ub_bank ^= syncs & 1
+
+    def probe_ub_bank(self, scratch: int = 127) -> int:
+        """
+        Find which UB bank LD_UB reads and remember it in `ub_bank`.
+
+        The bank select is only cleared by reset, so it depends on every
+        SYNC run since. VPU ops write the bank LD_UB does not read: word
+        `scratch` of both banks gets a marker, a RELU writes over one of
+        them, and the untouched one is the bank being read. Replaces the
+        program at PC 0.
+
+        Raises:
+            IOError: an upload or the run failed, or both banks read back
+                the same (a bitstream that maps UART accesses to bank 0)
+        """
+        marker = bytes([0xA5]) * self.UB_WORD_SIZE
+        for bank in (0, 1):
+            if not self.write_unified_buffer((bank << 8) | scratch, marker):
+                raise IOError("unified buffer write was not acknowledged")
+        if not self.load_program([self.encoder.relu(0, scratch, 3), self.encoder.halt()]):
+            raise IOError("bank probe program upload failed")
+        if not self.execute():
+            raise IOError("bank probe program did not halt")
+        kept = [self.read_unified_buffer((bank << 8) | scratch) == marker for bank in (0, 1)]
+        if kept.count(True) != 1:
+            raise IOError("UB bank probe inconclusive: no UART bank select?")
+        self.ub_bank = kept.index(True)
+        return self.ub_bank
+
+    def supports_exec_read(self) -> bool:
+        """Probe (once) for the fused EXEC_READ command with a zero-length read"""
+        if self._exec_read is None:
+            self.uart.flush()
+            self.uart.send_command(UARTCommand.EXEC_READ, 0, 0, 0, 0)
+            reply = self.uart.read_exact(1, 0.2)
+            self._exec_read = reply == bytes([UARTTransport.ACK_BYTE_EXEC_READ])
+            if not self._exec_read:
+                # Older bitstreams NACK each header byte; let them drain
+                self.uart.read_exact(8, 0.05)
+                self.uart.flush()
+        return self._exec_read
+
+    def supports_exec_queue(self) -> bool:
+        """Probe (once) for the queued-start EXEC_QUEUE command"""
+        if self._exec_queue is None:
+            self.uart.flush()
+            self.uart.send_data(bytes([UARTCommand.EXEC_QUEUE, 0x80, 0x00]))
+            reply = self.uart.read_exact(1, 0.2)
+            self._exec_queue = reply == bytes([UARTTransport.ACK_BYTE_QUEUED])
+            if not self._exec_queue:
+                # Older bitstreams NACK each byte; let them drain
+                self.uart.read_exact(3, 0.05)
+                self.uart.flush()
+        return self._exec_queue
+
+    def queue_execution(self, pc: int) -> None:
+        """
+        Queue a start at instruction `pc` (EXEC_QUEUE). It fires on the
+        cycle after the running program's HALT, or at once if nothing is
+        running; wait_queued_start() collects the answer. The link stays
+        free meanwhile, e.g. to upload the next segment elsewhere in
+        instruction memory.
+        """
+        self.uart.send_data(bytes([UARTCommand.EXEC_QUEUE, 0x00, pc & 0x1F]))
+
+    def wait_queued_start(self, timeout: float = 2.0) -> Optional[bool]:
+        """
+        Block until the queued start fires. Returns True if it followed a
+        HALT back to back, False if the TPU was already idle when the
+        command arrived, None if no answer came in time.
+        """
+        reply = self.uart.read_exact(1, timeout)
+        if reply == bytes([UARTTransport.ACK_BYTE_QUEUED]):
+            return True
+        if reply == bytes([UARTTransport.ACK_BYTE_STARTED_IDLE]):
+            return False
+        return None
+
+    def execute_and_read_into(self, addr: int, out, timeout: float = 2.0) -> int:
+        """
+        Run the loaded program and read len(out) bytes of the Unified
+        Buffer from `addr` into `out` once it halts. Returns the number of
+        bytes received.
+
+        Uses the fused EXEC_READ command when the bitstream has it: the
+        FPGA waits for HALT itself, so there is no status polling and no
+        separate READ_UB round trip. Otherwise falls back to execute()
+        followed by read_unified_buffer_into().
+        """
+        length = memoryview(out).nbytes
+        if not self.supports_exec_read():
+            if not self.execute(timeout):
+                print("Warning: Execution may not have completed")
+            return self.read_unified_buffer_into(addr, out)
+        self.uart.send_command(UARTCommand.EXEC_READ, (addr >> 8) & 0xFF, addr & 0xFF,
+                               length >> 8, length & 0xFF)
+        received = self.uart.read_into(out, timeout + self.uart.wire_time(length))
+        if received < length:
+            # No HALT in time: any byte aborts the on-chip wait; resynchronise
+            self.uart.flush()
+            self.read_status()
+        self._ran_program(received == length)
+        return received
+
+    def execute_and_read(self, addr: int, length: int = 32, timeout: float = 2.0) -> bytes:
+        """execute_and_read_into() returning bytes (short on timeout)"""
+        buf = bytearray(length)
+        return bytes(buf[:self.execute_and_read_into(addr, buf, timeout)])
 
     # -------------------------------------------------------------------------
     # High-Level Inference API
     # -------------------------------------------------------------------------
 
-    def matrix_multiply(self, weights: np.ndarray, inputs: np.ndarray) -> np.ndarray:
+    def matrix_multiply(self, weights: np.ndarray, inputs: np.ndarray,
+                        weight_addr: int = 0) -> np.ndarray:
         """
         Perform matrix multiplication: output = weights @ inputs
 
@@ -386,51 +1016,87 @@ class TPUCoprocessor:
         Args:
             weights: Weight matrix (3x3 for systolic array)
             inputs: Input vector/matrix
+            weight_addr: Weight memory row for the 3 weight rows (e.g. a
+                WeightPager slot address)
 
         Returns:
             Result matrix after multiplication
         """
+        return self.matrix_multiply_batch(weights, np.reshape(inputs, (3, 1)), weight_addr)
+
+    @staticmethod
+    def weight_rows(weights: np.ndarray) -> List[bytes]:
+        """
+        Weight memory rows for a 3x3 matrix. The array computes x @ W with
+        weight row i as W[i], so the transpose is stored to get weights @ x.
+        """
+        w_int8 = np.clip(weights, -128, 127).astype(np.int8)
+        return [w_int8[:, col].tobytes() for col in range(3)]
+
+    def matrix_multiply_batch(self, weights: np.ndarray, inputs: np.ndarray,
+                              weight_addr: int = 0) -> np.ndarray:
+        """
+        Compute weights @ inputs for up to MAX_BATCH input columns in one
+        program run.
+
+        The array latches one activation per MATMUL, so each column gets
+        its own LD_UB / MATMUL / ST_UB triple; the weights are loaded once.
+        Inputs go to UB words 0..n-1 of the bank LD_UB reads (bank 0
+        unless `ub_bank` says otherwise) in one burst, and results come
+        back from BATCH_OUTPUT_ADDR.. of bank 0, where ST_UB writes. Outputs start at a fixed
+        address so the program for n columns is a prefix of the one for
+        n+1, and changing batch size only re-sends the tail.
+
+        Args:
+            weights: Weight matrix (3x3)
+            inputs: 3 x n input matrix, one column per vector
+            weight_addr: Weight memory row for the 3 weight rows
+
+        Returns:
+            3 x n int8 result matrix
+
+        Raises:
+            IOError: a weight or input upload was not acknowledged, or the
+                result read came back short
+        """
         # Validate dimensions
         assert weights.shape == (3, 3), f"Weights must be 3x3, got {weights.shape}"
+        count = inputs.shape[1]
+        assert inputs.shape[0] == 3 and 1 <= count <= self.MAX_BATCH, \
+            f"Inputs must be 3 x 1..{self.MAX_BATCH}, got {inputs.shape}"
 
         # Convert to int8 for hardware
-        w_int8 = np.clip(weights, -128, 127).astype(np.int8)
         i_int8 = np.clip(inputs, -128, 127).astype(np.int8)
 
-        # Load weights to weight memory (row by row)
-        for row in range(3):
-            row_data = bytes(w_int8[row, :].tobytes().ljust(8, b'\x00'))
-            self.write_weights(row, row_data)
-
-        # Load inputs to unified buffer
-        input_bytes = i_int8.flatten().tobytes()
-        self.write_unified_buffer(0, input_bytes)
-
-        # Create and load the compute program
-        # For 3x3 systolic array, we need to load all 3 weight rows
-        # RD_WEIGHT(row, 1) loads one row from weight memory to FIFOs
-        program = [
-            self.encoder.load_weights(0, 1),        # Load weight row 0
-            self.encoder.load_weights(1, 1),        # Load weight row 1
-            self.encoder.load_weights(2, 1),        # Load weight row 2
-            self.encoder.load_ub(0, 1),             # Load input from UB addr 0
-            self.encoder.matmul(0, 0, 3),           # MATMUL: ub[0] -> acc[0], 3 rows
-            self.encoder.store_ub(1, 1),            # Store acc[0] result to UB addr 1
-            self.encoder.halt()                      # Done
-        ]
+        # Load weights to weight memory (skipped when already resident)
+        if not self.load_weights(weight_addr, self.weight_rows(weights)):
+            raise IOError(f"weight upload to row {weight_addr} failed")
+
+        # One UB word per input column, written as a single burst
+        words = np.zeros((count, self.UB_WORD_SIZE), dtype=np.int8)
+        words[:, :3] = i_int8.T
+        if not self.write_unified_buffer((self.ub_bank or 0) << 8, words):
+            raise IOError("unified buffer write was not acknowledged")
+
+        # RD_WEIGHT(row, 1) loads one row from weight memory to the FIFOs;
+        # the FIFO keeps them for every MATMUL that follows
+        program = [self.encoder.load_weights(weight_addr + row, 1) for row in range(3)]
+        for col in range(count):
+            program += [
+                self.encoder.load_ub(col, 1),                          # Latch input col
+                self.encoder.matmul(col, col, 3),                      # ub[col] -> acc[col]
+                self.encoder.store_ub(self.BATCH_OUTPUT_ADDR + col, 1),
+            ]
+        program.append(self.encoder.halt())
         self.load_program(program)
 
-        # Execute
-        if not self.execute():
-            print("Warning: Execution may not have completed")
-
-        # Read results
-        result_bytes = self.read_unified_buffer(1, 32)
-
-        # Convert back to numpy (assuming int32 accumulator output)
-        result = np.frombuffer(result_bytes[:12], dtype=np.int8).reshape(3, 1)
-
-        return result
+        # Execute and read back; ST_UB writes the 3 saturated int8 outputs
+        # to bytes 0..2 of each word
+        results = np.zeros((count, self.UB_WORD_SIZE), dtype=np.int8)
+        received = self.execute_and_read_into(self.BATCH_OUTPUT_ADDR, results)
+        if received < results.nbytes:
+            raise IOError(f"result read returned {received} of {results.nbytes} bytes")
+        return np.ascontiguousarray(results[:, :3].T)
 
 
 # =============================================================================
@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+"""
+TPU Emulator
+============
+Behavioural, cycle-approximate model of rtl/tpu_top.sv behind the real
+UART protocol, so host drivers and test scripts run without a Basys3.
+
+Modelled blocks:
+- UART DMA command decoder (inherited from uart_standin.UARTStandIn)
+- Double-banked unified buffer, weight memory, 32-entry instruction memory
+- tpu_controller FSM: fetch/decode, the LD_UB -> MATMUL interlock, SYNC
+  bank toggling, CFG_REG, HALT
+- 3x3 systolic array, weight FIFO and the double-buffered accumulators
+- ST_UB / VPU output path (activation pipeline passthrough clamp)
+
+Cycle counts follow the controller and systolic_controller state machines
+(fetch + decode + execute, including the 256-cycle accumulator clear) and
+are accumulated in `cycles`; status reads report sys_busy until the run
+would have finished at `clock_hz`.
+
+Usage:
+    python3 tpu_emulator.py [--baud 115200]     # serve on a pty, prints the port
+    python3 test_tpu_commands.py /dev/pts/N     # any script, unmodified
+    python3 tpu_emulator.py --tcp 7000          # serve socket://<host>:7000
+
+    with PtyStandIn(TPUEmulator()) as dev:      # from Python
+        tpu = TPUCoprocessor(dev.port)
+
+    ser = EmulatedSerial(TPUEmulator())          # in-process pyserial-style port
+"""
+
+import argparse
+import threading
+import time
+from collections import deque
+from typing import Optional
+
+import numpy as np
+import serial
+
+from tpu_coprocessor import InstructionEncoder, Opcode
+from uart_standin import (UARTStandIn, PtyStandIn, TcpStandIn, STATUS_IDLE,
+                          STATUS_HALTED, UB_BANK_DEPTH, INSTR_DEPTH)
+
+STATUS_SYS_BUSY = 0x01
+ACC_DEPTH = 256
+
+# Execute-state cycle counts (after FETCH + DECODE), from tpu_controller.sv
+# and systolic_controller.sv
+FETCH_DECODE_CYCLES = 2
+ACC_CLEAR_CYCLES = 256 + 2
+WEIGHT_LOAD_CYCLES = 7
+SYS_PIPELINE_LATENCY = 4
+EXEC_CYCLES = {
+    Opcode.RD_WEIGHT: 12,   # wt_busy never drops while pushing: 10-cycle timeout
+    Opcode.LD_UB: 2,
+    Opcode.ST_UB: 5,        # read, PIPE_LATENCY wait, capture+write, done
+    Opcode.RD_HOST_MEM: 2,
+    Opcode.WR_HOST_MEM: 2,
+    Opcode.CFG_REG: 1,
+    Opcode.SYNC: 1,
+    Opcode.HALT: 1,
+}
+VPU_CYCLES = 4
+VPU_FROM_ACC = (Opcode.RELU, Opcode.RELU6, Opcode.SIGMOID, Opcode.TANH,
+                Opcode.ADD_BIAS, Opcode.BATCH_NORM)
+VPU_POOL = (Opcode.MAX_POOL, Opcode.AVG_POOL)
+
+
+def clamp_int8(values: np.ndarray, signed: bool) -> bytes:
+    """Activation pipeline passthrough: saturate to int8 or uint8"""
+    if signed:
+        return np.clip(values, -128, 127).astype(np.int8).tobytes()
+    return np.clip(values, 0, 255).astype(np.uint8).tobytes()
+
+
+class TPUEmulator(UARTStandIn):
+    """
+    UART-level model of tpu_top with a working datapath.
+
+    EXECUTE runs the loaded program to HALT in one step (bounded by
+    `max_instructions`, since a program without HALT would run forever).
+    Matrix semantics match the hardware: the last three RD_WEIGHT rows
+    form W (row i, byte j -> W[i][j]), LD_UB latches x from bytes 0..2 of
+    a UB word, MATMUL clears the accumulator buffer and writes x @ W into
+    one entry, MATMUL_ACC adds x @ W to an entry, and ST_UB
+    writes the saturated 3-byte result to bank 0 of the UB.
+    """
+
+    def __init__(self, clock_hz: float = 100e6, max_instructions: int = 4096):
+        super().__init__()
+        self.clock_hz = clock_hz
+        self.max_instructions = max_instructions
+        self.reset()
+
+    def reset(self) -> None:
+        """Model rst_n: clear controller and datapath state (memories keep contents)"""
+        self.acc = np.zeros((2, ACC_DEPTH, 3), dtype=np.int64)
+        self.weight_fifo = deque(maxlen=3)
+        self.activation = bytes(3)
+        self.cfg = [0] * 256
+        self.acc_buf_sel = 0
+        self.ub_bank_sel = 0
+        self.ld_ub_completed = False
+        self.stored_acc_addr = 0
+        self.stored_acc_buf = 0
+        self.stored_signed = False
+        self.pc = 0
+        self.halted = False
+        self.status = STATUS_IDLE
+        self.busy_until = 0.0
+        self.cycles = 0
+        self.last_run_cycles = 0
+        self.instructions_retired = 0
+
+    # -------------------------------------------------------------------------
+    # Controller
+    # -------------------------------------------------------------------------
+
+    def execute(self, pc: int = 0) -> bool:
+        """start_execution: run from `pc` (start_pc) until HALT"""
+        if self._running():
+            return False  # Still running: the controller ignores the pulse
+        self.pc = pc
+        self.halted = False
+        run_cycles = 0
+        for _ in range(self.max_instructions):
+            run_cycles += self.step()
+            if self.halted:
+                break
+        self.last_run_cycles = run_cycles
+        self.cycles += run_cycles
+        self.busy_until = time.monotonic() + run_cycles / self.clock_hz
+        # A program that never halts leaves the controller busy until reset()
+        self.status = STATUS_HALTED if self.halted else STATUS_IDLE | STATUS_SYS_BUSY
+        return True
+
+    def step(self) -> int:
+        """Fetch, decode and execute one instruction; return its cycle count"""
+        instr = self.instr[self.pc % INSTR_DEPTH]
+        opcode, arg1, arg2, arg3, flags = InstructionEncoder.decode(instr)
+        self.pc = (self.pc + 1) & 0xFF
+        self.instructions_retired += 1
+        cycles = FETCH_DECODE_CYCLES
+
+        if opcode == Opcode.RD_WEIGHT:
+            for row in range(max(arg2, 1)):
+                self.weight_fifo.append(self.weight_row(arg1 + row))
+        elif opcode == Opcode.LD_UB:
+            self._load_activation(arg1)
+        elif opcode in (Opcode.MATMUL, Opcode.CONV2D, Opcode.MATMUL_ACC):
+            if not self.ld_ub_completed:
+                # RTL redirects to LD_UB with the MATMUL's fields, then moves on
+                self._load_activation(arg1)
+                return cycles + EXEC_CYCLES[Opcode.LD_UB]
+            return cycles + self._matmul(opcode, arg1, arg2, arg3, flags)
+        elif opcode == Opcode.ST_UB:
+            values = self.acc[self.stored_acc_buf, self.stored_acc_addr]
+            self.set_ub_word(self._ub_index(0, arg1), clamp_int8(values, self.stored_signed))
+        elif opcode in VPU_FROM_ACC:
+            values = self.acc[self.acc_buf_sel ^ 1, arg1]
+            if opcode == Opcode.RELU:
+                values = np.maximum(values, 0)
+            elif opcode == Opcode.RELU6:
+                values = np.clip(values, 0, 6)
+            self.set_ub_word(self._ub_index(self.ub_bank_sel ^ 1, arg2),
+                             clamp_int8(values, self.stored_signed))
+            return cycles + VPU_CYCLES
+        elif opcode in (Opcode.RD_HOST_MEM, Opcode.WR_HOST_MEM):
+            pass  # dma_busy is tied low in tpu_datapath
+        elif opcode in VPU_POOL:
+            return cycles + VPU_CYCLES  # Reads the UB; no write-back in the RTL
+        elif opcode == Opcode.SYNC:
+            self.acc_buf_sel ^= 1
+            self.ub_bank_sel ^= 1
+        elif opcode == Opcode.CFG_REG:
+            self.cfg[arg1] = (arg2 << 8) | arg3
+        elif opcode == Opcode.HALT:
+            self.halted = True
+        else:
+            return cycles  # NOP and invalid opcodes retire in DECODE
+        return cycles + EXEC_CYCLES.get(opcode, 1)
+
+    def _matmul(self, opcode: int, ub_addr: int, acc_addr: int, rows: int, flags: int) -> int:
+        signed = bool(flags & 0x2)
+        self._load_activation(ub_addr)  # MATMUL re-reads the UB in its first cycle
+        dtype = np.int8 if signed else np.uint8
+        x = np.frombuffer(self.activation, dtype=dtype).astype(np.int64)
+        w = np.zeros((3, 3), dtype=np.int64)
+        for i, row in enumerate(self.weight_fifo):
+            w[i] = np.frombuffer(row[:3], dtype=dtype)
+        result = x @ w
+        cycles = 1 + WEIGHT_LOAD_CYCLES + rows + 2 + SYS_PIPELINE_LATENCY + 2
+        if opcode == Opcode.MATMUL_ACC:
+            self.acc[self.acc_buf_sel, acc_addr] += result
+        else:
+            # The clear state machine zeroes all 256 entries of the buffer
+            self.acc[self.acc_buf_sel] = 0
+            self.acc[self.acc_buf_sel, acc_addr] = result
+            cycles += ACC_CLEAR_CYCLES
+        self.stored_acc_addr = acc_addr
+        self.stored_acc_buf = self.acc_buf_sel
+        self.stored_signed = signed
+        self.ld_ub_completed = False
+        return cycles
+
+    def _load_activation(self, ub_addr: int) -> None:
+        self.activation = self.ub_word(self._ub_index(self.ub_bank_sel, ub_addr))[:3]
+        self.ld_ub_completed = True
+
+    @staticmethod
+    def _ub_index(bank: int, addr: int) -> int:
+        return bank * UB_BANK_DEPTH + addr % UB_BANK_DEPTH
+
+    def _busy(self) -> bool:
+        return time.monotonic() < self.busy_until
+
+    def _running(self) -> bool:
+        # Within the run's time at clock_hz, or a program that never halted
+        return self._busy() or (not self.halted and bool(self.status & STATUS_SYS_BUSY))
+
+    def _wait_for_halt(self) -> None:
+        # halt_req rises once the run's cycles have elapsed at clock_hz
+        time.sleep(max(0.0, self.busy_until - time.monotonic()))
+
+    def _read_status(self, frame: bytes) -> bytes:
+        if self._busy():
+            return bytes([STATUS_IDLE | STATUS_SYS_BUSY])
+        return bytes([self.status])
+
+
+class EmulatedSerial:
+    """
+    Minimal pyserial.Serial stand-in wired straight to a device model.
+
+    Responses are available as soon as the command bytes are written.
+    read() honours `timeout` like pyserial (None blocks, 0 polls), which
+    matters when another thread is the writer; I/O on a closed port raises
+    serial.PortNotOpenError. With `paced=True`, write()
+    and read() sleep for the bytes' wire time at `baudrate` so host-side
+    timing resembles a real link.
+    """
+
+    def __init__(self, device: Optional[UARTStandIn] = None, baudrate: int = 115200,
+                 timeout: Optional[float] = None, paced: bool = False):
+        self.device = device if device is not None else TPUEmulator()
+        self.port = 'emulator'
+        self.baudrate = baudrate
+        self.timeout = timeout
+        self.paced = paced
+        self.is_open = True
+        self._rx = bytearray()
+        self._cond = threading.Condition()
+
+    @property
+    def in_waiting(self) -> int:
+        return len(self._rx)
+
+    def write(self, data) -> int:
+        if not self.is_open:
+            raise serial.PortNotOpenError()
+        data = bytes(data)
+        self._pace(len(data))
+        with self._cond:
+            self._rx += self.device.feed(data)
+            self._cond.notify_all()
+        return len(data)
+
+    def read(self, size: int = 1) -> bytes:
+        if not self.is_open:
+            raise serial.PortNotOpenError()
+        with self._cond:
+            self._cond.wait_for(lambda: len(self._rx) >= size or not self.is_open,
+                                self.timeout)
+            data = bytes(self._rx[:size])
+            del self._rx[:size]
+        self._pace(len(data))
+        return data
+
+    def readinto(self, buf) -> int:
+        view = memoryview(buf).cast('B')
+        data = self.read(len(view))
+        view[:len(data)] = data
+        return len(data)
+
+    def reset_input_buffer(self) -> None:
+        with self._cond:
+            self._rx.clear()
+
+    def reset_output_buffer(self) -> None:
+        pass
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        with self._cond:
+            self.is_open = False
+            self._cond.notify_all()
+
+    def _pace(self, nbytes: int) -> None:
+        if self.paced and nbytes:
+            time.sleep(nbytes * 10 / self.baudrate)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--baud', type=int, default=115200)
+    parser.add_argument('--clock', type=float, default=100e6, help='Core clock (Hz)')
+    parser.add_argument('--tcp', type=int, metavar='PORT',
+                        help='Serve on a TCP port instead of a pty')
+    parser.add_argument('--host', default='0.0.0.0', help='TCP bind address')
+    args = parser.parse_args()
+
+    emulator = TPUEmulator(clock_hz=args.clock)
+    if args.tcp is not None:
+        server = TcpStandIn(emulator, baudrate=args.baud, host=args.host, port=args.tcp)
+    else:
+        server = PtyStandIn(emulator, baudrate=args.baud)
+    with server as dev:
+        where = dev.url if args.tcp is not None else dev.port
+        print(f"TPU emulator on {where} ({args.baud} baud), Ctrl-C to stop")
+        try:
+            while True:
+                time.sleep(1.0)
+        except KeyboardInterrupt:
+            pass
+    print(f"\nBytes rx/tx: {emulator.rx_count}/{emulator.tx_count}, "
+          f"instructions: {emulator.instructions_retired}, cycles: {emulator.cycles}")
+
+
+if __name__ == "__main__":
+    main()
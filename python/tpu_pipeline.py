@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+Layer Pipeline
+==============
+Model parallelism for multi-layer MLPs: each board holds the weights of
+some of the layers, and micro-batches flow board -> host -> board, so all
+boards compute at once on different micro-batches.
+
+This is TPU_Basys3.forward_pass (matmul, optional ReLU, read back) split
+across boards. Layers are 3x3 weight matrices (the array size); ReLU runs
+on the host between boards, on the int8 values ST_UB saturated.
+
+Each stage has its own worker thread and port, and bounded queues between
+stages, so while stage k reads back micro-batch m+1, stage k+1 is already
+uploading and computing micro-batch m. Per-stage busy and wait times show
+the bottleneck layer: the stage with the highest utilization sets the
+pipeline's throughput.
+
+Usage:
+    pipe = LayerPipeline(['/dev/ttyUSB1', '/dev/ttyUSB3'],
+                         [(w1, True), (w2, True), (w3, False)])
+    outputs = pipe.forward_pass(inputs)          # inputs: 3 x N
+    print(pipe.report()['bottleneck'])
+"""
+
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from tpu_coprocessor import TPUCoprocessor
+
+Layer = Tuple[np.ndarray, bool]  # (3x3 weights, apply ReLU)
+_DONE = object()
+
+
+@dataclass
+class Stage:
+    """Consecutive layers pinned to one board, and its timing counters"""
+    index: int
+    tpu: TPUCoprocessor
+    layers: List[Layer]
+    weight_addrs: List[int]
+    micro_batches: int = 0
+    busy_time: float = 0.0      # Uploading, computing, reading back
+    wait_in_time: float = 0.0   # Starved: waiting for the previous stage
+    wait_out_time: float = 0.0  # Blocked: next stage's queue full
+    error: Optional[Exception] = field(default=None, repr=False)
+
+
+class LayerPipeline:
+    """
+    Run an MLP with its layers spread over several boards.
+
+    Layers are assigned to boards in contiguous groups (as evenly as
+    possible); a board holding several layers keeps each at its own weight
+    address, so weights are uploaded once by pin_weights() and only
+    checked against the residency shadow afterwards.
+    """
+
+    def __init__(self, ports: Sequence[Union[str, TPUCoprocessor]], layers: Sequence[Layer],
+                 baudrate: int = 115200, queue_depth: int = 2):
+        if not layers:
+            raise ValueError("pipeline needs at least one layer")
+        tpus = [port if isinstance(port, TPUCoprocessor) else TPUCoprocessor(port, baudrate)
+                for port in ports[:len(layers)]]
+        self.stages: List[Stage] = []
+        start = 0
+        for index, tpu in enumerate(tpus):
+            count = (len(layers) - start) // (len(tpus) - index)
+            group = [(np.asarray(w), bool(relu)) for w, relu in layers[start:start + count]]
+            self.stages.append(Stage(index, tpu, group, [3 * j for j in range(len(group))]))
+            start += count
+        self.queue_depth = queue_depth
+        self.wall_time = 0.0
+        self.pin_weights()
+
+    def close(self) -> None:
+        for stage in self.stages:
+            stage.tpu.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def pin_weights(self) -> None:
+        """Make every stage's layer weights resident on its board"""
+        for stage in self.stages:
+            for (weights, _), addr in zip(stage.layers, stage.weight_addrs):
+                if not stage.tpu.load_weights(addr, TPUCoprocessor.weight_rows(weights)):
+                    raise IOError(f"stage {stage.index}: weight upload to row {addr} failed")
+
+    # -------------------------------------------------------------------------
+    # Execution
+    # -------------------------------------------------------------------------
+
+    def forward_pass(self, inputs: np.ndarray, micro_batch: Optional[int] = None) -> np.ndarray:
+        """Push a 3 x N batch through every layer; returns the 3 x N int8 output"""
+        inputs = np.asarray(inputs).reshape(3, -1)
+        size = min(micro_batch or TPUCoprocessor.MAX_BATCH,
+                   min(stage.tpu.MAX_BATCH for stage in self.stages))
+        queues = [queue.Queue(maxsize=self.queue_depth) for _ in range(len(self.stages) + 1)]
+        workers = [threading.Thread(target=self._run_stage, daemon=True,
+                                    args=(stage, queues[i], queues[i + 1]))
+                   for i, stage in enumerate(self.stages)]
+        started = time.perf_counter()
+        for worker in workers:
+            worker.start()
+
+        feeder = threading.Thread(target=self._feed, args=(inputs, size, queues[0]), daemon=True)
+        feeder.start()
+        outputs = []
+        while True:
+            item = queues[-1].get()
+            if item is _DONE:
+                break
+            outputs.append(item)
+        feeder.join()
+        for worker in workers:
+            worker.join()
+        self.wall_time += time.perf_counter() - started
+
+        for stage in self.stages:
+            if stage.error is not None:
+                error, stage.error = stage.error, None
+                raise IOError(f"stage {stage.index} failed: {error}") from error
+        return np.concatenate(outputs, axis=1) if outputs else np.zeros((3, 0), np.int8)
+
+    @staticmethod
+    def _feed(inputs: np.ndarray, size: int, out: queue.Queue) -> None:
+        for start in range(0, inputs.shape[1], size):
+            out.put(inputs[:, start:start + size])
+        out.put(_DONE)
+
+    def _run_stage(self, stage: Stage, inbox: queue.Queue, outbox: queue.Queue) -> None:
+        while True:
+            waited = time.perf_counter()
+            item = inbox.get()
+            stage.wait_in_time += time.perf_counter() - waited
+            if item is _DONE:
+                outbox.put(_DONE)
+                return
+            if stage.error is not None:
+                continue  # Drain so upstream stages are not blocked
+            busy = time.perf_counter()
+            try:
+                activations = item
+                for (weights, relu), addr in zip(stage.layers, stage.weight_addrs):
+                    activations = stage.tpu.matrix_multiply_batch(weights, activations, addr)
+                    if relu:
+                        activations = np.maximum(activations, 0)
+            except Exception as exc:
+                stage.error = exc
+                continue
+            stage.busy_time += time.perf_counter() - busy
+            stage.micro_batches += 1
+            waited = time.perf_counter()
+            outbox.put(activations)
+            stage.wait_out_time += time.perf_counter() - waited
+
+    def reference(self, inputs: np.ndarray) -> np.ndarray:
+        """Host-side result the pipeline should produce (int8 saturation per layer)"""
+        activations = np.asarray(inputs).reshape(3, -1)
+        for stage in self.stages:
+            for weights, relu in stage.layers:
+                activations = np.clip(weights @ activations, -128, 127).astype(np.int8)
+                if relu:
+                    activations = np.maximum(activations, 0)
+        return activations
+
+    # -------------------------------------------------------------------------
+    # Reporting
+    # -------------------------------------------------------------------------
+
+    def report(self) -> Dict[str, object]:
+        """Per-stage utilization (busy / wall time) and the bottleneck stage"""
+        wall = self.wall_time or 1.0
+        stages = [{'layers': len(stage.layers), 'micro_batches': stage.micro_batches,
+                   'busy_s': stage.busy_time, 'wait_in_s': stage.wait_in_time,
+                   'wait_out_s': stage.wait_out_time,
+                   'utilization': stage.busy_time / wall}
+                  for stage in self.stages]
+        bottleneck = max(range(len(stages)), key=lambda i: stages[i]['busy_s'])
+        return {'wall_s': self.wall_time, 'stages': stages, 'bottleneck': bottleneck}
+
+
+def main():
+    """Compare one board running every layer with one board per layer"""
+    import argparse
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--port', default='emu://?paced=1', help='Port URL for every board')
+    parser.add_argument('--layers', type=int, default=3)
+    parser.add_argument('--columns', type=int, default=90)
+    parser.add_argument('--baud', type=int, default=460800)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    layers = [(rng.integers(-2, 3, (3, 3)), i < args.layers - 1) for i in range(args.layers)]
+    inputs = rng.integers(-8, 9, (3, args.columns))
+    for boards in sorted({1, args.layers}):
+        with LayerPipeline([args.port] * boards, layers, args.baud) as pipe:
+            start = time.perf_counter()
+            outputs = pipe.forward_pass(inputs)
+            elapsed = time.perf_counter() - start
+            assert np.array_equal(outputs, pipe.reference(inputs))
+            report = pipe.report()
+        utilization = ', '.join(f"{s['utilization']:.0%}" for s in report['stages'])
+        print(f"{boards} board(s): {args.columns / elapsed:7.1f} columns/s, "
+              f"stage utilization [{utilization}], bottleneck stage {report['bottleneck']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,596 @@
+#!/usr/bin/env python3
+"""
+TPU Server
+==========
+Lets several processes share one board. The server owns the
+TPUCoprocessor (and so the UART) and accepts requests from any number of
+clients over a local Unix socket (or TCP):
+
+- RAW: whole UART command frames plus the number of response bytes to
+  collect, which must match the commands' replies where those are fixed
+- MATMUL: a 3x3 int8 weight matrix and a 3-element input vector
+- STATS: queue-depth and throughput metrics as JSON
+
+Clients may pipeline: every message carries a request id and responses
+come back tagged with it. Each client has its own queue and the device
+worker serves clients round-robin, one request per turn, so a client
+with a deep pipeline cannot starve the others. Consecutive RAW requests
+(from any clients) are coalesced into a single UART write and a single
+read of their combined responses.
+
+Message framing (both directions): '>IBI' header (request id,
+kind or status, payload length) followed by the payload.
+
+Usage:
+    python3 tpu_server.py --port /dev/ttyUSB1 --socket /tmp/tpu.sock
+    python3 tpu_server.py --port emu:// --tcp 7100     # no board needed
+
+    client = TPUClient('/tmp/tpu.sock')
+    y = client.matrix_multiply(weights, inputs)
+    ids = [client.submit_raw(bytes([0x06]), 1) for _ in range(8)]
+    replies = [client.result(i) for i in ids]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import struct
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from enum import IntEnum
+from typing import Dict, Hashable, List, Optional, Tuple, Union
+
+import numpy as np
+
+from tpu_coprocessor import TPUCoprocessor, UARTCommand
+
+MESSAGE_HEADER = struct.Struct('>IBI')  # request id, kind/status, payload length
+RAW_HEADER = struct.Struct('>H')        # response length, then command bytes
+MAX_PAYLOAD = 64 * 1024
+
+STATUS_OK = 0
+STATUS_ERROR = 1
+
+Address = Union[str, Tuple[str, int]]
+
+
+def _raw_frame_size(frame: bytes) -> Optional[int]:
+    """
+    Length of the UART command frame at the start of `frame`, or None if
+    its header is incomplete. Unknown command bytes are one byte long
+    (the FPGA NACKs them and stays idle).
+    """
+    cmd = frame[0]
+    if cmd in (UARTCommand.WRITE_UB, UARTCommand.WRITE_WT, UARTCommand.WRITE_INSTR_BURST):
+        if len(frame) < 5:
+            return None
+        length = (frame[3] << 8) | frame[4]
+        if cmd == UARTCommand.WRITE_INSTR_BURST:
+            return 5 + 4 * length
+        return 5 + max(length, 1)
+    return {UARTCommand.WRITE_INSTR: 7, UARTCommand.READ_UB: 5, UARTCommand.EXEC_READ: 5,
+            UARTCommand.CFG_NOTIFY: 3, UARTCommand.EXEC_QUEUE: 3}.get(cmd, 1)
+
+
+def _raw_response_size(frame: bytes) -> Optional[int]:
+    """
+    Bytes the FPGA sends back for one whole command frame, or None when
+    that depends on device state: runs (completion push, a program that
+    never halts) and CFG_NOTIFY (NACKed byte by byte by older bitstreams).
+    """
+    cmd = frame[0]
+    length = (frame[3] << 8) | frame[4] if len(frame) >= 5 else 0
+    if cmd == UARTCommand.READ_UB:
+        return length
+    if cmd == UARTCommand.EXEC_READ:
+        return 1 if length == 0 else None  # Zero length: the support probe
+    if cmd == UARTCommand.EXEC_QUEUE:
+        return 1 if frame[1] & 0x80 else None
+    if cmd in (UARTCommand.EXECUTE, UARTCommand.CFG_NOTIFY):
+        return None
+    # WRITE_UB/WRITE_WT ACK, READ_STATUS, and the NACK of an unknown byte
+    return {UARTCommand.WRITE_INSTR: 0, UARTCommand.WRITE_INSTR_BURST: 2,
+            UARTCommand.READ_DEBUG: 10}.get(cmd, 1)
+
+
+class RequestKind(IntEnum):
+    RAW = 0x01
+    MATMUL = 0x02
+    STATS = 0x03
+
+
+@dataclass
+class Request:
+    """One queued client request and the future its response goes to"""
+    client: int
+    request_id: int
+    kind: RequestKind
+    payload: bytes
+    future: asyncio.Future
+    enqueued: float = field(default_factory=time.monotonic)
+
+
+class FairQueue:
+    """
+    Per-client FIFO queues served round-robin.
+
+    Clients with pending requests sit in rotation order; pop() takes the
+    head request of the first client and moves that client to the back.
+    """
+
+    def __init__(self):
+        self._queues: 'OrderedDict[Hashable, deque]' = OrderedDict()
+        self.depth = 0
+
+    def __len__(self) -> int:
+        return self.depth
+
+    def push(self, client: Hashable, item) -> None:
+        self._queues.setdefault(client, deque()).append(item)
+        self.depth += 1
+
+    def peek(self):
+        """Next item pop() would return (None when empty)"""
+        for queue in self._queues.values():
+            return queue[0]
+        return None
+
+    def pop(self):
+        client, queue = next(iter(self._queues.items()))
+        item = queue.popleft()
+        if queue:
+            self._queues.move_to_end(client)
+        else:
+            del self._queues[client]
+        self.depth -= 1
+        return item
+
+    def client_depth(self, client: Hashable) -> int:
+        return len(self._queues.get(client, ()))
+
+    def drop(self, client: Hashable) -> List:
+        """Remove and return everything queued for `client`"""
+        items = list(self._queues.pop(client, ()))
+        self.depth -= len(items)
+        return items
+
+
+class TPUServer:
+    """
+    Multiplex client requests onto one TPUCoprocessor.
+
+    Socket handling runs on an asyncio loop; all device I/O runs on a
+    single worker thread, one batch at a time. A batch is either one
+    MATMUL, or up to `max_batch` RAW requests sent as one UART write.
+    Clients with `max_pending` requests queued get STATUS_ERROR replies
+    until their queue drains.
+    """
+
+    def __init__(self, tpu: TPUCoprocessor, max_batch: int = 16, max_pending: int = 64,
+                 timeout: float = 1.0):
+        self.tpu = tpu
+        self.max_batch = max_batch
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.queue = FairQueue()
+        self.clients: Dict[int, Dict[str, float]] = {}
+        self.stats = {'requests': 0, 'rejected': 0, 'errors': 0, 'batches': 0,
+                      'batched_requests': 0, 'max_depth': 0, 'bytes_out': 0, 'bytes_in': 0}
+        self._next_client = 0
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='tpu-device')
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._work: Optional[asyncio.Event] = None
+        self._server = None
+        self.address = None
+        self._thread = None
+        self._ready = threading.Event()
+
+    # -------------------------------------------------------------------------
+    # Serving
+    # -------------------------------------------------------------------------
+
+    async def serve(self, address: Address) -> None:
+        """Listen on `address` (Unix socket path or (host, port)) until cancelled"""
+        self._loop = asyncio.get_running_loop()
+        self._work = asyncio.Event()
+        if isinstance(address, str):
+            if os.path.exists(address):
+                os.unlink(address)  # Stale socket from an earlier run
+            self._server = await asyncio.start_unix_server(self._handle_client, address)
+        else:
+            self._server = await asyncio.start_server(self._handle_client, *address)
+        self.address = self._server.sockets[0].getsockname()
+        dispatcher = asyncio.ensure_future(self._dispatch())
+        self._ready.set()
+        try:
+            async with self._server:
+                await self._server.serve_forever()
+        finally:
+            dispatcher.cancel()
+            if isinstance(address, str) and os.path.exists(address):
+                os.unlink(address)
+
+    def start(self, address: Address):
+        """Serve from a background thread (returns once listening)"""
+        self._thread = threading.Thread(
+            target=asyncio.run, args=(self._serve_until_stopped(address),), daemon=True)
+        self._thread.start()
+        self._ready.wait(timeout=5.0)
+        return self
+
+    def stop(self) -> None:
+        if self._loop is not None and self._server is not None:
+            self._loop.call_soon_threadsafe(self._server.close)
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+            self._thread = None
+        self._executor.shutdown(wait=True)
+
+    async def _serve_until_stopped(self, address: Address) -> None:
+        try:
+            await self.serve(address)
+        except asyncio.CancelledError:
+            pass
+
+    # -------------------------------------------------------------------------
+    # Clients
+    # -------------------------------------------------------------------------
+
+    async def _handle_client(self, reader: asyncio.StreamReader,
+                             writer: asyncio.StreamWriter) -> None:
+        client = self._next_client
+        self._next_client += 1
+        self.clients[client] = {'submitted': 0, 'completed': 0, 'rejected': 0,
+                                'max_depth': 0, 'wait_total': 0.0}
+        write_lock = asyncio.Lock()
+        replies = set()
+        try:
+            while True:
+                try:
+                    header = await reader.readexactly(MESSAGE_HEADER.size)
+                    request_id, kind, length = MESSAGE_HEADER.unpack(header)
+                    if length > MAX_PAYLOAD:
+                        break
+                    payload = await reader.readexactly(length)
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+                future = self._loop.create_future()
+                reply = asyncio.ensure_future(
+                    self._reply(writer, write_lock, request_id, future))
+                replies.add(reply)
+                reply.add_done_callback(replies.discard)
+                self._submit(client, request_id, kind, payload, future)
+        finally:
+            for request in self.queue.drop(client):
+                request.future.cancel()
+            for reply in replies:
+                reply.cancel()
+            del self.clients[client]
+            writer.close()
+
+    def _submit(self, client: int, request_id: int, kind: int, payload: bytes,
+                future: asyncio.Future) -> None:
+        metrics = self.clients[client]
+        metrics['submitted'] += 1
+        self.stats['requests'] += 1
+        if kind == RequestKind.STATS:
+            future.set_result(json.dumps(self.metrics()).encode())
+            return
+        if kind not in (RequestKind.RAW, RequestKind.MATMUL):
+            future.set_exception(ValueError(f"unknown request kind {kind:#x}"))
+            return
+        if self.queue.client_depth(client) >= self.max_pending:
+            metrics['rejected'] += 1
+            self.stats['rejected'] += 1
+            future.set_exception(IOError(f"queue full ({self.max_pending} pending)"))
+            return
+        self.queue.push(client, Request(client, request_id, RequestKind(kind), payload, future))
+        metrics['max_depth'] = max(metrics['max_depth'], self.queue.client_depth(client))
+        self.stats['max_depth'] = max(self.stats['max_depth'], len(self.queue))
+        self._work.set()
+
+    async def _reply(self, writer: asyncio.StreamWriter, lock: asyncio.Lock,
+                     request_id: int, future: asyncio.Future) -> None:
+        try:
+            payload = await future
+            status = STATUS_OK
+        except asyncio.CancelledError:
+            return
+        except Exception as exc:
+            payload = str(exc).encode()
+            status = STATUS_ERROR
+        async with lock:
+            try:
+                writer.write(MESSAGE_HEADER.pack(request_id, status, len(payload)) + payload)
+                await writer.drain()
+            except ConnectionError:
+                pass
+
+    # -------------------------------------------------------------------------
+    # Device worker
+    # -------------------------------------------------------------------------
+
+    async def _dispatch(self) -> None:
+        while True:
+            await self._work.wait()
+            self._work.clear()
+            while self.queue:
+                batch = self._next_batch()
+                now = time.monotonic()
+                for request in batch:
+                    metrics = self.clients.get(request.client)
+                    if metrics is not None:
+                        metrics['wait_total'] += now - request.enqueued
+                try:
+                    results = await self._loop.run_in_executor(self._executor,
+                                                               self._run_batch, batch)
+                except Exception as exc:
+                    self.stats['errors'] += len(batch)
+                    results = [exc] * len(batch)
+                for request, result in zip(batch, results):
+                    metrics = self.clients.get(request.client)
+                    if metrics is not None:
+                        metrics['completed'] += 1
+                    if request.future.done():
+                        continue  # Client went away
+                    if isinstance(result, Exception):
+                        request.future.set_exception(result)
+                    else:
+                        request.future.set_result(result)
+
+    def _next_batch(self) -> List[Request]:
+        """One MATMUL, or the run of RAW requests at the head of the rotation"""
+        batch = [self.queue.pop()]
+        if batch[0].kind == RequestKind.RAW:
+            while len(batch) < self.max_batch:
+                head = self.queue.peek()
+                if head is None or head.kind != RequestKind.RAW:
+                    break
+                batch.append(self.queue.pop())
+        self.stats['batches'] += 1
+        self.stats['batched_requests'] += len(batch)
+        return batch
+
+    def _run_batch(self, batch: List[Request]) -> List[Union[bytes, Exception]]:
+        """Worker thread: perform the batch on the device"""
+        if batch[0].kind == RequestKind.MATMUL:
+            return [self._run_matmul(batch[0].payload)]
+        return self._run_raw(batch)
+
+    def _run_matmul(self, payload: bytes) -> Union[bytes, Exception]:
+        if len(payload) != 12:
+            return ValueError(f"MATMUL payload is 12 bytes, got {len(payload)}")
+        values = np.frombuffer(payload, dtype=np.int8)
+        result = self.tpu.matrix_multiply(values[:9].reshape(3, 3), values[9:].reshape(3, 1))
+        self.stats['bytes_out'] += len(payload)
+        self.stats['bytes_in'] += 3
+        return result.astype(np.int8).tobytes()
+
+    def _run_raw(self, batch: List[Request]) -> List[Union[bytes, Exception]]:
+        """
+        Requests whose reply length follows from their commands share one
+        UART write and one read; a request whose reply depends on device
+        state gets an exchange of its own, so a wrong length cannot shift
+        the replies of other clients.
+        """
+        results: List[Union[bytes, Exception, None]] = [None] * len(batch)
+        group = []
+        for index, request in enumerate(batch):
+            try:
+                command, response_len, checked = self._parse_raw(request.payload)
+            except ValueError as exc:
+                results[index] = exc
+                continue
+            if checked:
+                group.append((index, command, response_len))
+            else:
+                self._exchange(group, results)
+                self._exchange([(index, command, response_len)], results)
+                group = []
+        self._exchange(group, results)
+        return results
+
+    @staticmethod
+    def _parse_raw(payload: bytes) -> Tuple[bytes, int, bool]:
+        """
+        Split a RAW payload into (command bytes, response length, whether
+        that length could be checked against the commands).
+
+        Raises:
+            ValueError: the commands are not whole frames, or their
+                replies do not add up to the requested length
+        """
+        if len(payload) < RAW_HEADER.size + 1:
+            raise ValueError("RAW payload needs a response length and a command")
+        (response_len,) = RAW_HEADER.unpack_from(payload)
+        command = payload[RAW_HEADER.size:]
+        view = memoryview(command)
+        expected = 0
+        offset = 0
+        while offset < len(command):
+            size = _raw_frame_size(view[offset:])
+            if size is None or offset + size > len(command):
+                raise ValueError(f"RAW command 0x{command[offset]:02X} at byte {offset} "
+                                 f"is cut off")
+            reply = _raw_response_size(view[offset:offset + size])
+            expected = None if expected is None or reply is None else expected + reply
+            offset += size
+        if expected is not None and expected != response_len:
+            raise ValueError(f"RAW commands answer {expected} bytes, "
+                             f"{response_len} requested")
+        return command, response_len, expected is not None
+
+    def _exchange(self, group: List[Tuple[int, bytes, int]],
+                  results: List[Union[bytes, Exception, None]]) -> None:
+        """Send (index, command, response length) entries as one write, one read"""
+        if not group:
+            return
+        for _, command, _ in group:
+            self._invalidate_shadows(command)
+        uart = self.tpu.uart
+        frames = b''.join(command for _, command, _ in group)
+        total = sum(response_len for _, _, response_len in group)
+        uart.send_data(frames)
+        response = uart.read_exact(total, self.timeout) if total else b''
+        if len(response) < total:
+            # Late bytes would be mistaken for the next batch's responses
+            uart.ser.reset_input_buffer()
+        self.stats['bytes_out'] += len(frames)
+        self.stats['bytes_in'] += len(response)
+
+        offset = 0
+        for index, _, response_len in group:
+            chunk = response[offset:offset + response_len]
+            offset += response_len
+            if len(chunk) < response_len:
+                self.stats['errors'] += 1
+                results[index] = IOError(f"expected {response_len} response bytes, "
+                                         f"got {len(chunk)}")
+            else:
+                results[index] = chunk
+
+    def _invalidate_shadows(self, command: bytes) -> None:
+        """
+        Raw commands bypass the driver: forget what they may overwrite.
+
+        Every frame of the (already validated) command bytes is checked.
+        Runs started behind the driver's back (EXECUTE, EXEC_READ,
+        EXEC_QUEUE) move the UB bank select by an unknown number of SYNCs.
+        """
+        tpu = self.tpu
+        view = memoryview(command)
+        offset = 0
+        while offset < len(command):
+            cmd = command[offset]
+            if cmd == UARTCommand.WRITE_WT:
+                addr, length = struct.unpack_from('>HH', command, offset + 1)
+                tpu.weight_cache.invalidate(addr, max(1, -(-length // 8)))
+            elif cmd in (UARTCommand.WRITE_INSTR, UARTCommand.WRITE_INSTR_BURST):
+                tpu.invalidate_program_cache()
+            elif cmd in (UARTCommand.EXECUTE, UARTCommand.EXEC_READ, UARTCommand.EXEC_QUEUE):
+                tpu.ub_bank = None
+            offset += _raw_frame_size(view[offset:])
+
+    # -------------------------------------------------------------------------
+    # Metrics
+    # -------------------------------------------------------------------------
+
+    def metrics(self) -> dict:
+        """Global counters plus per-client queue depth and mean queueing delay"""
+        clients = {}
+        for client, metrics in self.clients.items():
+            completed = metrics['completed']
+            clients[str(client)] = dict(
+                metrics, depth=self.queue.client_depth(client),
+                mean_wait_ms=1e3 * metrics['wait_total'] / completed if completed else 0.0)
+        batches = self.stats['batches']
+        return dict(self.stats, depth=len(self.queue),
+                    mean_batch=self.stats['batched_requests'] / batches if batches else 0.0,
+                    clients=clients)
+
+
+class TPUClient:
+    """
+    Blocking client for TPUServer.
+
+    submit_*() send a request and return its id without waiting, so many
+    requests can be in flight; result() waits for a given id, holding on
+    to replies that arrive for other ids. Server-side failures raise
+    IOError.
+    """
+
+    def __init__(self, address: Address, timeout: Optional[float] = 5.0):
+        family = socket.AF_UNIX if isinstance(address, str) else socket.AF_INET
+        self.sock = socket.socket(family, socket.SOCK_STREAM)
+        self.sock.settimeout(timeout)
+        self.sock.connect(address)
+        self._next_id = 0
+        self._replies: Dict[int, Tuple[int, bytes]] = {}
+
+    def close(self) -> None:
+        self.sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def submit(self, kind: RequestKind, payload: bytes = b'') -> int:
+        request_id = self._next_id
+        self._next_id = (self._next_id + 1) & 0xFFFFFFFF
+        self.sock.sendall(MESSAGE_HEADER.pack(request_id, kind, len(payload)) + payload)
+        return request_id
+
+    def submit_raw(self, command: bytes, response_len: int) -> int:
+        return self.submit(RequestKind.RAW, RAW_HEADER.pack(response_len) + bytes(command))
+
+    def submit_matmul(self, weights: np.ndarray, inputs: np.ndarray) -> int:
+        w_int8 = np.clip(weights, -128, 127).astype(np.int8).reshape(9)
+        i_int8 = np.clip(inputs, -128, 127).astype(np.int8).reshape(3)
+        return self.submit(RequestKind.MATMUL, w_int8.tobytes() + i_int8.tobytes())
+
+    def result(self, request_id: int) -> bytes:
+        while request_id not in self._replies:
+            header = self._recv_exact(MESSAGE_HEADER.size)
+            reply_id, status, length = MESSAGE_HEADER.unpack(header)
+            self._replies[reply_id] = (status, self._recv_exact(length))
+        status, payload = self._replies.pop(request_id)
+        if status != STATUS_OK:
+            raise IOError(payload.decode(errors='replace'))
+        return payload
+
+    def raw(self, command: bytes, response_len: int) -> bytes:
+        """Send UART command bytes and return `response_len` response bytes"""
+        return self.result(self.submit_raw(command, response_len))
+
+    def matrix_multiply(self, weights: np.ndarray, inputs: np.ndarray) -> np.ndarray:
+        """weights @ inputs on the shared board (same result as TPUCoprocessor)"""
+        result = self.result(self.submit_matmul(weights, inputs))
+        return np.frombuffer(result, dtype=np.int8).reshape(3, 1)
+
+    def stats(self) -> dict:
+        return json.loads(self.result(self.submit(RequestKind.STATS)))
+
+    def _recv_exact(self, count: int) -> bytes:
+        data = bytearray()
+        while len(data) < count:
+            chunk = self.sock.recv(count - len(data))
+            if not chunk:
+                raise ConnectionError("TPU server closed the connection")
+            data += chunk
+        return bytes(data)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--port', default='/dev/ttyUSB1', help='Board port or transport URL')
+    parser.add_argument('--baud', type=int, default=115200)
+    parser.add_argument('--socket', default='/tmp/tpu.sock', help='Unix socket path')
+    parser.add_argument('--tcp', type=int, metavar='PORT', help='Listen on TCP instead')
+    parser.add_argument('--host', default='127.0.0.1', help='TCP bind address')
+    parser.add_argument('--max-batch', type=int, default=16)
+    parser.add_argument('--max-pending', type=int, default=64)
+    args = parser.parse_args()
+
+    tpu = TPUCoprocessor(args.port, args.baud)
+    server = TPUServer(tpu, max_batch=args.max_batch, max_pending=args.max_pending)
+    address = (args.host, args.tcp) if args.tcp is not None else args.socket
+    print(f"Serving {args.port} on {address}, Ctrl-C to stop")
+    try:
+        asyncio.run(server.serve(address))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(json.dumps(server.metrics(), indent=2))
+        tpu.close()
+
+
+if __name__ == "__main__":
+    main()
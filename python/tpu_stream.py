@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+Double-Buffered Streaming
+=========================
+Streams weights @ inputs over many input columns through one board, with
+the upload of each batch hidden behind the run of the batch before it.
+
+The unified buffer has two banks (address bit 8). LD_UB and MATMUL read
+the bank the controller's bank select points at, and SYNC flips it; the
+select survives across runs. Each batch program ends with SYNC, so runs
+alternate banks, and while batch i runs on one bank the host uploads
+batch i+1 into the other:
+
+    upload 0 -> [bank 0]
+    EXECUTE 0 (reads bank 0) | upload 1 -> [bank 1]  (hidden)
+    wait for HALT, read results 0
+    EXECUTE 1 (reads bank 1) | upload 2 -> [bank 0]  (hidden)
+    ...
+
+ST_UB always writes bank 0, so results come back from BATCH_OUTPUT_ADDR..
+of bank 0, above the input words, and are read before the next run
+overwrites them. The host does not know the bank select at connect time;
+it is probed once (TPUCoprocessor.probe_ub_bank) and then followed through
+each run's SYNC.
+
+The report splits the UART upload time into the part that overlapped a
+run (hidden) and the part the TPU sat idle for (the first batch, and any
+upload longer than the run it overlaps). A status poll after each upload
+tells which: still busy means the whole upload was hidden; otherwise
+only the run's length was, taken from its cycle count at the board clock
+(CompletionPredictor.clock_hz).
+
+Usage:
+    stream = DoubleBufferedMatmul(tpu, weights)
+    outputs = stream.run(inputs)                 # inputs: 3 x N
+    print(stream.report()['hidden_fraction'])
+"""
+
+import time
+from typing import Dict, List
+
+import numpy as np
+
+from completion_predictor import CompletionPredictor
+from tpu_coprocessor import TPUCoprocessor
+
+
+class DoubleBufferedMatmul:
+    """
+    weights @ inputs in batches of up to MAX_BATCH columns, uploading the
+    next batch into the idle UB bank while the current one runs.
+    """
+
+    def __init__(self, tpu: TPUCoprocessor, weights: np.ndarray, weight_addr: int = 0,
+                 batch: int = TPUCoprocessor.MAX_BATCH):
+        assert weights.shape == (3, 3), f"Weights must be 3x3, got {weights.shape}"
+        assert 1 <= batch <= TPUCoprocessor.MAX_BATCH, \
+            f"batch must be 1..{TPUCoprocessor.MAX_BATCH}, got {batch}"
+        self.tpu = tpu
+        self.weights = np.asarray(weights)
+        self.weight_addr = weight_addr
+        self.batch = batch
+        self.reset_stats()
+
+    def reset_stats(self) -> None:
+        self.batches = 0
+        self.columns = 0
+        self.upload_time = 0.0      # All input uploads
+        self.hidden_time = 0.0      # Upload time that overlapped a run
+        self.read_time = 0.0        # Result reads
+        self.wall_time = 0.0
+
+    def program(self, count: int) -> List[int]:
+        """matrix_multiply_batch's program with a SYNC before HALT"""
+        enc = self.tpu.encoder
+        program = [enc.load_weights(self.weight_addr + row, 1) for row in range(3)]
+        for col in range(count):
+            program += [enc.load_ub(col, 1), enc.matmul(col, col, 3),
+                        enc.store_ub(TPUCoprocessor.BATCH_OUTPUT_ADDR + col, 1)]
+        program += [enc.sync(), enc.halt()]
+        return program
+
+    def _upload(self, bank: int, columns: np.ndarray) -> float:
+        """Write one batch to words 0.. of `bank`; returns the time it took"""
+        start = time.monotonic()
+        words = np.zeros((columns.shape[1], TPUCoprocessor.UB_WORD_SIZE), dtype=np.int8)
+        words[:, :3] = np.clip(columns, -128, 127).astype(np.int8).T
+        if not self.tpu.write_unified_buffer(bank << 8, words):
+            raise IOError(f"upload to UB bank {bank} was not acknowledged")
+        elapsed = time.monotonic() - start
+        self.upload_time += elapsed
+        return elapsed
+
+    def run(self, inputs: np.ndarray, timeout: float = 2.0) -> np.ndarray:
+        """
+        Compute weights @ inputs (3 x N) batch by batch; returns 3 x N int8.
+
+        Raises:
+            IOError: an upload was not acknowledged, a run did not halt, or
+                a result read came back short
+        """
+        assert inputs.shape[0] == 3, f"Inputs must be 3 x N, got {inputs.shape}"
+        tpu = self.tpu
+        start = time.monotonic()
+        outputs = np.zeros((3, inputs.shape[1]), dtype=np.int8)
+        batches = [inputs[:, i:i + self.batch] for i in range(0, inputs.shape[1], self.batch)]
+        if not batches:
+            return outputs
+        # Uploads interleave with the run, so poll for completion instead
+        # of waiting on a push that could land between an upload's bytes
+        push = tpu.completion_push
+        if push:
+            tpu.set_completion_push(False)
+        try:
+            if not tpu.load_weights(self.weight_addr, tpu.weight_rows(self.weights)):
+                raise IOError(f"weight upload to row {self.weight_addr} failed")
+            if tpu.ub_bank is None:
+                tpu.probe_ub_bank()
+            self._upload(tpu.ub_bank, batches[0])
+            col = 0
+            for i, columns in enumerate(batches):
+                count = columns.shape[1]
+                program = self.program(count)
+                if not tpu.load_program(program):
+                    raise IOError("program upload failed")
+                bank = tpu.ub_bank
+                started = tpu.start_execution()
+                if i + 1 < len(batches):
+                    # The upload starts with the run and overlaps it up to HALT
+                    upload = self._upload(bank ^ 1, batches[i + 1])
+                    if tpu.read_status().is_idle():
+                        # Halted during the upload: the run's cycle count is
+                        # all it could hide
+                        cycles = CompletionPredictor.estimate_cycles(program)
+                        self.hidden_time += min(upload, cycles / tpu.predictor.clock_hz)
+                    else:
+                        self.hidden_time += upload
+                if not tpu.wait_idle(timeout=timeout, started=started):
+                    raise IOError(f"batch {i} did not halt")
+
+                read_start = time.monotonic()
+                results = np.zeros((count, TPUCoprocessor.UB_WORD_SIZE), dtype=np.int8)
+                received = tpu.read_unified_buffer_into(TPUCoprocessor.BATCH_OUTPUT_ADDR, results)
+                self.read_time += time.monotonic() - read_start
+                if received < results.nbytes:
+                    raise IOError(f"batch {i}: result read returned {received} "
+                                  f"of {results.nbytes} bytes")
+                outputs[:, col:col + count] = results[:, :3].T
+                col += count
+                self.batches += 1
+            self.columns += inputs.shape[1]
+            return outputs
+        finally:
+            if push:
+                tpu.set_completion_push(True)
+            self.wall_time += time.monotonic() - start
+
+    def reference(self, inputs: np.ndarray) -> np.ndarray:
+        """Host-side result run() should produce (int8 saturation)"""
+        return np.clip(self.weights @ inputs, -128, 127).astype(np.int8)
+
+    def report(self) -> Dict[str, float]:
+        """UART upload time hidden behind runs, and where the rest of the time went"""
+        return {'batches': self.batches, 'columns': self.columns,
+                'wall_s': self.wall_time,
+                'upload_s': self.upload_time, 'hidden_upload_s': self.hidden_time,
+                'exposed_upload_s': self.upload_time - self.hidden_time,
+                'read_s': self.read_time,
+                'hidden_fraction': self.hidden_time / self.upload_time if self.upload_time else 0.0}
+
+
+def main():
+    """Stream columns through an emulated board with a slow clock"""
+    import argparse
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--port', default='emu://?paced=1')
+    parser.add_argument('--baud', type=int, default=115200)
+    parser.add_argument('--columns', type=int, default=90)
+    parser.add_argument('--run-ms', type=float, default=30.0,
+                        help='Emulated run time of a full batch (emu:// only)')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    weights = rng.integers(-2, 3, (3, 3))
+    inputs = rng.integers(-8, 9, (3, args.columns))
+    tpu = TPUCoprocessor(args.port, args.baud)
+    try:
+        stream = DoubleBufferedMatmul(tpu, weights)
+        if args.port.startswith('emu://'):
+            cycles = CompletionPredictor.estimate_cycles(stream.program(stream.batch))
+            tpu.uart.ser.device.clock_hz = cycles / (args.run_ms / 1000)
+        start = time.perf_counter()
+        for i in range(0, args.columns, stream.batch):
+            tpu.matrix_multiply_batch(weights, inputs[:, i:i + stream.batch])
+        serial = time.perf_counter() - start
+        start = time.perf_counter()
+        outputs = stream.run(inputs)
+        elapsed = time.perf_counter() - start
+        assert np.array_equal(outputs, stream.reference(inputs))
+        report = stream.report()
+    finally:
+        tpu.close()
+    print(f"{args.columns} columns in {report['batches']} batches: "
+          f"{args.columns / serial:.1f} columns/s one bank, "
+          f"{args.columns / elapsed:.1f} columns/s double-buffered")
+    print(f"upload {report['upload_s'] * 1e3:.1f} ms, hidden behind runs "
+          f"{report['hidden_upload_s'] * 1e3:.1f} ms ({report['hidden_fraction']:.0%}), "
+          f"reads {report['read_s'] * 1e3:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+TPU Transports
+==============
+Opens the byte link to a TPU by URL, so the same driver code can talk to
+a board, a remote simulator or an in-process model.
+
+Every backend returns a pyserial-style port (write, read, readinto,
+in_waiting, reset_input_buffer, reset_output_buffer, flush, close,
+timeout, baudrate):
+
+    /dev/ttyUSB1, COM3       Local serial port
+    socket://host:port       Raw TCP: a board host running ser2net, or
+                             `tpu_emulator.py --tcp PORT` on another machine
+    rfc2217://, loop://      Other pyserial URL handlers
+    emu://                   In-process TPUEmulator
+    standin://               In-process UARTStandIn (protocol only, no datapath)
+
+In-process backends have no wire by default, which takes the link out of
+host-stack benchmarks; add ?paced=1 to sleep for each byte's wire time at
+the configured baud rate.
+
+Usage:
+    ser = open_transport('socket://lab-pi:7000', baudrate=115200, timeout=2.0)
+    tpu = TPUCoprocessor('emu://')
+"""
+
+from typing import Optional
+from urllib.parse import parse_qs, urlsplit
+
+import serial
+
+IN_PROCESS_SCHEMES = ('emu', 'standin')
+
+
+def open_transport(url: str, baudrate: int = 115200, timeout: Optional[float] = 2.0):
+    """Open the port named by `url` (a device path or a URL, see module docstring)"""
+    parts = urlsplit(url)
+    if parts.scheme in IN_PROCESS_SCHEMES:
+        # Imported here: the emulator itself imports the driver module
+        from tpu_emulator import EmulatedSerial, TPUEmulator
+        from uart_standin import UARTStandIn
+        options = parse_qs(parts.query)
+        paced = options.get('paced', ['0'])[0].lower() not in ('0', 'false', 'no')
+        device = TPUEmulator() if parts.scheme == 'emu' else UARTStandIn()
+        return EmulatedSerial(device, baudrate, timeout, paced=paced)
+    # pyserial handles plain device paths and its own URL schemes
+    return serial.serial_for_url(url, baudrate=baudrate, timeout=timeout)
+
+
+def is_in_process(ser) -> bool:
+    """True for backends with no real link (no settle delays needed)"""
+    return not hasattr(ser, 'fileno')
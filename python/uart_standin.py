@@ -0,0 +1,429 @@
+#!/usr/bin/env python3
+"""
+UART Stand-In Device
+====================
+Byte-level model of the FPGA side of the UART protocol (rtl/uart_dma_basys3.sv
+plus the memories it writes in rtl/tpu_top.sv), for exercising host code
+without a Basys3 attached.
+
+Layers:
+- UARTStandIn: protocol model with no I/O. feed() takes bytes from the host
+  and returns the bytes the FPGA would send back.
+- PtyStandIn: runs a UARTStandIn behind a pseudo-terminal, paced at the
+  configured baud rate, so unmodified pyserial code can open `.port`.
+- TcpStandIn: the same over TCP; open `.url` (socket://host:port).
+
+Memory map (matches tpu_top.sv):
+- Unified buffer: 2 banks x 128 words x 32 bytes (bank = address bit 8)
+- Weight memory: 256 rows x 8 bytes
+- Instruction memory: 32 x 32-bit words
+
+Usage:
+    with PtyStandIn(baudrate=115200) as dev:
+        tpu = TPUCoprocessor(dev.port)
+"""
+
+import os
+import select
+import socket
+import threading
+import time
+import tty
+from typing import Callable, Dict, Optional, Tuple
+
+# UART command bytes (rtl/uart_dma_basys3.sv)
+CMD_WRITE_UB = 0x01
+CMD_WRITE_WT = 0x02
+CMD_WRITE_INSTR = 0x03
+CMD_READ_UB = 0x04
+CMD_EXECUTE = 0x05
+CMD_READ_STATUS = 0x06
+CMD_WRITE_INSTR_BURST = 0x08
+CMD_CFG_NOTIFY = 0x09
+CMD_EXEC_READ = 0x0A
+CMD_EXEC_QUEUE = 0x0B
+CMD_READ_DEBUG = 0x14
+
+ACK_UB = 0xAA
+ACK_WT = 0xBB
+ACK_INSTR = 0xCC
+ACK_NOTIFY_CFG = 0xDE
+ACK_EXEC_READ = 0xEA  # Zero-length EXEC_READ probe
+ACK_QUEUED = 0xEB  # EXEC_QUEUE start fired at the active run's HALT (also the probe ACK)
+ACK_STARTED_IDLE = 0xEC  # EXEC_QUEUE start fired at once: nothing was running
+QUEUE_PROBE = 0x80
+NOTIFY = 0xDD  # Unsolicited completion push, followed by the status byte
+NOTIFY_ENABLE = 0x80
+NACK = 0xFF
+
+# Status byte: {halt_req, 0, ub_done, ub_busy, vpu_done, vpu_busy, sys_done, sys_busy}
+STATUS_IDLE = 0x20
+STATUS_HALTED = 0xA0
+
+UB_WORD_BYTES = 32
+UB_BANK_DEPTH = 128
+UB_DEPTH = 2 * UB_BANK_DEPTH
+WT_ROW_BYTES = 8
+WT_DEPTH = 256
+INSTR_DEPTH = 32
+
+
+class UARTStandIn:
+    """
+    Sans-IO model of the UART DMA command decoder.
+
+    Bytes may be fed in arbitrary fragments; a command is decoded once all
+    of its bytes are available. Subclasses extend the command table via
+    `_handlers()` and model execution by overriding `execute()`.
+    """
+
+    def __init__(self):
+        self.ub = bytearray(UB_DEPTH * UB_WORD_BYTES)
+        self.weights = bytearray(WT_DEPTH * WT_ROW_BYTES)
+        self.instr = [0] * INSTR_DEPTH
+        self.status = STATUS_IDLE
+        self.notify = False  # CFG_NOTIFY: push 0xDD + status at HALT
+        self.rx_count = 0
+        self.tx_count = 0
+        self.last_rx = 0
+        self._rx = bytearray()
+        self._table = self._handlers()
+
+    # -------------------------------------------------------------------------
+    # Host-facing interface
+    # -------------------------------------------------------------------------
+
+    def feed(self, data: bytes) -> bytes:
+        """Consume host bytes, return the device's response bytes"""
+        if data:
+            self.rx_count += len(data)
+            self.last_rx = data[-1]
+            self._rx += data
+        out = bytearray()
+        while self._rx:
+            entry = self._table.get(self._rx[0])
+            if entry is None:
+                # Unrecognized command: RTL answers 0xFF and stays in IDLE
+                del self._rx[0]
+                out.append(NACK)
+                continue
+            size, handler = entry
+            needed = size(self._rx)
+            if needed is None or len(self._rx) < needed:
+                break
+            frame = bytes(self._rx[:needed])
+            del self._rx[:needed]
+            out += handler(frame)
+        self.tx_count += len(out)
+        return bytes(out)
+
+    def execute(self, pc: int = 0) -> bool:
+        """Run the loaded program from `pc` (no datapath here: halt immediately)"""
+        self.status = STATUS_HALTED
+        return True
+
+    # -------------------------------------------------------------------------
+    # Memory helpers
+    # -------------------------------------------------------------------------
+
+    def ub_word(self, addr: int) -> bytes:
+        base = (addr % UB_DEPTH) * UB_WORD_BYTES
+        return bytes(self.ub[base:base + UB_WORD_BYTES])
+
+    def set_ub_word(self, addr: int, data: bytes) -> None:
+        base = (addr % UB_DEPTH) * UB_WORD_BYTES
+        self.ub[base:base + UB_WORD_BYTES] = bytes(data).ljust(UB_WORD_BYTES, b'\x00')[:UB_WORD_BYTES]
+
+    def weight_row(self, addr: int) -> bytes:
+        base = (addr % WT_DEPTH) * WT_ROW_BYTES
+        return bytes(self.weights[base:base + WT_ROW_BYTES])
+
+    # -------------------------------------------------------------------------
+    # Command decoding
+    # -------------------------------------------------------------------------
+
+    def _handlers(self) -> Dict[int, Tuple[Callable[[bytearray], Optional[int]],
+                                           Callable[[bytes], bytes]]]:
+        """Map command byte -> (frame size from buffered bytes, handler)"""
+        return {
+            CMD_WRITE_UB:    (self._size_with_payload, self._write_ub),
+            CMD_WRITE_WT:    (self._size_with_payload, self._write_wt),
+            CMD_WRITE_INSTR: (lambda rx: 7, self._write_instr),
+            CMD_READ_UB:     (lambda rx: 5, self._read_ub),
+            CMD_EXECUTE:     (lambda rx: 1, self._execute),
+            CMD_READ_STATUS: (lambda rx: 1, self._read_status),
+            CMD_WRITE_INSTR_BURST: (self._size_instr_burst, self._write_instr_burst),
+            CMD_CFG_NOTIFY:  (lambda rx: 3, self._cfg_notify),
+            CMD_EXEC_READ:   (lambda rx: 5, self._exec_read),
+            CMD_EXEC_QUEUE:  (lambda rx: 3, self._exec_queue),
+            CMD_READ_DEBUG:  (lambda rx: 1, self._read_debug),
+        }
+
+    @staticmethod
+    def _size_with_payload(rx: bytearray) -> Optional[int]:
+        """5-byte header followed by `length` data bytes (at least one)"""
+        if len(rx) < 5:
+            return None
+        length = (rx[3] << 8) | rx[4]
+        return 5 + max(length, 1)
+
+    @staticmethod
+    def _size_instr_burst(rx: bytearray) -> Optional[int]:
+        """5-byte header followed by `count` 4-byte instructions"""
+        if len(rx) < 5:
+            return None
+        return 5 + 4 * ((rx[3] << 8) | rx[4])
+
+    @staticmethod
+    def _header(frame: bytes) -> Tuple[int, int]:
+        addr = (frame[1] << 8) | frame[2]
+        length = (frame[3] << 8) | frame[4]
+        return addr, length
+
+    @staticmethod
+    def _uart_ub_addr(addr: int) -> int:
+        # addr_hi[0] selects the bank, addr_lo the word within it
+        return ((addr >> 8) & 1) * UB_BANK_DEPTH + addr % UB_BANK_DEPTH
+
+    def _write_ub(self, frame: bytes) -> bytes:
+        addr, _ = self._header(frame)
+        payload = frame[5:]
+        # Bursts auto-increment; a short last word is zero-filled
+        for offset in range(0, len(payload), UB_WORD_BYTES):
+            self.set_ub_word(self._uart_ub_addr(addr), payload[offset:offset + UB_WORD_BYTES])
+            addr += 1
+        return bytes([ACK_UB])
+
+    def _write_wt(self, frame: bytes) -> bytes:
+        addr, _ = self._header(frame)
+        payload = frame[5:]
+        for offset in range(0, len(payload), WT_ROW_BYTES):
+            row = payload[offset:offset + WT_ROW_BYTES].ljust(WT_ROW_BYTES, b'\x00')
+            base = (addr % WT_DEPTH) * WT_ROW_BYTES
+            self.weights[base:base + WT_ROW_BYTES] = row
+            addr += 1
+        return bytes([ACK_WT])
+
+    def _write_instr(self, frame: bytes) -> bytes:
+        self.instr[frame[2] & 0x1F] = int.from_bytes(frame[3:7], 'big')
+        return b''
+
+    def _write_instr_burst(self, frame: bytes) -> bytes:
+        addr, count = self._header(frame)
+        payload = frame[5:]
+        for i in range(count):
+            self.instr[(addr + i) & 0x1F] = int.from_bytes(payload[4 * i:4 * i + 4], 'big')
+        return bytes([ACK_INSTR, sum(payload) & 0xFF])
+
+    def _read_ub(self, frame: bytes) -> bytes:
+        addr, length = self._header(frame)
+        # Bursts stream consecutive words
+        words = -(-length // UB_WORD_BYTES)
+        data = b''.join(self.ub_word(self._uart_ub_addr(addr + i)) for i in range(words))
+        return data[:length]
+
+    def _cfg_notify(self, frame: bytes) -> bytes:
+        self.notify = bool(frame[2] & NOTIFY_ENABLE)
+        return bytes([ACK_NOTIFY_CFG])
+
+    def _execute(self, frame: bytes) -> bytes:
+        # execute() returns False when the start pulse is ignored (still running)
+        if self.execute() and self.notify and self._halted():
+            self._wait_for_halt()
+            return bytes([NOTIFY, self.status])
+        return b''
+
+    def _exec_read(self, frame: bytes) -> bytes:
+        _, length = self._header(frame)
+        if length == 0:
+            return bytes([ACK_EXEC_READ])
+        self.execute()
+        if not self._halted():
+            return b''  # Never halts: the RTL waits until a host byte aborts
+        self._wait_for_halt()
+        return self._read_ub(frame)
+
+    def _exec_queue(self, frame: bytes) -> bytes:
+        if frame[1] & QUEUE_PROBE:
+            return bytes([ACK_QUEUED])
+        behind = self._running()
+        if behind:
+            if not self._halted():
+                return b''  # Never halts: the start stays queued until reset
+            # The start fires at HALT; the push for that HALT is replaced by the ACK
+            self._wait_for_halt()
+        self.execute(frame[2] & (INSTR_DEPTH - 1))
+        return bytes([ACK_QUEUED if behind else ACK_STARTED_IDLE])
+
+    def _running(self) -> bool:
+        """A started run has not reached HALT yet (runs are instant here)"""
+        return False
+
+    def _halted(self) -> bool:
+        return (self.status & STATUS_HALTED) == STATUS_HALTED
+
+    def _wait_for_halt(self) -> None:
+        """Block until the running program reaches HALT (no run time modelled here)"""
+
+    def _read_status(self, frame: bytes) -> bytes:
+        return bytes([self.status])
+
+    def _read_debug(self, frame: bytes) -> bytes:
+        return (bytes([0])
+                + (self.rx_count & 0xFFFFFFFF).to_bytes(4, 'little')
+                + (self.tx_count & 0xFFFFFFFF).to_bytes(4, 'little')
+                + bytes([self.last_rx]))
+
+
+class _PacedServer:
+    """
+    Serve a UARTStandIn over a byte stream, paced like a UART link.
+
+    Host bytes are delivered to the model only after the time they would
+    take on the wire (10 bit times per byte at `baudrate`), and responses
+    are released at the same rate, so host-side timing behaves like a
+    real UART link. Subclasses provide the stream (_accept/_close).
+    """
+
+    def __init__(self, device: Optional[UARTStandIn] = None, baudrate: int = 115200):
+        self.device = device if device is not None else UARTStandIn()
+        self.baudrate = baudrate
+        self.byte_time = 10.0 / baudrate
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+        self._close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def _wire_delay(self, nbytes: int, free_at: float) -> float:
+        """Sleep until `nbytes` have crossed the wire; return new free time"""
+        done = max(time.monotonic(), free_at) + nbytes * self.byte_time
+        delay = done - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        return done
+
+    def _run(self) -> None:
+        while self._running:
+            fd = self._accept()
+            if fd is not None:
+                self._serve(fd)
+
+    def _accept(self) -> Optional[int]:
+        """Return the fd of the next host connection (None to poll again)"""
+        raise NotImplementedError
+
+    def _disconnect(self, fd: int) -> bool:
+        """Host closed the stream; return True to wait for a new connection"""
+        return False
+
+    def _close(self) -> None:
+        raise NotImplementedError
+
+    def _serve(self, fd: int) -> None:
+        rx_free = tx_free = 0.0
+        while self._running:
+            try:
+                ready, _, _ = select.select([fd], [], [], 0.05)
+            except (OSError, ValueError):
+                break
+            if not ready:
+                continue
+            try:
+                data = os.read(fd, 4096)
+            except OSError:
+                break
+            if not data:
+                if self._disconnect(fd):
+                    break
+                continue
+            rx_free = self._wire_delay(len(data), rx_free)
+            response = self.device.feed(data)
+            if response:
+                tx_free = self._wire_delay(len(response), max(tx_free, rx_free))
+                try:
+                    os.write(fd, response)
+                except OSError:
+                    break
+
+
+class PtyStandIn(_PacedServer):
+    """
+    Serve a UARTStandIn on a pseudo-terminal.
+
+    `.port` is the slave device path for serial.Serial().
+    """
+
+    def __init__(self, device: Optional[UARTStandIn] = None, baudrate: int = 115200):
+        super().__init__(device, baudrate)
+        self._master, self._slave = os.openpty()
+        tty.setraw(self._slave)
+        self.port = os.ttyname(self._slave)
+
+    def _run(self) -> None:
+        self._serve(self._master)
+
+    def _close(self) -> None:
+        for fd in (self._master, self._slave):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+
+class TcpStandIn(_PacedServer):
+    """
+    Serve a UARTStandIn on a TCP port, one host connection at a time.
+
+    `.url` is the matching pyserial socket:// URL (port 0 picks a free
+    port), so a remote simulator is reached exactly like a board host.
+    """
+
+    def __init__(self, device: Optional[UARTStandIn] = None, baudrate: int = 115200,
+                 host: str = '127.0.0.1', port: int = 0):
+        super().__init__(device, baudrate)
+        self._listener = socket.create_server((host, port))
+        self.host, self.tcp_port = self._listener.getsockname()[:2]
+        self.url = f"socket://{self.host}:{self.tcp_port}"
+        self._conn = None
+
+    def _accept(self) -> Optional[int]:
+        try:
+            ready, _, _ = select.select([self._listener], [], [], 0.05)
+            if not ready:
+                return None
+            self._conn, _ = self._listener.accept()
+        except OSError:
+            self._running = False
+            return None
+        self._conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return self._conn.fileno()
+
+    def _disconnect(self, fd: int) -> bool:
+        self._conn.close()
+        self._conn = None
+        return True
+
+    def _close(self) -> None:
+        for sock in (self._conn, self._listener):
+            if sock is not None:
+                try:
+                    sock.close()
+                except OSError:
+                    pass
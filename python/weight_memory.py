@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+Weight Memory Residency
+=======================
+Host-side bookkeeping for the FPGA weight memory (rtl/tpu_top.sv
+weight_memory: 256 rows x 64 bits), so drivers only send WRITE_WT
+traffic for rows that are not already on the board.
+
+- WeightMemoryShadow mirrors the row contents and indexes uploaded tiles
+  (a tensor's consecutive rows) by content hash. A tile that is already
+  resident costs one dict lookup and no UART bytes.
+- WeightPager maps logical weight tiles (more than fit on chip) onto
+  fixed-size physical slots, evicting least recently used tiles, or the
+  tile needed furthest in the future when the access schedule is known.
+
+Usage:
+    pager = WeightPager(tpu, tile_rows=3)
+    pager.register('fc1', w1_rows)
+    addr = pager.acquire('fc1')    # uploads only on a miss
+"""
+
+import hashlib
+from collections import OrderedDict
+from typing import Dict, Hashable, List, Optional, Sequence, Tuple
+
+WEIGHT_DEPTH = 256
+WEIGHT_ROW_BYTES = 8
+
+
+def pad_row(row) -> bytes:
+    """Normalize a weight row to exactly WEIGHT_ROW_BYTES bytes"""
+    return bytes(row).ljust(WEIGHT_ROW_BYTES, b'\x00')[:WEIGHT_ROW_BYTES]
+
+
+def tile_digest(rows: List[bytes]) -> bytes:
+    """Content hash of a tile (padded rows)"""
+    return hashlib.blake2b(b''.join(rows), digest_size=16).digest()
+
+
+class WeightMemoryShadow:
+    """
+    Host copy of the 256-row weight memory.
+
+    `rows` holds what each address contains (None when unknown). `tiles`
+    maps the start address of each uploaded tile to (digest, row count);
+    a write that overlaps a tile drops its entry. Counters:
+    hits/misses per tile load, rows_sent/rows_skipped per row.
+    """
+
+    DEPTH = WEIGHT_DEPTH
+
+    def __init__(self):
+        self.rows: List[Optional[bytes]] = [None] * self.DEPTH
+        self.tiles: Dict[int, Tuple[bytes, int]] = {}
+        self.stats = {'hits': 0, 'misses': 0, 'rows_sent': 0, 'rows_skipped': 0}
+
+    def is_resident(self, addr: int, rows: List[bytes]) -> bool:
+        """True if the exact tile is already loaded at `addr`"""
+        return self.tiles.get(addr) == (tile_digest(rows), len(rows))
+
+    def locate(self, rows: List[bytes]) -> Optional[int]:
+        """Start address of a resident copy of this tile, if any"""
+        key = (tile_digest(rows), len(rows))
+        for addr, entry in self.tiles.items():
+            if entry == key:
+                return addr
+        return None
+
+    def changed_runs(self, addr: int, rows: List[bytes]) -> List[Tuple[int, List[bytes]]]:
+        """
+        Return (addr, rows) runs that differ from the shadow and must be
+        written; an empty list means the tile is already resident.
+        """
+        rows = [pad_row(r) for r in rows]
+        if self.is_resident(addr, rows):
+            self.stats['hits'] += 1
+            self.stats['rows_skipped'] += len(rows)
+            return []
+        self.stats['misses'] += 1
+        runs = []
+        for offset, row in enumerate(rows):
+            row_addr = addr + offset
+            if self.rows[row_addr] == row:
+                self.stats['rows_skipped'] += 1
+            elif runs and runs[-1][0] + len(runs[-1][1]) == row_addr:
+                runs[-1][1].append(row)
+            else:
+                runs.append((row_addr, [row]))
+        for _, run in runs:
+            self.stats['rows_sent'] += len(run)
+        return runs
+
+    def update(self, addr: int, rows: List[bytes]) -> None:
+        """Record that [addr, addr+len) now holds `rows` as one tile"""
+        rows = [pad_row(r) for r in rows]
+        self._drop_tiles(addr, len(rows))
+        self.rows[addr:addr + len(rows)] = rows
+        self.tiles[addr] = (tile_digest(rows), len(rows))
+
+    def invalidate(self, addr: int = 0, count: int = WEIGHT_DEPTH) -> None:
+        """Forget the contents of [addr, addr+count) (all by default)"""
+        for row_addr in range(addr, min(addr + count, self.DEPTH)):
+            self.rows[row_addr] = None
+        self._drop_tiles(addr, count)
+
+    def hit_rate(self) -> float:
+        total = self.stats['hits'] + self.stats['misses']
+        return self.stats['hits'] / total if total else 0.0
+
+    def _drop_tiles(self, addr: int, count: int) -> None:
+        for start, (_, length) in list(self.tiles.items()):
+            if start < addr + count and addr < start + length:
+                del self.tiles[start]
+
+
+class WeightPager:
+    """
+    Page logical weight tiles through the physical weight memory.
+
+    Physical rows [base, base + slots * tile_rows) are split into slots of
+    `tile_rows` rows. acquire() returns the slot address of a tile,
+    uploading it through `tpu.load_weights` on a miss (rows that happen
+    to match the slot's old contents are still skipped by the shadow).
+
+    Eviction is LRU unless a schedule (the order tiles will be acquired
+    in) is set, in which case the tile whose next use is furthest away is
+    evicted (Belady); tiles off the schedule go first, LRU among them.
+    Hits are checked against the driver's weight shadow, so a tile whose
+    rows were overwritten or forgotten behind the pager's back is reloaded.
+    """
+
+    def __init__(self, tpu, tile_rows: int = 3, base: int = 0,
+                 slots: Optional[int] = None):
+        if slots is None:
+            slots = (WEIGHT_DEPTH - base) // tile_rows
+        if slots < 1 or base + slots * tile_rows > WEIGHT_DEPTH:
+            raise ValueError(f"{slots} slots of {tile_rows} rows from {base} "
+                             f"do not fit in {WEIGHT_DEPTH} rows")
+        self.tpu = tpu
+        self.tile_rows = tile_rows
+        self.base = base
+        self.slots = slots
+        self._tiles: Dict[Hashable, List[bytes]] = {}
+        self._resident: 'OrderedDict[Hashable, int]' = OrderedDict()  # key -> slot, LRU first
+        self._free = list(range(slots - 1, -1, -1))
+        self._schedule: List[Hashable] = []
+        self._position = 0
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'bytes_sent': 0}
+
+    def register(self, key: Hashable, rows: Sequence[bytes]) -> None:
+        """Define (or replace) the contents of logical tile `key`"""
+        if len(rows) > self.tile_rows:
+            raise ValueError(f"tile {key!r} has {len(rows)} rows, slots hold {self.tile_rows}")
+        self._tiles[key] = [pad_row(r) for r in rows]
+        if key in self._resident:
+            # Contents changed: reload on next acquire
+            self._free.append(self._resident.pop(key))
+
+    def set_schedule(self, keys: Sequence[Hashable]) -> None:
+        """Declare the upcoming acquire() order for schedule-aware eviction"""
+        self._schedule = list(keys)
+        self._position = 0
+
+    def acquire(self, key: Hashable) -> int:
+        """Make tile `key` resident and return its weight memory address"""
+        if key not in self._tiles:
+            raise KeyError(f"tile {key!r} is not registered")
+        if self._position < len(self._schedule) and self._schedule[self._position] == key:
+            self._position += 1
+        rows = self._tiles[key]
+        slot = self._resident.pop(key, None)
+        if slot is not None and self.tpu.weight_cache.is_resident(self.address(slot), rows):
+            self.stats['hits'] += 1
+            self._resident[key] = slot  # Most recently used
+            return self.address(slot)
+
+        # Not resident, or its rows were overwritten or forgotten since
+        # (invalidate_weight_cache, raw writes): reload into the same slot
+        self.stats['misses'] += 1
+        if slot is None:
+            slot = self._free.pop() if self._free else self._evict()
+        addr = self.address(slot)
+        sent_before = self.tpu.weight_cache.stats['rows_sent']
+        ok = self.tpu.load_weights(addr, rows)
+        self.stats['bytes_sent'] += (self.tpu.weight_cache.stats['rows_sent']
+                                     - sent_before) * WEIGHT_ROW_BYTES
+        if not ok:
+            self._free.append(slot)
+            raise IOError(f"weight upload for tile {key!r} at row {addr} failed")
+        self._resident[key] = slot
+        return addr
+
+    def address(self, slot: int) -> int:
+        return self.base + slot * self.tile_rows
+
+    def resident(self) -> List[Hashable]:
+        """Resident tile keys, least recently used first"""
+        return list(self._resident)
+
+    def invalidate(self) -> None:
+        """Forget all residency (board reset or reprogrammed)"""
+        self._free = list(range(self.slots - 1, -1, -1))
+        self._resident.clear()
+
+    def hit_rate(self) -> float:
+        total = self.stats['hits'] + self.stats['misses']
+        return self.stats['hits'] / total if total else 0.0
+
+    def _evict(self) -> int:
+        upcoming = self._schedule[self._position:]
+        if upcoming:
+            next_use = {}
+            for distance, key in enumerate(upcoming):
+                next_use.setdefault(key, distance)
+            # Furthest next use wins; never-used-again counts as infinite.
+            # max() keeps the first (least recently used) key on ties.
+            victim = max(self._resident,
+                         key=lambda k: next_use.get(k, len(upcoming)))
+        else:
+            victim = next(iter(self._resident))
+        self.stats['evictions'] += 1
+        return self._resident.pop(victim)
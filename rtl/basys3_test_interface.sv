@@ -40,6 +40,7 @@ module basys3_test_interface (
     output logic [31:0] instr_wr_data,
 
     output logic        start_execution,
+    output logic [4:0]  start_pc,
 
     // From TPU Core (status)
     input  logic        sys_busy,
@@ -427,6 +428,7 @@ logic uart_instr_wr_en;
 logic [4:0] uart_instr_wr_addr;
 logic [31:0] uart_instr_wr_data;
 logic uart_start_execution;
+logic [4:0] uart_start_pc;
 
 // UART Debug signals
 logic [7:0] uart_debug_state;
@@ -460,6 +462,7 @@ uart_dma_basys3 uart_dma (
     .instr_wr_addr(uart_instr_wr_addr),
     .instr_wr_data(uart_instr_wr_data),
     .start_execution(uart_start_execution),
+    .start_pc(uart_start_pc),
     .sys_busy(sys_busy),
     .sys_done(sys_done),
     .vpu_busy(vpu_busy),
@@ -531,5 +534,6 @@ assign instr_wr_addr = uart_active ? uart_instr_wr_addr : phys_instr_wr_addr;
 assign instr_wr_data = uart_active ? uart_instr_wr_data : phys_instr_wr_data;
 
 assign start_execution = uart_active ? uart_start_execution : phys_start_execution;
+assign start_pc = uart_active ? uart_start_pc : 5'd0;  // Buttons always start at PC 0
 
 endmodule
@@ -1,7 +1,8 @@
 module tpu_controller (
     input  logic        clk,
     input  logic        rst_n,
-    input  logic        start_execution, // Start signal (resets PC)
+    input  logic        start_execution, // Start signal (loads PC from start_pc)
+    input  logic [7:0]  start_pc,        // First PC of the run (0 except for queued segments)
 
     // Instruction memory interface
     output logic [7:0]  instr_addr,      // PC
@@ -220,14 +221,16 @@ module tpu_controller (
             else micro_cnt <= micro_cnt + 1'b1;
 
             // PC Management
-            if (start_execution && state == S_RESET) begin
-                pc <= 8'h00;
+            if (start_execution && (state == S_RESET || state == S_HALT)) begin
+                pc <= start_pc;
             end else if (pc_inc) begin
                 pc <= pc + 1'b1;
             end
 
-            // SYNC Buffer Toggling (only when buffers are idle)
-            if (state == S_SYNC && micro_cnt == 0 && !ub_busy && !wt_busy) begin
+            // SYNC Buffer Toggling (only when buffers are idle). S_SYNC leaves
+            // on the first idle cycle, so this toggles once even if a UART
+            // write kept the UB busy when SYNC was entered
+            if (state == S_SYNC && !ub_busy && !wt_busy) begin
                 cur_acc_buf_sel <= ~cur_acc_buf_sel;
                 cur_ub_bank_sel <= ~cur_ub_bank_sel;
             end
@@ -575,7 +578,7 @@ module tpu_controller (
 
             // ---------------------------------------------------------------------
             S_SYNC: begin
-                // Toggle buffers (Happens in sequential block on cnt==0)
+                // Toggle buffers (Happens in sequential block on the first idle cycle)
                 // Only toggle if buffers are idle (checked in sequential block)
                 if (micro_cnt == 0 && !ub_busy && !wt_busy) begin
                     // Toggle happens in sequential block
@@ -597,7 +600,11 @@ module tpu_controller (
             // ---------------------------------------------------------------------
             S_HALT: begin
                 halt_req = 1'b1;
-                next_state = S_HALT; // Trap here
+                // Hold until the host starts the next run (PC reset above)
+                if (start_execution) begin
+                    next_state = S_FETCH;
+                    reset_micro_cnt = 1'b1;
+                end
             end
 
         endcase
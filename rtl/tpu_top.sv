@@ -153,6 +153,7 @@ logic        test_instr_wr_en;
 logic [4:0]  test_instr_wr_addr;
 logic [31:0] test_instr_wr_data;
 logic        test_start_execution;
+logic [4:0]  test_start_pc;    // First PC of a UART-started run (queued segments)
 
 // =============================================================================
 // DMA CONTROL SIGNALS (LEGACY)
@@ -237,6 +238,7 @@ tpu_controller controller (
     .clk            (clk),
     .rst_n          (rst_n),
     .start_execution(test_start_execution),  // CRITICAL: Connect start signal from UART/buttons
+    .start_pc       ({3'b000, test_start_pc}),
 
     // Instruction interface
     .instr_addr     (instr_addr),
@@ -368,6 +370,7 @@ basys3_test_interface test_interface (
 
     // To Controller
     .start_execution    (test_start_execution),
+    .start_pc           (test_start_pc),
 
     // From Datapath (status)
     .sys_busy           (sys_busy),
@@ -485,18 +488,51 @@ assign use_test_interface = test_ub_wr_en | test_ub_rd_en | test_wt_wr_en | test
 
 // NEW: UB mux control - ONLY depends on UB read/write enables
 // This allows controller to write to UB even when test_instr_wr_en is high
-assign use_test_interface_ub = test_ub_wr_en | test_ub_rd_en;
-
-// Unified Buffer connections (TEST INTERFACE takes priority for programming, otherwise CONTROLLER)
-// When controller writes (ST_UB instruction), use accumulator output; when UART writes, use test data
-// CRITICAL FIX: Use use_test_interface_ub instead of use_test_interface
-assign ub_wr_data = use_test_interface_ub ? test_ub_wr_data : acc_data_out;
-assign ub_wr_en = use_test_interface_ub ? test_ub_wr_en : ctrl_ub_wr_en;
-assign ub_rd_en = use_test_interface_ub ? test_ub_rd_en : ctrl_ub_rd_en;
-assign ub_wr_addr = use_test_interface_ub ? {1'b0, test_ub_wr_addr[7:0]} : ctrl_ub_wr_addr;  // UART always uses bank 0
-assign ub_rd_addr = use_test_interface_ub ? {1'b0, test_ub_rd_addr[7:0]} : ctrl_ub_rd_addr;  // UART always uses bank 0
-assign ub_wr_count = use_test_interface_ub ? test_ub_wr_count : ctrl_ub_wr_count;
-assign ub_rd_count = use_test_interface_ub ? test_ub_rd_count : ctrl_ub_rd_count;
+assign use_test_interface_ub = test_ub_wr_en | test_ub_rd_en;  // Debug visibility only
+
+// Unified Buffer connections. The read and write ports are muxed separately
+// so the host can stream the next batch into one bank over UART while a
+// program reads the other (LD_UB/MATMUL use {cur_ub_bank_sel, addr}; the
+// UART addresses a bank with bit 8 of its address, i.e. addr_hi[0]).
+// UART reads take priority on the read port (the host only reads after HALT).
+// On the write port the controller keeps priority: a UART word write that
+// lands in the same cycle as an ST_UB/VPU write is held
+// until that write ends (controller writes last a few cycles; UART words arrive
+// thousands of cycles apart, so one holding register is enough).
+logic         uart_wr_pending;
+logic [8:0]   uart_wr_pending_addr;
+logic [8:0]   uart_wr_pending_count;
+logic [255:0] uart_wr_pending_data;
+logic         use_test_ub_wr;
+
+always_ff @(posedge clk or negedge rst_n) begin
+    if (!rst_n) begin
+        uart_wr_pending       <= 1'b0;
+        uart_wr_pending_addr  <= 9'h000;
+        uart_wr_pending_count <= 9'h000;
+        uart_wr_pending_data  <= 256'h0;
+    end else if (test_ub_wr_en && ctrl_ub_wr_en) begin
+        uart_wr_pending       <= 1'b1;
+        uart_wr_pending_addr  <= test_ub_wr_addr;
+        uart_wr_pending_count <= test_ub_wr_count;
+        uart_wr_pending_data  <= test_ub_wr_data;
+    end else if (!ctrl_ub_wr_en) begin
+        uart_wr_pending <= 1'b0;
+    end
+end
+
+assign use_test_ub_wr = (test_ub_wr_en || uart_wr_pending) && !ctrl_ub_wr_en;
+
+assign ub_wr_en    = use_test_ub_wr | ctrl_ub_wr_en;
+assign ub_wr_data  = !use_test_ub_wr ? acc_data_out :
+                     uart_wr_pending ? uart_wr_pending_data : test_ub_wr_data;
+assign ub_wr_addr  = !use_test_ub_wr ? ctrl_ub_wr_addr :
+                     uart_wr_pending ? uart_wr_pending_addr : test_ub_wr_addr;
+assign ub_wr_count = !use_test_ub_wr ? ctrl_ub_wr_count :
+                     uart_wr_pending ? uart_wr_pending_count : test_ub_wr_count;
+assign ub_rd_en    = test_ub_rd_en ? 1'b1 : ctrl_ub_rd_en;
+assign ub_rd_addr  = test_ub_rd_en ? test_ub_rd_addr : ctrl_ub_rd_addr;
+assign ub_rd_count = test_ub_rd_en ? test_ub_rd_count : ctrl_ub_rd_count;
 
 // Weight FIFO data (from TEST INTERFACE or legacy DMA)
 // Weight data comes from weight memory during RD_WEIGHT execution
@@ -541,7 +577,7 @@ assign hazard_detected = pipeline_stall;
 // [2]   = ub_wr_en (write enable)
 // [1]   = test_ub_rd_en (UART read enable)
 // [0]   = test_ub_wr_en (UART write enable)
-// Note: UART always uses bank 0, controller uses ctrl_ub_buf_sel in address bit 8
+// Note: UART selects the bank with addr_hi[0], controller with cur_ub_bank_sel (address bit 8)
 assign debug_bank_state = {
     use_test_interface_ub,  // UPDATED: use UB-specific mux signal
     ub_rd_addr[8],
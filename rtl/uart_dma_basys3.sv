@@ -34,6 +34,7 @@ module uart_dma_basys3 #(
 
     // To Controller
     output logic        start_execution, // Pulse to start
+    output logic [4:0]  start_pc,        // First PC of the run (0 unless queued by cmd 0x0B)
 
     // From Datapath (status)
     input logic        sys_busy,
@@ -137,6 +138,10 @@ localparam WRITE_INSTR    = 8'd8;
 localparam READ_UB        = 8'd9;
 localparam SEND_STATUS    = 8'd10;
 localparam EXECUTE        = 8'd11;
+localparam WRITE_INSTR_BURST = 8'd12;  // Burst instruction upload (cmd 0x08)
+localparam SEND_INSTR_ACK = 8'd13;     // 0xCC + checksum after a burst upload
+localparam SEND_NOTIFY    = 8'd14;     // Completion push: 0xDD + status (enabled by cmd 0x09)
+localparam EXEC_WAIT      = 8'd15;     // Fused execute-and-read (cmd 0x0A): wait for HALT
 localparam READ_DEBUG     = 8'd20;  // Debug command to read debug counters
 
 logic [7:0] state;
@@ -151,6 +156,35 @@ logic [4:0] byte_index;  // For building up 32-byte writes
 logic [255:0] ub_buffer;
 logic [63:0]  wt_buffer;
 logic [31:0]  instr_buffer;
+logic [7:0]   instr_checksum;  // 8-bit sum of burst instruction bytes
+
+// Completion push (cmd 0x09): on a rising edge of halt_req, send 0xDD and
+// the status byte unprompted, so the host need not poll READ_STATUS
+logic         notify_en;
+logic         notify_pending;
+logic         halt_req_prev;
+
+// Fused execute-and-read (cmd 0x0A): set once halt_req has dropped after
+// the start pulse, so the HALT of the previous run is not mistaken for ours
+logic         exec_armed;
+
+// Queued start (cmd 0x0B): a start at queue_pc that fires when the run
+// the UART started reaches HALT, so the next program segment starts
+// without waiting for the host. run_active covers runs started over the
+// UART (EXECUTE, EXEC_READ, queued) until their HALT's rising edge
+logic         run_active;
+logic         queue_pending;
+logic [4:0]   queue_pc;
+logic         queue_behind;       // Armed while a run was active (back-to-back start)
+logic         queue_ack_pending;  // 0xEB/0xEC owed to the host once the start fired
+logic [7:0]   queue_ack_byte;     // Latched when the start fires
+
+// Single-byte command responses (ACK/NACK): latched where the command
+// completes and sent once TX is free, so a response that falls due while
+// the previous byte is still shifting out is not dropped
+logic         resp_pending;
+logic [7:0]   resp_byte;
+logic         resp_sent;          // tx_valid carries a latched response (accepted this edge)
 
 // Read buffer for sending data back
 logic [255:0] read_buffer;
@@ -187,7 +221,22 @@ always @(posedge clk or negedge rst_n) begin
         ub_rd_count <= 9'h0;
         wt_wr_en <= 1'b0;
         instr_wr_en <= 1'b0;
+        instr_checksum <= 8'h00;
+        notify_en <= 1'b0;
+        notify_pending <= 1'b0;
+        halt_req_prev <= 1'b0;
+        exec_armed <= 1'b0;
+        run_active <= 1'b0;
+        queue_pending <= 1'b0;
+        queue_pc <= 5'd0;
+        queue_behind <= 1'b0;
+        queue_ack_pending <= 1'b0;
+        queue_ack_byte <= 8'h00;
+        resp_pending <= 1'b0;
+        resp_byte <= 8'h00;
+        resp_sent <= 1'b0;
         start_execution <= 1'b0;
+        start_pc <= 5'd0;
         
         read_buffer <= 256'h0;
         read_index <= 8'h0;
@@ -249,6 +298,13 @@ always @(posedge clk or negedge rst_n) begin
             debug_state_changes <= debug_state_changes + 1;
         end
 
+        // Latch completion; it is sent from IDLE once TX is free. A HALT
+        // that fires a queued start is answered by that start's ACK instead
+        halt_req_prev <= halt_req;
+        if (notify_en && halt_req && !halt_req_prev && !queue_pending) begin
+            notify_pending <= 1'b1;
+        end
+
         // Track TX events
         if (tx_valid && tx_ready) begin
             debug_tx_count <= debug_tx_count + 1;
@@ -265,6 +321,22 @@ always @(posedge clk or negedge rst_n) begin
             ub_rd_en <= 1'b0;
         end
         start_execution <= 1'b0;
+
+        // Queued start: fire the cycle after the active run's HALT (or at
+        // once if none is active); the ACK goes out from IDLE. 0xEB if it
+        // waited for a HALT, 0xEC if nothing was running (the TPU sat idle
+        // until the command). A start never overwrites an unsent ACK
+        if (halt_req && !halt_req_prev) begin
+            run_active <= 1'b0;
+        end
+        if (queue_pending && !run_active && !queue_ack_pending) begin
+            start_execution <= 1'b1;
+            start_pc <= queue_pc;
+            run_active <= 1'b1;
+            queue_pending <= 1'b0;
+            queue_ack_pending <= 1'b1;
+            queue_ack_byte <= queue_behind ? 8'hEB : 8'hEC;
+        end
         // Don't clear tx_valid here - let each state manage it
         // tx_valid should stay high until tx_ready is true and byte is accepted
 
@@ -280,9 +352,11 @@ always @(posedge clk or negedge rst_n) begin
                 // Clear tx_valid when idle (unless we're sending error response)
                 tx_valid <= 1'b0;
 
-                // Only process rx_valid on rising edge to avoid processing same byte multiple times
-                // But only if TX is ready (not busy transmitting previous response)
-                if (rx_valid && !rx_valid_prev && !rx_framing_error && tx_ready) begin
+                // Only process rx_valid on rising edge to avoid processing same byte multiple times.
+                // Do not gate on tx_ready: a pipelining host sends the next command while the
+                // previous ACK is still shifting out, and RX has no buffer to hold the byte.
+                // Single-byte responses are latched in resp_pending and sent once TX is free.
+                if (rx_valid && !rx_valid_prev && !rx_framing_error) begin
                     command <= rx_data;
                     byte_count <= 16'h0000;
                     byte_index <= 5'd0;
@@ -291,21 +365,28 @@ always @(posedge clk or negedge rst_n) begin
                         8'h01: state <= READ_ADDR_HI;  // Write UB
                         8'h02: state <= READ_ADDR_HI;  // Write Weight
                         8'h03: state <= READ_ADDR_HI;  // Write Instruction
+                        8'h08: state <= READ_ADDR_HI;  // Write Instruction burst
                         8'h04: state <= READ_ADDR_HI;  // Read UB
                         8'h05: state <= EXECUTE;       // Start execution
                         8'h06: state <= SEND_STATUS;   // Read status
+                        8'h09: state <= READ_ADDR_HI;  // Configure completion push
+                        8'h0A: state <= READ_ADDR_HI;  // Execute, then read UB
+                        8'h0B: state <= READ_ADDR_HI;  // Queue a start at a PC
                         8'h14: state <= READ_DEBUG;    // Read debug counters (0x14 = 20)
                         default: begin
                             // Unrecognized command - send error response (0xFF) to indicate invalid command
                             // This helps diagnose if communication is working but command is wrong
-                            tx_valid <= 1'b1;
-                            tx_data <= 8'hFF;  // Error: unrecognized command
-                            debug_tx_count <= debug_tx_count + 1;
+                            resp_pending <= 1'b1;
+                            resp_byte <= 8'hFF;  // Error: unrecognized command
                             state <= IDLE;  // Stay in IDLE
                         end
                     endcase
+                end else if (notify_pending && !resp_pending && !queue_ack_pending && tx_ready && !tx_valid) begin
+                    // Host bytes take priority; a pending completion goes out between commands
+                    notify_pending <= 1'b0;
+                    byte_index <= 5'd0;
+                    state <= SEND_NOTIFY;
                 end
-                // If tx_ready is false, we wait for it to become true before processing new commands
             end
 
             // ================================================================
@@ -331,7 +412,33 @@ always @(posedge clk or negedge rst_n) begin
                         8'h01: state <= READ_LENGTH_HI;  // Write UB needs length
                         8'h02: state <= READ_LENGTH_HI;  // Write Weight needs length
                         8'h03: state <= WRITE_INSTR;     // Write Instr (fixed 4 bytes)
+                        8'h08: state <= READ_LENGTH_HI;  // Burst needs instruction count
                         8'h04: state <= READ_LENGTH_HI;  // Read UB needs length
+                        8'h0A: state <= READ_LENGTH_HI;  // Execute-and-read needs length
+                        8'h0B: begin
+                            // [0x0B, flags, pc]: start at `pc` when the active run
+                            // halts, or at once if none is; answered when the start
+                            // fires. flags[7] is a capability probe: ACK 0xEB only.
+                            // Older bitstreams answer 0xFF to each byte.
+                            if (addr_hi[7]) begin
+                                resp_pending <= 1'b1;
+                                resp_byte <= 8'hEB;
+                            end else begin
+                                queue_pc <= rx_data[4:0];
+                                queue_behind <= run_active;
+                                queue_pending <= 1'b1;
+                            end
+                            state <= IDLE;
+                        end
+                        8'h09: begin
+                            // [0x09, 0x00, flags]: flags[7] enables completion push.
+                            // ACK 0xDE; older bitstreams answer 0xFF to each byte.
+                            notify_en <= rx_data[7];
+                            notify_pending <= 1'b0;
+                            resp_pending <= 1'b1;
+                            resp_byte <= 8'hDE;
+                            state <= IDLE;
+                        end
                         default: state <= IDLE;
                     endcase
                 end
@@ -356,16 +463,42 @@ always @(posedge clk or negedge rst_n) begin
                     case (command)
                         8'h01: state <= WRITE_UB;
                         8'h02: state <= WRITE_WT;
+                        8'h08: begin
+                            // length = instruction count; zero is a capability probe
+                            instr_checksum <= 8'h00;
+                            byte_index <= 5'd0;
+                            if ({length[15:8], rx_data} == 16'h0000)
+                                state <= SEND_INSTR_ACK;
+                            else
+                                state <= WRITE_INSTR_BURST;
+                        end
                         8'h04: begin
                             // Start read operation from Unified Buffer
                             ub_rd_en <= 1'b1;
                             ub_rd_addr <= {addr_hi[0], addr_lo};  // 9-bit address: [8]=bank from addr_hi[0], [7:0]=addr_lo
-                            ub_rd_count <= 9'd1;  // Read 1 word (256 bits = 32 bytes)
+                            ub_rd_count <= 9'd1;  // One word per fetch; READ_UB refetches for bursts
                             byte_count <= 16'h0000;  // Reset byte count for READ_UB
                             read_ub_initialized <= 1'b0;  // Reset initialization flag
                             read_ub_wait_valid <= 1'b1;   // Wait for ub_rd_valid signal
                             state <= READ_UB;
                         end
+                        8'h0A: begin
+                            // [0x0A, addr_hi, addr_lo, len_hi, len_lo]: start the
+                            // program, then answer like READ_UB once it halts.
+                            // Zero length is a capability probe: ACK 0xEA, no run.
+                            byte_count <= 16'h0000;
+                            if ({length[15:8], rx_data} == 16'h0000) begin
+                                resp_pending <= 1'b1;
+                                resp_byte <= 8'hEA;
+                                state <= IDLE;
+                            end else begin
+                                start_execution <= 1'b1;
+                                start_pc <= 5'd0;
+                                run_active <= 1'b1;
+                                exec_armed <= 1'b0;
+                                state <= EXEC_WAIT;
+                            end
+                        end
                         default: state <= IDLE;
                     endcase
                 end
@@ -394,6 +527,7 @@ always @(posedge clk or negedge rst_n) begin
                     // Check BEFORE increment: when byte_index is 31, we're receiving byte31 (the 32nd byte)
                     // At this point: ub_buffer has bytes 0-30, rx_data = byte31
                     // CRITICAL: This check MUST be inside rx_valid block to ensure rx_data is valid!
+                    // Bursts (length > 32) write one word per 32 bytes at consecutive addresses
                     if (byte_index == 5'd31) begin
                         ub_wr_en <= 1'b1;
                         ub_wr_addr <= {addr_hi[0], addr_lo};  // 9-bit address: [8]=bank from addr_hi[0], [7:0]=addr_lo
@@ -444,51 +578,26 @@ always @(posedge clk or negedge rst_n) begin
                         // Check if we're done (use byte_count + 1 since increment is non-blocking)
                         if (byte_count + 1 >= length) begin
                             // Send ACK byte to confirm write completed
-                            if (tx_ready) begin
-                                tx_valid <= 1'b1;
-                                tx_data <= 8'hAA;  // ACK byte
-                            end
+                            resp_pending <= 1'b1;
+                            resp_byte <= 8'hAA;  // ACK byte
                             state <= IDLE;
                         end
                     end else if (byte_count + 1 >= length) begin
-                        // Partial write path: less than 32 bytes total
-                        // CRITICAL: This is inside rx_valid block - ub_buffer hasn't been updated yet!
-                        // We must account for rx_data being the CURRENT byte, not yet shifted in.
-                        // The NEW buffer would be {rx_data, ub_buffer[255:8]}, so we shift indices by 8.
+                        // Partial word: the last (or only) word of a transfer whose length is not
+                        // a multiple of 32. After this byte shifts in, the n = byte_index+1 newest
+                        // bytes sit at the top of the buffer (oldest lowest), with stale bytes of
+                        // earlier words below them. Shifting right by 32-n bytes puts byte 0 of the
+                        // word at [7:0] and zero-fills the unused upper bytes.
                         ub_wr_en <= 1'b1;
                         ub_wr_addr <= {addr_hi[0], addr_lo};  // 9-bit address: [8]=bank from addr_hi[0], [7:0]=addr_lo
                         ub_wr_count <= 9'd1;  // Write 1 word (256 bits = 32 bytes)
-                        // Construct ub_wr_data as if ub_buffer already had rx_data shifted in:
-                        // - OLD [X:Y] maps to NEW [X-8:Y-8]
-                        // - OLD [255:248] (MSB) maps to NEW rx_data
-                        ub_wr_data <= {
-                            ub_buffer[39:32],   ub_buffer[31:24],   ub_buffer[23:16],   ub_buffer[15:8],
-                            ub_buffer[71:64],   ub_buffer[63:56],   ub_buffer[55:48],   ub_buffer[47:40],
-                            ub_buffer[103:96],  ub_buffer[95:88],   ub_buffer[87:80],   ub_buffer[79:72],
-                            ub_buffer[135:128], ub_buffer[127:120], ub_buffer[119:112], ub_buffer[111:104],
-                            ub_buffer[167:160], ub_buffer[159:152], ub_buffer[151:144], ub_buffer[143:136],
-                            ub_buffer[199:192], ub_buffer[191:184], ub_buffer[183:176], ub_buffer[175:168],
-                            ub_buffer[231:224], ub_buffer[223:216], ub_buffer[215:208], ub_buffer[207:200],
-                            rx_data,            ub_buffer[255:248], ub_buffer[247:240], ub_buffer[239:232]
-                        };
-                        // Same for last_ub_write_data
-                        last_ub_write_data <= {
-                            ub_buffer[39:32],   ub_buffer[31:24],   ub_buffer[23:16],   ub_buffer[15:8],
-                            ub_buffer[71:64],   ub_buffer[63:56],   ub_buffer[55:48],   ub_buffer[47:40],
-                            ub_buffer[103:96],  ub_buffer[95:88],   ub_buffer[87:80],   ub_buffer[79:72],
-                            ub_buffer[135:128], ub_buffer[127:120], ub_buffer[119:112], ub_buffer[111:104],
-                            ub_buffer[167:160], ub_buffer[159:152], ub_buffer[151:144], ub_buffer[143:136],
-                            ub_buffer[199:192], ub_buffer[191:184], ub_buffer[183:176], ub_buffer[175:168],
-                            ub_buffer[231:224], ub_buffer[223:216], ub_buffer[215:208], ub_buffer[207:200],
-                            rx_data,            ub_buffer[255:248], ub_buffer[247:240], ub_buffer[239:232]
-                        };
+                        ub_wr_data <= {rx_data, ub_buffer[255:8]} >> {(5'd31 - byte_index), 3'b000};
+                        last_ub_write_data <= {rx_data, ub_buffer[255:8]} >> {(5'd31 - byte_index), 3'b000};
                         last_ub_write_addr <= addr_lo;
 
                         // Send ACK byte to confirm write completed
-                        if (tx_ready) begin
-                            tx_valid <= 1'b1;
-                            tx_data <= 8'hAA;  // ACK byte
-                        end
+                        resp_pending <= 1'b1;
+                        resp_byte <= 8'hAA;  // ACK byte
 
                         state <= IDLE;
                     end
@@ -519,10 +628,8 @@ always @(posedge clk or negedge rst_n) begin
 
                         // Check if done after 8-byte write
                         if (byte_count + 1 >= length) begin
-                            if (tx_ready) begin
-                                tx_valid <= 1'b1;
-                                tx_data <= 8'hBB;  // ACK for weight write
-                            end
+                            resp_pending <= 1'b1;
+                            resp_byte <= 8'hBB;  // ACK for weight write
                             state <= IDLE;
                         end
                     end else if (byte_count + 1 >= length) begin
@@ -532,10 +639,8 @@ always @(posedge clk or negedge rst_n) begin
                         wt_wr_data <= {rx_data, wt_buffer[63:8]};
 
                         // Send ACK
-                        if (tx_ready) begin
-                            tx_valid <= 1'b1;
-                            tx_data <= 8'hBB;  // ACK for weight write
-                        end
+                        resp_pending <= 1'b1;
+                        resp_byte <= 8'hBB;  // ACK for weight write
 
                         state <= IDLE;
                     end
@@ -561,6 +666,95 @@ always @(posedge clk or negedge rst_n) begin
                 end
             end
 
+            // ================================================================
+            // WRITE_INSTR_BURST: `length` instructions (4 bytes each, big-
+            // endian) written to consecutive addresses from addr_lo[4:0]
+            // ================================================================
+            WRITE_INSTR_BURST: begin
+                if (rx_valid && !rx_valid_prev && !rx_framing_error) begin
+                    instr_buffer <= {instr_buffer[23:0], rx_data};
+                    instr_checksum <= instr_checksum + rx_data;
+                    byte_count <= byte_count + 1;
+
+                    if (byte_count[1:0] == 2'd3) begin
+                        instr_wr_en <= 1'b1;
+                        instr_wr_addr <= addr_lo[4:0];
+                        instr_wr_data <= {instr_buffer[23:0], rx_data};
+                        addr_lo <= addr_lo + 1;
+                    end
+
+                    if (byte_count + 1 >= {length[13:0], 2'b00}) begin
+                        byte_index <= 5'd0;
+                        state <= SEND_INSTR_ACK;
+                    end
+                end
+            end
+
+            // ================================================================
+            // SEND_INSTR_ACK: ACK (0xCC) then checksum of the burst bytes
+            // ================================================================
+            SEND_INSTR_ACK: begin
+                if (tx_ready && tx_valid) begin
+                    // Byte was just accepted by TX module
+                    tx_valid <= 1'b0;
+                    if (byte_index == 5'd1) begin
+                        state <= IDLE;
+                    end else begin
+                        byte_index <= byte_index + 1;
+                    end
+                end else if (tx_ready && !tx_valid && !resp_pending) begin
+                    tx_valid <= 1'b1;
+                    tx_data <= (byte_index == 5'd0) ? 8'hCC : instr_checksum;
+                    debug_tx_count <= debug_tx_count + 1;
+                end
+            end
+
+            // ================================================================
+            // SEND_NOTIFY: completion push, 0xDD then the status byte
+            // ================================================================
+            SEND_NOTIFY: begin
+                // Host bytes are never dropped: a command arriving now is
+                // decoded as in IDLE. If 0xDD has not gone out yet the push
+                // is re-armed, otherwise the cut-short push is not repeated
+                // (hosts that send while a run may finish should poll).
+                if (rx_valid && !rx_valid_prev && !rx_framing_error) begin
+                    command <= rx_data;
+                    byte_count <= 16'h0000;
+                    byte_index <= 5'd0;
+                    if (byte_index == 5'd0 && !tx_valid) begin
+                        notify_pending <= 1'b1;
+                    end
+                    tx_valid <= 1'b0;
+
+                    case (rx_data)
+                        8'h01: state <= READ_ADDR_HI;  // Write UB
+                        8'h02: state <= READ_ADDR_HI;  // Write Weight
+                        8'h03: state <= READ_ADDR_HI;  // Write Instruction
+                        8'h08: state <= READ_ADDR_HI;  // Write Instruction burst
+                        8'h04: state <= READ_ADDR_HI;  // Read UB
+                        8'h05: state <= EXECUTE;       // Start execution
+                        8'h06: state <= SEND_STATUS;   // Read status
+                        8'h09: state <= READ_ADDR_HI;  // Configure completion push
+                        8'h0A: state <= READ_ADDR_HI;  // Execute, then read UB
+                        8'h0B: state <= READ_ADDR_HI;  // Queue a start at a PC
+                        8'h14: state <= READ_DEBUG;    // Read debug counters
+                        default: state <= IDLE;
+                    endcase
+                end else if (tx_ready && tx_valid) begin
+                    tx_valid <= 1'b0;
+                    if (byte_index == 5'd1) begin
+                        state <= IDLE;
+                    end else begin
+                        byte_index <= byte_index + 1;
+                    end
+                end else if (tx_ready && !tx_valid && !resp_pending) begin
+                    tx_valid <= 1'b1;
+                    tx_data <= (byte_index == 5'd0) ? 8'hDD
+                             : {halt_req, 1'b0, ub_done, ub_busy, vpu_done, vpu_busy, sys_done, sys_busy};
+                    debug_tx_count <= debug_tx_count + 1;
+                end
+            end
+
             // ================================================================
             // READ_UB: Read data from Unified Buffer and send via UART
             // ================================================================
@@ -579,9 +773,13 @@ always @(posedge clk or negedge rst_n) begin
                         8'h01: state <= READ_ADDR_HI;  // Write UB
                         8'h02: state <= READ_ADDR_HI;  // Write Weight
                         8'h03: state <= READ_ADDR_HI;  // Write Instruction
+                        8'h08: state <= READ_ADDR_HI;  // Write Instruction burst
                         8'h04: state <= READ_ADDR_HI;  // Read UB (restart)
                         8'h05: state <= EXECUTE;       // Start execution
                         8'h06: state <= SEND_STATUS;   // Read status
+                        8'h09: state <= READ_ADDR_HI;  // Configure completion push
+                        8'h0A: state <= READ_ADDR_HI;  // Execute, then read UB
+                        8'h0B: state <= READ_ADDR_HI;  // Queue a start at a PC
                         8'h14: state <= READ_DEBUG;    // Read debug counters
                         default: state <= IDLE;
                     endcase
@@ -601,7 +799,7 @@ always @(posedge clk or negedge rst_n) begin
                             // Data is now valid - capture it
                             read_buffer <= ub_rd_data;  // Capture actual data from unified buffer
                             read_index <= 8'd0;
-                            byte_count <= 16'd0;
+                            // byte_count is NOT reset here: it counts bytes across all words of a burst
                             tx_valid <= 1'b0;
                             read_ub_wait_valid <= 1'b0;  // Done waiting
                             read_ub_initialized <= 1'b1; // Mark as initialized
@@ -641,8 +839,13 @@ always @(posedge clk or negedge rst_n) begin
                             read_ub_initialized <= 1'b0;  // Reset for next READ_UB
                             read_ub_wait_valid <= 1'b0;   // Reset wait flag
                             debug_last_tx_byte <= 8'hBB;  // Debug: READ_UB complete
+                        end else if (read_index == 8'd31) begin
+                            // Burst read: word exhausted, fetch the next address in the same bank
+                            ub_rd_en <= 1'b1;
+                            ub_rd_addr <= {ub_rd_addr[8], ub_rd_addr[7:0] + 8'd1};
+                            read_ub_wait_valid <= 1'b1;
                         end
-                    end else if (tx_ready && !tx_valid && byte_count < length) begin
+                    end else if (tx_ready && !tx_valid && !resp_pending && byte_count < length) begin
                         // TX is ready and we have data to send - send next byte
                         tx_valid <= 1'b1;
                         tx_data <= read_buffer[7:0];  // Send LSB of buffer
@@ -653,11 +856,52 @@ always @(posedge clk or negedge rst_n) begin
                 end
             end
 
+            // ================================================================
+            // EXEC_WAIT: program started by cmd 0x0A; stream the UB range
+            // once it reaches HALT. A host byte aborts the wait (e.g. a
+            // program without HALT) and is decoded as a new command.
+            // ================================================================
+            EXEC_WAIT: begin
+                if (rx_valid && !rx_valid_prev && !rx_framing_error) begin
+                    command <= rx_data;
+                    byte_count <= 16'h0000;
+                    byte_index <= 5'd0;
+
+                    case (rx_data)
+                        8'h01: state <= READ_ADDR_HI;  // Write UB
+                        8'h02: state <= READ_ADDR_HI;  // Write Weight
+                        8'h03: state <= READ_ADDR_HI;  // Write Instruction
+                        8'h08: state <= READ_ADDR_HI;  // Write Instruction burst
+                        8'h04: state <= READ_ADDR_HI;  // Read UB
+                        8'h05: state <= EXECUTE;       // Start execution
+                        8'h06: state <= SEND_STATUS;   // Read status
+                        8'h09: state <= READ_ADDR_HI;  // Configure completion push
+                        8'h0A: state <= READ_ADDR_HI;  // Execute, then read UB
+                        8'h0B: state <= READ_ADDR_HI;  // Queue a start at a PC
+                        8'h14: state <= READ_DEBUG;    // Read debug counters
+                        default: state <= IDLE;
+                    endcase
+                end else if (!halt_req) begin
+                    exec_armed <= 1'b1;
+                end else if (exec_armed) begin
+                    // The data answers the command: no completion push as well
+                    notify_pending <= 1'b0;
+                    ub_rd_en <= 1'b1;
+                    ub_rd_addr <= {addr_hi[0], addr_lo};
+                    ub_rd_count <= 9'd1;
+                    read_ub_initialized <= 1'b0;
+                    read_ub_wait_valid <= 1'b1;
+                    state <= READ_UB;
+                end
+            end
+
             // ================================================================
             // EXECUTE: Start TPU execution
             // ================================================================
             EXECUTE: begin
                 start_execution <= 1'b1;
+                start_pc <= 5'd0;
+                run_active <= 1'b1;
                 state <= IDLE;
             end
 
@@ -676,14 +920,18 @@ always @(posedge clk or negedge rst_n) begin
                         8'h01: state <= READ_ADDR_HI;  // Write UB
                         8'h02: state <= READ_ADDR_HI;  // Write Weight
                         8'h03: state <= READ_ADDR_HI;  // Write Instruction
+                        8'h08: state <= READ_ADDR_HI;  // Write Instruction burst
                         8'h04: state <= READ_ADDR_HI;  // Read UB
                         8'h05: state <= EXECUTE;       // Start execution
                         8'h06: state <= SEND_STATUS;   // Read status (restart)
+                        8'h09: state <= READ_ADDR_HI;  // Configure completion push
+                        8'h0A: state <= READ_ADDR_HI;  // Execute, then read UB
+                        8'h0B: state <= READ_ADDR_HI;  // Queue a start at a PC
                         8'h14: state <= READ_DEBUG;    // Read debug counters
                         default: state <= IDLE;
                     endcase
-                end else begin
-                    // Always send status byte when TX is ready
+                end else if (!resp_pending) begin
+                    // Send status byte when TX is ready (after any pending ACK/NACK)
                     // CRITICAL: Status byte format includes halt_req in bit 7 for Python script detection
                     // [7]=halt_req, [6]=0, [5]=ub_done, [4]=ub_busy,
                     // [3]=vpu_done, [2]=vpu_busy, [1]=sys_done, [0]=sys_busy
@@ -718,9 +966,13 @@ always @(posedge clk or negedge rst_n) begin
                         8'h01: state <= READ_ADDR_HI;  // Write UB
                         8'h02: state <= READ_ADDR_HI;  // Write Weight
                         8'h03: state <= READ_ADDR_HI;  // Write Instruction
+                        8'h08: state <= READ_ADDR_HI;  // Write Instruction burst
                         8'h04: state <= READ_ADDR_HI;  // Read UB
                         8'h05: state <= EXECUTE;       // Start execution
                         8'h06: state <= SEND_STATUS;   // Read status
+                        8'h09: state <= READ_ADDR_HI;  // Configure completion push
+                        8'h0A: state <= READ_ADDR_HI;  // Execute, then read UB
+                        8'h0B: state <= READ_ADDR_HI;  // Queue a start at a PC
                         8'h14: begin
                             // Restart READ_DEBUG
                             byte_count <= 16'h0000;
@@ -738,7 +990,7 @@ always @(posedge clk or negedge rst_n) begin
                         byte_count <= 16'd0;
                         state <= IDLE;
                     end
-                end else if (tx_ready && !tx_valid) begin
+                end else if (tx_ready && !tx_valid && !resp_pending) begin
                     // TX is ready and we're not sending - send next byte
                     tx_valid <= 1'b1;
                     case (byte_count)
@@ -766,6 +1018,29 @@ always @(posedge clk or negedge rst_n) begin
 
             default: state <= IDLE;
         endcase
+
+        // Pending ACK/NACK: offered after the state logic so it wins the
+        // TX handshake. Multi-byte responses wait for it (the host sees
+        // responses in command order), and it is never offered on a cycle
+        // that decodes a host byte, when the next response may be latched.
+        // The queued-start ACK follows through the same slot, from IDLE only
+        // so it cannot split a multi-byte response
+        if (resp_sent) begin
+            tx_valid <= 1'b0;
+            resp_sent <= 1'b0;
+        end else if (tx_ready && !tx_valid && !(rx_valid && !rx_valid_prev)) begin
+            if (resp_pending) begin
+                resp_pending <= 1'b0;
+                resp_sent <= 1'b1;
+                tx_valid <= 1'b1;
+                tx_data <= resp_byte;
+            end else if (queue_ack_pending && state == IDLE) begin
+                queue_ack_pending <= 1'b0;
+                resp_sent <= 1'b1;
+                tx_valid <= 1'b1;
+                tx_data <= queue_ack_byte;
+            end
+        end
     end
 end
 
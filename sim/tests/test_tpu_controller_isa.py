@@ -195,3 +195,42 @@ async def test_controller_instruction_fields(dut):
 
     dut._log.info("Instruction field extraction test completed")
 
+
+
+@cocotb.test()
+async def test_controller_restart_from_halt(dut):
+    """start_execution restarts a halted controller from start_pc"""
+    clock = Clock(dut.clk, 10, units="ns")
+    cocotb.start_soon(clock.start())
+
+    # Initialize
+    dut.rst_n.value = 0
+    dut.start_execution.value = 0
+    dut.start_pc.value = 0
+    dut.instr_data.value = 0x3F << 26  # HALT at every address
+    for busy in (dut.sys_busy, dut.sys_done, dut.vpu_busy, dut.dma_busy,
+                 dut.wt_busy, dut.ub_busy, dut.ub_rd_valid):
+        busy.value = 0
+
+    await ClockCycles(dut.clk, 2)
+    dut.rst_n.value = 1
+
+    for run, pc in enumerate((0, 5, 9)):
+        dut.start_pc.value = pc
+        dut.start_execution.value = 1
+        await RisingEdge(dut.clk)
+        dut.start_execution.value = 0
+        await Timer(1, units='ns')
+        assert dut.instr_addr.value == pc, f"run {run} did not load PC {pc}"
+        assert dut.halt_req.value == 0, f"run {run} still reports the previous HALT"
+
+        for _ in range(10):
+            await RisingEdge(dut.clk)
+            await Timer(1, units='ns')
+            if dut.halt_req.value == 1:
+                break
+        assert dut.halt_req.value == 1, f"run {run} never reached HALT"
+        await ClockCycles(dut.clk, 3)
+        assert dut.halt_req.value == 1, "halt_req should hold until the next start"
+
+    dut._log.info("Each start_execution after HALT ran the program again")
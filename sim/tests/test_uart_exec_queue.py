@@ -0,0 +1,155 @@
+"""
+UART DMA Queued Start Tests
+EXEC_QUEUE (0x0B, flags, pc) starts the program at `pc` once the run the
+UART started reaches HALT, or at once if none is running, and answers 0xEB
+(back-to-back) or 0xEC (started from idle) when the start fires;
+flags[7] is a probe answered with 0xEB (harness: sim/uart_dma_harness.sv;
+the test drives halt_req in place of the controller)
+"""
+import cocotb
+from cocotb.triggers import ClockCycles, ReadOnly, RisingEdge, with_timeout
+
+from uart_bfm import UartBFM
+
+EXECUTE = 0x05
+WRITE_INSTR_BURST = 0x08
+CFG_NOTIFY = 0x09
+EXEC_QUEUE = 0x0B
+ACK_INSTR = 0xCC
+ACK_NOTIFY_CFG = 0xDE
+NOTIFY = 0xDD
+ACK_QUEUED = 0xEB
+ACK_STARTED_IDLE = 0xEC
+QUEUE_PROBE = 0x80
+
+
+async def start_pulse(bfm, bits=20):
+    """Wait for the next start_execution pulse; returns its start_pc"""
+    dut = bfm.dut
+    await with_timeout(RisingEdge(dut.start_execution), bits * bfm.clks_per_bit * 10, "ns")
+    await ReadOnly()
+    return int(dut.start_pc.value)
+
+
+async def run_until_halt(bfm, pulse, run_cycles, halt_lag=3):
+    """Controller stand-in: drop halt_req after the start, raise it after the run"""
+    dut = bfm.dut
+    await pulse
+    await ClockCycles(dut.clk, halt_lag)
+    dut.halt_req.value = 0
+    await ClockCycles(dut.clk, run_cycles)
+    dut.halt_req.value = 1
+
+
+async def assert_silent(bfm, bits=40):
+    await ClockCycles(bfm.dut.clk, bits * bfm.clks_per_bit)
+    assert bfm.rx_queue.empty(), "unexpected byte from the DUT"
+
+
+@cocotb.test()
+async def test_probe(dut):
+    """flags[7] answers 0xEB and does not start anything"""
+    bfm = UartBFM(dut)
+    await bfm.reset()
+
+    pulse = cocotb.start_soon(RisingEdge(dut.start_execution))
+    await bfm.send(bytes([EXEC_QUEUE, QUEUE_PROBE, 0]))
+    assert await bfm.recv(1) == bytes([ACK_QUEUED])
+    await assert_silent(bfm)
+    assert not pulse.done(), "probe started execution"
+    pulse.kill()
+    dut._log.info("Probe acknowledged without a start")
+
+
+@cocotb.test()
+async def test_start_from_idle(dut):
+    """Nothing running: the start fires at once at the given PC, ACK 0xEC"""
+    bfm = UartBFM(dut)
+    await bfm.reset()
+    dut.halt_req.value = 0  # Controller still in S_RESET
+
+    pulse = cocotb.start_soon(start_pulse(bfm))
+    await bfm.send(bytes([EXEC_QUEUE, 0, 16]))
+    assert await pulse == 16
+    assert await bfm.recv(1) == bytes([ACK_STARTED_IDLE])
+    dut._log.info("Queued start fired immediately at PC 16")
+
+
+@cocotb.test()
+async def test_start_waits_for_halt(dut):
+    """Queued behind a run: fires at its HALT, and the link stays usable meanwhile"""
+    bfm = UartBFM(dut)
+    await bfm.reset()
+    dut.halt_req.value = 1
+
+    # EXECUTE segment 0 at PC 0
+    pulse = cocotb.start_soon(start_pulse(bfm))
+    await bfm.send(bytes([EXECUTE]))
+    assert await pulse == 0
+    await ClockCycles(dut.clk, 3)
+    dut.halt_req.value = 0
+
+    # Queue segment 1 at PC 16, then upload segment 2 over segment 0's half
+    pulse = cocotb.start_soon(start_pulse(bfm, bits=2000))
+    await bfm.send(bytes([EXEC_QUEUE, 0, 16]))
+    segment = [(0x03 << 26) | (i << 18) for i in range(4)]
+    payload = b''.join(i.to_bytes(4, 'big') for i in segment)
+    await bfm.send(bytes([WRITE_INSTR_BURST, 0, 0, 0, len(segment)]) + payload)
+    assert await bfm.recv(2) == bytes([ACK_INSTR, sum(payload) & 0xFF])
+    await assert_silent(bfm)
+    assert not pulse.done(), "queued start fired before HALT"
+
+    dut.halt_req.value = 1
+    assert await pulse == 16
+    assert await bfm.recv(1) == bytes([ACK_QUEUED])
+    await ClockCycles(dut.clk, 2)
+    for addr, instr in enumerate(segment):
+        assert int(dut.instruction_memory[addr].value) == instr
+    dut._log.info("Segment 1 started at segment 0's HALT")
+
+
+@cocotb.test()
+async def test_chain_without_push(dut):
+    """With the push on, a HALT that fires a queued start sends only the ACK"""
+    bfm = UartBFM(dut)
+    await bfm.reset()
+    dut.halt_req.value = 1
+    await bfm.send(bytes([CFG_NOTIFY, 0x00, 0x80]))
+    assert await bfm.recv(1) == bytes([ACK_NOTIFY_CFG])
+
+    run = cocotb.start_soon(run_until_halt(bfm, cocotb.start_soon(start_pulse(bfm)), 3000))
+    await bfm.send(bytes([EXECUTE]))
+    await ClockCycles(dut.clk, 500)
+    queued = cocotb.start_soon(start_pulse(bfm, bits=2000))
+    await bfm.send(bytes([EXEC_QUEUE, 0, 16]))
+    await run
+    assert await queued == 16
+    assert await bfm.recv(1) == bytes([ACK_QUEUED])
+
+    # The last segment's HALT is pushed as usual
+    await ClockCycles(dut.clk, 3)
+    dut.halt_req.value = 0
+    await ClockCycles(dut.clk, 1000)
+    dut.halt_req.value = 1
+    push = await bfm.recv(2)
+    assert push[0] == NOTIFY, f"push 0x{push[0]:02X}"
+    await assert_silent(bfm)
+    dut._log.info("One ACK per queued start, one push at the final HALT")
+
+
+@cocotb.test()
+async def test_acks_not_dropped_while_tx_busy(dut):
+    """Probe and start ACKs that fall due behind a NACK still go out, in order"""
+    bfm = UartBFM(dut)
+    await bfm.reset()
+    dut.halt_req.value = 0
+
+    await bfm.send(bytes([0x77, EXEC_QUEUE, QUEUE_PROBE, 0, 0x77]))
+    got = await bfm.recv(3)
+    assert got == bytes([0xFF, ACK_QUEUED, 0xFF]), f"probe responses {got.hex()}"
+
+    pulse = cocotb.start_soon(start_pulse(bfm))
+    await bfm.send(bytes([EXEC_QUEUE, 0, 16, 0x77]))
+    assert await pulse == 16
+    got = await bfm.recv(2)
+    assert got == bytes([ACK_STARTED_IDLE, 0xFF]), f"start responses {got.hex()}"
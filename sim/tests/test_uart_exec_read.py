@@ -0,0 +1,121 @@
+"""
+UART DMA Fused Execute-and-Read Tests
+EXEC_READ (0x0A, addr_hi, addr_lo, len_hi, len_lo) pulses start_execution,
+waits for halt_req to drop and rise again, then streams the UB range like
+READ_UB; zero length is a probe answered with 0xEA (harness:
+sim/uart_dma_harness.sv; the test drives halt_req in place of the controller)
+"""
+import cocotb
+from cocotb.triggers import ClockCycles, RisingEdge, with_timeout
+
+from uart_bfm import UartBFM
+
+WRITE_UB = 0x01
+READ_STATUS = 0x06
+CFG_NOTIFY = 0x09
+EXEC_READ = 0x0A
+ACK_UB = 0xAA
+ACK_EXEC_READ = 0xEA
+ACK_NOTIFY_CFG = 0xDE
+HALTED = 0x80
+
+
+def header(cmd, addr, length):
+    return bytes([cmd, (addr >> 8) & 0xFF, addr & 0xFF, (length >> 8) & 0xFF, length & 0xFF])
+
+
+async def write_ub(bfm, addr, data):
+    await bfm.send(header(WRITE_UB, addr, len(data)) + data)
+    assert await bfm.recv(1) == bytes([ACK_UB])
+
+
+async def exec_read(bfm, addr, length, run_cycles=2000, halt_lag=3):
+    """Send EXEC_READ; the controller drops halt_req `halt_lag` cycles after the start"""
+    dut = bfm.dut
+    pulse = cocotb.start_soon(with_timeout(RisingEdge(dut.start_execution),
+                                           20 * bfm.clks_per_bit * 10, "ns"))
+    await bfm.send(header(EXEC_READ, addr, length))
+    await pulse
+    await ClockCycles(dut.clk, halt_lag)
+    dut.halt_req.value = 0
+    await ClockCycles(dut.clk, run_cycles)
+    assert bfm.rx_queue.empty(), "data sent before HALT"
+    dut.halt_req.value = 1
+    return await bfm.recv(length)
+
+
+async def assert_silent(bfm, bits=40):
+    await ClockCycles(bfm.dut.clk, bits * bfm.clks_per_bit)
+    assert bfm.rx_queue.empty(), "unexpected byte from the DUT"
+
+
+@cocotb.test()
+async def test_exec_read_waits_for_halt(dut):
+    """The UB range streams only after the run's HALT, not the previous one's"""
+    bfm = UartBFM(dut)
+    await bfm.reset()
+    dut.halt_req.value = 1  # Previous run halted
+
+    data = bytes((i * 5 + 1) & 0xFF for i in range(64))
+    await write_ub(bfm, 20, data)
+    for run, length in enumerate((3, 40, 64)):
+        got = await exec_read(bfm, 20, length, run_cycles=500 + 1000 * run)
+        assert got == data[:length], f"run {run}: {got.hex()}"
+        await assert_silent(bfm)
+    dut._log.info("Results streamed after each HALT")
+
+
+@cocotb.test()
+async def test_zero_length_probe(dut):
+    """Zero length answers 0xEA and does not start the program"""
+    bfm = UartBFM(dut)
+    await bfm.reset()
+
+    pulse = cocotb.start_soon(RisingEdge(dut.start_execution))
+    await bfm.send(header(EXEC_READ, 0, 0))
+    assert await bfm.recv(1) == bytes([ACK_EXEC_READ])
+    await assert_silent(bfm)
+    assert not pulse.done(), "probe started execution"
+    pulse.kill()
+    dut._log.info("Probe acknowledged without a run")
+
+
+@cocotb.test()
+async def test_host_byte_aborts_wait(dut):
+    """A program that never halts: the next command is still answered"""
+    bfm = UartBFM(dut)
+    await bfm.reset()
+
+    await bfm.send(header(EXEC_READ, 0, 32))
+    await ClockCycles(dut.clk, 500)
+    await bfm.send(bytes([READ_STATUS]))
+    status = (await bfm.recv(1))[0]
+    assert not status & HALTED, f"status 0x{status:02X}"
+    dut.halt_req.value = 1
+    await assert_silent(bfm)
+    dut._log.info("Wait aborted by READ_STATUS")
+
+
+@cocotb.test()
+async def test_no_push_after_exec_read(dut):
+    """With the completion push on, EXEC_READ answers with the data only"""
+    bfm = UartBFM(dut)
+    await bfm.reset()
+    await bfm.send(bytes([CFG_NOTIFY, 0x00, 0x80]))
+    assert await bfm.recv(1) == bytes([ACK_NOTIFY_CFG])
+
+    await write_ub(bfm, 7, bytes(range(32)))
+    assert await exec_read(bfm, 7, 8) == bytes(range(8))
+    await assert_silent(bfm)
+    dut._log.info("No 0xDD after the fused read")
+
+
+@cocotb.test()
+async def test_probe_ack_not_dropped_while_tx_busy(dut):
+    """The zero-length probe right behind a NACKed byte still gets 0xEA"""
+    bfm = UartBFM(dut)
+    await bfm.reset()
+
+    await bfm.send(bytes([0x77]) + header(EXEC_READ, 0, 0) + bytes([0x77]))
+    got = await bfm.recv(3)
+    assert got == bytes([0xFF, ACK_EXEC_READ, 0xFF]), f"responses {got.hex()}"
@@ -0,0 +1,109 @@
+"""
+UART DMA Completion Push Tests
+CFG_NOTIFY (0x09, 0x00, flags): flags[7] enables an unsolicited 0xDD +
+status byte on each rising edge of halt_req (harness: sim/uart_dma_harness.sv,
+where the test drives halt_req in place of the controller)
+"""
+import cocotb
+from cocotb.triggers import ClockCycles, RisingEdge, with_timeout
+
+from uart_bfm import UartBFM
+
+EXECUTE = 0x05
+READ_STATUS = 0x06
+CFG_NOTIFY = 0x09
+ACK_NOTIFY_CFG = 0xDE
+NOTIFY = 0xDD
+NOTIFY_ENABLE = 0x80
+HALTED = 0x80
+
+
+async def configure(bfm, flags):
+    await bfm.send(bytes([CFG_NOTIFY, 0x00, flags]))
+    assert await bfm.recv(1) == bytes([ACK_NOTIFY_CFG])
+
+
+async def run_program(bfm, cycles=500):
+    """EXECUTE, then raise halt_req as the controller would at HALT"""
+    dut = bfm.dut
+    pulse = cocotb.start_soon(with_timeout(RisingEdge(dut.start_execution),
+                                           20 * bfm.clks_per_bit * 10, "ns"))
+    await bfm.send(bytes([EXECUTE]))
+    await pulse
+    dut.halt_req.value = 0  # Controller re-arms: halt_req drops on start
+    await ClockCycles(dut.clk, cycles)
+    dut.halt_req.value = 1
+
+
+async def assert_silent(bfm, bits=40):
+    await ClockCycles(bfm.dut.clk, bits * bfm.clks_per_bit)
+    assert bfm.rx_queue.empty(), "unexpected byte from the DUT"
+
+
+@cocotb.test()
+async def test_push_disabled_by_default(dut):
+    """Without CFG_NOTIFY, reaching HALT sends nothing"""
+    bfm = UartBFM(dut)
+    await bfm.reset()
+
+    await run_program(bfm)
+    await assert_silent(bfm)
+    await bfm.send(bytes([READ_STATUS]))
+    status = (await bfm.recv(1))[0]
+    assert status & HALTED, f"status 0x{status:02X}"
+    dut._log.info("No push while disabled")
+
+
+@cocotb.test()
+async def test_push_on_halt(dut):
+    """Each run that reaches HALT pushes 0xDD + a halted status byte, once"""
+    bfm = UartBFM(dut)
+    await bfm.reset()
+    await configure(bfm, NOTIFY_ENABLE)
+
+    for run in range(3):
+        await run_program(bfm, cycles=200 + 300 * run)
+        push = await bfm.recv(2)
+        assert push[0] == NOTIFY, f"run {run}: push 0x{push[0]:02X}"
+        assert push[1] & HALTED, f"run {run}: status 0x{push[1]:02X}"
+        await assert_silent(bfm)  # halt_req stays high: no repeat
+    dut._log.info("Completion pushed on every run")
+
+
+@cocotb.test()
+async def test_push_can_be_disabled(dut):
+    bfm = UartBFM(dut)
+    await bfm.reset()
+    await configure(bfm, NOTIFY_ENABLE)
+    await configure(bfm, 0x00)
+
+    await run_program(bfm)
+    await assert_silent(bfm)
+    dut._log.info("Push disabled again")
+
+
+@cocotb.test()
+async def test_commands_still_answered_with_push_enabled(dut):
+    """READ_STATUS after the push sees the halted status; no stray bytes"""
+    bfm = UartBFM(dut)
+    await bfm.reset()
+    await configure(bfm, NOTIFY_ENABLE)
+
+    await run_program(bfm)
+    assert (await bfm.recv(2))[0] == NOTIFY
+    await bfm.send(bytes([READ_STATUS]))
+    status = (await bfm.recv(1))[0]
+    assert status & HALTED, f"status 0x{status:02X}"
+    await assert_silent(bfm)
+    dut._log.info("Commands unaffected by push mode")
+
+
+@cocotb.test()
+async def test_ack_not_dropped_while_tx_busy(dut):
+    """CFG_NOTIFY right behind a NACKed byte still gets its 0xDE"""
+    bfm = UartBFM(dut)
+    await bfm.reset()
+
+    await bfm.send(bytes([0x77, CFG_NOTIFY, 0x00, NOTIFY_ENABLE, 0x77]))
+    got = await bfm.recv(3)
+    assert got == bytes([0xFF, ACK_NOTIFY_CFG, 0xFF]), f"responses {got.hex()}"
@@ -0,0 +1,60 @@
+"""
+UART bus functional model for cocotb tests of uart_dma_basys3
+
+Bit-bangs 8N1 frames into the DUT's uart_rx and decodes frames from its
+uart_tx. CLKS_PER_BIT must match the harness CLOCK_FREQ / BAUD_RATE.
+"""
+import cocotb
+from cocotb.clock import Clock
+from cocotb.queue import Queue
+from cocotb.triggers import ClockCycles, FallingEdge, with_timeout
+
+CLKS_PER_BIT = 60
+
+
+class UartBFM:
+    """Host side of the UART link"""
+
+    def __init__(self, dut, clks_per_bit=CLKS_PER_BIT):
+        self.dut = dut
+        self.clks_per_bit = clks_per_bit
+        self.rx_queue = Queue()
+        dut.uart_rx.value = 1
+        if hasattr(dut, 'halt_req'):
+            dut.halt_req.value = 0
+
+    async def reset(self):
+        cocotb.start_soon(Clock(self.dut.clk, 10, units="ns").start())
+        self.dut.rst_n.value = 0
+        await ClockCycles(self.dut.clk, 5)
+        self.dut.rst_n.value = 1
+        await ClockCycles(self.dut.clk, 5)
+        cocotb.start_soon(self._monitor_tx())
+
+    async def send(self, data):
+        """Send bytes back-to-back (one stop bit, no gaps)"""
+        for byte in bytes(data):
+            frame = [0] + [(byte >> i) & 1 for i in range(8)] + [1]
+            for bit in frame:
+                self.dut.uart_rx.value = bit
+                await ClockCycles(self.dut.clk, self.clks_per_bit)
+
+    async def recv(self, count, timeout_bits=200):
+        """Receive `count` bytes; fail the test if they do not arrive"""
+        out = bytearray()
+        for _ in range(count):
+            byte = await with_timeout(self.rx_queue.get(),
+                                      timeout_bits * self.clks_per_bit * 10, "ns")
+            out.append(byte)
+        return bytes(out)
+
+    async def _monitor_tx(self):
+        while True:
+            await FallingEdge(self.dut.uart_tx)
+            # Middle of the first data bit
+            await ClockCycles(self.dut.clk, self.clks_per_bit + self.clks_per_bit // 2)
+            byte = 0
+            for i in range(8):
+                byte |= int(self.dut.uart_tx.value) << i
+                await ClockCycles(self.dut.clk, self.clks_per_bit)
+            self.rx_queue.put_nowait(byte)
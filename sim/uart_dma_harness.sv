@@ -0,0 +1,93 @@
+`timescale 1ns / 1ps
+
+// UART DMA harness for cocotb
+// Connects uart_dma_basys3 straight to unified_buffer (9-bit addresses passed
+// through unchanged) and to a 32-entry instruction memory like tpu_top's.
+// Small CLOCK_FREQ/BAUD_RATE keep UART frames short in simulation:
+// 60 clocks per bit, 4 clocks per RX oversample.
+// halt_req is driven by the test (controller stand-in); start_execution and
+// start_pc are brought out so tests can see EXECUTE pulses and queued starts.
+
+module uart_dma_harness #(
+    parameter CLOCK_FREQ = 6_000_000,
+    parameter BAUD_RATE  = 100_000
+)(
+    input  logic clk,
+    input  logic rst_n,
+    input  logic uart_rx,
+    output logic uart_tx,
+    input  logic halt_req,
+    output logic start_execution,
+    output logic [4:0] start_pc
+);
+
+logic         ub_wr_en;
+logic [8:0]   ub_wr_addr;
+logic [255:0] ub_wr_data;
+logic         ub_rd_en;
+logic [8:0]   ub_rd_addr;
+logic [255:0] ub_rd_data;
+logic         ub_rd_valid;
+logic         ub_busy;
+logic         ub_done;
+
+logic         instr_wr_en;
+logic [4:0]   instr_wr_addr;
+logic [31:0]  instr_wr_data;
+logic [31:0]  instruction_memory [0:31];
+
+always_ff @(posedge clk) begin
+    if (instr_wr_en)
+        instruction_memory[instr_wr_addr] <= instr_wr_data;
+end
+
+uart_dma_basys3 #(
+    .CLOCK_FREQ(CLOCK_FREQ),
+    .BAUD_RATE(BAUD_RATE)
+) dma (
+    .clk            (clk),
+    .rst_n          (rst_n),
+    .uart_rx        (uart_rx),
+    .uart_tx        (uart_tx),
+    .ub_wr_en       (ub_wr_en),
+    .ub_wr_addr     (ub_wr_addr),
+    .ub_wr_count    (),
+    .ub_wr_data     (ub_wr_data),
+    .ub_rd_en       (ub_rd_en),
+    .ub_rd_addr     (ub_rd_addr),
+    .ub_rd_count    (),
+    .ub_rd_data     (ub_rd_data),
+    .ub_rd_valid    (ub_rd_valid),
+    .wt_wr_en       (),
+    .wt_wr_addr     (),
+    .wt_wr_data     (),
+    .instr_wr_en    (instr_wr_en),
+    .instr_wr_addr  (instr_wr_addr),
+    .instr_wr_data  (instr_wr_data),
+    .start_execution(start_execution),
+    .start_pc       (start_pc),
+    .sys_busy       (1'b0),
+    .sys_done       (1'b0),
+    .vpu_busy       (1'b0),
+    .vpu_done       (1'b0),
+    .ub_busy        (ub_busy),
+    .ub_done        (ub_done),
+    .halt_req       (halt_req)
+);
+
+unified_buffer ub (
+    .clk        (clk),
+    .rst_n      (rst_n),
+    .ub_rd_en   (ub_rd_en),
+    .ub_rd_addr (ub_rd_addr),
+    .ub_rd_data (ub_rd_data),
+    .ub_rd_valid(ub_rd_valid),
+    .ub_wr_en   (ub_wr_en),
+    .ub_wr_addr (ub_wr_addr),
+    .ub_wr_data (ub_wr_data),
+    .ub_wr_ready(),
+    .ub_busy    (ub_busy),
+    .ub_done    (ub_done)
+);
+
+endmodule